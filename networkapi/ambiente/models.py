@@ -417,6 +417,12 @@ class EnvironmentVip(BaseModel):
 
     log = logging.getLogger('EnvironmentVip')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'environments': 'environmentenvironmentvip_set',
+        'optionsvip': 'optionvipenvironmentvip_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'ambientevip'
         managed = True
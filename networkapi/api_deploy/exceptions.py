@@ -31,6 +31,25 @@ class ConnectionException(APIException):
     default_detail = 'Failed trying to connect to equipment.'
 
 
+class DeployTimeoutException(APIException):
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    default_detail = 'Timeout applying config on equipment.'
+
+    def __init__(self, equipment_id=None):
+        self.detail = u'Timeout applying config on equipment %s.' % (
+            equipment_id)
+
+
+class EquipmentsDeployException(APIException):
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    default_detail = 'Error applying config on equipments.'
+
+    def __init__(self, results=None):
+        self.detail = u'Error applying config on equipments: %s' % (
+            u', '.join(u'%s: %s' % (result.equipment_id, result.error)
+                       for result in results or []))
+
+
 class InvalidCommandException(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = 'Error: Invalid command sent to equipment. Please check template syntax or module used.'
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import threading
+import time
+from Queue import Empty
+from Queue import Queue
+
+from django.db import connection
+
+from networkapi.api_deploy import exceptions
+from networkapi.extra_logging import local
+from networkapi.settings import DEPLOY_EQUIPMENT_TIMEOUT
+from networkapi.settings import DEPLOY_MAX_WORKERS
+
+log = logging.getLogger(__name__)
+
+# Attributes of networkapi.extra_logging.local copied to workers, so logs
+# of a deploy keep the request that started it.
+LOCAL_ATTRS = ('request_id', 'request_user', 'request_path',
+               'request_context')
+
+
+class DeployTask(object):
+
+    """Deploy in an equipment.
+
+    deploy: function without arguments that applies config and returns
+            equipment output.
+    rollback: function without arguments that undoes deploy, used by
+              atomic runs.
+    """
+
+    def __init__(self, equipment, deploy, rollback=None):
+        self.equipment = equipment
+        self.deploy = deploy
+        self.rollback = rollback
+
+
+class DeployResult(object):
+
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+    TIMEOUT = 'timeout'
+    ROLLED_BACK = 'rolled_back'
+
+    def __init__(self, equipment_id):
+        self.equipment_id = equipment_id
+        self.status = None
+        self.output = None
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def failed(self):
+        return self.status in (self.FAILURE, self.TIMEOUT)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'output': self.output,
+            'error': unicode(self.error) if self.error else None,
+            'elapsed': self.elapsed
+        }
+
+
+class DeployExecutor(object):
+
+    """Runs deploys in many equipments in a bounded pool of threads.
+
+    Each deploy has timeout seconds to finish from the moment it starts.
+    A deploy that times out can not be interrupted, its worker is left
+    behind and another one takes the remaining deploys.
+
+    With atomic, deploys that succeeded are rolled back when any other
+    fails.
+    """
+
+    def __init__(self, max_workers=DEPLOY_MAX_WORKERS,
+                 timeout=DEPLOY_EQUIPMENT_TIMEOUT, atomic=False):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.atomic = atomic
+
+    def run(self, tasks):
+        """Runs tasks and waits them.
+
+        :param tasks: list of DeployTask, at most one by equipment.
+
+        Returns: dict of equipment id -> DeployResult
+        """
+
+        results = self._run(tasks, 'deploy')
+
+        if self.atomic and any(result.failed for result in results.values()):
+            self._rollback(tasks, results)
+
+        return results
+
+    def _rollback(self, tasks, results):
+        rollback_tasks = [
+            DeployTask(task.equipment, task.rollback) for task in tasks
+            if task.rollback is not None and
+            results[task.equipment.id].status == DeployResult.SUCCESS]
+
+        for equipment_id, rollback in self._run(
+                rollback_tasks, 'rollback').iteritems():
+            result = results[equipment_id]
+            if rollback.failed:
+                log.error(u'Rollback of deploy in equipment %s failed: %s',
+                          equipment_id, rollback.error)
+                result.error = rollback.error
+            else:
+                result.status = DeployResult.ROLLED_BACK
+                result.output = rollback.output
+
+    def _run(self, tasks, action):
+        # action only names workers and logs, tasks run their deploy.
+        results = dict()
+        if not tasks:
+            return results
+
+        condition = threading.Condition()
+        queue = Queue()
+        for task in tasks:
+            results[task.equipment.id] = DeployResult(task.equipment.id)
+            queue.put(task)
+
+        context = dict((attr, getattr(local, attr)) for attr in LOCAL_ATTRS
+                       if hasattr(local, attr))
+
+        def worker():
+            for attr, value in context.iteritems():
+                setattr(local, attr, value)
+            try:
+                while True:
+                    try:
+                        task = queue.get_nowait()
+                    except Empty:
+                        return
+                    self._execute(task, action, results[task.equipment.id],
+                                  condition)
+            finally:
+                # Workers do not keep database connections open.
+                connection.close()
+
+        def start_worker():
+            thread = threading.Thread(target=worker,
+                                      name='DeployExecutor-%s' % action)
+            thread.daemon = True
+            thread.start()
+
+        for i in xrange(min(self.max_workers, len(tasks))):
+            start_worker()
+
+        with condition:
+            while True:
+                now = time.time()
+                pending = [result for result in results.values()
+                           if result.status is None]
+                if not pending:
+                    break
+
+                deadlines = list()
+                for result in pending:
+                    if result.started is None:
+                        continue
+                    deadline = result.started + self.timeout
+                    if deadline <= now:
+                        result.status = DeployResult.TIMEOUT
+                        result.error = exceptions.DeployTimeoutException(
+                            result.equipment_id)
+                        result.finished = now
+                        log.error(u'Timeout in %s of equipment %s.', action,
+                                  result.equipment_id)
+                        if not queue.empty():
+                            start_worker()
+                    else:
+                        deadlines.append(deadline)
+
+                # Woken up by workers when deploys start or finish.
+                condition.wait(min(deadlines) - now if deadlines else None)
+
+        return results
+
+    def _execute(self, task, action, result, condition):
+        with condition:
+            result.started = time.time()
+            condition.notify_all()
+
+        try:
+            output = task.deploy()
+            status, error = DeployResult.SUCCESS, None
+        except Exception, e:
+            log.error(u'Error in %s of equipment %s: %s', action,
+                      task.equipment.id, e)
+            output, status, error = None, DeployResult.FAILURE, e
+
+        with condition:
+            # Result of a deploy that timed out is already set.
+            if result.status is None:
+                result.output = output
+                result.status = status
+                result.error = error
+                result.finished = time.time()
+            condition.notify_all()
+
+
+def run_deploy(tasks, atomic=False):
+    """Runs tasks in DeployExecutor and returns their outputs.
+
+    Raises: exception of task that failed, see raise_for_failures.
+    """
+
+    results = DeployExecutor(atomic=atomic).run(tasks)
+    raise_for_failures(tasks, results)
+
+    return dict((equipment_id, result.output)
+                for equipment_id, result in results.iteritems())
+
+
+def raise_for_failures(tasks, results):
+    """Raises exception of the task that failed or, when many failed,
+    EquipmentsDeployException with all of them.
+    """
+
+    failed = [results[task.equipment.id] for task in tasks
+              if results[task.equipment.id].failed]
+
+    if len(failed) == 1:
+        raise failed[0].error
+    if failed:
+        raise exceptions.EquipmentsDeployException(failed)
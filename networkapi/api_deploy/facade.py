@@ -17,6 +17,9 @@ import logging
 import os
 
 from networkapi.api_deploy import exceptions
+from networkapi.api_deploy.executor import DeployTask
+from networkapi.api_deploy.executor import run_deploy
+from networkapi.api_deploy.templates import ConfigFile
 from networkapi.api_equipment.exceptions import AllEquipmentsAreInMaintenanceException
 from networkapi.api_rest import exceptions as api_exceptions
 from networkapi.distributedlock import distributedlock
@@ -47,6 +50,8 @@ def _applyconfig(equipment, filename, equipment_access=None, source_server=None,
     Args:
             equipment: networkapi.equipamento.Equipamento()
             filename: relative file path from TFTPBOOT_FILES_PATH to apply in equipment
+                      or networkapi.api_deploy.templates.ConfigFile(), written
+                      to file only here
             equipment_access: networkapi.equipamento.EquipamentoAcesso() to use
             source_server: source TFTP server address
             port: ssh tcp port
@@ -63,6 +68,9 @@ def _applyconfig(equipment, filename, equipment_access=None, source_server=None,
     if source_server is None:
         source_server = TFTP_SERVER_ADDR
 
+    if isinstance(filename, ConfigFile):
+        filename = filename.save()
+
     # TODO: Handle exceptions from the following methods and generate response
     # for the caller
 
@@ -113,6 +121,15 @@ def create_file_from_script(script, prefix_name=''):
     return CONFIG_FILES_REL_PATH + filename_out
 
 
+def _validate_filename(rel_filename):
+    if isinstance(rel_filename, ConfigFile):
+        rel_filename = rel_filename.rel_path
+
+    path = os.path.abspath(TFTPBOOT_FILES_PATH + rel_filename)
+    if not path.startswith(TFTPBOOT_FILES_PATH):
+        raise exceptions.InvalidFilenameException(rel_filename)
+
+
 def deploy_config_in_equipment_synchronous(rel_filename, equipment, lockvar,
                                            tftpserver=None,
                                            equipment_access=None):
@@ -120,7 +137,7 @@ def deploy_config_in_equipment_synchronous(rel_filename, equipment, lockvar,
 
     Args:
             rel_filename: relative file path from TFTPBOOT_FILES_PATH to apply
-                          in equipment
+                          in equipment, or ConfigFile()
             equipment: networkapi.equipamento.Equipamento() or Equipamento().id
             lockvar: distributed lock variable to use when applying config to
                      equipment
@@ -133,10 +150,7 @@ def deploy_config_in_equipment_synchronous(rel_filename, equipment, lockvar,
     Raises:
     """
 
-    # validate filename
-    path = os.path.abspath(TFTPBOOT_FILES_PATH + rel_filename)
-    if not path.startswith(TFTPBOOT_FILES_PATH):
-        raise exceptions.InvalidFilenameException(rel_filename)
+    _validate_filename(rel_filename)
 
     if type(equipment) is int:
         equipment = Equipamento.get_by_pk(equipment)
@@ -160,7 +174,7 @@ def deploy_config_in_equipment(rel_filename, equipment, tftpserver=None,
 
     Args:
             rel_filename: relative file path from TFTPBOOT_FILES_PATH to apply
-                          in equipment
+                          in equipment, or ConfigFile()
             equipment: networkapi.equipamento.Equipamento() or Equipamento().id
             lockvar: distributed lock variable to use when applying config to
                      equipment
@@ -173,10 +187,7 @@ def deploy_config_in_equipment(rel_filename, equipment, tftpserver=None,
     Raises:
     """
 
-    # validate filename
-    path = os.path.abspath(TFTPBOOT_FILES_PATH + rel_filename)
-    if not path.startswith(TFTPBOOT_FILES_PATH):
-        raise exceptions.InvalidFilenameException(rel_filename)
+    _validate_filename(rel_filename)
 
     if type(equipment) is int:
         equipment = Equipamento.get_by_pk(equipment)
@@ -191,3 +202,54 @@ def deploy_config_in_equipment(rel_filename, equipment, tftpserver=None,
 
     return _applyconfig(
         equipment, rel_filename, equipment_access, tftpserver)
+
+
+def deploy_config_task(rel_filename, equipment, lockvar=None,
+                       rollback=None, tftpserver=None):
+    """Creates task that applies configuration file on equipment
+
+    Args:
+            rel_filename: relative file path from TFTPBOOT_FILES_PATH to apply
+                          in equipment, or ConfigFile()
+            equipment: networkapi.equipamento.Equipamento()
+            lockvar: distributed lock variable to hold while applying config,
+                     when it is not held by caller
+            rollback: function without arguments that returns the relative
+                      file path or ConfigFile() of config that undoes
+                      rel_filename
+            tftpserver: source TFTP server address
+
+    Returns:
+            networkapi.api_deploy.executor.DeployTask()
+    """
+
+    def apply_file(filename):
+        if lockvar is not None:
+            return deploy_config_in_equipment_synchronous(
+                filename, equipment, lockvar, tftpserver)
+        return deploy_config_in_equipment(filename, equipment, tftpserver)
+
+    return DeployTask(
+        equipment,
+        lambda: apply_file(rel_filename),
+        (lambda: apply_file(rollback())) if rollback is not None else None)
+
+
+def deploy_config_in_equipments(tasks, atomic=False):
+    """Apply configuration on many equipments in parallel
+
+    Args:
+            tasks: list of networkapi.api_deploy.executor.DeployTask(), at
+                   most one by equipment
+            atomic: undo deploys in every equipment when any of them fails,
+                    for tasks with rollback
+
+    Returns:
+            dict of equipment id -> equipment output
+
+    Raises:
+            exception of the deploy that failed or EquipmentsDeployException
+            when many failed
+    """
+
+    return run_deploy(tasks, atomic)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import os
+import threading
+import time
+
+from django.template import Template
+
+from networkapi.equipamento.models import EquipamentoRoteiro
+from networkapi.settings import CONFIG_FILES_MAX_AGE
+
+log = logging.getLogger(__name__)
+
+__all__ = ('TemplateRegistry', 'templates', 'get_roteiros', 'ConfigFile',
+           'cleanup_config_files')
+
+# Seconds between cleanups of a directory of config files by process
+CLEANUP_INTERVAL = 3600
+
+
+class TemplateRegistry(object):
+
+    """Per-process compiled config templates, by path.
+
+    Template is compiled again when its file is modified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = dict()
+        self._pid = os.getpid()
+
+    def get(self, path):
+        """Returns django Template of file in path.
+
+        Raises:
+                IOError: if cannot read file
+                TemplateSyntaxError: if file is not a valid template
+        """
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError, e:
+            raise IOError(e.errno, e.strerror, path)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._templates = dict()
+
+            cached = self._templates.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        file_handle = open(path, 'r')
+        try:
+            template = Template(file_handle.read())
+        finally:
+            file_handle.close()
+
+        with self._lock:
+            self._templates[path] = (mtime, template)
+
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates = dict()
+
+
+templates = TemplateRegistry()
+
+
+def get_roteiros(equipments, template_types):
+    """Returns file names of templates of equipments in one query.
+
+    Args:
+            equipments: list of networkapi.equipamento.Equipamento() or ids
+            template_types: list of types of template
+
+    Returns:
+            dict of (equipment id, template type) -> roteiro file name,
+            without equipments that have none or many roteiros of type
+    """
+
+    equipment_ids = set(getattr(equipment, 'id', equipment)
+                        for equipment in equipments)
+
+    roteiros = dict()
+    duplicated = set()
+    for equipment_id, template_type, roteiro in \
+            EquipamentoRoteiro.objects.filter(
+                equipamento__in=equipment_ids,
+                roteiro__tipo_roteiro__tipo__in=template_types
+            ).values_list('equipamento', 'roteiro__tipo_roteiro__tipo',
+                          'roteiro__roteiro'):
+        key = (equipment_id, template_type)
+        if key in roteiros:
+            duplicated.add(key)
+        roteiros[key] = roteiro
+
+    for key in duplicated:
+        log.error('Many templates of type %s in equipment %s.' %
+                  (key[1], key[0]))
+        del roteiros[key]
+
+    return roteiros
+
+
+class ConfigFile(object):
+
+    """Config rendered in memory, written to file only when deployed.
+
+    Args:
+            directory: absolute path of directory of file
+            rel_directory: path of directory relative to TFTPBOOT_FILES_PATH
+            filename: name of file
+            content: rendered config
+    """
+
+    def __init__(self, directory, rel_directory, filename, content):
+        self.directory = directory
+        self.rel_path = rel_directory + filename
+        self.path = directory + filename
+        self.content = content
+
+        self._saved = False
+
+    def save(self):
+        """Writes config to file, once.
+
+        Returns:
+                file name with path relative to TFTPBOOT_FILES_PATH
+
+        Raises:
+                IOError: if cannot write file
+        """
+
+        if not self._saved:
+            cleanup_config_files(self.directory)
+            try:
+                file_handle = open(self.path, 'w')
+                file_handle.write(self.content)
+                file_handle.close()
+            except IOError, e:
+                log.error('Error writing to config file: %s' % self.path)
+                raise e
+            self._saved = True
+
+        return self.rel_path
+
+    def __repr__(self):
+        return '<ConfigFile: %s>' % self.rel_path
+
+
+_cleanups = dict()
+_cleanups_lock = threading.Lock()
+
+
+def cleanup_config_files(directory, max_age=None):
+    """Removes files of directory older than max_age seconds, at most once
+    every CLEANUP_INTERVAL seconds by process.
+
+    Args:
+            directory: absolute path of directory of config files
+            max_age: defaults to CONFIG_FILES_MAX_AGE, 0 keeps files
+
+    Returns:
+            number of files removed
+    """
+
+    if max_age is None:
+        max_age = CONFIG_FILES_MAX_AGE
+    if not max_age:
+        return 0
+
+    now = time.time()
+    with _cleanups_lock:
+        if now - _cleanups.get(directory, 0) < CLEANUP_INTERVAL:
+            return 0
+        _cleanups[directory] = now
+
+    try:
+        filenames = os.listdir(directory)
+    except OSError, e:
+        log.warning('Failure to list config files of %s: %s' %
+                    (directory, e))
+        return 0
+
+    removed = 0
+    for filename in filenames:
+        path = os.path.join(directory, filename)
+        try:
+            if os.path.isfile(path) and \
+                    now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed += 1
+        except OSError, e:
+            # Removed by other process
+            log.debug('Failure to remove config file %s: %s' % (path, e))
+
+    if removed:
+        log.info('Removed %s config files older than %ss of %s' %
+                 (removed, max_age, directory))
+
+    return removed
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from networkapi.api_deploy.exceptions import DeployTimeoutException
+from networkapi.api_deploy.exceptions import EquipmentsDeployException
+from networkapi.api_deploy.executor import DeployExecutor
+from networkapi.api_deploy.executor import DeployResult
+from networkapi.api_deploy.executor import DeployTask
+from networkapi.api_deploy.executor import run_deploy
+
+
+class FakeEquipment(object):
+
+    def __init__(self, id):
+        self.id = id
+
+
+def task(equipment_id, deploy, rollback=None):
+    return DeployTask(FakeEquipment(equipment_id), deploy, rollback)
+
+
+def fail():
+    raise ValueError('failed')
+
+
+class DeployExecutorTestCase(unittest.TestCase):
+
+    def test_deploys_run_in_parallel(self):
+        def deploy():
+            time.sleep(0.05)
+            return 'ok'
+
+        tasks = [task(i, deploy) for i in xrange(4)]
+        start = time.time()
+        results = DeployExecutor(max_workers=4, timeout=5).run(tasks)
+
+        self.assertLess(time.time() - start, 0.2)
+        self.assertEquals([DeployResult.SUCCESS] * 4,
+                          [results[i].status for i in xrange(4)])
+
+    def test_workers_are_bounded(self):
+        running = list()
+        peak = list()
+        lock = threading.Lock()
+
+        def deploy():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        DeployExecutor(max_workers=2, timeout=5).run(
+            [task(i, deploy) for i in xrange(6)])
+
+        self.assertEquals(2, max(peak))
+
+    def test_timeout(self):
+        event = threading.Event()
+
+        results = DeployExecutor(max_workers=1, timeout=0.05).run([
+            task(1, lambda: event.wait(5)),
+            task(2, lambda: 'ok')])
+        event.set()
+
+        self.assertEquals(DeployResult.TIMEOUT, results[1].status)
+        self.assertIsInstance(results[1].error, DeployTimeoutException)
+        self.assertEquals(DeployResult.SUCCESS, results[2].status)
+
+    def test_atomic_rollback(self):
+        rolled_back = list()
+
+        results = DeployExecutor(timeout=5, atomic=True).run([
+            task(1, lambda: 'ok', lambda: rolled_back.append(1)),
+            task(2, fail, lambda: rolled_back.append(2))])
+
+        self.assertEquals([1], rolled_back)
+        self.assertEquals(DeployResult.ROLLED_BACK, results[1].status)
+        self.assertEquals(DeployResult.FAILURE, results[2].status)
+
+    def test_run_deploy_raises_error_of_failure(self):
+        with self.assertRaises(ValueError):
+            run_deploy([task(1, lambda: 'ok'), task(2, fail)])
+
+        with self.assertRaises(EquipmentsDeployException):
+            run_deploy([task(1, fail), task(2, fail)])
+
+        self.assertEquals({1: 'ok', 2: 'ok'},
+                          run_deploy([task(1, lambda: 'ok'),
+                                      task(2, lambda: 'ok')]))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import patch
+
+from networkapi.api_deploy import templates
+from networkapi.api_deploy.templates import ConfigFile
+from networkapi.api_deploy.templates import TemplateRegistry
+
+
+class TemplatesDirTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp() + '/'
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, filename, content, age=0):
+        path = self.directory + filename
+        with open(path, 'w') as file_handle:
+            file_handle.write(content)
+        if age:
+            mtime = time.time() - age
+            os.utime(path, (mtime, mtime))
+        return path
+
+
+class TemplateRegistryTestCase(TemplatesDirTestCase):
+
+    def test_template_is_compiled_once_while_not_modified(self):
+        path = self.write('vlan', 'vlan {{ VLAN_NUMBER }}', age=10)
+        registry = TemplateRegistry()
+
+        template = registry.get(path)
+
+        self.assertIs(template, registry.get(path))
+
+    def test_modified_template_is_compiled_again(self):
+        path = self.write('vlan', 'vlan {{ VLAN_NUMBER }}', age=10)
+        registry = TemplateRegistry()
+        template = registry.get(path)
+
+        self.write('vlan', 'no vlan {{ VLAN_NUMBER }}')
+
+        self.assertIsNot(template, registry.get(path))
+
+    def test_missing_template_raises_io_error(self):
+        self.assertRaises(IOError, TemplateRegistry().get,
+                          self.directory + 'missing')
+
+
+class GetRoteirosTestCase(unittest.TestCase):
+
+    def test_roteiros_of_equipments_in_one_query(self):
+        with patch.object(templates, 'EquipamentoRoteiro') as model:
+            model.objects.filter.return_value.values_list.return_value = [
+                (1, 'ipv4_activate', 'r1_activate'),
+                (1, 'ipv4_deactivate', 'r1_deactivate'),
+                (2, 'ipv4_activate', 'r2_activate'),
+                (2, 'ipv4_activate', 'r2_activate_other'),
+            ]
+
+            roteiros = templates.get_roteiros(
+                [1, 2], ['ipv4_activate', 'ipv4_deactivate'])
+
+        self.assertEqual(1, model.objects.filter.call_count)
+        # ambiguous templates are not chosen
+        self.assertEqual({
+            (1, 'ipv4_activate'): 'r1_activate',
+            (1, 'ipv4_deactivate'): 'r1_deactivate',
+        }, roteiros)
+
+
+class ConfigFileTestCase(TemplatesDirTestCase):
+
+    def setUp(self):
+        super(ConfigFileTestCase, self).setUp()
+        patcher = patch.object(templates, 'CONFIG_FILES_MAX_AGE', 60)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        templates._cleanups.clear()
+
+    def test_file_is_written_only_when_saved(self):
+        config = ConfigFile(self.directory, 'network/', 'equip1', 'vlan 2')
+
+        self.assertFalse(os.path.exists(config.path))
+        self.assertEqual('network/equip1', config.save())
+
+        with open(config.path) as file_handle:
+            self.assertEqual('vlan 2', file_handle.read())
+
+    def test_file_is_written_once(self):
+        config = ConfigFile(self.directory, 'network/', 'equip1', 'vlan 2')
+        config.save()
+        os.remove(config.path)
+
+        config.save()
+
+        self.assertFalse(os.path.exists(config.path))
+
+    def test_old_files_are_removed(self):
+        self.write('old', 'vlan 1', age=120)
+        self.write('new', 'vlan 1', age=30)
+
+        ConfigFile(self.directory, 'network/', 'equip1', 'vlan 2').save()
+
+        self.assertEqual(['equip1', 'new'],
+                         sorted(os.listdir(self.directory)))
+
+    def test_files_are_removed_once_by_interval(self):
+        templates.cleanup_config_files(self.directory)
+        self.write('old', 'vlan 1', age=120)
+
+        self.assertEqual(0, templates.cleanup_config_files(self.directory))
+        self.assertTrue(os.path.exists(self.directory + 'old'))
+
+    def test_files_are_kept_without_max_age(self):
+        self.write('old', 'vlan 1', age=120)
+
+        self.assertEqual(
+            0, templates.cleanup_config_files(self.directory, max_age=0))
+        self.assertTrue(os.path.exists(self.directory + 'old'))
@@ -23,9 +23,11 @@ from rest_framework.response import Response
 
 from networkapi.api_deploy import exceptions
 from networkapi.api_deploy import facade
+from networkapi.api_deploy.executor import DeployExecutor
 from networkapi.api_deploy.permissions import DeployConfig
 from networkapi.api_rest import exceptions as api_exceptions
 from networkapi.distributedlock import LOCK_EQUIPMENT_DEPLOY_CONFIG_USERSCRIPT
+from networkapi.equipamento.models import Equipamento
 from networkapi.queue_tools import queue_keys
 from networkapi.queue_tools.rabbitmq import QueueManager
 from networkapi.settings import USER_SCRIPTS_REL_PATH
@@ -106,19 +108,36 @@ def deploy_sync_copy_script_to_multiple_equipments(request):
 
         script_file = facade.create_file_from_script(
             script, USER_SCRIPTS_REL_PATH)
+
+        # Deploys in equipments run in parallel, an error in one of them
+        # does not stop the others.
+        errors = dict()
+        tasks = list()
         for id_equip in id_equips:
             equipment_id = int(id_equip)
             lockvar = LOCK_EQUIPMENT_DEPLOY_CONFIG_USERSCRIPT % (equipment_id)
-            output_data[equipment_id] = dict()
             try:
-                output_data[equipment_id]['output'] = facade.deploy_config_in_equipment_synchronous(
-                    script_file, equipment_id, lockvar)
-                output_data[equipment_id]['status'] = 'OK'
+                equipment = Equipamento.get_by_pk(equipment_id)
+                tasks.append(facade.deploy_config_task(
+                    script_file, equipment, lockvar))
             except Exception, e:
-                log.error('Error applying script file to equipment_id %s: %s' % (
-                    equipment_id, e))
-                output_data[equipment_id]['output'] = str(e)
-                output_data[equipment_id]['status'] = 'ERROR'
+                errors[equipment_id] = e
+
+        results = DeployExecutor().run(tasks)
+        for equipment_id, result in results.iteritems():
+            if result.failed:
+                errors[equipment_id] = result.error
+            else:
+                output_data[equipment_id] = dict()
+                output_data[equipment_id]['output'] = result.output
+                output_data[equipment_id]['status'] = 'OK'
+
+        for equipment_id, e in errors.iteritems():
+            log.error('Error applying script file to equipment_id %s: %s' % (
+                equipment_id, e))
+            output_data[equipment_id] = dict()
+            output_data[equipment_id]['output'] = str(e)
+            output_data[equipment_id]['status'] = 'ERROR'
 
         return Response(output_data)
     except KeyError, key:
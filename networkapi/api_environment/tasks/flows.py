@@ -3,12 +3,15 @@
 from networkapi import settings
 from networkapi import celery_app
 from networkapi.api_task.classes import BaseTask
+from networkapi.plugins.SDN import inventory
 
 
 @celery_app.task(bind=True, base=BaseTask, serializer='pickle')
 def async_add_flow(self, plugins, user_id, data):
     """ Asynchronous flows insertion into environment equipment """
 
+    inventory.prefetch(plugins)
+
     for plugin in plugins:
         plugin.add_flow(data=data)
 
@@ -17,5 +20,7 @@ def async_add_flow(self, plugins, user_id, data):
 def async_flush_environment(self, plugins, user_id, data):
     """ Asynchronous flush and restore of flows of an environment """
 
+    inventory.prefetch(plugins)
+
     for plugin in plugins:
         plugin.update_all_flows(data=data)
@@ -90,7 +90,7 @@ class ModelV3Serializer(DynamicFieldsModelSerializer):
 
     def get_brand(self, obj):
 
-        return self.extends_serializer(obj.marca, 'brand')
+        return self.extends_serializer(obj, 'brand')
 
     def get_serializers(self):
         if not self.mapping:
@@ -99,12 +99,14 @@ class ModelV3Serializer(DynamicFieldsModelSerializer):
                     'serializer': BrandV3Serializer,
                     'kwargs': {
                         'source': 'id'
-                    }
+                    },
+                    'obj': 'marca'
                 },
                 'brand__details': {
                     'serializer': BrandV3Serializer,
                     'kwargs': {
-                    }
+                    },
+                    'obj': 'marca'
                 },
             }
 
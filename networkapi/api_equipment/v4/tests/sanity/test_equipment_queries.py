@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from django.test.client import Client
+
+from networkapi.test.test_case import NetworkApiTestCase
+from networkapi.util.geral import prepare_url
+
+log = logging.getLogger(__name__)
+
+
+class EquipmentQueriesTestCase(NetworkApiTestCase):
+
+    """Number of queries to get a page of equipments does not depend on
+    size of page.
+    """
+
+    fixtures = [
+        'networkapi/system/fixtures/initial_variables.json',
+        'networkapi/usuario/fixtures/initial_usuario.json',
+        'networkapi/grupo/fixtures/initial_ugrupo.json',
+        'networkapi/usuario/fixtures/initial_usuariogrupo.json',
+        'networkapi/grupo/fixtures/initial_permissions.json',
+        'networkapi/grupo/fixtures/initial_permissoes_administrativas.json',
+        'networkapi/grupo/fixtures/initial_equip_grupos.json',
+        'networkapi/grupo/fixtures/initial_direitos_grupos_equip.json',
+
+        'networkapi/api_equipment/v4/fixtures/initial_pre_equipment.json',
+        'networkapi/api_equipment/v4/fixtures/initial_equipment.json',
+        'networkapi/api_equipment/v4/fixtures/initial_equipment_group.json',
+        'networkapi/api_equipment/v4/fixtures/initial_as.json',
+        'networkapi/api_equipment/v4/fixtures/initial_as_equipment.json',
+        'networkapi/api_equipment/v4/fixtures/initial_vrf.json',
+        'networkapi/api_equipment/v4/fixtures/initial_virtual_interface.json',
+        'networkapi/api_equipment/v4/fixtures/initial_ipv4.json',
+        'networkapi/api_equipment/v4/fixtures/initial_ipv4_equipment.json',
+        'networkapi/api_equipment/v4/fixtures/initial_ipv6.json',
+        'networkapi/api_equipment/v4/fixtures/initial_ipv6_equipment.json',
+    ]
+
+    def setUp(self):
+        self.client = Client()
+        self.authorization = self.get_http_authorization('test')
+
+    def tearDown(self):
+        pass
+
+    def get_page(self, size, **kwargs):
+        search = {
+            'start_record': 0,
+            'end_record': size,
+            'asorting_cols': ['id'],
+            'searchable_columns': [],
+            'extends_search': []
+        }
+
+        get_url = prepare_url('/api/v4/equipment/', search=search, **kwargs)
+
+        response = self.client.get(
+            get_url,
+            HTTP_AUTHORIZATION=self.authorization
+        )
+
+        self.compare_status(200, response.status_code)
+
+        return response.data['equipments']
+
+    def assert_queries_by_page(self, **kwargs):
+        queries_one, equipments = self.count_queries(
+            self.get_page, 1, **kwargs)
+        self.assertEqual([1], [equipment['id'] for equipment in equipments])
+
+        queries_all, equipments = self.count_queries(
+            self.get_page, 100, **kwargs)
+        self.assertEqual(
+            [1, 2, 3, 4, 5, 6],
+            [equipment['id'] for equipment in equipments]
+        )
+
+        self.assertEqual(
+            queries_one,
+            queries_all,
+            'Queries should be same for pages of 1 and %s equipments. '
+            'Expected: %s, Received: %s' %
+            (len(equipments), queries_one, queries_all)
+        )
+
+    def test_get_equipments_with_details_of_relations(self):
+        """V4 Test of queries to get equipments with details of model
+        and equipment type.
+        """
+
+        self.assert_queries_by_page(
+            include=['model__details', 'equipment_type__details'])
+
+    def test_get_equipments_with_ips_and_environments(self):
+        """V4 Test of queries to get equipments with ips, groups and
+        environments.
+        """
+
+        self.assert_queries_by_page(
+            include=['ipsv4', 'ipsv6', 'groups', 'environments'])
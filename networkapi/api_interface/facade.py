@@ -19,14 +19,17 @@ import re
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.template import Context
-from django.template import Template
 
 from networkapi.api_deploy.facade import deploy_config_in_equipment_synchronous
+from networkapi.api_deploy.facade import deploy_config_in_equipments
+from networkapi.api_deploy.facade import deploy_config_task
+from networkapi.api_deploy.templates import ConfigFile
+from networkapi.api_deploy.templates import get_roteiros
+from networkapi.api_deploy.templates import templates
 from networkapi.api_interface import exceptions
 from networkapi.distributedlock import LOCK_EQUIPMENT
 from networkapi.distributedlock import LOCK_INTERFACE_DEPLOY_CONFIG
 from networkapi.equipamento.models import Equipamento
-from networkapi.equipamento.models import EquipamentoRoteiro
 from networkapi.exception import InvalidValueError
 from networkapi.extra_logging import local
 from networkapi.extra_logging import NO_REQUEST_ID
@@ -66,16 +69,19 @@ def generate_delete_file(user, equip_id, interface_list, channel):
     filename_out = 'equip_' + \
         str(equip_id) + '_channel_' + str(channel.id) + \
         '_remove_' + str(request_id)
-    filename_to_save = INTERFACE_CONFIG_FILES_PATH + filename_out
-    rel_file_to_deploy = INTERFACE_CONFIG_TOAPPLY_REL_PATH + filename_out
 
     key_dict['PORTCHANNEL_NAME'] = channel.nome
 
+    roteiros = get_roteiros(
+        [int(equip_id)], [TEMPLATE_REMOVE_INTERFACE, TEMPLATE_REMOVE_CHANNEL])
+    interface_template_file = None
+
     for i in interface_list:
         key_dict['INTERFACE_NAME'] = i.interface
         try:
-            interface_template_file = _load_template_file(
-                int(equip_id), TEMPLATE_REMOVE_INTERFACE)
+            if interface_template_file is None:
+                interface_template_file = _load_template_file(
+                    int(equip_id), TEMPLATE_REMOVE_INTERFACE, roteiros)
             config_to_be_saved += interface_template_file.render(
                 Context(key_dict))
         except exceptions.InterfaceTemplateException, e:
@@ -88,22 +94,16 @@ def generate_delete_file(user, equip_id, interface_list, channel):
 
     try:
         channel_template_file = _load_template_file(
-            int(equip_id), TEMPLATE_REMOVE_CHANNEL)
+            int(equip_id), TEMPLATE_REMOVE_CHANNEL, roteiros)
         config_to_be_saved += channel_template_file.render(Context(key_dict))
     except KeyError, exception:
         log.error('Erro: %s ' % exception)
         raise exceptions.InvalidKeyException(exception)
 
-    # Save new file
-    try:
-        file_handle = open(filename_to_save, 'w')
-        file_handle.write(config_to_be_saved)
-        file_handle.close()
-    except IOError, e:
-        log.error('Error writing to config file: %s' % filename_to_save)
-        raise e
-
-    return rel_file_to_deploy
+    # Written to file when deployed
+    return ConfigFile(INTERFACE_CONFIG_FILES_PATH,
+                      INTERFACE_CONFIG_TOAPPLY_REL_PATH,
+                      filename_out, config_to_be_saved)
 
 
 def delete_channel(user, equip_id, interface_list, channel):
@@ -164,15 +164,18 @@ def generate_and_deploy_channel_config_sync(user, id_channel):
         file_to_deploy = _generate_config_file(grouped_interfaces)
         files_to_deploy[equipment_id] = file_to_deploy
 
-    # TODO Deploy config file
-    # make separate threads
+    tasks = list()
     for equipment_id in files_to_deploy.keys():
         lockvar = LOCK_INTERFACE_DEPLOY_CONFIG % (equipment_id)
         equipamento = Equipamento.get_by_pk(equipment_id)
-        status_deploy = deploy_config_in_equipment_synchronous(
-            files_to_deploy[equipment_id], equipamento, lockvar)
+        tasks.append(deploy_config_task(
+            files_to_deploy[equipment_id], equipamento, lockvar))
 
-    return status_deploy
+    status_deploy = deploy_config_in_equipments(tasks)
+
+    # keeps output of last equipment, as when equipments were deployed one
+    # at a time
+    return status_deploy[tasks[-1].equipment.id]
 
 
 def _generate_config_file(interfaces_list):
@@ -206,10 +209,12 @@ def _generate_config_file(interfaces_list):
     request_id = getattr(local, 'request_id', NO_REQUEST_ID)
     filename_out = 'int-d_' + \
         str(interfaces_list[0].id) + '_config_' + str(request_id)
-    filename_to_save = INTERFACE_CONFIG_FILES_PATH + filename_out
-    rel_file_to_deploy = INTERFACE_CONFIG_TOAPPLY_REL_PATH + filename_out
 
-    int_template_file = _load_template_file(equipment_id, TEMPLATE_TYPE_INT)
+    roteiros = get_roteiros(
+        [equipment_id], [TEMPLATE_TYPE_INT, TEMPLATE_TYPE_CHANNEL])
+    int_template_file = _load_template_file(
+        equipment_id, TEMPLATE_TYPE_INT, roteiros)
+    channel_template_file = None
     channels_configured = {}
 
     for interface in interfaces_list:
@@ -221,8 +226,9 @@ def _generate_config_file(interfaces_list):
             if interface.channel is not None:
                 if interface.channel.id is not None and \
                         interface.channel.id not in channels_configured.keys():
-                    channel_template_file = _load_template_file(
-                        equipment_id, TEMPLATE_TYPE_CHANNEL)
+                    if channel_template_file is None:
+                        channel_template_file = _load_template_file(
+                            equipment_id, TEMPLATE_TYPE_CHANNEL, roteiros)
                     config_to_be_saved += channel_template_file.render(
                         Context(key_dict))
                     channels_configured[interface.channel.id] = 1
@@ -233,19 +239,13 @@ def _generate_config_file(interfaces_list):
             log.error('Erro: %s ' % exception)
             raise exceptions.InvalidKeyException(exception)
 
-    # Save new file
-    try:
-        file_handle = open(filename_to_save, 'w')
-        file_handle.write(config_to_be_saved)
-        file_handle.close()
-    except IOError, e:
-        log.error('Error writing to config file: %s' % filename_to_save)
-        raise e
-
-    return rel_file_to_deploy
+    # Written to file when deployed
+    return ConfigFile(INTERFACE_CONFIG_FILES_PATH,
+                      INTERFACE_CONFIG_TOAPPLY_REL_PATH,
+                      filename_out, config_to_be_saved)
 
 
-def _load_template_file(equipment_id, template_type):
+def _load_template_file(equipment_id, template_type, roteiros=None):
 
     try:
         INTERFACE_CONFIG_TEMPLATE_PATH = get_variable(
@@ -255,22 +255,21 @@ def _load_template_file(equipment_id, template_type):
             'Erro buscando a variável INTERFACE_CONFIG'
             '<TOAPPLY,TEMPLATE,FILES>_PATH.')
 
+    if roteiros is None:
+        roteiros = get_roteiros([equipment_id], [template_type])
+
     try:
-        equipment_template = (EquipamentoRoteiro.search(
-            None, equipment_id, template_type)).uniqueResult()
-    except:
+        roteiro = roteiros[(equipment_id, template_type)]
+    except KeyError:
         log.error('Template type %s not found. Equip: %s' %
                   (template_type, equipment_id))
         raise exceptions.InterfaceTemplateException()
 
-    filename_in = INTERFACE_CONFIG_TEMPLATE_PATH + \
-        equipment_template.roteiro.roteiro
+    filename_in = INTERFACE_CONFIG_TEMPLATE_PATH + roteiro
 
-    # Read contents from file
+    # Compiled once by process, while file is not modified
     try:
-        file_handle = open(filename_in, 'r')
-        template_file = Template(file_handle.read())
-        file_handle.close()
+        template_file = templates.get(filename_in)
     except IOError, e:
         log.error('Error opening template file for read: %s. Equip: %s' %
                   (filename_in, equipment_id))
@@ -19,7 +19,8 @@ from django.db import transaction
 from django.template import Context
 from django.template import Template
 
-from networkapi.api_deploy.facade import deploy_config_in_equipment_synchronous
+from networkapi.api_deploy.facade import deploy_config_in_equipments
+from networkapi.api_deploy.facade import deploy_config_task
 from networkapi.api_network import exceptions
 from networkapi.api_network.models import DHCPRelayIPv4
 from networkapi.api_network.models import DHCPRelayIPv6
@@ -117,8 +118,7 @@ def deploy_networkIPv4_configuration(user, networkipv4, equipment_list):
             # load dict with all equipment attributes
             dict_ips = get_dict_v4_to_use_in_configuration_deploy(
                 user, networkipv4, equipment_list)
-            status_deploy = dict()
-            # TODO implement threads
+            tasks = list()
             for equipment in equipment_list:
                 # generate config file
                 file_to_deploy = _generate_config_file(
@@ -126,9 +126,9 @@ def deploy_networkIPv4_configuration(user, networkipv4, equipment_list):
                 # deploy config file in equipments
                 lockvar = LOCK_EQUIPMENT_DEPLOY_CONFIG_NETWORK_SCRIPT % (
                     equipment.id)
-                status_deploy[equipment.id] = \
-                    deploy_config_in_equipment_synchronous(
-                        file_to_deploy, equipment, lockvar)
+                tasks.append(deploy_config_task(
+                    file_to_deploy, equipment, lockvar))
+            status_deploy = deploy_config_in_equipments(tasks)
 
             networkipv4.activate(user)
             transaction.commit()
@@ -160,8 +160,7 @@ def deploy_networkIPv6_configuration(user, networkipv6, equipment_list):
             # load dict with all equipment attributes
             dict_ips = get_dict_v6_to_use_in_configuration_deploy(
                 user, networkipv6, equipment_list)
-            status_deploy = dict()
-            # TODO implement threads
+            tasks = list()
             for equipment in equipment_list:
                 # generate config file
                 file_to_deploy = _generate_config_file(
@@ -169,8 +168,9 @@ def deploy_networkIPv6_configuration(user, networkipv6, equipment_list):
                 # deploy config file in equipments
                 lockvar = LOCK_EQUIPMENT_DEPLOY_CONFIG_NETWORK_SCRIPT % (
                     equipment.id)
-                status_deploy[equipment.id] = deploy_config_in_equipment_synchronous(
-                    file_to_deploy, equipment, lockvar)
+                tasks.append(deploy_config_task(
+                    file_to_deploy, equipment, lockvar))
+            status_deploy = deploy_config_in_equipments(tasks)
 
             networkipv6.activate(user)
             transaction.commit()
@@ -202,8 +202,7 @@ def remove_deploy_networkIPv4_configuration(user, networkipv4, equipment_list):
             # load dict with all equipment attributes
             dict_ips = get_dict_v4_to_use_in_configuration_deploy(
                 user, networkipv4, equipment_list)
-            status_deploy = dict()
-            # TODO implement threads
+            tasks = list()
             for equipment in equipment_list:
                 # generate config file
                 file_to_deploy = _generate_config_file(
@@ -211,8 +210,9 @@ def remove_deploy_networkIPv4_configuration(user, networkipv4, equipment_list):
                 # deploy config file in equipments
                 lockvar = LOCK_EQUIPMENT_DEPLOY_CONFIG_NETWORK_SCRIPT % (
                     equipment.id)
-                status_deploy[equipment.id] = deploy_config_in_equipment_synchronous(
-                    file_to_deploy, equipment, lockvar)
+                tasks.append(deploy_config_task(
+                    file_to_deploy, equipment, lockvar))
+            status_deploy = deploy_config_in_equipments(tasks)
             networkipv4.deactivate(user)
             transaction.commit()
             if networkipv4.vlan.ativada == 1:
@@ -251,8 +251,7 @@ def remove_deploy_networkIPv6_configuration(user, networkipv6, equipment_list):
             # load dict with all equipment attributes
             dict_ips = get_dict_v6_to_use_in_configuration_deploy(
                 user, networkipv6, equipment_list)
-            status_deploy = dict()
-            # TODO implement threads
+            tasks = list()
             for equipment in equipment_list:
                 # generate config file
                 file_to_deploy = _generate_config_file(
@@ -260,8 +259,9 @@ def remove_deploy_networkIPv6_configuration(user, networkipv6, equipment_list):
                 # deploy config file in equipments
                 lockvar = LOCK_EQUIPMENT_DEPLOY_CONFIG_NETWORK_SCRIPT % (
                     equipment.id)
-                status_deploy[equipment.id] = deploy_config_in_equipment_synchronous(
-                    file_to_deploy, equipment, lockvar)
+                tasks.append(deploy_config_task(
+                    file_to_deploy, equipment, lockvar))
+            status_deploy = deploy_config_in_equipments(tasks)
 
             networkipv6.deactivate(user)
             transaction.commit()
@@ -4,7 +4,6 @@ import logging
 from django.core.exceptions import FieldError
 from django.core.exceptions import ObjectDoesNotExist
 
-from networkapi.api_deploy.facade import deploy_config_in_equipment
 from networkapi.api_equipment import exceptions as exceptions_eqpt
 from networkapi.api_equipment import facade as facade_eqpt
 from networkapi.api_network import exceptions
@@ -216,18 +215,10 @@ def undeploy_networkipv4(network_id, user, force=False):
         dict_ips = get_dict_v4_to_use_in_configuration_deploy(
             user, netv4_obj, routers)
 
-        status_deploy = dict()
-
-        # TODO implement threads
-        for equipment in routers:
-
-            # generate config file
-            file_to_deploy = utils.generate_config_file(
-                dict_ips, equipment, TEMPLATE_NETWORKv4_DEACTIVATE)
-
-            # deploy config file in equipments
-            status_deploy[equipment.id] = \
-                deploy_config_in_equipment(file_to_deploy, equipment)
+        # generate config files and deploy them in equipments
+        status_deploy = utils.deploy_config_in_routers(
+            dict_ips, routers, TEMPLATE_NETWORKv4_DEACTIVATE,
+            TEMPLATE_NETWORKv4_ACTIVATE)
 
         netv4_obj.deactivate_v3()
 
@@ -239,12 +230,9 @@ def undeploy_networkipv4(network_id, user, force=False):
             if not utils.has_active_network_in_vlan(netv4_obj.vlan):
 
                 # remove int vlan
-                for equipment in routers:
-                    if equipment.maintenance is not True:
-                        pass
-                        # Delete SVI
-                        status_deploy[equipment.id] += utils.remove_svi(
-                            equipment, netv4_obj.vlan.num_vlan)
+                for equipment_id, output in utils.remove_svi_in_routers(
+                        routers, netv4_obj.vlan.num_vlan).iteritems():
+                    status_deploy[equipment_id] += output
 
                 # Need verify this call
                 netv4_obj.vlan.deactivate_v3(locks_name)
@@ -337,22 +325,14 @@ def deploy_networkipv4(network_id, user):
         if netv4_obj.active == 1:
             raise exceptions.NetworkAlreadyActive()
 
-        status_deploy = dict()
-
         # load dict with all equipment attributes
         dict_ips = get_dict_v4_to_use_in_configuration_deploy(
             user, netv4_obj, routers)
 
-        # TODO implement threads
-        for equipment in routers:
-
-            # generate config file
-            file_to_deploy = utils.generate_config_file(
-                dict_ips, equipment, TEMPLATE_NETWORKv4_ACTIVATE)
-
-            # Apply configuration file on equipment
-            status_deploy[equipment.id] = \
-                deploy_config_in_equipment(file_to_deploy, equipment)
+        # generate config files and deploy them in equipments
+        status_deploy = utils.deploy_config_in_routers(
+            dict_ips, routers, TEMPLATE_NETWORKv4_ACTIVATE,
+            TEMPLATE_NETWORKv4_DEACTIVATE)
 
         netv4_obj.activate_v3()
         # transaction.commit()
@@ -4,7 +4,6 @@ import logging
 from django.core.exceptions import FieldError
 from django.core.exceptions import ObjectDoesNotExist
 
-from networkapi.api_deploy.facade import deploy_config_in_equipment
 from networkapi.api_equipment import exceptions as exceptions_eqpt
 from networkapi.api_equipment import facade as facade_eqpt
 from networkapi.api_network import exceptions
@@ -217,17 +216,10 @@ def undeploy_networkipv6(network_id, user):
         dict_ips = get_dict_v6_to_use_in_configuration_deploy(
             user, netv6_obj, routers)
 
-        status_deploy = dict()
-
-        # TODO implement threads
-        for equipment in routers:
-            # generate config file
-            file_to_deploy = utils.generate_config_file(
-                dict_ips, equipment, TEMPLATE_NETWORKv6_DEACTIVATE)
-
-            # deploy config file in equipments
-            status_deploy[equipment.id] = \
-                deploy_config_in_equipment(file_to_deploy, equipment)
+        # generate config files and deploy them in equipments
+        status_deploy = utils.deploy_config_in_routers(
+            dict_ips, routers, TEMPLATE_NETWORKv6_DEACTIVATE,
+            TEMPLATE_NETWORKv6_ACTIVATE)
 
         netv6_obj.deactivate_v3()
 
@@ -238,11 +230,9 @@ def undeploy_networkipv6(network_id, user):
             if not utils.has_active_network_in_vlan(netv6_obj.vlan):
 
                 # remove int vlan
-                for equipment in routers:
-                    if equipment.maintenance is not True:
-                        status_deploy[
-                            equipment.id] += utils.remove_svi(
-                                equipment, netv6_obj.vlan.num_vlan)
+                for equipment_id, output in utils.remove_svi_in_routers(
+                        routers, netv6_obj.vlan.num_vlan).iteritems():
+                    status_deploy[equipment_id] += output
 
                 netv6_obj.vlan.deactivate_v3(locks_name)
 
@@ -341,17 +331,10 @@ def deploy_networkipv6(network_id, user):
         dict_ips = get_dict_v6_to_use_in_configuration_deploy(
             user, netv6_obj, routers)
 
-        status_deploy = dict()
-
-        # TODO implement threads
-        for equipment in routers:
-
-            # generate config file
-            file_to_deploy = utils.generate_config_file(
-                dict_ips, equipment, TEMPLATE_NETWORKv6_ACTIVATE)
-
-            status_deploy[equipment.id] = \
-                deploy_config_in_equipment(file_to_deploy, equipment)
+        # generate config files and deploy them in equipments
+        status_deploy = utils.deploy_config_in_routers(
+            dict_ips, routers, TEMPLATE_NETWORKv6_ACTIVATE,
+            TEMPLATE_NETWORKv6_DEACTIVATE)
 
         netv6_obj.activate_v3()
 
@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 import logging
+from functools import partial
 
 from django.template import Context
-from django.template import Template
 
+from networkapi.api_deploy.executor import DeployTask
+from networkapi.api_deploy.facade import deploy_config_in_equipments
+from networkapi.api_deploy.facade import deploy_config_task
+from networkapi.api_deploy.templates import ConfigFile
+from networkapi.api_deploy.templates import get_roteiros
+from networkapi.api_deploy.templates import templates
 from networkapi.api_network import exceptions
-from networkapi.equipamento import models as eqpt_models
 from networkapi.extra_logging import local
 from networkapi.extra_logging import NO_REQUEST_ID
 from networkapi.plugins.factory import PluginFactory
+from networkapi.settings import DEPLOY_ROLLBACK
 from networkapi.settings import NETWORK_CONFIG_FILES_PATH
 from networkapi.settings import NETWORK_CONFIG_TEMPLATE_PATH
 from networkapi.settings import NETWORK_CONFIG_TOAPPLY_REL_PATH
@@ -20,67 +26,60 @@ TEMPLATE_NETWORKv6_ACTIVATE = 'ipv6_activate_network_configuration'
 TEMPLATE_NETWORKv6_DEACTIVATE = 'ipv6_deactivate_network_configuration'
 
 
-def generate_config_file(dict_ips, equipment, template_type):
-    """Load a template and write a file with the rended output.
+def generate_config_file(dict_ips, equipment, template_type, roteiros=None):
+    """Load a template and render it to a config file.
 
     Args: 2-dimension dictionary with equipments information for template
           rendering equipment to render template to template type to load.
+          roteiros: dict of templates of equipments, see get_roteiros
 
-    Returns: filename with relative path to settings.TFTPBOOT_FILES_PATH
+    Returns: networkapi.api_deploy.templates.ConfigFile(), written to
+             NETWORK_CONFIG_FILES_PATH when deployed
     """
 
-    config_to_be_saved = ''
     request_id = getattr(local, 'request_id', NO_REQUEST_ID)
 
     filename_out = 'network_equip%s_config_%s' % (equipment.id, request_id)
 
-    filename_to_save = NETWORK_CONFIG_FILES_PATH + filename_out
-    rel_file_to_deploy = NETWORK_CONFIG_TOAPPLY_REL_PATH + filename_out
-
     try:
-        network_template_file = load_template_file(equipment, template_type)
+        network_template_file = load_template_file(
+            equipment, template_type, roteiros)
         key_dict = generate_template_dict(dict_ips, equipment)
-        config_to_be_saved += network_template_file.render(Context(key_dict))
+        config_to_be_saved = network_template_file.render(Context(key_dict))
     except KeyError, exception:
         log.error('Erro: %s ' % exception)
         raise exceptions.InvalidKeyException(exception)
 
-    # Save new file
-    try:
-        file_handle = open(filename_to_save, 'w')
-        file_handle.write(config_to_be_saved)
-        file_handle.close()
-    except IOError, e:
-        log.error('Error writing to config file: %s' % filename_to_save)
-        raise e
+    return ConfigFile(NETWORK_CONFIG_FILES_PATH,
+                      NETWORK_CONFIG_TOAPPLY_REL_PATH,
+                      filename_out, config_to_be_saved)
 
-    return rel_file_to_deploy
 
-
-def load_template_file(equipment, template_type):
+def load_template_file(equipment, template_type, roteiros=None):
     """Load template file with specific type related to equipment.
 
     Args: equipment: Equipamento object
     template_type: Type of template to be loaded
+    roteiros: dict of templates of equipments, see get_roteiros, searched
+              for equipment when not given
 
     Returns: template string
     """
 
+    if roteiros is None:
+        roteiros = get_roteiros([equipment], [template_type])
+
     try:
-        equipment_template = (eqpt_models.EquipamentoRoteiro.search(
-            None, equipment.id, template_type)).uniqueResult()
-    except:
+        roteiro = roteiros[(equipment.id, template_type)]
+    except KeyError:
         log.error('Template type %s not found.' % template_type)
         raise exceptions.NetworkTemplateException()
 
-    filename_in = NETWORK_CONFIG_TEMPLATE_PATH + \
-        '/' + equipment_template.roteiro.roteiro
+    filename_in = NETWORK_CONFIG_TEMPLATE_PATH + '/' + roteiro
 
-    # Read contents from file
+    # Compiled once by process, while file is not modified
     try:
-        file_handle = open(filename_in, 'r')
-        template_file = Template(file_handle.read())
-        file_handle.close()
+        template_file = templates.get(filename_in)
     except IOError, e:
         log.error('Error opening template file for read: %s' % filename_in)
         raise Exception(e)
@@ -155,3 +154,40 @@ def remove_svi(equipment, vlan_num):
     equip_plugin.close()
 
     return output
+
+
+def deploy_config_in_routers(dict_ips, routers, template_type,
+                             rollback_template_type):
+    """Generates config files of template type and deploys them in
+    routers in parallel.
+
+    With DEPLOY_ROLLBACK, config of rollback template type is deployed in
+    routers that succeeded when any other fails.
+
+    Returns: dict of equipment id -> equipment output
+    """
+
+    roteiros = get_roteiros(routers, [template_type, rollback_template_type])
+
+    tasks = list()
+    for equipment in routers:
+        file_to_deploy = generate_config_file(
+            dict_ips, equipment, template_type, roteiros)
+        rollback = partial(generate_config_file, dict_ips, equipment,
+                           rollback_template_type, roteiros)
+        tasks.append(
+            deploy_config_task(file_to_deploy, equipment, rollback=rollback))
+
+    return deploy_config_in_equipments(tasks, atomic=DEPLOY_ROLLBACK)
+
+
+def remove_svi_in_routers(routers, vlan_num):
+    """Removes SVI of vlan from routers not in maintenance, in parallel.
+
+    Returns: dict of equipment id -> equipment output
+    """
+
+    tasks = [DeployTask(equipment, partial(remove_svi, equipment, vlan_num))
+             for equipment in routers if equipment.maintenance is not True]
+
+    return deploy_config_in_equipments(tasks)
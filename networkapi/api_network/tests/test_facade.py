@@ -225,7 +225,7 @@ class NetworkFacadeTestCase(unittest.TestCase):
 
     def mock_deploy_config(self, response):
         deploy_config_mock = patch(
-            'networkapi.api_network.facade.v1.deploy_config_in_equipment_synchronous').start()
+            'networkapi.api_deploy.facade.deploy_config_in_equipment_synchronous').start()
         deploy_config_mock.return_value = response
         return deploy_config_mock
 
@@ -4,8 +4,11 @@ import logging
 from _mysql_exceptions import OperationalError
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 
 from networkapi.api_ogp import exceptions
+from networkapi.api_ogp import object_permissions
 from networkapi.models.BaseModel import BaseModel
 from networkapi.util.geral import get_app
 
@@ -444,3 +447,17 @@ class ObjectGroupPermissionGeneral(BaseModel):
 
         # required because of delete attribute class
         super(ObjectGroupPermissionGeneral, self).delete()
+
+
+post_save.connect(object_permissions.invalidate_object_type,
+                  sender=ObjectType)
+post_delete.connect(object_permissions.invalidate_object_type,
+                    sender=ObjectType)
+post_save.connect(object_permissions.invalidate_object_perm,
+                  sender=ObjectGroupPermission)
+post_delete.connect(object_permissions.invalidate_object_perm,
+                    sender=ObjectGroupPermission)
+post_save.connect(object_permissions.invalidate_general_perm,
+                  sender=ObjectGroupPermissionGeneral)
+post_delete.connect(object_permissions.invalidate_general_perm,
+                    sender=ObjectGroupPermissionGeneral)
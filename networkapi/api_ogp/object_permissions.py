@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+
+from django.core.cache import cache
+from django.db.models import get_model
+
+from networkapi.admin_permission import AdminPermission
+from networkapi.settings import OBJECT_PERMISSION_CACHE_TIME
+from networkapi.util.cache_generation import bump_generation
+from networkapi.util.cache_generation import current_generation
+
+log = logging.getLogger(__name__)
+
+KEY_GENERATION = 'object_permissions:generation'
+KEY_GENERAL = 'object_permissions:%s:general:%s:%s'
+KEY_OBJECT = 'object_permissions:%s:object:%s:%s'
+
+# Operation -> flag of permission. Other operations are granted by any
+# permission of the groups.
+OPERATIONS = {
+    AdminPermission.OBJ_READ_OPERATION: 'read',
+    AdminPermission.OBJ_WRITE_OPERATION: 'write',
+    AdminPermission.OBJ_DELETE_OPERATION: 'delete',
+    AdminPermission.OBJ_UPDATE_CONFIG_OPERATION: 'change_config',
+}
+FLAGS = ('read', 'write', 'delete', 'change_config')
+
+
+class ObjectPermissionMatrix(object):
+
+    """Permissions of a set of user groups on some objects of a type.
+
+    general: flags granted to the groups by general permissions (None when
+             the groups have any general permission).
+    restricted: objects that have individual permissions, to any group.
+    allowed: flag -> objects the groups have individual permission to.
+    """
+
+    def __init__(self, general=None, restricted=None, allowed=None):
+        self.general = general or set()
+        self.restricted = restricted or set()
+        self.allowed = allowed or dict()
+
+    @classmethod
+    def load(cls, ugroups_id, object_type, objects_id=()):
+        """Loads matrix of objects_id, from cache when possible.
+
+        General permissions are cached by user group and individual
+        permissions by object, so only the rows of the groups and objects
+        not cached yet are read from database.
+        """
+
+        ugroups_id = set(int(ugroup_id) for ugroup_id in ugroups_id)
+        objects_id = set(int(object_id) for object_id in objects_id
+                         if object_id is not None)
+
+        general = set()
+        for perms in _get_many(KEY_GENERAL, object_type, ugroups_id,
+                               _load_general_perms).itervalues():
+            for flags in perms:
+                general.add(None)
+                general.update(flags)
+
+        restricted = set()
+        allowed = dict((flag, set()) for flag in (None,) + FLAGS)
+        for object_id, perms in _get_many(KEY_OBJECT, object_type,
+                                          objects_id,
+                                          _load_object_perms).iteritems():
+            if perms:
+                restricted.add(object_id)
+            for ugroup_id, flags in perms:
+                if ugroup_id in ugroups_id:
+                    allowed[None].add(object_id)
+                    for flag in flags:
+                        allowed[flag].add(object_id)
+
+        return cls(general, restricted, allowed)
+
+    def has_general_perm(self, operation):
+        return OPERATIONS.get(operation) in self.general
+
+    def denied(self, objects_id, operation):
+        """Returns first object of objects_id the groups do not have
+        individual permission of operation, or None.
+        """
+
+        allowed = self.allowed.get(OPERATIONS.get(operation), ())
+        for object_id in objects_id:
+            if object_id is None:
+                continue
+            if int(object_id) in self.restricted and \
+                    int(object_id) not in allowed:
+                return object_id
+        return None
+
+
+def get_matrix(ugroups_id, object_type, objects_id=()):
+    """Returns ObjectPermissionMatrix of groups on objects_id of object
+    type.
+    """
+
+    return ObjectPermissionMatrix.load(ugroups_id, object_type, objects_id)
+
+
+def _flags(values):
+    return tuple(flag for flag, value in zip(FLAGS, values) if value)
+
+
+def _load_general_perms(object_type, ugroups_id):
+    """Returns user group -> list of flags of its general permissions."""
+
+    ogp_general_model = get_model('api_ogp', 'ObjectGroupPermissionGeneral')
+
+    perms = dict((ugroup_id, []) for ugroup_id in ugroups_id)
+    rows = ogp_general_model.objects.filter(
+        object_type__name=object_type,
+        user_group__in=ugroups_id
+    ).values_list('user_group', *FLAGS)
+    for row in rows:
+        perms[row[0]].append(_flags(row[1:]))
+
+    return perms
+
+
+def _load_object_perms(object_type, objects_id):
+    """Returns object -> list of (user group, flags) of its individual
+    permissions.
+
+    Permissions of every group are loaded, as an object with permissions
+    only to other groups is denied. They are bounded by the number of
+    groups.
+    """
+
+    ogp_model = get_model('api_ogp', 'ObjectGroupPermission')
+
+    perms = dict((object_id, []) for object_id in objects_id)
+    rows = ogp_model.objects.filter(
+        object_type__name=object_type,
+        object_value__in=objects_id
+    ).values_list('object_value', 'user_group', *FLAGS)
+    for row in rows:
+        perms[row[0]].append((row[1], _flags(row[2:])))
+
+    return perms
+
+
+def _get_many(key, object_type, ids, load):
+    """Returns id -> permissions of ids, from cache when possible, loading
+    the ones missing with load(object_type, ids).
+    """
+
+    if not ids:
+        return dict()
+
+    if not OBJECT_PERMISSION_CACHE_TIME:
+        return load(object_type, ids)
+
+    generation = _generation()
+    keys = dict((key % (generation, object_type, i), i) for i in ids)
+    perms = dict((keys[k], value)
+                 for k, value in cache.get_many(keys.keys()).iteritems())
+
+    missing = [i for i in ids if i not in perms]
+    if missing:
+        loaded = load(object_type, missing)
+        cache.set_many(dict((key % (generation, object_type, i), loaded[i])
+                            for i in missing),
+                       OBJECT_PERMISSION_CACHE_TIME)
+        perms.update(loaded)
+
+    return perms
+
+
+def invalidate_object_type(sender, instance, **kwargs):
+    """Signal receiver that invalidates every permission cached."""
+
+    bump_generation(KEY_GENERATION, cache)
+
+
+def invalidate_object_perm(sender, instance, **kwargs):
+    """Signal receiver that invalidates permissions cached of the object
+    of an ObjectGroupPermission.
+    """
+
+    cache.delete(KEY_OBJECT % (_generation(), instance.object_type.name,
+                               instance.object_value))
+
+
+def invalidate_general_perm(sender, instance, **kwargs):
+    """Signal receiver that invalidates general permissions cached of the
+    user group of an ObjectGroupPermissionGeneral.
+    """
+
+    cache.delete(KEY_GENERAL % (_generation(), instance.object_type.name,
+                                instance.user_group_id))
+
+
+def _generation():
+    return current_generation(KEY_GENERATION, cache)
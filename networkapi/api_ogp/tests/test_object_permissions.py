@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import Mock
+from mock import patch
+
+from networkapi.admin_permission import AdminPermission
+from networkapi.api_ogp import object_permissions
+from networkapi.api_ogp.object_permissions import ObjectPermissionMatrix
+
+READ = AdminPermission.OBJ_READ_OPERATION
+WRITE = AdminPermission.OBJ_WRITE_OPERATION
+
+
+class ObjectPermissionMatrixTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.perms = ObjectPermissionMatrix(
+            general=set(),
+            restricted=set([1, 2, 3]),
+            allowed={None: set([1, 2]), 'read': set([1, 2]),
+                     'write': set([1]), 'delete': set(),
+                     'change_config': set()}
+        )
+
+    def test_general_perm(self):
+        perms = ObjectPermissionMatrix(general=set([None, 'read']))
+
+        self.assertTrue(perms.has_general_perm(READ))
+        self.assertFalse(perms.has_general_perm(WRITE))
+        self.assertTrue(perms.has_general_perm('OTHER'))
+
+    def test_objects_allowed(self):
+        self.assertIsNone(self.perms.denied(['1', '2'], READ))
+        self.assertIsNone(self.perms.denied([1], WRITE))
+
+    def test_object_denied(self):
+        self.assertEquals('2', self.perms.denied(['1', '2'], WRITE))
+        self.assertEquals(3, self.perms.denied([1, 3], READ))
+
+    def test_objects_without_individual_perms_are_allowed(self):
+        self.assertIsNone(self.perms.denied([4, None, '5'], WRITE))
+
+
+class LoadTestCase(unittest.TestCase):
+
+    OBJECT_PERMS = {
+        1: [(10, ('read',))],
+        2: [(20, ('read', 'write'))],
+        3: [],
+    }
+
+    def setUp(self):
+        cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        cache.clear()
+
+        def load_object_perms(object_type, objects_id):
+            return dict((object_id, self.OBJECT_PERMS[object_id])
+                        for object_id in objects_id)
+
+        self.load_general_perms = Mock(
+            side_effect=lambda object_type, ugroups_id: dict(
+                (ugroup_id, []) for ugroup_id in ugroups_id))
+        self.load_object_perms = Mock(side_effect=load_object_perms)
+
+        for attribute, value in (
+                ('cache', cache),
+                ('OBJECT_PERMISSION_CACHE_TIME', 300),
+                ('_load_general_perms', self.load_general_perms),
+                ('_load_object_perms', self.load_object_perms)):
+            patcher = patch.object(object_permissions, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_only_objects_requested_are_loaded(self):
+        perms = object_permissions.get_matrix([10], 'Vlan', ['1', 3])
+
+        self.load_object_perms.assert_called_once_with('Vlan', [1, 3])
+        self.load_general_perms.assert_called_once_with('Vlan', [10])
+        self.assertIsNone(perms.denied([1, 3], READ))
+        self.assertEquals(1, perms.denied([1], WRITE))
+
+    def test_objects_cached_are_not_loaded_again(self):
+        object_permissions.get_matrix([10], 'Vlan', [1, 3])
+        perms = object_permissions.get_matrix([20], 'Vlan', [1, 2])
+
+        # permissions of objects are shared by every group
+        self.assertEquals([1, 3], sorted(
+            self.load_object_perms.call_args_list[0][0][1]))
+        self.assertEquals([2], self.load_object_perms.call_args_list[1][0][1])
+        self.assertEquals(1, perms.denied([1, 2], WRITE))
+
+    def test_changed_permission_invalidates_its_object(self):
+        object_permissions.get_matrix([10], 'Vlan', [1, 2])
+
+        object_permissions.invalidate_object_perm(
+            None, Mock(object_value=2, **{'object_type.name': 'Vlan'}))
+        object_permissions.get_matrix([10], 'Vlan', [1, 2])
+
+        self.assertEquals([2], self.load_object_perms.call_args_list[1][0][1])
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import copy
 import logging
+from functools import partial
 
 import json_delta
+from django.core.cache import cache
 from django.db.models import Q
 from django.db.transaction import commit_on_success
 
+from networkapi.api_deploy.executor import DeployExecutor
+from networkapi.api_deploy.executor import DeployTask
 from networkapi.api_equipment import exceptions as exceptions_eqpt
 from networkapi.api_equipment import facade as facade_eqpt
 from networkapi.api_pools import exceptions
@@ -17,6 +21,7 @@ from networkapi.equipamento.models import EquipamentoAcesso
 from networkapi.plugins.factory import PluginFactory
 from networkapi.requisicaovips.models import ServerPool
 from networkapi.requisicaovips.models import ServerPoolMember
+from networkapi.settings import POOL_MEMBER_STATE_CACHE_TIME
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +29,21 @@ log = logging.getLogger(__name__)
 ################
 # Apply in eqpt
 ################
+def _add_load_balancers(load_balance, equips):
+    """Adds load balancers not yet in load_balance, resolving plugins of
+    all of them at once.
+    """
+
+    equips = [e for e in equips if str(e.id) not in load_balance]
+
+    for e, plugin in zip(equips, PluginFactory.factory_many(equips)):
+        load_balance[str(e.id)] = {
+            'plugin': plugin,
+            'access': EquipamentoAcesso.search(equipamento=e.id),
+            'pools': [],
+        }
+
+
 def _prepare_apply(pools, created=False, user=None):
 
     load_balance = dict()
@@ -40,22 +60,11 @@ def _prepare_apply(pools, created=False, user=None):
             reserve_name_healthcheck(pool['identifier'])
         healthcheck['new'] = True
 
+        _add_load_balancers(load_balance, equips)
+
         for e in equips:
 
             eqpt_id = str(e.id)
-            equipment_access = EquipamentoAcesso.search(
-                equipamento=e.id
-            )
-
-            plugin = PluginFactory.factory(e)
-
-            if not load_balance.get(eqpt_id):
-
-                load_balance[eqpt_id] = {
-                    'plugin': plugin,
-                    'access': equipment_access,
-                    'pools': [],
-                }
 
             vips_requests = ServerPool().get_vips_related(pool['id'])
 
@@ -236,21 +245,10 @@ def update_real_pool(pools, user):
                 pool['identifier'])
             healthcheck['new'] = True
 
+        _add_load_balancers(load_balance, equips)
+
         for e in equips:
             eqpt_id = str(e.id)
-            equipment_access = EquipamentoAcesso.search(
-                equipamento=e.id
-            )
-
-            plugin = PluginFactory.factory(e)
-
-            if not load_balance.get(eqpt_id):
-
-                load_balance[eqpt_id] = {
-                    'plugin': plugin,
-                    'access': equipment_access,
-                    'pools': [],
-                }
 
             vips_requests = ServerPool().get_vips_related(pool['id'])
 
@@ -301,21 +299,10 @@ def _prepare_apply_state(pools, user=None):
 
             keys.append(sorted([str(eqpt.id) for eqpt in equips]))
 
+            _add_load_balancers(load_balance, equips)
+
             for e in equips:
                 eqpt_id = str(e.id)
-                equipment_access = EquipamentoAcesso.search(
-                    equipamento=e.id
-                )
-
-                plugin = PluginFactory.factory(e)
-
-                if not load_balance.get(eqpt_id):
-
-                    load_balance[eqpt_id] = {
-                        'plugin': plugin,
-                        'access': equipment_access,
-                        'pools': [],
-                    }
 
                 mbs = pool['server_pool_members']
                 idx_mbs = [mb['id'] for mb in mbs]
@@ -399,6 +386,151 @@ def get_poolmember_state(pools):
     return status
 
 
+def get_poolmembers_state(pool_ids):
+    """Return states of members of many pools, read from load balancers.
+
+    Pools are grouped by load balancer and each load balancer is queried
+    once for all of its pools, concurrently with the others. States are
+    kept in cache for POOL_MEMBER_STATE_CACHE_TIME seconds. Failures of a
+    load balancer are reported in pools of it, not raised.
+
+    Returns: list of {id, server_pool_members: [{id, member_status}],
+             error} in order of pool_ids, without pools that do not exist.
+    """
+
+    pool_ids = [int(pool_id) for pool_id in pool_ids]
+    states = dict()
+
+    if POOL_MEMBER_STATE_CACHE_TIME:
+        keys = dict((_poolmember_state_key(pool_id), pool_id)
+                    for pool_id in pool_ids)
+        for key, state in cache.get_many(keys.keys()).iteritems():
+            states[keys[key]] = state
+
+    missing = [pool_id for pool_id in set(pool_ids) if pool_id not in states]
+    if missing:
+        collected = _collect_poolmembers_state(missing)
+        states.update(collected)
+
+        if POOL_MEMBER_STATE_CACHE_TIME:
+            cache.set_many(dict(
+                (_poolmember_state_key(pool_id), state)
+                for pool_id, state in collected.iteritems()
+                if state['error'] is None), POOL_MEMBER_STATE_CACHE_TIME)
+
+    response = list()
+    for pool_id in pool_ids:
+        if pool_id in states:
+            response.append(states.pop(pool_id))
+    return response
+
+
+def _poolmember_state_key(pool_id):
+    return 'pool_member_state:%s' % pool_id
+
+
+def _collect_poolmembers_state(pool_ids):
+    server_pools = ServerPool.objects.filter(id__in=pool_ids)\
+        .prefetch_related('serverpoolmember_set__ip',
+                          'serverpoolmember_set__ipv6')
+
+    load_balance = _prepare_state_by_lb(server_pools)
+
+    tasks = [DeployTask(lb['equipment'],
+                        partial(lb['plugin'].get_state_member, lb))
+             for lb in load_balance.values()]
+    results = DeployExecutor().run(tasks)
+
+    ps = dict((server_pool.id, dict()) for server_pool in server_pools)
+    errors = dict()
+    for eqpt_id, result in results.iteritems():
+        lb = load_balance[eqpt_id]
+
+        if result.failed:
+            for pool in lb['pools']:
+                errors.setdefault(pool['id'], unicode(result.error))
+            continue
+
+        # states are in order of pools and members sent to plugin
+        for pool, state in zip(lb['pools'], result.output or []):
+            for pool_member, st in zip(pool['pools_members'], state):
+                ps[pool['id']].setdefault(pool_member['id'], set()).add(st)
+
+    states = dict()
+    for server_pool in server_pools:
+        pool_members = server_pool.serverpoolmember_set.all()
+        error = errors.get(server_pool.id)
+
+        if error is None and pool_members and not ps[server_pool.id]:
+            error = exceptions_eqpt.\
+                AllEquipmentsAreInMaintenanceException().detail
+        if error is None and any(len(st) > 1
+                                 for st in ps[server_pool.id].values()):
+            error = 'There are states differents in equipments.'
+            log.error('%s Pool:%s', error, server_pool.id)
+
+        members = list()
+        for pool_member in pool_members:
+            st = ps[server_pool.id].get(pool_member.id, set())
+            members.append({
+                'id': pool_member.id,
+                'member_status': list(st)[0] if len(st) == 1 else None
+            })
+
+        states[server_pool.id] = {
+            'id': server_pool.id,
+            'server_pool_members': members,
+            'error': error
+        }
+
+    return states
+
+
+def _prepare_state_by_lb(server_pools):
+    """Group pools by load balancer, resolving plugin and access of each
+    load balancer once.
+    """
+
+    load_balance = dict()
+    equips_by_env = dict()
+
+    for server_pool in server_pools:
+        server_pool_members = server_pool.serverpoolmember_set.all()
+        if not server_pool_members:
+            continue
+
+        env_id = server_pool.environment_id
+        if env_id not in equips_by_env:
+            equips_by_env[env_id] = list(Equipamento.objects.filter(
+                maintenance=0,
+                equipamentoambiente__ambiente__id=env_id,
+                tipo_equipamento__tipo_equipamento=u'Balanceador'
+            ).select_related('modelo__marca').distinct())
+
+        for e in equips_by_env[env_id]:
+            if e.id not in load_balance:
+                load_balance[e.id] = {
+                    'equipment': e,
+                    'plugin': PluginFactory.factory(e),
+                    'access': EquipamentoAcesso.search(equipamento=e.id),
+                    'pools': [],
+                }
+
+            load_balance[e.id]['pools'].append({
+                'id': server_pool.id,
+                'nome': server_pool.identifier,
+                'pools_members': [{
+                    'id': pool_member.id,
+                    'ip': pool_member.ip.ip_formated
+                    if pool_member.ip else pool_member.ipv6.ip_formated,
+                    'port': pool_member.port_real,
+                    'member_status': pool_member.member_status
+                } for pool_member in server_pool_members]
+            })
+
+    return load_balance
+
+
 def _validate_pool_members_to_apply(pool, user=None):
 
     if pool['server_pool_members']:
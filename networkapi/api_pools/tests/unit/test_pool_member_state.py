@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import Mock
+from mock import patch
+
+from networkapi.api_pools.facade.v3 import deploy as facade_pool_deploy
+
+
+def pool_member(member_id, ip, status=7):
+    return Mock(id=member_id, ip=Mock(ip_formated=ip), ipv6=None,
+                port_real=80, member_status=status)
+
+
+def server_pool(pool_id, env_id, members):
+    pool = Mock(id=pool_id, identifier='pool_%s' % pool_id,
+                environment_id=env_id)
+    pool.serverpoolmember_set.all.return_value = members
+    return pool
+
+
+class PoolMemberStateBulkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # LB 1 balances environments 10 and 20, LB 2 only environment 20.
+        self.lbs = {1: Mock(id=1), 2: Mock(id=2)}
+        self.equips = {10: [self.lbs[1]], 20: [self.lbs[1], self.lbs[2]]}
+        self.pools = [
+            server_pool(1, 10, [pool_member(11, '10.0.0.1'),
+                                pool_member(12, '10.0.0.2')]),
+            server_pool(2, 20, [pool_member(21, '10.0.0.3')]),
+        ]
+        self.plugins = dict((eqpt_id, Mock()) for eqpt_id in self.lbs)
+        self.plugins[1].get_state_member.return_value = [[7, 3], [7]]
+        self.plugins[2].get_state_member.return_value = [[7]]
+
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        self.cache.clear()
+        self.patches = [
+            patch.object(facade_pool_deploy, 'cache', self.cache),
+            patch.object(facade_pool_deploy, 'POOL_MEMBER_STATE_CACHE_TIME',
+                         30),
+            patch.object(facade_pool_deploy, 'ServerPool'),
+            patch.object(facade_pool_deploy, 'Equipamento'),
+            patch.object(facade_pool_deploy, 'EquipamentoAcesso'),
+            patch.object(facade_pool_deploy, 'PluginFactory'),
+        ]
+        mocks = [p.start() for p in self.patches]
+        server_pool_model, equipamento, equipamento_acesso, factory = \
+            mocks[2:]
+
+        server_pool_model.objects.filter.side_effect = \
+            lambda id__in: Mock(prefetch_related=lambda *args: [
+                pool for pool in self.pools if pool.id in id__in])
+        equipamento.objects.filter.side_effect = \
+            lambda **kwargs: Mock(select_related=lambda *args: Mock(
+                distinct=lambda: self.equips[
+                    kwargs['equipamentoambiente__ambiente__id']]))
+        factory.factory.side_effect = lambda e: self.plugins[e.id]
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_queries_each_load_balancer_once_for_all_pools(self):
+        states = facade_pool_deploy.get_poolmembers_state(['2', '1'])
+
+        self.assertEqual([2, 1], [state['id'] for state in states])
+        self.assertEqual([{'id': 21, 'member_status': 7}],
+                         states[0]['server_pool_members'])
+        self.assertEqual([{'id': 11, 'member_status': 7},
+                          {'id': 12, 'member_status': 3}],
+                         states[1]['server_pool_members'])
+        self.assertIsNone(states[0]['error'])
+        self.assertIsNone(states[1]['error'])
+
+        self.assertEqual(1, self.plugins[1].get_state_member.call_count)
+        self.assertEqual(1, self.plugins[2].get_state_member.call_count)
+        lb = self.plugins[1].get_state_member.call_args[0][0]
+        self.assertEqual([1, 2], [pool['id'] for pool in lb['pools']])
+        self.assertEqual(['10.0.0.1', '10.0.0.2'],
+                         [m['ip'] for m in lb['pools'][0]['pools_members']])
+
+    def test_serves_repeated_polls_from_cache(self):
+        first = facade_pool_deploy.get_poolmembers_state(['1', '2'])
+        second = facade_pool_deploy.get_poolmembers_state(['1', '2'])
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.plugins[1].get_state_member.call_count)
+        self.assertEqual(1, self.plugins[2].get_state_member.call_count)
+
+    def test_failure_of_load_balancer_is_reported_in_its_pools(self):
+        self.plugins[2].get_state_member.side_effect = Exception('refused')
+
+        states = facade_pool_deploy.get_poolmembers_state(['1', '2'])
+
+        self.assertIsNone(states[0]['error'])
+        self.assertEqual('refused', states[1]['error'])
+        self.assertEqual([{'id': 21, 'member_status': 7}],
+                         states[1]['server_pool_members'])
+        # only states read with success are cached
+        self.assertEqual(['pool_member_state:1'], self.cache.get_many(
+            ['pool_member_state:1', 'pool_member_state:2']).keys())
+
+    def test_different_states_in_load_balancers(self):
+        self.plugins[2].get_state_member.return_value = [[3]]
+
+        states = facade_pool_deploy.get_poolmembers_state(['2'])
+
+        self.assertEqual('There are states differents in equipments.',
+                         states[0]['error'])
+        self.assertEqual([{'id': 21, 'member_status': None}],
+                         states[0]['server_pool_members'])
+
+    def test_pools_that_do_not_exist_are_left_out(self):
+        states = facade_pool_deploy.get_poolmembers_state(['1', '99', '1'])
+
+        self.assertEqual([1], [state['id'] for state in states])
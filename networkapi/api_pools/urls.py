@@ -56,6 +56,8 @@ urlpatterns = patterns(
     ########################
     # Manage Pool V3
     ########################
+    url(r'^v3/pool/deploy/state/$',
+        views_v3.PoolMemberStateBulkView.as_view()),
     url(r'^v3/pool/deploy/async/(?P<obj_ids>[;\w]+)/$',
         views_v3.PoolAsyncDeployView.as_view()),
     url(r'^v3/pool/deploy/(?P<obj_ids>[;\w]+)/member/status/$',
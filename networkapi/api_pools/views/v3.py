@@ -112,6 +112,29 @@ class PoolMemberStateView(CustomAPIView):
         return Response(response, status=status.HTTP_200_OK)
 
 
+class PoolMemberStateBulkView(CustomAPIView):
+
+    @logs_method_apiview
+    @raise_json_validate('')
+    @permission_classes_apiview((IsAuthenticated, permissions.Read))
+    def get(self, request, *args, **kwargs):
+        """
+        Returns states of members of many pools, read from load balancers.
+        Pools are given by ids separated by ";" in parameter ids.
+        """
+
+        pool_ids = [pool_id for pool_id in
+                    request.GET.get('ids', '').split(';') if pool_id]
+        if not pool_ids or not all(pool_id.isdigit() for pool_id in pool_ids):
+            raise rest_exceptions.ValidationAPIException(
+                'Parameter ids must have ids of pools separated by ";".')
+
+        response = {
+            'server_pools': facade_pool_deploy.get_poolmembers_state(pool_ids)
+        }
+        return Response(response, status=status.HTTP_200_OK)
+
+
 class PoolDeployView(CustomAPIView):
 
     @logs_method_apiview
@@ -10,6 +10,8 @@ from rest_framework.authentication import get_authorization_header
 
 from networkapi.auth import authenticate
 
+AUTHENTICATED_ATTR = '_networkapi_authenticated'
+
 
 class BasicAuthentication(BaseAuthentication):
 
@@ -42,8 +44,18 @@ class BasicAuthentication(BaseAuthentication):
             msg = 'Invalid basic header. Credentials not correctly base64 encoded'
             raise exceptions.AuthenticationFailed(msg)
 
+        # Middleware and views authenticate the same request, credentials
+        # are verified once and the user is shared through the request.
+        http_request = getattr(request, '_request', request)
+        authenticated = getattr(http_request, AUTHENTICATED_ATTR, None)
+        if authenticated is not None and authenticated[0] == auth[1]:
+            return authenticated[1]
+
         userid, password = auth_parts[0], auth_parts[2]
-        return self.authenticate_credentials(userid, password)
+        user_auth_tuple = self.authenticate_credentials(userid, password)
+        setattr(http_request, AUTHENTICATED_ATTR, (auth[1], user_auth_tuple))
+
+        return user_auth_tuple
 
     def authenticate_credentials(self, userid, password):
         """
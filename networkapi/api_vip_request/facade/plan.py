@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from networkapi.ambiente.models import EnvironmentVip
+from networkapi.api_equipment import facade as facade_eqpt
+from networkapi.api_pools.facade.v3.base import get_pool_by_id
+from networkapi.api_vip_request import exceptions
+from networkapi.api_vip_request.models import VipRequest
+from networkapi.api_vip_request.models import VipRequestDSCP
+from networkapi.equipamento.models import Equipamento
+from networkapi.ip.models import Ip
+from networkapi.ip.models import Ipv6
+from networkapi.requisicaovips.models import OptionVip
+from networkapi.requisicaovips.models import ServerPool
+
+log = logging.getLogger(__name__)
+
+VIP_OPTIONS = ('cache_group', 'traffic_return', 'timeout', 'persistence')
+PORT_OPTIONS = ('l7_protocol', 'l4_protocol')
+
+
+class VipApplyPlan(object):
+
+    """Rows used to build payloads of a batch of vip requests to load
+    balancers, loaded in a few queries for the whole batch.
+
+    Rows not loaded, as of ids not present in batch, are searched one by
+    one, raising the same exceptions of a single search.
+    """
+
+    def __init__(self, vip_requests):
+        start = time.time()
+
+        vip_ids = set()
+        option_ids = set()
+        ipv4_ids = set()
+        ipv6_ids = set()
+        pool_ids = set()
+        envvip_ids = set()
+
+        for vip_request in vip_requests:
+            vip_ids.add(int(vip_request['id']))
+            envvip_ids.add(vip_request['environmentvip'])
+            if vip_request['ipv4']:
+                ipv4_ids.add(vip_request['ipv4'])
+            if vip_request['ipv6']:
+                ipv6_ids.add(vip_request['ipv6'])
+            for option in VIP_OPTIONS:
+                option_ids.add(vip_request['options'].get(option))
+
+            for port in vip_request['ports']:
+                for option in PORT_OPTIONS:
+                    option_ids.add(port['options'].get(option))
+                for pool in port['pools']:
+                    option_ids.add(pool['l7_rule'])
+                    pool_ids.add(pool['server_pool'])
+
+        option_ids.discard(None)
+
+        self.vips = VipRequest.objects.select_related(
+            'ipv4__networkipv4', 'ipv6__networkipv6').in_bulk(vip_ids)
+        self.options = OptionVip.objects.in_bulk(option_ids)
+        self.ipsv4 = Ip.objects.in_bulk(ipv4_ids)
+        self.ipsv6 = Ipv6.objects.in_bulk(ipv6_ids)
+        self.dscps = dict(VipRequestDSCP.objects.filter(
+            vip_request__in=vip_ids).values_list('vip_request', 'dscp'))
+        self.pools = ServerPool.objects.select_related(
+            'healthcheck', 'servicedownaction'
+        ).prefetch_related(
+            'serverpoolmember_set__ip', 'serverpoolmember_set__ipv6'
+        ).in_bulk(pool_ids)
+        self.confs = dict(EnvironmentVip.objects.filter(
+            id__in=envvip_ids).values_list('id', 'conf'))
+
+        self._equips_by_envvip = dict()
+        self._equips_by_ids = dict()
+        self._can_update_config = dict()
+
+        self.elapsed = time.time() - start
+
+    def vip(self, vip_id):
+        try:
+            return self.vips[int(vip_id)]
+        except KeyError:
+            try:
+                return VipRequest.objects.get(id=vip_id)
+            except ObjectDoesNotExist:
+                raise exceptions.VipRequestDoesNotExistException()
+
+    def option(self, option_id):
+        try:
+            return self.options[option_id]
+        except KeyError:
+            return OptionVip.objects.get(id=option_id)
+
+    def ipv4(self, ipv4_id):
+        try:
+            return self.ipsv4[ipv4_id]
+        except KeyError:
+            return Ip.get_by_pk(ipv4_id)
+
+    def ipv6(self, ipv6_id):
+        try:
+            return self.ipsv6[ipv6_id]
+        except KeyError:
+            return Ipv6.get_by_pk(ipv6_id)
+
+    def dscp(self, vip_id):
+        return self.dscps.get(int(vip_id))
+
+    def pool(self, pool_id):
+        try:
+            return self.pools[pool_id]
+        except KeyError:
+            return get_pool_by_id(pool_id)
+
+    def conf(self, envvip_id):
+        try:
+            return self.confs[envvip_id]
+        except KeyError:
+            return EnvironmentVip.objects.get(id=envvip_id).conf
+
+    def equips_by_envvip(self, envvip_id):
+        """Returns load balancers of environment vip, see
+        api_equipment.facade.get_eqpt_by_envvip.
+        """
+
+        if envvip_id not in self._equips_by_envvip:
+            self._equips_by_envvip[envvip_id] = list(
+                facade_eqpt.get_eqpt_by_envvip(envvip_id).select_related(
+                    'modelo__marca'))
+        return self._equips_by_envvip[envvip_id]
+
+    def equips_by_ids(self, eqpt_ids):
+        """Returns load balancers not in maintenance among eqpt_ids."""
+
+        key = tuple(sorted(eqpt_ids))
+        if key not in self._equips_by_ids:
+            self._equips_by_ids[key] = list(Equipamento.objects.filter(
+                id__in=eqpt_ids,
+                maintenance=0,
+                tipo_equipamento__tipo_equipamento=u'Balanceador'
+            ).select_related('modelo__marca').distinct())
+        return self._equips_by_ids[key]
+
+    def can_update_config(self, equips, user):
+        key = (tuple(sorted(e.id for e in equips)), user.id)
+        if key not in self._can_update_config:
+            self._can_update_config[key] = \
+                facade_eqpt.all_equipments_can_update_config(equips, user)
+        return self._can_update_config[key]
+
+
+def pool_payload(server_pool, healthcheck_identifier):
+    """Returns pool as sent to load balancers, from ServerPool with its
+    members prefetched.
+    """
+
+    healthcheck = server_pool.healthcheck
+    return {
+        'id': server_pool.id,
+        'nome': server_pool.identifier,
+        'lb_method': server_pool.lb_method,
+        'healthcheck': {
+            'identifier': healthcheck_identifier,
+            'healthcheck_type': healthcheck.healthcheck_type,
+            'healthcheck_request': healthcheck.healthcheck_request,
+            'healthcheck_expect': healthcheck.healthcheck_expect,
+            'destination': healthcheck.destination,
+            'new': True
+        },
+        'action': server_pool.servicedownaction.name,
+        'pool_created': server_pool.pool_created,
+        'pools_members': [{
+            'id': pool_member.id,
+            'identifier': pool_member.identifier,
+            'ip': pool_member.ip.ip_formated
+            if pool_member.ip else pool_member.ipv6.ip_formated,
+            'port': pool_member.port_real,
+            'member_status': pool_member.member_status,
+            'limit': pool_member.limit,
+            'priority': pool_member.priority,
+            'weight': pool_member.weight
+        } for pool_member in server_pool.serverpoolmember_set.all()]
+    }
@@ -2,37 +2,34 @@
 import copy
 import json
 import logging
+import time
 
 from django.core.exceptions import FieldError
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.transaction import commit_on_success
 
-from networkapi.ambiente.models import EnvironmentVip
 from networkapi.api_equipment import exceptions as exceptions_eqpt
 from networkapi.api_equipment import facade as facade_eqpt
-from networkapi.api_pools.facade.v3.base import get_pool_by_id
 from networkapi.api_pools.facade.v3.base import reserve_name_healthcheck
 from networkapi.api_rest.exceptions import NetworkAPIException
 from networkapi.api_rest.exceptions import ObjectDoesNotExistException
 from networkapi.api_rest.exceptions import ValidationAPIException
 from networkapi.api_vip_request import exceptions
 from networkapi.api_vip_request import syncs
+from networkapi.api_vip_request.facade.plan import PORT_OPTIONS
+from networkapi.api_vip_request.facade.plan import VIP_OPTIONS
+from networkapi.api_vip_request.facade.plan import VipApplyPlan
+from networkapi.api_vip_request.facade.plan import pool_payload
 from networkapi.api_vip_request.models import VipRequest
-from networkapi.api_vip_request.models import VipRequestDSCP
-from networkapi.equipamento.models import Equipamento
 from networkapi.equipamento.models import EquipamentoAcesso
 from networkapi.infrastructure.datatable import build_query_to_datatable_v3
-from networkapi.ip.models import Ip
-from networkapi.ip.models import Ipv6
 from networkapi.plugins.factory import PluginFactory
-from networkapi.requisicaovips.models import OptionVip
 from networkapi.requisicaovips.models import ServerPool
 from networkapi.util import valid_expression
 from networkapi.util.geral import get_app
 
 
 # serializers
-pool_slz = get_app('api_pools', module_label='serializers.v3')
 vip_slz = get_app('api_vip_request', module_label='serializers.v3')
 
 
@@ -155,35 +152,32 @@ def get_vip_request_by_search(search=dict()):
         return vip_map
 
 
-def prepare_apply(load_balance, vip, created=True, user=None):
+def prepare_apply(load_balance, vip, created=True, user=None, plan=None):
+    """Adds payloads of vip to load_balance, by load balancer.
 
-    vip_request = copy.deepcopy(vip)
+    plan: VipApplyPlan with rows of the batch vip is part of, by default
+          rows of vip are loaded alone.
+    """
+
+    if plan is None:
+        plan = VipApplyPlan([vip])
+
+    vip_request = _copy_vip(vip)
 
     id_vip = str(vip_request.get('id'))
 
     equips, conf, cluster_unit = _validate_vip_to_apply(
-        vip_request, created, user)
-
-    cache_group = OptionVip.objects.get(
-        id=vip_request.get('options').get('cache_group'))
-    traffic_return = OptionVip.objects.get(
-        id=vip_request.get('options').get('traffic_return'))
-    timeout = OptionVip.objects.get(
-        id=vip_request.get('options').get('timeout'))
-    persistence = OptionVip.objects.get(
-        id=vip_request.get('options').get('persistence'))
+        vip_request, created, user, plan)
 
     if vip_request['ipv4']:
-        ipv4 = Ip.get_by_pk(vip_request['ipv4']) if vip_request[
-            'ipv4'] else None
+        ipv4 = plan.ipv4(vip_request['ipv4'])
         vip_request['ipv4'] = {
             'id': ipv4.id,
             'ip_formated': ipv4.ip_formated
         }
 
     if vip_request['ipv6']:
-        ipv6 = Ipv6.get_by_pk(vip_request['ipv6']) if vip_request[
-            'ipv6'] else None
+        ipv6 = plan.ipv6(vip_request['ipv6'])
         vip_request['ipv6'] = {
             'id': ipv6.id,
             'ip_formated': ipv6.ip_formated
@@ -192,80 +186,34 @@ def prepare_apply(load_balance, vip, created=True, user=None):
     if conf:
         conf = json.loads(conf)
 
+    options = vip_request['options']
     vip_request['options'] = dict()
-    vip_request['options']['cache_group'] = {
-        'id': cache_group.id,
-        'nome_opcao_txt': cache_group.nome_opcao_txt
-    }
-    vip_request['options']['traffic_return'] = {
-        'id': traffic_return.id,
-        'nome_opcao_txt': traffic_return.nome_opcao_txt
-    }
-    vip_request['options']['timeout'] = {
-        'id': timeout.id,
-        'nome_opcao_txt': timeout.nome_opcao_txt
-    }
-    vip_request['options']['persistence'] = {
-        'id': persistence.id,
-        'nome_opcao_txt': persistence.nome_opcao_txt
-    }
+    for option in VIP_OPTIONS:
+        option_vip = plan.option(options.get(option))
+        vip_request['options'][option] = {
+            'id': option_vip.id,
+            'nome_opcao_txt': option_vip.nome_opcao_txt
+        }
     vip_request['options']['cluster_unit'] = cluster_unit
+    vip_request['options']['dscp'] = plan.dscp(vip_request['id'])
 
-    try:
-        vip_request['options']['dscp'] = VipRequestDSCP.objects.get(
-            vip_request=vip_request['id']
-        ).dscp
-    except:
-        vip_request['options']['dscp'] = None
-        pass
-
-    for idx, port in enumerate(vip_request['ports']):
-        for i, pl in enumerate(port['pools']):
-
-            pool = get_pool_by_id(pl['server_pool'])
-            pool_serializer = pool_slz.PoolV3Serializer(pool)
-
-            l7_rule = OptionVip.objects.get(
-                id=pl['l7_rule']).nome_opcao_txt
-
-            healthcheck = pool_serializer.data['healthcheck']
-            healthcheck['identifier'] = reserve_name_healthcheck(
-                pool_serializer.data['identifier'])
-            healthcheck['new'] = True
-            vip_request['ports'][idx]['pools'][i]['server_pool'] = {
-                'id': pool_serializer.data['id'],
-                'nome': pool_serializer.data['identifier'],
-                'lb_method': pool_serializer.data['lb_method'],
-                'healthcheck': healthcheck,
-                'action': pool_serializer.data['servicedownaction']['name'],
-                'pool_created': pool_serializer.data['pool_created'],
-                'pools_members': [{
-                    'id': pool_member['id'],
-                    'identifier': pool_member['identifier'],
-                    'ip': pool_member['ip']['ip_formated'] if pool_member['ip'] else pool_member['ipv6']['ip_formated'],
-                    'port': pool_member['port_real'],
-                    'member_status': pool_member['member_status'],
-                    'limit': pool_member['limit'],
-                    'priority': pool_member['priority'],
-                    'weight': pool_member['weight']
-                } for pool_member in pool_serializer.data['server_pool_members']]
-            }
+    for port in vip_request['ports']:
+        for pl in port['pools']:
 
-            vip_request['ports'][idx]['pools'][i]['l7_rule'] = l7_rule
-        l7_protocol = OptionVip.objects.get(
-            id=port['options']['l7_protocol'])
-        l4_protocol = OptionVip.objects.get(
-            id=port['options']['l4_protocol'])
+            pool = plan.pool(pl['server_pool'])
 
-        vip_request['ports'][idx]['options'] = dict()
-        vip_request['ports'][idx]['options']['l7_protocol'] = {
-            'id': l7_protocol.id,
-            'nome_opcao_txt': l7_protocol.nome_opcao_txt
-        }
-        vip_request['ports'][idx]['options']['l4_protocol'] = {
-            'id': l4_protocol.id,
-            'nome_opcao_txt': l4_protocol.nome_opcao_txt
-        }
+            pl['server_pool'] = pool_payload(
+                pool, reserve_name_healthcheck(pool.identifier))
+            pl['l7_rule'] = plan.option(pl['l7_rule']).nome_opcao_txt
+
+        options = port['options']
+        port['options'] = dict()
+        for option in PORT_OPTIONS:
+            option_vip = plan.option(options.get(option))
+            port['options'][option] = {
+                'id': option_vip.id,
+                'nome_opcao_txt': option_vip.nome_opcao_txt
+            }
 
     vip_request['conf'] = conf
 
@@ -312,16 +260,13 @@ def prepare_apply(load_balance, vip, created=True, user=None):
                                     eqpts = item.get('eqpts')
                                     if eqpts:
 
-                                        eqpts = Equipamento.objects.filter(
-                                            id__in=eqpts,
-                                            maintenance=0,
-                                            tipo_equipamento__tipo_equipamento=u'Balanceador').distinct()
+                                        eqpts = plan.equips_by_ids(eqpts)
 
                                         if facade_eqpt.all_equipments_are_in_maintenance(equips):
                                             raise exceptions_eqpt.AllEquipmentsAreInMaintenanceException()
 
                                         if user:
-                                            if not facade_eqpt.all_equipments_can_update_config(equips, user):
+                                            if not plan.can_update_config(equips, user):
                                                 raise exceptions_eqpt.UserDoesNotHavePermInAllEqptException(
                                                     'User does not have permission to update conf in eqpt. \
                                                     Verify the permissions of user group with equipment group. Vip:{}'.format(
@@ -390,15 +335,32 @@ def prepare_apply(load_balance, vip, created=True, user=None):
     return load_balance
 
 
-@commit_on_success
-def create_real_vip_request(vip_requests, user):
+def _copy_vip(vip):
+    """Copies parts of vip replaced by prepare_apply, so vip is kept."""
+
+    vip_request = dict(vip)
+    vip_request['ports'] = list()
+    for port in vip['ports']:
+        port = dict(port)
+        port['pools'] = [dict(pool) for pool in port['pools']]
+        vip_request['ports'].append(port)
+
+    return vip_request
+
+
+def plan_apply(vip_requests, created=True, user=None):
+    """Returns payloads of vip_requests by load balancer, built from rows
+    of all of them loaded together in VipApplyPlan.
+    """
+
+    start = time.time()
+    plan = VipApplyPlan(vip_requests)
 
     load_balance = dict()
     keys = list()
-
     for vip in vip_requests:
         load_balance = prepare_apply(
-            load_balance, vip, created=False, user=user)
+            load_balance, vip, created=created, user=user, plan=plan)
 
         keys.append(sorted([str(key) for key in load_balance.keys()]))
 
@@ -407,12 +369,38 @@ def create_real_vip_request(vip_requests, user):
     if len(list(set(keys))) > 1:
         raise Exception('Vips Request are in differents load balancers')
 
+    log.info('Apply of %s vips planned in %.3fs, %.3fs loading rows.' % (
+        len(vip_requests), time.time() - start, plan.elapsed))
+
+    return load_balance
+
+
+def _call_load_balancers(load_balance, method):
+    """Calls method of plugin of each load balancer with its payload,
+    returning their results.
+    """
+
+    start = time.time()
+    results = list()
     for lb in load_balance:
         inst = copy.deepcopy(load_balance.get(lb))
         log.info('started call:%s' % lb)
-        inst.get('plugin').create_vip(inst)
+        results.append(getattr(inst.get('plugin'), method)(inst))
         log.info('ended call')
 
+    log.info('Apply in %s load balancers done in %.3fs.' % (
+        len(load_balance), time.time() - start))
+
+    return results
+
+
+@commit_on_success
+def create_real_vip_request(vip_requests, user):
+
+    load_balance = plan_apply(vip_requests, created=False, user=user)
+
+    _call_load_balancers(load_balance, 'create_vip')
+
     ids = [vip_id.get('id') for vip_id in vip_requests]
 
     vips = VipRequest.objects.filter(id__in=ids)
@@ -428,8 +416,7 @@ def create_real_vip_request(vip_requests, user):
 @commit_on_success
 def update_real_vip_request(vip_requests, user):
 
-    load_balance = dict()
-    keys = list()
+    vips_to_apply = list()
     for vip in vip_requests:
 
         # old VIP
@@ -543,24 +530,15 @@ def update_real_vip_request(vip_requests, user):
             port_del['delete'] = True
             vip_request['ports'].append(port_del)
 
-        load_balance = prepare_apply(load_balance, vip_request,
-                                     created=True, user=user)
+        vips_to_apply.append(vip_request)
 
-        keys.append(sorted([str(key) for key in load_balance.keys()]))
-
-    # vips are in differents load balancers
-    keys = [','.join(key) for key in keys]
-    if len(list(set(keys))) > 1:
-        raise Exception('Vips Request are in differents load balancers')
+    load_balance = plan_apply(vips_to_apply, created=True, user=user)
 
     pools_ids_ins = list()
     pools_ids_del = list()
 
-    for lb in load_balance:
-        inst = copy.deepcopy(load_balance.get(lb))
-        log.info('started call:%s' % lb)
-        pool_ins, pool_del = inst.get('plugin').update_vip(inst)
-        log.info('ended call')
+    for pool_ins, pool_del in _call_load_balancers(load_balance,
+                                                   'update_vip'):
         pools_ids_ins += pool_ins
         pools_ids_del += pool_del
 
@@ -578,8 +556,7 @@ def update_real_vip_request(vip_requests, user):
 @commit_on_success
 def patch_real_vip_request(vip_requests, user):
 
-    load_balance = dict()
-    keys = list()
+    vips_to_apply = list()
     for vip in vip_requests:
 
         vip_old = VipRequest.get_by_pk(vip.get('id'))
@@ -596,46 +573,20 @@ def patch_real_vip_request(vip_requests, user):
 
         update_vip_request(vip_dict, user, permit_created=True)
 
-        load_balance = prepare_apply(
-            load_balance, vip_dict, created=True, user=user)
+        vips_to_apply.append(vip_dict)
 
-        keys.append(sorted([str(key) for key in load_balance.keys()]))
+    load_balance = plan_apply(vips_to_apply, created=True, user=user)
 
-    # vips are in differents load balancers
-    keys = [','.join(key) for key in keys]
-    if len(list(set(keys))) > 1:
-        raise Exception('Vips Request are in differents load balancers')
-
-    for lb in load_balance:
-        inst = copy.deepcopy(load_balance.get(lb))
-        log.info('started call:%s' % lb)
-        inst.get('plugin').partial_update_vip(inst)
-        log.info('ended call')
+    _call_load_balancers(load_balance, 'partial_update_vip')
 
 
 @commit_on_success
 def delete_real_vip_request(vip_requests, user):
-    load_balance = dict()
-
-    keys = list()
-    for vip in vip_requests:
-        load_balance = prepare_apply(
-            load_balance, vip, created=True, user=user)
-
-        keys.append(sorted([str(key) for key in load_balance.keys()]))
-
-    # vips are in differents load balancers
-    keys = [','.join(key) for key in keys]
-    if len(list(set(keys))) > 1:
-        raise Exception('Vips Request are in differents load balancers')
+    load_balance = plan_apply(vip_requests, created=True, user=user)
 
     pools_ids = list()
 
-    for lb in load_balance:
-        inst = copy.deepcopy(load_balance.get(lb))
-        log.info('started call:%s' % lb)
-        pool_del = inst.get('plugin').delete_vip(inst)
-        log.info('ended call')
+    for pool_del in _call_load_balancers(load_balance, 'delete_vip'):
         pools_ids += pool_del
 
     ids = [vip_id.get('id') for vip_id in vip_requests]
@@ -651,9 +602,12 @@ def delete_real_vip_request(vip_requests, user):
         ServerPool.objects.filter(id__in=pools_ids).update(pool_created=False)
 
 
-def _validate_vip_to_apply(vip_request, update=False, user=None):
+def _validate_vip_to_apply(vip_request, update=False, user=None, plan=None):
+
+    if plan is None:
+        plan = VipApplyPlan([vip_request])
 
-    vip = get_vip_request_by_id(vip_request.get('id'))
+    vip = plan.vip(vip_request.get('id'))
 
     # validate vip with same ipv4 ou ipv6
     vip_with_ip = get_vip_request_by_ip(vip.ipv4, vip.ipv6, vip.environmentvip)
@@ -672,15 +626,15 @@ def _validate_vip_to_apply(vip_request, update=False, user=None):
     if not update and vip.created:
         raise exceptions.VipRequestAlreadyCreated(vip.id)
 
-    equips = facade_eqpt.get_eqpt_by_envvip(vip_request['environmentvip'])
+    equips = plan.equips_by_envvip(vip_request['environmentvip'])
 
-    conf = EnvironmentVip.objects.get(id=vip_request['environmentvip']).conf
+    conf = plan.conf(vip_request['environmentvip'])
 
     if facade_eqpt.all_equipments_are_in_maintenance(equips):
         raise exceptions_eqpt.AllEquipmentsAreInMaintenanceException()
 
     if user:
-        if not facade_eqpt.all_equipments_can_update_config(equips, user):
+        if not plan.can_update_config(equips, user):
             raise exceptions_eqpt.UserDoesNotHavePermInAllEqptException(
                 'User does not have permission to update conf in eqpt. \
                 Verify the permissions of user group with equipment group. Vip:{}'.format(
@@ -67,6 +67,12 @@ class VipRequest(BaseModel):
         db_column='name',
         null=True)
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'ports': 'viprequestport_set',
+        'options': 'viprequestoptionvip_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'vip_request'
         managed = True
@@ -890,6 +896,12 @@ class VipRequestPort(BaseModel):
         options = self.viprequestportoptionvip_set.all()
         return options
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'pools': 'viprequestportpool_set',
+        'options': 'viprequestportoptionvip_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'vip_request_port'
         managed = True
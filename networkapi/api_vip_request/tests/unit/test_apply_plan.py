@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from mock import Mock
+from mock import patch
+
+from networkapi.api_vip_request.facade import plan
+from networkapi.api_vip_request.facade import v3 as facade
+
+
+def vip_request(vip_id, pool_ids):
+    return {
+        'id': vip_id,
+        'environmentvip': 1,
+        'ipv4': 10 + vip_id,
+        'ipv6': None,
+        'options': {
+            'cache_group': 1,
+            'traffic_return': 2,
+            'timeout': 3,
+            'persistence': 4
+        },
+        'ports': [{
+            'port': 80,
+            'options': {'l4_protocol': 5, 'l7_protocol': 6},
+            'pools': [{'server_pool': pool_id, 'l7_rule': 7}
+                      for pool_id in pool_ids]
+        }]
+    }
+
+
+class VipApplyPlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        models = ('VipRequest', 'OptionVip', 'Ip', 'Ipv6', 'VipRequestDSCP',
+                  'ServerPool', 'EnvironmentVip')
+        self.patches = [patch.object(plan, model) for model in models]
+        self.models = dict(zip(models, [p.start() for p in self.patches]))
+
+        self.models['OptionVip'].objects.in_bulk.side_effect = \
+            lambda ids: dict((i, Mock(id=i)) for i in ids)
+        self.models['ServerPool'].objects.select_related.return_value\
+            .prefetch_related.return_value.in_bulk.side_effect = \
+            lambda ids: dict((i, Mock(id=i)) for i in ids)
+        self.models['VipRequestDSCP'].objects.filter.return_value\
+            .values_list.return_value = [(1, 3)]
+        self.models['EnvironmentVip'].objects.filter.return_value\
+            .values_list.return_value = []
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_loads_rows_of_whole_batch_at_once(self):
+        vips = [vip_request(1, [100, 101]), vip_request(2, [101, 102])]
+
+        apply_plan = plan.VipApplyPlan(vips)
+
+        options = self.models['OptionVip'].objects
+        self.assertEqual(1, options.in_bulk.call_count)
+        self.assertEqual(set(range(1, 8)), options.in_bulk.call_args[0][0])
+        self.assertEqual({11, 12}, self.models['Ip'].objects.in_bulk
+                         .call_args[0][0])
+        self.assertEqual([100, 101, 102], sorted(apply_plan.pools))
+
+        self.assertEqual(3, apply_plan.dscp('1'))
+        self.assertIsNone(apply_plan.dscp(2))
+
+    def test_rows_out_of_batch_are_searched_alone(self):
+        apply_plan = plan.VipApplyPlan([vip_request(1, [100])])
+
+        self.assertEqual(7, apply_plan.option(7).id)
+        self.assertFalse(self.models['OptionVip'].objects.get.called)
+
+        apply_plan.option(99)
+        self.models['OptionVip'].objects.get.assert_called_once_with(id=99)
+
+        with patch.object(plan, 'get_pool_by_id') as get_pool_by_id:
+            apply_plan.pool(999)
+        get_pool_by_id.assert_called_once_with(999)
+
+        apply_plan.conf(1)
+        self.models['EnvironmentVip'].objects.get.assert_called_once_with(
+            id=1)
+
+    def test_can_update_config_is_checked_once_by_equipments(self):
+        apply_plan = plan.VipApplyPlan([vip_request(1, [100])])
+        equips = [Mock(id=2), Mock(id=1)]
+        user = Mock(id=5)
+
+        with patch.object(plan.facade_eqpt,
+                          'all_equipments_can_update_config') as can_update:
+            can_update.return_value = True
+            self.assertTrue(apply_plan.can_update_config(equips, user))
+            self.assertTrue(apply_plan.can_update_config(equips[::-1], user))
+
+        self.assertEqual(1, can_update.call_count)
+
+
+class PoolPayloadTestCase(unittest.TestCase):
+
+    def test_payload_of_pool(self):
+        member = Mock(id=1, identifier='member', ip=None,
+                      ipv6=Mock(ip_formated='fdbe::1'), port_real=8080,
+                      member_status=7, limit=0, priority=1, weight=2)
+        server_pool = Mock(id=10, identifier='pool', lb_method='round-robin',
+                           pool_created=False)
+        server_pool.servicedownaction.name = 'none'
+        server_pool.serverpoolmember_set.all.return_value = [member]
+
+        payload = plan.pool_payload(server_pool, 'MONITOR_POOL_pool')
+
+        self.assertEqual('pool', payload['nome'])
+        self.assertEqual('none', payload['action'])
+        self.assertEqual('MONITOR_POOL_pool',
+                         payload['healthcheck']['identifier'])
+        self.assertTrue(payload['healthcheck']['new'])
+        self.assertEqual([{
+            'id': 1,
+            'identifier': 'member',
+            'ip': 'fdbe::1',
+            'port': 8080,
+            'member_status': 7,
+            'limit': 0,
+            'priority': 1,
+            'weight': 2
+        }], payload['pools_members'])
+
+
+class CopyVipTestCase(unittest.TestCase):
+
+    def test_pools_replaced_in_copy_are_kept_in_vip(self):
+        vip = vip_request(1, [100])
+
+        vip_copy = facade._copy_vip(vip)
+        vip_copy['ports'][0]['pools'][0]['server_pool'] = {'id': 100}
+        vip_copy['ports'][0]['options'] = dict()
+        vip_copy['options'] = dict()
+
+        self.assertEqual(vip_request(1, [100]), vip)
@@ -23,6 +23,12 @@ class VirtualInterface(BaseModel):
 
     log = logging.getLogger('VirtualInterface')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'ipv4_equipment_virtual_interface': 'ipequipamento_set',
+        'ipv6_equipment_virtual_interface': 'ipv6equipament_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'virtual_interface'
         managed = True
@@ -16,12 +16,13 @@
 import logging
 
 from networkapi.admin_permission import AdminPermission
-from networkapi.api_ogp import models
+from networkapi.api_ogp import object_permissions
 from networkapi.equipamento.models import Equipamento
 from networkapi.grupo.models import DireitosGrupoEquipamento
 from networkapi.grupo.models import EGrupo
 from networkapi.grupo.models import PermissaoAdministrativa
 from networkapi.grupo.models import PermissaoAdministrativaNotFoundError
+from networkapi.usuario import credential_cache
 from networkapi.usuario.models import Usuario
 
 log = logging.getLogger(__name__)
@@ -36,10 +37,19 @@ def authenticate(username, password, user_ldap=None):
     if username is None or password is None:
         return None
 
+    user, cache_key = credential_cache.get_user(username, password, user_ldap)
+    if user is not None:
+        return user
+
     if user_ldap is None:
-        return Usuario().get_enabled_user(username, password)
+        user = Usuario().get_enabled_user(username, password)
     else:
-        return Usuario().get_by_ldap_user(user_ldap, True)
+        user = Usuario().get_by_ldap_user(user_ldap, True)
+
+    if user is not None:
+        credential_cache.set_user(cache_key, password, user)
+
+    return user
 
 
 def has_perm(user, perm_function, perm_oper, egroup_id=None, equip_id=None, equip_oper=None):
@@ -90,58 +100,28 @@ def _has_equip_perm(ugroup, egroups, equip_oper):
 
 def validate_object_perm(objects_id, user, operation, object_type):
 
-    ugroups = user.grupos.all()
+    ugroups_id = user.grupos.values_list('id', flat=True)
+    perms = object_permissions.get_matrix(ugroups_id, object_type,
+                                          objects_id)
 
     # general perms
-    perms = models.ObjectGroupPermissionGeneral.objects.filter(
-        object_type__name=object_type
-    )
-    if perms:
-        pool_perm = _validate_obj(perms, ugroups, operation)
-        if pool_perm:
-            return True
+    if perms.has_general_perm(operation):
+        return True
 
     if len(objects_id) == 0:
         return False
 
-    for object_id in objects_id:
-
-        # individuals perms
-        perms = models.ObjectGroupPermission.objects.filter(
-            object_value=object_id,
-            object_type__name=object_type
-        )
-        if perms:
-            pool_perm = _validate_obj(perms, ugroups, operation)
-            if not pool_perm:
-                log.warning('User {} does not have permission {} to Object {}:{}'.format(
-                    user, operation, object_type, object_id
-                ))
-                return False
+    # individuals perms
+    object_id = perms.denied(objects_id, operation)
+    if object_id is not None:
+        log.warning('User {} does not have permission {} to Object {}:{}'.format(
+            user, operation, object_type, object_id
+        ))
+        return False
 
     return True
 
 
-def _validate_obj(perms, ugroups, operation):
-    obj_perm = False
-
-    perms = perms.filter(user_group__in=ugroups)
-
-    if operation == AdminPermission.OBJ_READ_OPERATION:
-        perms = perms.filter(read=True)
-    elif operation == AdminPermission.OBJ_WRITE_OPERATION:
-        perms = perms.filter(write=True)
-    elif operation == AdminPermission.OBJ_DELETE_OPERATION:
-        perms = perms.filter(delete=True)
-    elif operation == AdminPermission.OBJ_UPDATE_CONFIG_OPERATION:
-        perms = perms.filter(change_config=True)
-
-    if perms:
-        obj_perm = True
-
-    return obj_perm
-
-
 def perm_obj(request, operation, object_type, *args, **kwargs):
 
     obj_ids = kwargs.get('obj_ids')
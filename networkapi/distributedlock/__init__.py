@@ -54,17 +54,31 @@ LOCK_GET_IPV6_AVAILABLE = 'Ipv6_get_available_for_vip:%s'
 
 # Adjusts settings
 from django.core.cache import cache
+from networkapi.distributedlock.lockmanager import LockManager
+from networkapi.distributedlock.lockmanager import MemcachedCasClient
 from networkapi.distributedlock.memcachedlock import MemcachedLock
+from networkapi.settings import CACHES
+from networkapi.settings import LOCK_LEASE_TIMEOUT
 
 DEBUG = False
 DEFAULT_TIMEOUT = 1200
 DEFAULT_BLOCKING = True
 DEFAULT_MEMCACHED_CLIENT = cache
 
+lock_manager = LockManager(
+    DEFAULT_MEMCACHED_CLIENT, LOCK_LEASE_TIMEOUT,
+    cas_client=MemcachedCasClient(DEFAULT_MEMCACHED_CLIENT,
+                                  CACHES['default']['LOCATION']))
+
 
 def default_lock_factory(key):
-    return MemcachedLock(
-        key, DEFAULT_MEMCACHED_CLIENT, DEFAULT_TIMEOUT)
+    return lock_manager.lock(key)
+
+
+def get_lock_metrics():
+    """Returns wait and hold times of locks by prefix of lock name."""
+
+    return lock_manager.metrics.snapshot()
 
 
 def _debug(msg):
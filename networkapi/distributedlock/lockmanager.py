@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import copy
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+import memcache
+
+log = logging.getLogger('LockManager')
+
+__all__ = ('LockManager', 'LockBatch', 'LockMetrics', 'MemcachedCasClient')
+
+
+class LockMetrics(object):
+
+    """Wait and hold times of locks, aggregated by prefix of lock name
+    (vip, pool, network_ipv4, ...).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = dict()
+
+    @staticmethod
+    def prefixes(keys):
+        return set(key.split(':', 1)[0] for key in keys)
+
+    def _get(self, prefix):
+        if prefix not in self._metrics:
+            self._metrics[prefix] = {
+                'acquired': 0,
+                'released': 0,
+                'retries': 0,
+                'lost': 0,
+                'wait_time': 0.0,
+                'max_wait_time': 0.0,
+                'hold_time': 0.0,
+                'max_hold_time': 0.0,
+            }
+        return self._metrics[prefix]
+
+    def waited(self, keys, seconds, retries):
+        with self._lock:
+            for prefix in self.prefixes(keys):
+                metric = self._get(prefix)
+                metric['acquired'] += 1
+                metric['retries'] += retries
+                metric['wait_time'] += seconds
+                metric['max_wait_time'] = max(metric['max_wait_time'],
+                                              seconds)
+
+    def held(self, keys, seconds):
+        with self._lock:
+            for prefix in self.prefixes(keys):
+                metric = self._get(prefix)
+                metric['released'] += 1
+                metric['hold_time'] += seconds
+                metric['max_hold_time'] = max(metric['max_hold_time'],
+                                              seconds)
+
+    def lost(self, keys):
+        with self._lock:
+            for prefix in self.prefixes(keys):
+                self._get(prefix)['lost'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._metrics)
+
+    def reset(self):
+        with self._lock:
+            self._metrics = dict()
+
+
+class LockBatch(object):
+
+    """Set of locks acquired together by LockManager."""
+
+    def __init__(self, manager, keys, instance_id):
+        self.manager = manager
+        self.keys = keys
+        self.cache_keys = ['lock:%s' % key for key in keys]
+        self.instance_id = instance_id
+        self.acquired_at = time.time()
+
+    def release(self):
+        self.manager.release(self)
+
+    # Same interface of distributedlock, so a batch can be destroyed by
+    # networkapi.util.geral.destroy_lock
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.release()
+
+
+class ManagedLock(object):
+
+    """Single lock with the interface of MemcachedLock (acquire/release),
+    acquired through LockManager.
+    """
+
+    def __init__(self, manager, key):
+        self.manager = manager
+        self.key = key
+        self.batch = None
+
+    def acquire(self, blocking=True):
+        self.batch = self.manager.acquire([self.key], blocking)
+        return self.batch is not None
+
+    def release(self):
+        if self.batch is not None:
+            self.batch.release()
+            self.batch = None
+
+
+class MemcachedCasClient(object):
+
+    """gets and cas of keys of a django memcached cache, which does not
+    expose them. Ids of gets are kept by thread until reset_cas.
+    """
+
+    def __init__(self, cache, servers):
+        self.cache = cache
+        self.client = memcache.Client(servers, cache_cas=True)
+
+    def gets(self, key):
+        return self.client.gets(self.cache.make_key(key))
+
+    def cas(self, key, value, timeout):
+        return self.client.cas(self.cache.make_key(key), value, timeout)
+
+    def reset_cas(self):
+        self.client.reset_cas()
+
+
+class LockManager(object):
+
+    """Acquires batches of distributed locks in memcached.
+
+    Keys of a batch are sorted, so concurrent batches always try keys in
+    the same order. Keys already held are found with a single get_many and,
+    when any key of the batch can not be added, the keys added are removed
+    and the batch is retried after an exponential backoff with jitter, so
+    batches never wait holding part of their keys.
+
+    Locks are leases with a short timeout, renewed by a heartbeat thread
+    while they are held. Locks of a crashed worker expire after timeout.
+    Leases are renewed with gets and cas of cas_client (client when not
+    given), so a lock taken by other instance after it expired is not
+    taken back.
+    """
+
+    def __init__(self, client, timeout=120, heartbeat_interval=None,
+                 min_backoff=0.05, max_backoff=5.0, cas_client=None):
+        self.client = client
+        self.cas_client = cas_client or client
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat_interval or timeout / 3.0
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.metrics = LockMetrics()
+
+        self._lock = threading.Lock()
+        self._batches = dict()
+        self._heartbeat = None
+        self._heartbeat_pid = None
+
+    def lock(self, key):
+        return ManagedLock(self, key)
+
+    def acquire(self, keys, blocking=True):
+        """Acquires all locks of keys.
+
+        @return: LockBatch or None when blocking is False and some lock is
+                 held by other instance.
+        """
+
+        keys = sorted(set(str(key) for key in keys))
+        instance_id = uuid.uuid1().hex
+        batch = LockBatch(self, keys, instance_id)
+
+        start = time.time()
+        retries = 0
+        while not self._try_acquire(batch):
+            if not blocking:
+                return None
+
+            backoff = min(self.max_backoff, self.min_backoff * 2 ** retries)
+            backoff = random.uniform(backoff / 2, backoff)
+            log.warning('Waiting %.2fs for locks %s', backoff, keys)
+            time.sleep(backoff)
+            retries += 1
+
+        batch.acquired_at = time.time()
+        self.metrics.waited(keys, batch.acquired_at - start, retries)
+        self._register(batch)
+
+        log.debug('Acquired locks %s, instance_id=%s', keys, instance_id)
+
+        return batch
+
+    def _try_acquire(self, batch):
+        if not batch.cache_keys:
+            return True
+
+        # Backs off without adding anything when a key is already held
+        if self.client.get_many(batch.cache_keys):
+            return False
+
+        added_keys = list()
+        for cache_key in batch.cache_keys:
+            added = self.client.add(cache_key, batch.instance_id,
+                                    self.timeout)
+            if added:
+                added_keys.append(cache_key)
+                continue
+
+            if added == 0 and not (added is False):
+                self._delete_owned(added_keys, batch.instance_id)
+                raise RuntimeError(
+                    u'Error calling memcached add! Is memcached up and '
+                    u'configured? memcached_client.add returns %s' %
+                    repr(added))
+
+            # Partial acquisition, releases keys to avoid deadlock
+            self._delete_owned(added_keys, batch.instance_id)
+            return False
+
+        return True
+
+    def _owned(self, cache_keys, instance_id):
+        values = self.client.get_many(cache_keys)
+        return [cache_key for cache_key in cache_keys
+                if values.get(cache_key) == instance_id]
+
+    def _delete_owned(self, cache_keys, instance_id):
+        if not cache_keys:
+            return []
+
+        owned = self._owned(cache_keys, instance_id)
+        if owned:
+            self.client.delete_many(owned)
+        return owned
+
+    def release(self, batch):
+        self._unregister(batch)
+
+        owned = self._delete_owned(batch.cache_keys, batch.instance_id)
+        self.metrics.held(batch.keys, time.time() - batch.acquired_at)
+
+        if len(owned) != len(batch.cache_keys):
+            self.metrics.lost(batch.keys)
+            log.warning('Locks %s expired before release. Lease was not '
+                        'renewed in %ss.', batch.keys, self.timeout)
+        else:
+            log.debug('Released locks %s', batch.keys)
+
+    def renew(self, batch):
+        """Renews lease of locks of batch still owned by it."""
+
+        try:
+            renewed = [cache_key for cache_key in batch.cache_keys
+                       if self._renew(cache_key, batch.instance_id)]
+        finally:
+            self.cas_client.reset_cas()
+
+        if len(renewed) != len(batch.cache_keys):
+            log.error('Lease of locks %s lost.', batch.keys)
+
+    def _renew(self, cache_key, instance_id):
+        # cas fails when the lock changed since gets, even if it expired
+        # and was acquired by other instance in between.
+        if self.cas_client.gets(cache_key) != instance_id:
+            return False
+        return bool(self.cas_client.cas(cache_key, instance_id,
+                                        self.timeout))
+
+    def _register(self, batch):
+        with self._lock:
+            self._batches[batch.instance_id] = batch
+            self._start_heartbeat()
+
+    def _unregister(self, batch):
+        with self._lock:
+            self._batches.pop(batch.instance_id, None)
+
+    def _start_heartbeat(self):
+        # Threads do not survive fork, so a worker forked from a process
+        # that had a heartbeat needs its own.
+        if self._heartbeat is not None and self._heartbeat.is_alive() and \
+                self._heartbeat_pid == os.getpid():
+            return
+
+        self._heartbeat = threading.Thread(target=self._run_heartbeat,
+                                           name='LockManagerHeartbeat')
+        self._heartbeat.daemon = True
+        self._heartbeat_pid = os.getpid()
+        self._heartbeat.start()
+
+    def _run_heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+
+            with self._lock:
+                batches = self._batches.values()
+
+            for batch in batches:
+                try:
+                    self.renew(batch)
+                except Exception:
+                    log.exception('Failure to renew locks %s', batch.keys)
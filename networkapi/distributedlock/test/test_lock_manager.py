@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import patch
+
+from networkapi.distributedlock.lockmanager import LockManager
+
+
+KEYS = ['lock:pool:1', 'lock:pool:2', 'lock:vip:1', 'lock:vip:2']
+
+
+class LocMemCasClient(object):
+
+    """gets and cas of MemcachedCasClient over a LocMemCache. Values are
+    compared instead of cas ids, enough for instance ids of locks, that are
+    never set twice.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.values = dict()
+
+    def gets(self, key):
+        self.values[key] = self.cache.get(key)
+        return self.values[key]
+
+    def cas(self, key, value, timeout):
+        if key not in self.values or \
+                self.cache.get(key) != self.values.pop(key):
+            return False
+        self.cache.set(key, value, timeout)
+        return True
+
+    def reset_cas(self):
+        self.values.clear()
+
+
+class LockManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        self.cache.clear()
+        self.manager = LockManager(self.cache, timeout=60,
+                                   heartbeat_interval=3600,
+                                   cas_client=LocMemCasClient(self.cache))
+
+    def held(self):
+        return self.cache.get_many(KEYS)
+
+    def test_acquire_and_release_batch(self):
+        batch = self.manager.acquire(['pool:2', 'pool:1', 'pool:2'])
+
+        self.assertEquals(['pool:1', 'pool:2'], batch.keys)
+        self.assertEquals(
+            {'lock:pool:1': batch.instance_id,
+             'lock:pool:2': batch.instance_id},
+            self.held())
+
+        batch.release()
+
+        self.assertEquals({}, self.held())
+
+    def test_held_key_fails_without_adding(self):
+        self.cache.set('lock:pool:2', 'other')
+
+        with patch.object(self.cache, 'add') as add:
+            batch = self.manager.acquire(['pool:1', 'pool:2'],
+                                         blocking=False)
+
+        self.assertIsNone(batch)
+        self.assertFalse(add.called)
+        self.assertEquals({'lock:pool:2': 'other'}, self.held())
+
+    def test_partial_acquisition_is_released(self):
+        cache = self.cache
+        add = cache.add
+
+        # Other instance takes pool:2 between get_many and add
+        def racing_add(key, value, timeout=None):
+            if key == 'lock:pool:2':
+                cache.set(key, 'other')
+            return add(key, value, timeout)
+
+        with patch.object(cache, 'add', racing_add):
+            batch = self.manager.acquire(['pool:1', 'pool:2'],
+                                         blocking=False)
+
+        self.assertIsNone(batch)
+        self.assertEquals({'lock:pool:2': 'other'}, self.held())
+
+    def test_renew_keeps_only_owned_keys(self):
+        batch = self.manager.acquire(['vip:1', 'vip:2'])
+        self.cache.set('lock:vip:2', 'other')
+
+        self.manager.renew(batch)
+        batch.release()
+
+        self.assertEquals({'lock:vip:2': 'other'}, self.held())
+        self.assertEquals(1, self.manager.metrics.snapshot()['vip']['lost'])
+
+    def test_renew_does_not_take_back_key_acquired_by_other(self):
+        batch = self.manager.acquire(['vip:1'])
+        cas_client = self.manager.cas_client
+        gets = cas_client.gets
+
+        # Lease expires and other instance acquires vip:1 between gets
+        # and cas
+        def racing_gets(key):
+            value = gets(key)
+            self.cache.delete(key)
+            self.cache.add(key, 'other')
+            return value
+
+        with patch.object(cas_client, 'gets', racing_gets):
+            self.manager.renew(batch)
+
+        self.assertEquals({'lock:vip:1': 'other'}, self.held())
+
+    def test_metrics_by_prefix(self):
+        self.manager.acquire(['vip:1', 'pool:1']).release()
+        self.manager.acquire(['pool:2']).release()
+
+        metrics = self.manager.metrics.snapshot()
+
+        self.assertEquals(1, metrics['vip']['acquired'])
+        self.assertEquals(2, metrics['pool']['acquired'])
+        self.assertEquals(2, metrics['pool']['released'])
+        self.assertEquals(0, metrics['pool']['retries'])
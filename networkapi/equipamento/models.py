@@ -19,6 +19,8 @@ from _mysql_exceptions import OperationalError
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.db.models import get_model
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 
 from networkapi.ambiente.models import Ambiente
 from networkapi.ambiente.models import AmbienteNotFoundError
@@ -29,6 +31,7 @@ from networkapi.grupo.models import EGrupoNotFoundError
 from networkapi.models.BaseModel import BaseModel
 from networkapi.roteiro.models import Roteiro
 from networkapi.tipoacesso.models import TipoAcesso
+from networkapi.vlan import numbers
 
 
 class EquipamentoError(Exception):
@@ -485,6 +488,14 @@ class Equipamento(BaseModel):
 
     log = logging.getLogger('Equipamento')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'groups': 'grupos',
+        'environments': 'equipamentoambiente_set',
+        'ipv4_equipment_virtual_interface': 'ipequipamento_set',
+        'ipv6_equipment_virtual_interface': 'ipv6equipament_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'equipamentos'
         managed = True
@@ -1810,3 +1821,9 @@ class ModeloRoteiro(BaseModel):
                 u'Falha ao remover uma associação entre um Modelo e um Roteiro.')
             raise EquipamentoError(
                 e, u'Falha ao remover uma associação entre um Modelo e um Roteiro.')
+
+
+# VLAN numbers used by an environment include those of the environments
+# of its equipments.
+post_save.connect(numbers.invalidate_cache, sender=EquipamentoAmbiente)
+post_delete.connect(numbers.invalidate_cache, sender=EquipamentoAmbiente)
@@ -13,18 +13,31 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import atexit
 import logging
 import threading
 from datetime import datetime
+from functools import partial
+from hashlib import sha1
 from time import time
 
+from django.core.cache import cache
 from django.db import models
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 
+from networkapi.eventlog.writer import AuditWriter
 from networkapi.queue_tools.rabbitmq import QueueManager
+from networkapi.settings import AUDIT_LOG_ASYNC
+from networkapi.settings import AUDIT_LOG_BACKGROUND
+from networkapi.settings import AUDIT_USUARIO_CACHE_TIME
+from networkapi.settings import LOG_QUEUE
+from networkapi.util.transaction_hooks import on_commit
 
 LOG = logging.getLogger(__name__)
 
+KEY_AUDIT_USUARIO = 'audit_request:usuario:%s'
+
 
 class EventLogError(Exception):
 
@@ -90,15 +103,9 @@ class EventLog(models.Model):
         }
         """
 
-        parametro_anterior = [
-            '{0} : {1}'.format(key, evento['parametro_anterior'][key])
-            for key in evento['parametro_anterior']]
-        parametro_anterior = u'\n'.join(parametro_anterior)
-
-        parametro_atual = [
-            '{0} : {1}'.format(key, evento['parametro_atual'][key])
-            for key in evento['parametro_atual']]
-        parametro_atual = u'\n'.join(parametro_atual)
+        parametro_anterior = cls.format_parameters(
+            evento['parametro_anterior'])
+        parametro_atual = cls.format_parameters(evento['parametro_atual'])
 
         try:
             functionality = Functionality()
@@ -121,6 +128,43 @@ class EventLog(models.Model):
             raise EventLogError(
                 e, u'Falha ao salvar o log: evento = %s, id do usuario = %s.' % (evento, usuario))
 
+    @classmethod
+    def bulk_log(cls, records):
+        """
+        saves in a single insert the eventlogs buffered by AuditBuffer
+        """
+
+        try:
+            functionality = Functionality()
+            for funcionalidade in set(record['funcionalidade']
+                                      for record in records):
+                functionality.exist(funcionalidade)
+
+            cls.objects.bulk_create([
+                EventLog(
+                    usuario_id=record['usuario'],
+                    hora_evento=datetime.fromtimestamp(record['hora_evento']),
+                    acao=record['acao'],
+                    funcionalidade=record['funcionalidade'],
+                    parametro_anterior=record['parametro_anterior'],
+                    parametro_atual=record['parametro_atual'],
+                    id_objeto=record['id_objeto'],
+                    audit_request_id=record['audit_request'],
+                    evento='',
+                    resultado=0
+                ) for record in records])
+        except Exception, e:
+            cls.logger.error(
+                u'Falha ao salvar os logs: %s eventos.' % len(records))
+            raise EventLogError(
+                e, u'Falha ao salvar os logs: %s eventos.' % len(records))
+
+    @staticmethod
+    def format_parameters(parametros):
+        parametros = ['{0} : {1}'.format(key, parametros[key])
+                      for key in parametros]
+        return u'\n'.join(parametros)
+
 
 class EventLogQueue(object):
 
@@ -128,18 +172,17 @@ class EventLogQueue(object):
     def log(cls, usuario, evento):
         """Send the eventlog to queues"""
 
+        cls.send([cls.message(usuario, evento)])
+
+    @classmethod
+    def message(cls, usuario, evento):
+        """Returns message of eventlog sent to queues"""
+
         usuario_id = 'NoUser'
         if usuario:
             usuario_id = usuario.id
 
-        # Send to Queue
-        queue_manager = QueueManager(
-            broker_vhost='tasks',
-            exchange_name='eventslog',
-            routing_key='eventslog'
-        )
-
-        queue_manager.append({
+        return {
             'action': evento['acao'],
             'kind': evento['funcionalidade'],
             'timestamp': int(time()),
@@ -149,10 +192,153 @@ class EventLogQueue(object):
                 'old_value': evento['parametro_anterior'],
                 'new_value': evento['parametro_atual']
             }
-        })
+        }
+
+    @classmethod
+    def send(cls, messages):
+        """Send messages to queues in a single publish"""
+
+        # Send to Queue
+        queue_manager = QueueManager(
+            broker_vhost='tasks',
+            exchange_name='eventslog',
+            routing_key='eventslog'
+        )
+
+        for message in messages:
+            queue_manager.append(message)
         queue_manager.send()
 
 
+class AuditBuffer(object):
+
+    """
+    Buffers the events audited in a request, so they are saved in bulk
+    and sent to queues in a single publish after the request ends.
+    Events are buffered when the transaction of their change is committed.
+    Out of a request (no buffer started), events are saved right away.
+
+    Buffers are written after the response, by the background AuditWriter
+    when AUDIT_LOG_BACKGROUND or by a celery task when AUDIT_LOG_ASYNC. The
+    audit request of the buffer is only saved then, in the transaction of
+    its events.
+    """
+
+    THREAD_LOCAL = threading.local()
+
+    @staticmethod
+    def start():
+        AuditBuffer.THREAD_LOCAL.records = list()
+        AuditBuffer.THREAD_LOCAL.audit_request = None
+
+    @staticmethod
+    def started():
+        return getattr(AuditBuffer.THREAD_LOCAL, 'records', None) is not None
+
+    @staticmethod
+    def discard():
+        AuditBuffer.THREAD_LOCAL.records = None
+        AuditBuffer.THREAD_LOCAL.audit_request = None
+
+    @staticmethod
+    def log(usuario, evento):
+        """Saves the eventlog or buffers it when there is a buffer started"""
+
+        records = getattr(AuditBuffer.THREAD_LOCAL, 'records', None)
+
+        if records is None:
+            EventLog.log(usuario, evento)
+            if LOG_QUEUE:
+                EventLogQueue.log(usuario, evento)
+            return
+
+        audit_request = evento['audit_request']
+        if audit_request is not None and audit_request.pk is None:
+            AuditBuffer.THREAD_LOCAL.audit_request = audit_request
+
+        record = {
+            'usuario': usuario.id if usuario else None,
+            'hora_evento': time(),
+            'acao': evento['acao'],
+            'funcionalidade': evento['funcionalidade'],
+            'parametro_anterior': EventLog.format_parameters(
+                evento['parametro_anterior']),
+            'parametro_atual': EventLog.format_parameters(
+                evento['parametro_atual']),
+            'id_objeto': evento['id_objeto'],
+            'audit_request': audit_request.pk if audit_request else None,
+            'queue': EventLogQueue.message(usuario, evento)
+            if LOG_QUEUE else None
+        }
+
+        # Only events of changes committed are written; the ones of a
+        # transaction rolled back never reach the buffer.
+        on_commit(partial(records.append, record))
+
+    @staticmethod
+    def flush():
+        """Hands the events buffered to the writer"""
+
+        records = getattr(AuditBuffer.THREAD_LOCAL, 'records', None)
+        audit_request = getattr(AuditBuffer.THREAD_LOCAL, 'audit_request',
+                                None)
+        AuditBuffer.discard()
+
+        if not records:
+            return
+
+        batch = {
+            'audit_request': audit_request.to_data()
+            if audit_request is not None else None,
+            'records': records
+        }
+
+        if AUDIT_LOG_ASYNC:
+            from networkapi.eventlog.tasks import write_audit_events
+            write_audit_events.delay([batch])
+        elif AUDIT_LOG_BACKGROUND:
+            audit_writer.put(batch)
+        else:
+            AuditBuffer.write([batch])
+
+    @staticmethod
+    def write(batches):
+        """Writes batches of many requests in one transaction: audit
+        requests not saved yet, then their events in a single insert.
+        """
+
+        with transaction.commit_on_success():
+            audit_requests_id = iter(AuditRequest.save_all(
+                [batch['audit_request'] for batch in batches
+                 if batch['audit_request']]))
+
+            records = list()
+            for batch in batches:
+                audit_request_id = None
+                if batch['audit_request']:
+                    audit_request_id = next(audit_requests_id)
+
+                for record in batch['records']:
+                    # Batches are kept as queued, to be written again one
+                    # by one when writing many of them fails.
+                    record = dict(record)
+                    if record['audit_request'] is None:
+                        record['audit_request'] = audit_request_id
+                    records.append(record)
+
+            EventLog.bulk_log(records)
+
+        # Events are saved already, a failure to send them must not make
+        # their batches be written again.
+        messages = [record['queue'] for record in records if record['queue']]
+        if messages:
+            try:
+                EventLogQueue.send(messages)
+            except Exception:
+                LOG.exception(u'Failure to send %s events to queues.',
+                              len(messages))
+
+
 class AuditRequest(models.Model):
 
     """
@@ -179,8 +365,44 @@ class AuditRequest(models.Model):
         """
         from networkapi.usuario.models import Usuario
 
+        audit_request = AuditRequest()
+
         if not isinstance(user, Usuario):
+            audit_request.user_id = AuditRequest.usuario_id_of(user)
+        else:
+            audit_request.user = user
+
+        audit_request.ip = ip
+        audit_request.path = path
+        audit_request.request_id = identity
+        audit_request.request_context = context
+
+        AuditRequest.THREAD_LOCAL.current = audit_request
+        AuditRequest.THREAD_LOCAL.factory = None
+        return audit_request
+
+    @staticmethod
+    def new_lazy_request(factory):
+        """
+        Put on thread context a function that creates the request with
+        new_request, so it is only called when the request is first used.
+        """
+
+        AuditRequest.THREAD_LOCAL.current = None
+        AuditRequest.THREAD_LOCAL.factory = factory
+
+    @staticmethod
+    def usuario_id_of(user):
+        """
+        Returns id of Usuario of a django user, creating it if needed.
+        """
+        from networkapi.usuario.models import Usuario
+
+        key = KEY_AUDIT_USUARIO % sha1(user.username.encode('utf-8'))\
+            .hexdigest()
+        usuario_id = cache.get(key)
 
+        if usuario_id is None:
             # try to find a Usuario with the same email
             # Need to do this because we are using django 1.4 and we cannot
             # change the user model
@@ -190,19 +412,46 @@ class AuditRequest(models.Model):
                           'nome': user.get_full_name(),
                           'email': user.email,
                           'user': user.username})
+            usuario_id = usuario.id
+            cache.set(key, usuario_id, AUDIT_USUARIO_CACHE_TIME)
 
-        else:
-            usuario = user
+        return usuario_id
 
-        audit_request = AuditRequest()
-        audit_request.ip = ip
-        audit_request.user = usuario
-        audit_request.path = path
-        audit_request.request_id = identity
-        audit_request.request_context = context
+    def to_data(self):
+        """Returns fields of request to be saved by bulk_save"""
 
-        AuditRequest.THREAD_LOCAL.current = audit_request
-        return audit_request
+        return {
+            'request_id': self.request_id,
+            'request_context': self.request_context,
+            'ip': self.ip,
+            'path': self.path,
+            'user': self.user_id
+        }
+
+    @staticmethod
+    def save_all(requests_data):
+        """
+        Saves requests, one insert each.
+
+        Bulk insert does not return ids and request_id comes from clients,
+        so rows inserted by concurrent writers could not be told apart.
+
+        @return: ids of requests, in the order of requests_data.
+        """
+
+        audit_requests_id = list()
+        for data in requests_data:
+            audit_request = AuditRequest(
+                request_id=data['request_id'],
+                request_context=data['request_context'],
+                ip=data['ip'],
+                path=data['path'],
+                user_id=data['user']
+            )
+            audit_request.save()
+            audit_requests_id.append(audit_request.id)
+
+        return audit_requests_id
 
     @staticmethod
     def set_request_from_id(request_id):
@@ -229,6 +478,13 @@ class AuditRequest(models.Model):
         """
 
         audit_request = getattr(AuditRequest.THREAD_LOCAL, 'current', None)
+
+        factory = getattr(AuditRequest.THREAD_LOCAL, 'factory', None)
+        if audit_request is None and factory is not None:
+            AuditRequest.THREAD_LOCAL.factory = None
+            audit_request = factory()
+            AuditRequest.THREAD_LOCAL.current = audit_request
+
         if force_save and audit_request is not None and audit_request.pk is None:
             audit_request.save()
         return audit_request
@@ -239,6 +495,7 @@ class AuditRequest(models.Model):
         Remove audit request from thread context
         """
         AuditRequest.THREAD_LOCAL.current = None
+        AuditRequest.THREAD_LOCAL.factory = None
 
 
 class Functionality(models.Model):
@@ -260,3 +517,8 @@ class Functionality(models.Model):
             functionality.nome = event_functionality
             functionality.save()
             return event_functionality
+
+
+audit_writer = AuditWriter(AuditBuffer.write)
+
+atexit.register(audit_writer.flush)
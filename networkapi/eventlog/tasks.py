@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from networkapi import celery_app
+from networkapi.eventlog.models import AuditBuffer
+
+
+@celery_app.task
+def write_audit_events(batches):
+    """Writes the batches of events buffered by AuditBuffer in requests."""
+
+    AuditBuffer.write(batches)
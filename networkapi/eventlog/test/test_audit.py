@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.db import transaction
+from mock import Mock
+from mock import patch
+
+from networkapi.ambiente.models import GrupoL3
+from networkapi.eventlog.models import AuditBuffer
+from networkapi.eventlog.models import AuditRequest
+from networkapi.eventlog.models import EventLog
+from networkapi.eventlog.writer import AuditWriter
+from networkapi.models.models_signal_receiver import old_state_of
+from networkapi.models.models_signal_receiver import to_dict
+
+
+class AuditOldStateTestCase(unittest.TestCase):
+
+    def test_old_state_from_loaded_instance(self):
+        group_l3 = GrupoL3(id=1, nome='old name')
+        group_l3._state.adding = False
+
+        group_l3.nome = 'new name'
+        new_state = to_dict(group_l3)
+        old_state = old_state_of(group_l3, new_state)
+
+        self.assertEquals('old name', old_state['nome'])
+        self.assertEquals('new name', new_state['nome'])
+        self.assertEquals(new_state['id'], old_state['id'])
+
+
+class AuditBufferTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        AuditBuffer.discard()
+
+    def test_events_are_buffered(self):
+        AuditBuffer.start()
+
+        AuditBuffer.log(None, {
+            'acao': 'Alterar',
+            'funcionalidade': 'GrupoL3',
+            'parametro_anterior': {'nome': 'old name'},
+            'parametro_atual': {'nome': 'new name'},
+            'id_objeto': 1,
+            'audit_request': None
+        })
+
+        records = AuditBuffer.THREAD_LOCAL.records
+        self.assertEquals(1, len(records))
+        self.assertEquals('nome : old name', records[0]['parametro_anterior'])
+        self.assertEquals('nome : new name', records[0]['parametro_atual'])
+        self.assertIsNone(records[0]['usuario'])
+
+    def test_events_are_buffered_on_commit(self):
+        AuditBuffer.start()
+
+        with transaction.commit_manually():
+            AuditBuffer.log(None, {
+                'acao': 'Alterar',
+                'funcionalidade': 'GrupoL3',
+                'parametro_anterior': {'nome': 'old name'},
+                'parametro_atual': {'nome': 'new name'},
+                'id_objeto': 1,
+                'audit_request': None
+            })
+            self.assertEquals([], AuditBuffer.THREAD_LOCAL.records)
+            transaction.commit()
+
+        self.assertEquals(1, len(AuditBuffer.THREAD_LOCAL.records))
+
+    def test_events_of_rolled_back_changes_are_not_buffered(self):
+        AuditBuffer.start()
+
+        with transaction.commit_manually():
+            AuditBuffer.log(None, {
+                'acao': 'Remover',
+                'funcionalidade': 'GrupoL3',
+                'parametro_anterior': {'nome': 'name'},
+                'parametro_atual': {},
+                'id_objeto': 1,
+                'audit_request': None
+            })
+            transaction.rollback()
+
+        self.assertEquals([], AuditBuffer.THREAD_LOCAL.records)
+
+    def test_discard(self):
+        AuditBuffer.start()
+        AuditBuffer.discard()
+
+        self.assertIsNone(AuditBuffer.THREAD_LOCAL.records)
+
+    def test_unsaved_audit_request_is_kept(self):
+        audit_request = AuditRequest(request_id='1', path='/api/', ip='::1')
+        AuditBuffer.start()
+
+        AuditBuffer.log(None, {
+            'acao': 'Cadastrar',
+            'funcionalidade': 'GrupoL3',
+            'parametro_anterior': {},
+            'parametro_atual': {'nome': 'name'},
+            'id_objeto': 1,
+            'audit_request': audit_request
+        })
+
+        self.assertIs(audit_request, AuditBuffer.THREAD_LOCAL.audit_request)
+        self.assertIsNone(AuditBuffer.THREAD_LOCAL.records[0]['audit_request'])
+
+    @patch.object(EventLog, 'bulk_log')
+    @patch.object(AuditRequest, 'save_all', return_value=[7])
+    def test_write_keeps_batches_as_queued(self, save_all, bulk_log):
+        batches = [
+            {'audit_request': None,
+             'records': [{'audit_request': 3, 'queue': None}]},
+            {'audit_request': {'request_id': '1'},
+             'records': [{'audit_request': None, 'queue': None}]},
+        ]
+
+        AuditBuffer.write(batches)
+
+        save_all.assert_called_once_with([{'request_id': '1'}])
+        self.assertEquals([3, 7], [record['audit_request']
+                                   for record in bulk_log.call_args[0][0]])
+        self.assertIsNone(batches[1]['records'][0]['audit_request'])
+
+
+class LazyAuditRequestTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        AuditRequest.cleanup_request()
+
+    def test_factory_is_called_on_first_use(self):
+        calls = list()
+
+        def factory():
+            calls.append(1)
+            return AuditRequest(request_id='1', path='/api/', ip='::1')
+
+        AuditRequest.new_lazy_request(factory)
+        self.assertEquals([], calls)
+
+        audit_request = AuditRequest.current_request()
+
+        self.assertEquals('1', audit_request.request_id)
+        self.assertEquals([1], calls)
+
+    def test_cleanup_discards_factory(self):
+        AuditRequest.new_lazy_request(lambda: self.fail('factory called'))
+        AuditRequest.cleanup_request()
+
+        self.assertIsNone(AuditRequest.current_request())
+
+
+@patch('networkapi.eventlog.writer.connection', Mock())
+class AuditWriterTestCase(unittest.TestCase):
+
+    def test_batches_are_written_together(self):
+        write = Mock()
+
+        AuditWriter(write)._write(['a', 'b'])
+
+        write.assert_called_once_with(['a', 'b'])
+
+    def test_batches_are_written_one_by_one_after_failure(self):
+        written = list()
+
+        def write(batches):
+            if len(batches) > 1 or batches == ['b']:
+                raise Exception('failure')
+            written.extend(batches)
+
+        AuditWriter(write)._write(['a', 'b', 'c'])
+
+        self.assertEquals(['a', 'c'], written)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import os
+import threading
+from Queue import Empty
+from Queue import Queue
+
+from django.db import connection
+
+log = logging.getLogger(__name__)
+
+
+class AuditWriter(object):
+
+    """Background writer of audit batches.
+
+    Batches put by requests are drained by a daemon thread and written
+    together, so audit requests and events of concurrent requests are
+    inserted in bulk out of the response path.
+
+    Batches still queued are written at exit, but not when the process is
+    killed.
+    """
+
+    def __init__(self, write, max_batches=200):
+        self.write = write
+        self.max_batches = max_batches
+
+        self._lock = threading.Lock()
+        self._queue = Queue()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def put(self, batch):
+        with self._lock:
+            # Threads and queued batches do not survive fork.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = Queue()
+                self._thread = None
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name='AuditWriter')
+                self._thread.daemon = True
+                self._thread.start()
+
+        self._queue.put(batch)
+
+    def flush(self):
+        """Writes batches queued in the calling thread."""
+
+        batches = self._drain()
+        if batches:
+            self._write(batches)
+
+    def _drain(self, block=False):
+        batches = list()
+        try:
+            batches.append(self._queue.get(block))
+            while len(batches) < self.max_batches:
+                batches.append(self._queue.get_nowait())
+        except Empty:
+            pass
+        return batches
+
+    def _write(self, batches):
+        try:
+            self.write(batches)
+        except Exception:
+            if len(batches) == 1:
+                log.exception(u'Failure to write audit batch.')
+            else:
+                # A batch that cannot be written must not lose the others,
+                # so they are written again one by one.
+                log.warning(u'Failure to write %s audit batches, writing '
+                            u'them one by one.', len(batches), exc_info=True)
+                for batch in batches:
+                    self._write_one(batch)
+        finally:
+            # Connections are per thread, the writer does not keep one idle.
+            connection.close()
+
+    def _write_one(self, batch):
+        try:
+            self.write([batch])
+        except Exception:
+            log.exception(u'Failure to write audit batch.')
+
+    def _run(self):
+        while True:
+            self._write(self._drain(block=True))
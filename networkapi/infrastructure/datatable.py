@@ -13,8 +13,51 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import base64
+import json
+import logging
+from hashlib import sha1
+
+from django.core.cache import cache
+from django.core.exceptions import FieldError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import get_models
 from django.db.models import Q
 
+from networkapi.settings import DATATABLE_TOTAL_CACHE_TIME
+
+log = logging.getLogger(__name__)
+
+KEY_TOTAL = 'datatable_total:%s'
+
+
+class InvalidCursorError(FieldError):
+
+    """Cursor of search is invalid or of other ordering.
+
+    Subclass of FieldError, so facades report it as an invalid search.
+    """
+
+
+def joins_to_many(query_set):
+    """Returns if query joins a to-many relation, when rows may repeat.
+
+    Joins by primary key of joined table are to-one, any other join (reverse
+    foreign keys, many to many) may repeat rows.
+    """
+
+    pk_columns = dict((model._meta.db_table, model._meta.pk.column)
+                      for model in get_models())
+
+    for join in query_set.query.alias_map.values():
+        if join.lhs_alias is None:
+            # base table
+            continue
+        if join.rhs_join_col != pk_columns.get(join.table_name):
+            return True
+
+    return False
+
 
 def build_query_to_datatable(query_set, asorting_cols, custom_search,
                              searchable_columns, start_record, end_record):
@@ -30,14 +73,10 @@ def build_query_to_datatable(query_set, asorting_cols, custom_search,
         query_set = query_set.order_by("pk")
 
     # Apply filtering by value sent by user
-    if custom_search is not None:
-        output_q = None
-        for searchableColumn in searchable_columns:
-            kwargz = {searchableColumn + "__icontains": custom_search}
-            output_q = output_q | Q(**kwargz) if output_q else Q(**kwargz)
-        query_set = query_set.filter(output_q)
+    query_set = _filter_search(query_set, custom_search, searchable_columns)
 
-    query_set = query_set.distinct()
+    if joins_to_many(query_set):
+        query_set = query_set.distinct()
 
     total = query_set.count()
     # Slice pages
@@ -58,16 +97,24 @@ def build_query_to_datatable_v3(query_set, search={}):
     :param search.searchable_columns: List of fields used in "generic search"
     :param search.start_record: Value used in initial "limit"
     :param search.end_record: Value used in final "limit
-    :return obj_map.total: Total objects returned
+    :param search.cursor: Enables pagination by cursor when present, null in
+        first page or value of "cursor" of next_search/prev_search. Pages
+        have end_record - start_record objects.
+    :return obj_map.total: Total objects returned, cached for
+        DATATABLE_TOTAL_CACHE_TIME seconds in pagination by cursor
     :return obj_map.next_search: Copy of search
     :return obj_map.next_search.start_record: Value to use in initial "limit"
         in next search(add 25)
     :return obj_map.next_search.end_record: Value to use in final "limit"
         in next search(add 25)
+    :return obj_map.next_search.cursor: Cursor of next page, next_search is
+        null in last page
     :return obj_map.prev_search.start_record: Value to use in initial "limit"
         in prev search(remove 25 of value received)
     :return obj_map.prev_search.end_record: Value to use in final "limit"
         in prev search(remove 25 of value received)
+    :return obj_map.prev_search.cursor: Cursor of previous page, prev_search
+        is null in first page
     """
 
     if search.get('extends_search'):
@@ -82,6 +129,10 @@ def build_query_to_datatable_v3(query_set, search={}):
     search_query["start_record"] = search.get("start_record") or 0
     search_query["end_record"] = search.get("end_record") or 25
 
+    if 'cursor' in search:
+        search_query['cursor'] = search.get('cursor')
+        return _build_query_by_cursor(query_set, search_query)
+
     query_set, total = build_query_to_datatable(
         query_set,
         search_query["asorting_cols"],
@@ -109,3 +160,185 @@ def build_query_to_datatable_v3(query_set, search={}):
         obj_map["prev_search"]["end_record"] = f if f >= 0 else 25
 
     return obj_map
+
+
+def _build_query_by_cursor(query_set, search_query):
+    """Pages query by values of ordering columns of last (or first) object
+    of previous page, instead of offset, so deep pages are as fast as the
+    first.
+    """
+
+    ordering = _keyset_ordering(search_query['asorting_cols'])
+    fields = [field.lstrip('-') for field in ordering]
+    page_size = max(
+        search_query['end_record'] - search_query['start_record'], 1)
+
+    query_set = _filter_search(query_set, search_query['custom_search'],
+                               search_query['searchable_columns'])
+    if joins_to_many(query_set):
+        query_set = query_set.distinct()
+
+    total = _cached_total(query_set)
+
+    query_set = query_set.order_by(*ordering)
+
+    direction, values = None, None
+    if search_query['cursor']:
+        direction, values = _decode_cursor(search_query['cursor'], ordering)
+
+    if direction == 'prev':
+        # previous page is first page_size objects before cursor in reverse
+        # ordering
+        reverse = [field[1:] if field.startswith('-') else '-' + field
+                   for field in ordering]
+        page = query_set.filter(_after(ordering, values, reverse=True))
+        keys = list(page.order_by(*reverse).values_list(
+            *fields)[:page_size + 1])
+        has_prev = len(keys) > page_size
+        keys = keys[:page_size][::-1]
+        has_next = True
+    else:
+        page = query_set
+        if direction == 'next':
+            page = query_set.filter(_after(ordering, values))
+        keys = list(page.values_list(*fields)[:page_size + 1])
+        has_next = len(keys) > page_size
+        keys = keys[:page_size]
+        has_prev = direction == 'next'
+
+    # primary key is last column of keys
+    query_set = query_set.filter(pk__in=[key[-1] for key in keys])
+
+    obj_map = dict()
+    obj_map['query_set'] = query_set
+    obj_map['total'] = total
+
+    obj_map['next_search'] = None
+    if has_next and keys:
+        obj_map['next_search'] = search_query.copy()
+        obj_map['next_search']['cursor'] = _encode_cursor(
+            'next', ordering, keys[-1])
+
+    obj_map['prev_search'] = None
+    if has_prev and keys:
+        obj_map['prev_search'] = search_query.copy()
+        obj_map['prev_search']['cursor'] = _encode_cursor(
+            'prev', ordering, keys[0])
+
+    return obj_map
+
+
+def _filter_search(query_set, custom_search, searchable_columns):
+    if custom_search is not None:
+        output_q = None
+        for searchableColumn in searchable_columns:
+            kwargz = {searchableColumn + "__icontains": custom_search}
+            output_q = output_q | Q(**kwargz) if output_q else Q(**kwargz)
+        query_set = query_set.filter(output_q)
+    return query_set
+
+
+def _keyset_ordering(asorting_cols):
+    """Returns ordering with primary key as last column, so every object
+    has a distinct key.
+    """
+
+    ordering = list()
+    for field in asorting_cols:
+        if field.lstrip('-') == 'id':
+            field = field.replace('id', 'pk')
+        if field.lstrip('-') in [f.lstrip('-') for f in ordering]:
+            continue
+        ordering.append(field)
+        if field.lstrip('-') == 'pk':
+            break
+    else:
+        ordering.append('pk')
+
+    return ordering
+
+
+def _after(ordering, values, reverse=False):
+    """Returns Q of objects after key of values in ordering, or before it
+    with reverse.
+
+    NULLs are the lowest values, as ordered by MySQL.
+    """
+
+    after = None
+    equal = Q()
+    for field, value in zip(ordering, values):
+        column = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+
+        if value is None:
+            if descending:
+                # nothing after NULL
+                greater = None
+            else:
+                greater = Q(**{column + '__isnull': False})
+            same = Q(**{column + '__isnull': True})
+        else:
+            if descending:
+                greater = Q(**{column + '__lt': value}) | \
+                    Q(**{column + '__isnull': True})
+            else:
+                greater = Q(**{column + '__gt': value})
+            same = Q(**{column: value})
+
+        if greater is not None:
+            greater = equal & greater
+            after = after | greater if after is not None else greater
+        equal &= same
+
+    if after is None:
+        return Q(pk__in=[])
+    return after
+
+
+def _ordering_digest(ordering):
+    return sha1(','.join(ordering)).hexdigest()[:8]
+
+
+def _encode_cursor(direction, ordering, values):
+    data = json.dumps([direction, _ordering_digest(ordering), list(values)],
+                      cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(data)
+
+
+def _decode_cursor(cursor, ordering):
+    try:
+        direction, digest, values = json.loads(
+            base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise InvalidCursorError('Invalid cursor in search.')
+
+    if direction not in ('next', 'prev') or \
+            digest != _ordering_digest(ordering) or \
+            len(values) != len(ordering):
+        raise InvalidCursorError('Cursor of other search.')
+
+    return direction, values
+
+
+def _cached_total(query_set):
+    """Returns count of objects of query, cached by its SQL, so every page of
+    a search shares it.
+    """
+
+    if not DATATABLE_TOTAL_CACHE_TIME:
+        return query_set.count()
+
+    try:
+        sql, params = query_set.order_by().query.sql_with_params()
+    except Exception:
+        # as EmptyResultSet
+        return query_set.count()
+
+    key = KEY_TOTAL % sha1(repr((sql, params))).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = query_set.count()
+        cache.set(key, total, DATATABLE_TOTAL_CACHE_TIME)
+
+    return total
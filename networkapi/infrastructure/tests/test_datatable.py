@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+from collections import namedtuple
+
+from mock import Mock
+from mock import patch
+
+from networkapi.infrastructure import datatable
+
+JoinInfo = namedtuple('JoinInfo', 'table_name rhs_alias join_type lhs_alias '
+                      'lhs_join_col rhs_join_col nullable')
+
+
+def model(table, pk='id'):
+    return Mock(_meta=Mock(db_table=table, pk=Mock(column=pk)))
+
+
+def query_set(*joins):
+    alias_map = {'equipamentos': JoinInfo(
+        'equipamentos', 'equipamentos', None, None, None, None, False)}
+    for join in joins:
+        alias_map[join.rhs_alias] = join
+    return Mock(query=Mock(alias_map=alias_map))
+
+
+class JoinsToManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(datatable, 'get_models', return_value=[
+            model('equipamentos', 'id_equip'),
+            model('modelos', 'id_modelo'),
+            model('equip_do_grupo', 'id'),
+        ])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_query_without_joins(self):
+        self.assertFalse(datatable.joins_to_many(query_set()))
+
+    def test_join_by_foreign_key_is_to_one(self):
+        self.assertFalse(datatable.joins_to_many(query_set(JoinInfo(
+            'modelos', 'modelos', 'INNER JOIN', 'equipamentos', 'id_modelo',
+            'id_modelo', False))))
+
+    def test_join_by_reverse_foreign_key_is_to_many(self):
+        self.assertTrue(datatable.joins_to_many(query_set(JoinInfo(
+            'equip_do_grupo', 'equip_do_grupo', 'INNER JOIN', 'equipamentos',
+            'id_equip', 'id_equip', False))))
+
+
+class CursorTestCase(unittest.TestCase):
+
+    def test_ordering_ends_by_primary_key(self):
+        self.assertEqual(['-pk'], datatable._keyset_ordering(['-id']))
+        self.assertEqual(['vlan__nome', 'pk'],
+                         datatable._keyset_ordering(['vlan__nome']))
+        self.assertEqual(['nome', 'pk'],
+                         datatable._keyset_ordering(['nome', 'id', 'ativo']))
+
+    def test_cursor_is_decoded(self):
+        ordering = ['-num_vlan', 'pk']
+        cursor = datatable._encode_cursor('next', ordering, (None, 10))
+
+        self.assertEqual(('next', [None, 10]),
+                         datatable._decode_cursor(cursor, ordering))
+
+    def test_cursor_of_other_ordering_is_invalid(self):
+        cursor = datatable._encode_cursor('next', ['nome', 'pk'], ('a', 1))
+
+        self.assertRaises(datatable.InvalidCursorError,
+                          datatable._decode_cursor, cursor, ['-pk'])
+        self.assertRaises(datatable.InvalidCursorError,
+                          datatable._decode_cursor, 'nonsense', ['-pk'])
+
+    def test_first_key_has_nothing_before_it_in_descending_nulls(self):
+        self.assertEqual(
+            str(datatable.Q(pk__in=[])),
+            str(datatable._after(['-nome'], [None])))
+
+
+class CachedTotalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = dict()
+        cache = Mock(get=self.cache.get,
+                     set=lambda key, value, timeout:
+                     self.cache.__setitem__(key, value))
+        patches = [patch.object(datatable, 'cache', cache),
+                   patch.object(datatable, 'DATATABLE_TOTAL_CACHE_TIME', 60)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def search(self, sql, params, count):
+        qs = Mock()
+        qs.order_by.return_value.query.sql_with_params.return_value = \
+            (sql, params)
+        qs.count.return_value = count
+        return qs
+
+    def test_total_is_counted_once_by_search(self):
+        first = self.search('SELECT ... WHERE nome LIKE %s', ('%a%',), 10)
+        second = self.search('SELECT ... WHERE nome LIKE %s', ('%a%',), 11)
+
+        self.assertEqual(10, datatable._cached_total(first))
+        self.assertEqual(10, datatable._cached_total(second))
+        self.assertFalse(second.count.called)
+
+    def test_totals_of_other_params_are_apart(self):
+        datatable._cached_total(
+            self.search('SELECT ... WHERE nome LIKE %s', ('%a%',), 10))
+
+        self.assertEqual(3, datatable._cached_total(
+            self.search('SELECT ... WHERE nome LIKE %s', ('%b%',), 3)))
+
+    def test_total_is_not_cached_without_cache_time(self):
+        qs = self.search('SELECT ...', (), 10)
+
+        with patch.object(datatable, 'DATATABLE_TOTAL_CACHE_TIME', 0):
+            datatable._cached_total(qs)
+            datatable._cached_total(qs)
+
+        self.assertEqual(2, qs.count.call_count)
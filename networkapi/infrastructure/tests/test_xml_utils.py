@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+from collections import OrderedDict
+from xml.dom import InvalidCharacterErr
+
+from networkapi.infrastructure import xml_utils
+from networkapi.infrastructure.xml_utils import XMLError
+
+MAPS = [
+    None,
+    {},
+    {'id': None, 'nome': '', 'ambientes': []},
+    {'vlan': {'id': 1, 'ativada': True, 'acl': None, 'redes': {}}},
+    {'vlan': [{'id': 1}, {}, None, '', 2, {'ip': [1, {'oct': 10}]}]},
+    {'descricao': '<a href="x">&\'%s%%</a>', 'valor': 1.5, 'zero': 0},
+    {'nome': 'ação ☃', 'tupla': (1, 2), 'espacos': '  \n'},
+    OrderedDict([('z', 1), ('a', OrderedDict([('y', None), ('b', [])]))]),
+]
+
+XMLS = [
+    '<networkapi/>',
+    '<networkapi versao="1.0"><vlan><id>1</id></vlan><vlan><id/></vlan>'
+    '<vlan><id>2</id><id>3</id></vlan></networkapi>',
+    '<?xml version="1.0" encoding="UTF-8"?><networkapi versao="1.0">'
+    '<!--Comentario--><ambiente><id><!--Comentario--></id></ambiente>'
+    '<ambiente><id>3<teste>geovana</teste>2</id></ambiente></networkapi>',
+    '<r>a<!--c-->b<?pi x?>c</r>',
+    '<r>a<![CDATA[<b>]]>c<![CDATA[]]>d</r>',
+    '<r>1&amp;2 &#233; 50%%</r>',
+    '<r xmlns="urn:a" xmlns:p="urn:p" p:x="1" y="2"><p:c>1</p:c></r>',
+    '<!DOCTYPE r [<!ENTITY e "entidade">]><r>&e;</r>',
+    '<r>\n  <a>\n  </a>\n  <l/>\n  <l>1</l>\n</r>\n',
+]
+
+
+class DumpsTestCase(unittest.TestCase):
+
+    def test_same_xml_of_minidom(self):
+        for map in MAPS:
+            for root_attributes in (None, {'versao': '1.0'},
+                                    {'b': '<"&>', 'a': '', 'c': None}):
+                self.assertEqual(
+                    xml_utils.dumps_minidom(map, 'networkapi',
+                                            root_attributes),
+                    xml_utils.dumps(map, 'networkapi', root_attributes))
+
+    def test_xml_is_encoded_in_utf8(self):
+        xml = xml_utils.dumps_networkapi(
+            OrderedDict([('lista', []), ('nome', 'ação')]))
+
+        self.assertEqual(b'<?xml version="1.0" encoding="UTF-8"?>'
+                         b'<networkapi versao="1.0"><lista></lista>'
+                         b'<nome>a\xc3\xa7\xc3\xa3o</nome></networkapi>', xml)
+
+    def test_invalid_root_name(self):
+        self.assertRaises(InvalidCharacterErr, xml_utils.dumps, {}, '')
+
+
+class LoadsTestCase(unittest.TestCase):
+
+    def test_same_map_of_minidom(self):
+        for xml in XMLS + [xml_utils.dumps_networkapi(m) for m in MAPS]:
+            for force_list in (None, ['vlan', 'id', 'l', 'a']):
+                self.assertEqual(xml_utils.loads_minidom(xml, force_list),
+                                 xml_utils.loads(xml, force_list))
+
+    def test_force_list(self):
+        map, attrs_map = xml_utils.loads(
+            '<networkapi versao="1.0"><vlan><id>1</id></vlan><rede/>'
+            '</networkapi>', ['vlan', 'rede'])
+
+        self.assertEqual({'networkapi': {'vlan': [{'id': '1'}], 'rede': []}},
+                         map)
+        self.assertEqual({'versao': '1.0'}, attrs_map)
+
+    def test_invalid_xml_raises_xml_error(self):
+        for xml in ('', 'networkapi', '<r><a></r>', '<r/><s/>', None):
+            self.assertRaises(XMLError, xml_utils.loads, xml)
@@ -14,8 +14,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from xml.dom import InvalidCharacterErr
+from xml.dom import NamespaceErr
 from xml.dom.minicompat import StringTypes
-from xml.dom.minidom import *
+from xml.dom.minidom import getDOMImplementation
+from xml.dom.minidom import Node
+from xml.dom.minidom import parseString
+from xml.parsers import expat
+
+XML_HEADER = u'<?xml version="1.0" encoding="UTF-8"?>'
 
 
 class XMLError(Exception):
@@ -48,6 +54,275 @@ class InvalidNodeTypeXMLError(XMLError):
         XMLError.__init__(self, cause, message)
 
 
+def _text(value):
+    if not isinstance(value, StringTypes):
+        return '%s' % unicode(value)
+    return r'%s' % value.replace('%', '%%')
+
+
+def _escape(data):
+    # Mesmo escape do minidom
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace(
+        '"', '&quot;').replace('>', '&gt;')
+
+
+def _write_text_node(write, name, value):
+    if value is None:
+        write('<' + name + '/>')
+    else:
+        write('<' + name + '>' + _escape(_text(value)) + '</' + name + '>')
+
+
+def _write_map_node(write, name, map):
+    if map:
+        write('<' + name + '>')
+        _write_nodes(write, map.iteritems())
+        write('</' + name + '>')
+    else:
+        write('<' + name + '/>')
+
+
+def _write_nodes(write, items):
+    for key, value in items:
+        if isinstance(value, dict):
+            _write_map_node(write, key, value)
+        elif isinstance(value, type([])):
+            if not value:
+                write('<' + key + '></' + key + '>')
+            for item in value:
+                if isinstance(item, dict):
+                    _write_map_node(write, key, item)
+                else:
+                    _write_text_node(write, key, item)
+        else:
+            _write_text_node(write, key, value)
+
+
+def dumps(map, root_name, root_attributes=None):
+    """Cria um string no formato XML a partir dos elementos do map.
+
+    Os elementos do mapa serão nós filhos do root_name.
+
+    Cada chave do map será um Nó no XML. E o valor da chave será o conteúdo do Nó.
+
+    O XML é escrito diretamente, sem criar o DOM, e é idêntico ao gerado
+    pelo minidom em dumps_minidom.
+
+    Throws: XMLError, InvalidNodeNameXMLError, InvalidNodeTypeXMLError
+    """
+    # Mesmas validações de createDocument do minidom
+    if not root_name:
+        raise InvalidCharacterErr('Element with no name')
+    if ':' in root_name and root_name.split(':', 1)[0]:
+        raise NamespaceErr('illegal use of prefix without namespaces')
+
+    parts = [XML_HEADER, '<' + root_name]
+    write = parts.append
+
+    if root_attributes is not None:
+        for key in sorted(root_attributes):
+            value = root_attributes[key]
+            write(' %s="' % key)
+            if value:
+                write(_escape(value))
+            write('"')
+
+    items = map.items() if map is not None else None
+    if items:
+        write('>')
+        _write_nodes(write, items)
+        write('</' + root_name + '>')
+    else:
+        write('/>')
+
+    return u''.join(parts).encode('utf-8')
+
+
+def dumps_networkapi(map, version='1.0'):
+    return dumps(map, 'networkapi', {'versao': version})
+
+
+def _childs_value(childs_map, childs_values):
+    if len(childs_values) == 0 and len(childs_map) == 0:
+        return None
+    if len(childs_values) != 0 and len(childs_map) != 0:
+        childs_values.append(childs_map)
+        return childs_values
+    if len(childs_values) != 0:
+        if len(childs_values) == 1:
+            return childs_values[0]
+        return childs_values
+    return childs_map
+
+
+def _add_child_value(childs_map, name, child_value, force_list):
+    if name in childs_map:
+        if child_value is not None:
+            value = childs_map[name]
+            if not isinstance(value, type([])):
+                value = [value]
+            value.append(child_value)
+            childs_map[name] = value
+    elif name in force_list:
+        if child_value is None:
+            child_value = []
+        else:
+            child_value = [child_value]
+        childs_map[name] = child_value
+    else:
+        childs_map[name] = child_value
+
+
+def _qname(name):
+    # Nome qualificado do minidom, a partir do nome "uri local prefix" do
+    # expat
+    if ' ' not in name:
+        return name
+    parts = name.split(' ')
+    if len(parts) == 3:
+        uri, localname, prefix = parts
+        return '%s:%s' % (prefix, localname)
+    uri, localname = parts
+    return localname
+
+
+class _MapBuilder(object):
+
+    """Cria o map de loads a partir dos eventos do parser expat, sem criar
+    o DOM.
+
+    Os nós de texto são delimitados como no minidom: textos adjacentes
+    formam um único nó, e cada seção CDATA, comentário, processing
+    instruction ou element inicia outro nó.
+    """
+
+    def __init__(self, force_list):
+        self.force_list = force_list
+        # [nome, childs_map, childs_values, partes do texto, tipo do texto]
+        self.stack = []
+        self.namespaces = []
+        self.root_name = None
+        self.root_value = None
+        self.attrs_map = dict()
+        self.cdata = False
+        self.cdata_continue = False
+
+    def parse(self, xml):
+        # Mesmas opções do parser do minidom
+        parser = expat.ParserCreate(namespace_separator=' ')
+        parser.namespace_prefixes = True
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        parser.specified_attributes = True
+
+        parser.StartNamespaceDeclHandler = self.start_namespace
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.character_data
+        parser.StartCdataSectionHandler = self.start_cdata
+        parser.EndCdataSectionHandler = self.end_cdata
+        parser.CommentHandler = self.other_node
+        parser.ProcessingInstructionHandler = self.other_node
+        parser.ExternalEntityRefHandler = lambda *args: 1
+
+        parser.Parse(xml, True)
+
+    def end_text(self, frame):
+        if frame[4] is not None:
+            data = u''.join(frame[3])
+            if data.strip() != '':
+                frame[2].append(data.replace('%%', '%'))
+            frame[3] = []
+            frame[4] = None
+
+    def start_namespace(self, prefix, uri):
+        self.namespaces.append((prefix, uri))
+
+    def start_element(self, name, attributes):
+        if self.stack:
+            self.end_text(self.stack[-1])
+        else:
+            for prefix, uri in self.namespaces:
+                if prefix:
+                    self.attrs_map['xmlns:' + prefix] = uri
+                else:
+                    self.attrs_map['xmlns'] = uri
+            for i in range(0, len(attributes), 2):
+                self.attrs_map[_qname(attributes[i])] = attributes[i + 1]
+
+        del self.namespaces[:]
+        self.stack.append([_qname(name), dict(), [], [], None])
+
+    def end_element(self, name):
+        frame = self.stack.pop()
+        self.end_text(frame)
+        value = _childs_value(frame[1], frame[2])
+
+        if self.stack:
+            _add_child_value(self.stack[-1][1], frame[0], value,
+                             self.force_list)
+        else:
+            self.root_name = frame[0]
+            self.root_value = value
+
+    def character_data(self, data):
+        frame = self.stack[-1]
+        if self.cdata:
+            if self.cdata_continue and frame[4] == Node.CDATA_SECTION_NODE:
+                frame[3].append(data)
+                return
+            self.end_text(frame)
+            frame[4] = Node.CDATA_SECTION_NODE
+            self.cdata_continue = True
+        elif frame[4] != Node.TEXT_NODE:
+            self.end_text(frame)
+            frame[4] = Node.TEXT_NODE
+        frame[3].append(data)
+
+    def start_cdata(self):
+        self.cdata = True
+        self.cdata_continue = False
+
+    def end_cdata(self):
+        self.cdata = False
+        self.cdata_continue = False
+
+    def other_node(self, *args):
+        if self.stack:
+            self.end_text(self.stack[-1])
+
+
+def loads(xml, force_list=None):
+    """Cria um dict com os dados do element root.
+
+    O dict terá como chave o nome do element root e como valor o conteúdo do element root.
+    Quando o conteúdo de um element é uma lista de Nós então o valor do element será
+    um dict com uma chave para cada nó.
+    Entretanto, se existir nós, de um mesmo pai, com o mesmo nome, então eles serão
+    armazenados uma mesma chave do dict que terá como valor uma lista.
+
+    Se o element root tem atributo, então também retorna um dict com os atributos.
+
+    O XML é lido pelos eventos do parser expat, sem criar o DOM, e o
+    resultado é igual ao de loads_minidom.
+
+    Throws: XMLError
+    """
+    if force_list is None:
+        force_list = []
+
+    builder = _MapBuilder(force_list)
+    try:
+        builder.parse(xml)
+    except Exception, e:
+        raise XMLError(e, u'Falha ao realizar o parse do xml.')
+
+    map = dict()
+    map[builder.root_name] = builder.root_value
+
+    return map, builder.attrs_map
+
+
 def _add_text_node(value, node, doc):
     if value is None:
         return
@@ -102,8 +377,12 @@ def _add_nodes_to_parent(map, parent, doc):
                 i, u'Valor inválido para nome de uma TAG de XML: %s' % key)
 
 
-def dumps(map, root_name, root_attributes=None):
-    """Cria um string no formato XML a partir dos elementos do map.
+def dumps_minidom(map, root_name, root_attributes=None):
+    """Implementação anterior de dumps, que cria o DOM do minidom.
+
+    Mantida como referência para os testes de compatibilidade e benchmark.
+
+    Cria um string no formato XML a partir dos elementos do map.
 
     Os elementos do mapa serão nós filhos do root_name.
 
@@ -140,10 +419,6 @@ def dumps(map, root_name, root_attributes=None):
     return xml
 
 
-def dumps_networkapi(map, version='1.0'):
-    return dumps(map, 'networkapi', {'versao': version})
-
-
 def _create_childs_map(parent, force_list):
     if parent is None:
         return None
@@ -194,8 +469,12 @@ def _create_childs_map(parent, force_list):
     return None
 
 
-def loads(xml, force_list=None):
-    """Cria um dict com os dados do element root.
+def loads_minidom(xml, force_list=None):
+    """Implementação anterior de loads, que cria o DOM do minidom.
+
+    Mantida como referência para os testes de compatibilidade e benchmark.
+
+    Cria um dict com os dados do element root.
 
     O dict terá como chave o nome do element root e como valor o conteúdo do element root.
     Quando o conteúdo de um element é uma lista de Nós então o valor do element será
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Free-address index used to allocate IPv4/IPv6 addresses in a network.
+
+The addresses used in a network are kept as offsets (address - network
+address) in a sorted list of disjoint ranges, so a nearly full /16 is
+stored in a few ranges and a "next free address" lookup is a binary search
+instead of a walk over every host of the network.
+
+Indexes are stored in memcached and are updated by Ip/Ipv6 create and
+delete methods, once their transaction is committed. The database remains
+the source of truth: every address returned by the index is checked
+against it before being handed out and, when an index is lost or looks
+full, it is rebuilt with a single query (see the
+rebuild_ip_allocation_index command).
+"""
+import logging
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import get_model
+
+from networkapi.infrastructure.ipaddr import IPv4Address
+from networkapi.infrastructure.ipaddr import IPv4Network
+from networkapi.infrastructure.ipaddr import IPv6Address
+from networkapi.infrastructure.ipaddr import IPv6Network
+from networkapi.settings import IP_ALLOCATION_INDEX_CACHE_TIME
+from networkapi.util.transaction_hooks import on_commit
+
+log = logging.getLogger(__name__)
+
+KEY_INDEX_IPV4 = 'ip_allocation_index:v4:%s'
+KEY_INDEX_IPV6 = 'ip_allocation_index:v6:%s'
+
+
+class AddressIndex(object):
+
+    """Sorted list of disjoint ranges of used offsets.
+
+    Adjacent ranges are always merged, so the offset right after (or
+    before) a range is guaranteed to be free.
+    """
+
+    def __init__(self, starts=None, ends=None):
+        self.starts = starts or []
+        self.ends = ends or []
+
+    @classmethod
+    def from_offsets(cls, offsets):
+        """Builds an index from an iterable of used offsets."""
+
+        starts = []
+        ends = []
+        for offset in sorted(set(offsets)):
+            if ends and ends[-1] == offset - 1:
+                ends[-1] = offset
+            else:
+                starts.append(offset)
+                ends.append(offset)
+        return cls(starts, ends)
+
+    def __len__(self):
+        return sum(end - start + 1
+                   for start, end in zip(self.starts, self.ends))
+
+    def __contains__(self, offset):
+        pos = bisect_right(self.starts, offset) - 1
+        return pos >= 0 and self.ends[pos] >= offset
+
+    def add(self, offset):
+        """Marks offset as used."""
+
+        pos = bisect_right(self.starts, offset) - 1
+        if pos >= 0 and self.ends[pos] >= offset:
+            return
+
+        join_left = pos >= 0 and self.ends[pos] == offset - 1
+        join_right = pos + 1 < len(self.starts) and \
+            self.starts[pos + 1] == offset + 1
+
+        if join_left and join_right:
+            self.ends[pos] = self.ends[pos + 1]
+            del self.starts[pos + 1]
+            del self.ends[pos + 1]
+        elif join_left:
+            self.ends[pos] = offset
+        elif join_right:
+            self.starts[pos + 1] = offset
+        else:
+            self.starts.insert(pos + 1, offset)
+            self.ends.insert(pos + 1, offset)
+
+    def remove(self, offset):
+        """Marks offset as free."""
+
+        pos = bisect_right(self.starts, offset) - 1
+        if pos < 0 or self.ends[pos] < offset:
+            return
+
+        start, end = self.starts[pos], self.ends[pos]
+        if start == end:
+            del self.starts[pos]
+            del self.ends[pos]
+        elif offset == start:
+            self.starts[pos] = offset + 1
+        elif offset == end:
+            self.ends[pos] = offset - 1
+        else:
+            self.ends[pos] = offset - 1
+            self.starts.insert(pos + 1, offset + 1)
+            self.ends.insert(pos + 1, end)
+
+    def first_free(self, low, high, topdown=False):
+        """Returns the first free offset in [low, high] or None.
+
+        @param topdown: search from high to low.
+        """
+
+        if low > high:
+            return None
+
+        if topdown:
+            candidate = high
+            pos = bisect_right(self.starts, high) - 1
+            if pos >= 0 and self.ends[pos] >= high:
+                candidate = self.starts[pos] - 1
+            return candidate if candidate >= low else None
+
+        candidate = low
+        pos = bisect_right(self.starts, low) - 1
+        if pos >= 0 and self.ends[pos] >= low:
+            candidate = self.ends[pos] + 1
+        return candidate if candidate <= high else None
+
+
+class _IndexBackend(object):
+
+    """Glue between AddressIndex and one IP version of the models."""
+
+    key = None
+    ip_model = None
+    network_field = None
+
+    def network_of(self, network):
+        raise NotImplementedError()
+
+    def used_offsets(self, network, net):
+        raise NotImplementedError()
+
+    def to_address(self, net, offset):
+        raise NotImplementedError()
+
+    def address_of(self, ip):
+        raise NotImplementedError()
+
+    def is_used(self, network, address):
+        raise NotImplementedError()
+
+    def save(self, network, index):
+        cache.set(self.key % network.id, (index.starts, index.ends),
+                  IP_ALLOCATION_INDEX_CACHE_TIME)
+
+    def rebuild(self, network):
+        """Rebuilds the index of network from database."""
+
+        net = self.network_of(network)
+        index = AddressIndex.from_offsets(self.used_offsets(network, net))
+        self.save(network, index)
+        return index
+
+    def invalidate(self, network):
+        cache.delete(self.key % network.id)
+
+    def mark_used(self, ip):
+        self._mark(ip, True)
+
+    def mark_free(self, ip):
+        self._mark(ip, False)
+
+    def _mark(self, ip, used):
+        network = getattr(ip, self.network_field)
+        try:
+            offset = int(self.address_of(ip)) - \
+                int(self.network_of(network).network)
+        except Exception:
+            log.exception(u'Failure to get offset of ip in network %s. '
+                          u'Invalidating its allocation index.' % network.id)
+            on_commit(lambda: self.invalidate(network))
+            return
+
+        # A rolled back change must not reach the index
+        on_commit(lambda: self._update(network, offset, used))
+
+    def _update(self, network, offset, used):
+        try:
+            index = cache.get(self.key % network.id)
+            if index is None:
+                # Will be rebuilt from database on next allocation.
+                return
+            index = AddressIndex(*index)
+            if used:
+                index.add(offset)
+            else:
+                index.remove(offset)
+            self.save(network, index)
+        except Exception:
+            log.exception(u'Failure to update allocation index of network '
+                          u'%s. Invalidating it.' % network.id)
+            self.invalidate(network)
+
+    def first_available(self, network, low, high, topdown=False):
+        """Returns first address available in network between offsets
+        low and high or None if there is no address available.
+        """
+
+        net = self.network_of(network)
+        index = cache.get(self.key % network.id)
+        rebuilt = index is None
+        index = self.rebuild(network) if rebuilt else AddressIndex(*index)
+        changed = False
+
+        while True:
+            offset = index.first_free(low, high, topdown)
+            if offset is None and not rebuilt:
+                # Index may keep addresses freed out of it as used, so it is
+                # rebuilt before the network is reported as full.
+                index = self.rebuild(network)
+                rebuilt = True
+                changed = False
+                continue
+            if offset is None:
+                address = None
+                break
+
+            address = self.to_address(net, offset)
+            if not self.is_used(network, address):
+                break
+
+            # Index was stale, address was allocated out of the index.
+            index.add(offset)
+            changed = True
+
+        if changed:
+            self.save(network, index)
+
+        return address
+
+
+class _IPv4IndexBackend(_IndexBackend):
+
+    key = KEY_INDEX_IPV4
+    network_field = 'networkipv4'
+
+    def network_of(self, network):
+        return IPv4Network(network.networkv4)
+
+    def used_offsets(self, network, net):
+        ip_model = get_model('ip', 'Ip')
+        base = int(net.network)
+        octs = ip_model.objects.filter(networkipv4=network.id)\
+            .values_list('oct1', 'oct2', 'oct3', 'oct4')
+        return [((oct1 << 24) | (oct2 << 16) | (oct3 << 8) | oct4) - base
+                for oct1, oct2, oct3, oct4 in octs]
+
+    def to_address(self, net, offset):
+        return IPv4Address(int(net.network) + offset)
+
+    def address_of(self, ip):
+        return IPv4Address(ip.ip_formated)
+
+    def is_used(self, network, address):
+        ip_model = get_model('ip', 'Ip')
+        oct1, oct2, oct3, oct4 = str(address).split('.')
+        return ip_model.objects.filter(
+            networkipv4=network.id,
+            oct1=oct1, oct2=oct2, oct3=oct3, oct4=oct4
+        ).exists()
+
+
+class _IPv6IndexBackend(_IndexBackend):
+
+    key = KEY_INDEX_IPV6
+    network_field = 'networkipv6'
+
+    def network_of(self, network):
+        return IPv6Network(network.networkv6)
+
+    def used_offsets(self, network, net):
+        ip_model = get_model('ip', 'Ipv6')
+        base = int(net.network)
+        blocks = ip_model.objects.filter(networkipv6=network.id)\
+            .values_list('block1', 'block2', 'block3', 'block4',
+                         'block5', 'block6', 'block7', 'block8')
+        return [int(''.join(block.zfill(4) for block in ip), 16) - base
+                for ip in blocks]
+
+    def to_address(self, net, offset):
+        return IPv6Address(int(net.network) + offset)
+
+    def address_of(self, ip):
+        return IPv6Address(ip.ip_formated)
+
+    def is_used(self, network, address):
+        ip_model = get_model('ip', 'Ipv6')
+        blocks = dict(('block%s__in' % i, block_forms(block))
+                      for i, block in
+                      enumerate(address.exploded.split(':'), 1))
+        return ip_model.objects.filter(
+            networkipv6=network.id, **blocks).exists()
+
+
+def block_forms(block):
+    """Returns forms of an IPv6 block with and without leading zeros, as
+    blocks may be stored in both.
+    """
+
+    block = block.lstrip('0') or '0'
+    return [block.zfill(size) for size in range(len(block), 5)]
+
+
+ipv4_index = _IPv4IndexBackend()
+ipv6_index = _IPv6IndexBackend()
+
+
+def hosts_range(net, first_reserved=0, last_reserved=0):
+    """Returns offsets (low, high) of hosts of net that can be allocated.
+
+    Network and broadcast addresses are never allocated. first_reserved and
+    last_reserved follow the IPv4_MIN/IPv4_MAX (IPv6_MIN/IPv6_MAX)
+    semantics of Configuration.
+    """
+
+    numhosts = net.numhosts
+    low = max(1, first_reserved)
+    high = min(numhosts - 2, numhosts - last_reserved - 1)
+    return low, high
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from networkapi.ip.allocation_index import ipv4_index
+from networkapi.ip.allocation_index import ipv6_index
+from networkapi.ip.models import NetworkIPv4
+from networkapi.ip.models import NetworkIPv6
+
+
+class Command(BaseCommand):
+
+    help = 'Rebuilds free-address indexes of networks from database.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--networkv4', action='append', dest='networksv4',
+                    default=[], help='Id of NetworkIPv4 to rebuild.'),
+        make_option('--networkv6', action='append', dest='networksv6',
+                    default=[], help='Id of NetworkIPv6 to rebuild.'),
+    )
+
+    def handle(self, *args, **options):
+
+        networksv4 = options.get('networksv4')
+        networksv6 = options.get('networksv6')
+
+        # Without filters every network is rebuilt
+        if not networksv4 and not networksv6:
+            networksv4 = NetworkIPv4.objects.all()
+            networksv6 = NetworkIPv6.objects.all()
+        else:
+            networksv4 = NetworkIPv4.objects.filter(id__in=networksv4)
+            networksv6 = NetworkIPv6.objects.filter(id__in=networksv6)
+
+        for networkv4 in networksv4.iterator():
+            index = ipv4_index.rebuild(networkv4)
+            self.stdout.write(u'NetworkIPv4 %s: %s addresses used.' %
+                              (networkv4.id, len(index)))
+
+        for networkv6 in networksv6.iterator():
+            index = ipv6_index.rebuild(networkv6)
+            self.stdout.write(u'NetworkIPv6 %s: %s addresses used.' %
+                              (networkv6.id, len(index)))
@@ -52,6 +52,7 @@ from networkapi.infrastructure.ipaddr import IPv4Address
 from networkapi.infrastructure.ipaddr import IPv4Network
 from networkapi.infrastructure.ipaddr import IPv6Address
 from networkapi.infrastructure.ipaddr import IPv6Network
+from networkapi.ip import allocation_index
 from networkapi.models.BaseModel import BaseModel
 from networkapi.queue_tools import queue_keys
 from networkapi.queue_tools.rabbitmq import QueueManager
@@ -1100,6 +1101,7 @@ class NetworkIPv4(BaseModel):
             has_netv6=False
         )
         nets_envs = [IPNetwork(net.networkv4) for net in nets_envs]
+        free_space = network.FreeSpaceNetwork(nets_envs)
         network_found = None
 
         try:
@@ -1120,32 +1122,26 @@ class NetworkIPv4(BaseModel):
                 self.log.info(
                     u'Prefix that will be used: %s' % new_prefix)
 
-                free_nets = network.get_free_space_network([net4], nets_envs)
+                subnet = free_space.first_free_subnet(net4, new_prefix)
 
-                for free_net in free_nets:
-                    try:
-                        subnets = free_net.iter_subnets(new_prefix=new_prefix)
-                        subnet = subnets.next()
-                    except Exception:
-                        pass
-                    else:
-                        # Set octs by network generated
-                        self.oct1, self.oct2, self.oct3, self.oct4 = str(
-                            subnet.network).split('.')
-                        # Set block by network generated
-                        self.block = subnet.prefixlen
+                if subnet is not None:
+                    # Set octs by network generated
+                    self.oct1, self.oct2, self.oct3, self.oct4 = str(
+                        subnet.network).split('.')
+                    # Set block by network generated
+                    self.block = subnet.prefixlen
 
-                        self.broadcast = subnet.broadcast.compressed
-                        mask = subnet.netmask.exploded.split('.')
-                        self.mask_oct1 = mask[0]
-                        self.mask_oct2 = mask[1]
-                        self.mask_oct3 = mask[2]
-                        self.mask_oct4 = mask[3]
+                    self.broadcast = subnet.broadcast.compressed
+                    mask = subnet.netmask.exploded.split('.')
+                    self.mask_oct1 = mask[0]
+                    self.mask_oct2 = mask[1]
+                    self.mask_oct3 = mask[2]
+                    self.mask_oct4 = mask[3]
 
-                        if not self.network_type:
-                            self.network_type = config.ip_config.network_type
+                    if not self.network_type:
+                        self.network_type = config.ip_config.network_type
 
-                        return
+                    return
 
             # Checks if found any available network
             if network_found is None:
@@ -1181,6 +1177,13 @@ class Ip(BaseModel):
 
     log = logging.getLogger('Ip')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'ipv4_equipment_virtual_interface': 'ipequipamento_set',
+        'vips': 'viprequest_set',
+        'server_pool_members': 'serverpoolmember_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'ips'
         managed = True
@@ -1315,38 +1318,22 @@ class Ip(BaseModel):
         # Cast to API
         net4 = IPv4Network(networkipv4.networkv4)
 
-        # Find all ips ralated to network
-        ips = Ip.objects.filter(networkipv4__id=networkipv4.id)
-
-        # Cast all to API class
-        ipsv4 = set([IPv4Address(ip.ip_formated) for ip in ips])
-
         # Get configuration
         conf = configuration.get()
 
-        selected_ip = None
-
-        # For each ip generated
-        i = 0
-        for ip in net4.iterhosts():
+        # Do not use some range of IPs (config)
+        low, high = allocation_index.hosts_range(
+            net4, conf.IPv4_MIN, conf.IPv4_MAX)
 
-            # Do not use some range of IPs (config)
-            i = i + 1
-            if i >= conf.IPv4_MIN and i < (net4.numhosts - conf.IPv4_MAX):
-
-                # If IP generated was not used
-                if ip not in ipsv4:
-
-                    # Use it
-                    selected_ip = ip
-
-                    # Stop generation
-                    return selected_ip
+        selected_ip = allocation_index.ipv4_index.first_available(
+            networkipv4, low, high)
 
         if selected_ip is None:
             raise IpNotAvailableError(
                 None, u'No IP available to NETWORK %s.' % networkipv4.id)
 
+        return selected_ip
+
     @classmethod
     def get_first_available_ip(cls, id_network, topdown=False):
         """Get a first available Ipv4 for networkIPv4
@@ -1359,35 +1346,17 @@ class Ip(BaseModel):
         # Cast to API
         net4 = IPv4Network(networkipv4.networkv4)
 
-        # Find all ips ralated to network
-        ips = Ip.objects.filter(networkipv4__id=networkipv4.id)
+        low, high = allocation_index.hosts_range(net4)
 
-        # Cast all to API class
-        ipsv4 = set([IPv4Address(ip.ip_formated) for ip in ips])
-
-        selected_ip = None
-
-        if topdown:
-            method = net4.iterhostsTopDown
-        else:
-            method = net4.iterhosts
-
-        # For each ip generated
-        for ip in method():
-
-            # If IP generated was not used
-            if ip not in ipsv4:
-
-                # Use it
-                selected_ip = ip
-
-                # Stop generation
-                return selected_ip
+        selected_ip = allocation_index.ipv4_index.first_available(
+            networkipv4, low, high, topdown)
 
         if selected_ip is None:
             raise IpNotAvailableError(
                 None, u'No IP available to NETWORK %s.' % networkipv4.id)
 
+        return selected_ip
+
     def edit_ipv4(self, user):
         try:
 
@@ -1853,6 +1822,7 @@ class Ip(BaseModel):
 
             # Deletes Obj IP
             super(Ip, self).delete()
+            allocation_index.ipv4_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -1970,6 +1940,7 @@ class Ip(BaseModel):
                 self.validate_v3(eqpts)
 
             self.save()
+            allocation_index.ipv4_index.mark_used(self)
 
             # Creates relationship between ip and equipment #
             for eqpt in ip_map.get('equipments', []):
@@ -2128,6 +2099,7 @@ class Ip(BaseModel):
 
             # Deletes Obj IP
             super(Ip, self).delete()
+            allocation_index.ipv4_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -2263,6 +2235,7 @@ class Ip(BaseModel):
                 self.validate_v3(eqpts)
 
             self.save()
+            allocation_index.ipv4_index.mark_used(self)
 
             # Creates relationship between ip and equipment #
             for eqpt in ip_map.get('equipments', []):
@@ -2444,6 +2417,7 @@ class Ip(BaseModel):
 
             # Deletes Obj IP
             super(Ip, self).delete()
+            allocation_index.ipv4_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -2491,36 +2465,17 @@ class Ip(BaseModel):
         # Cast to API
         net4 = IPNetwork(self.networkipv4.networkv4)
 
-        # Find all ips ralated to network
-        ips = self.networkipv4.ip_set.all()
-
-        # Cast all to API class
-        ipsv4 = set([IPv4Address(ip.ip_formated) for ip in ips])
-
         # Get configuration
         conf = configuration.get()
 
-        selected_ip = None
-
-        # For each ip generated
-        i = 0
-        for ip in net4.iterhosts():
-
-            # Do not use some range of IPs (config)
-            # IPv4_MIN = Firsts
-            # IPv4_MAX = Number minimum of Ip reserveds
-            # First IP and 2 last I
-            i = i + 1
-            if i >= conf.IPv4_MIN and i < (net4.numhosts - conf.IPv4_MAX):
-
-                # If IP generated was not used
-                if ip not in ipsv4:
+        # Do not use some range of IPs (config)
+        # IPv4_MIN = Firsts
+        # IPv4_MAX = Number minimum of Ip reserveds
+        low, high = allocation_index.hosts_range(
+            net4, conf.IPv4_MIN, conf.IPv4_MAX)
 
-                    # Use it
-                    selected_ip = ip
-
-                    # Stop generation
-                    break
+        selected_ip = allocation_index.ipv4_index.first_available(
+            self.networkipv4, low, high)
 
         if selected_ip is None:
             raise IpNotAvailableError(None, u'No IP available to VLAN %s.' %
@@ -3899,6 +3854,7 @@ class NetworkIPv6(BaseModel):
             has_netv4=False
         )
         nets_envs = [IPNetwork(net.networkv6) for net in nets_envs]
+        free_space = network.FreeSpaceNetwork(nets_envs)
         network_found = None
 
         try:
@@ -3919,38 +3875,31 @@ class NetworkIPv6(BaseModel):
                 self.log.info(
                     u'Prefix that will be used: %s' % new_prefix)
 
-                free_nets = network.get_free_space_network([net6], nets_envs)
-
-                for free_net in free_nets:
-                    try:
-                        subnets = free_net.iter_subnets(new_prefix=new_prefix)
-                        subnet = subnets.next()
-                    except Exception:
-                        pass
-                    else:
-
-                        # Set octs by network generated
-                        self.block1, self.block2, self.block3, self.block4,\
-                            self.block5, self.block6, self.block7, \
-                            self.block8 = str(
-                                subnet.network.exploded
-                            ).split(':')
-
-                        # Set block by network generated
-                        self.block = subnet.prefixlen
-
-                        mask = subnet.netmask.exploded.split(':')
-                        self.mask1 = mask[0]
-                        self.mask2 = mask[1]
-                        self.mask3 = mask[2]
-                        self.mask4 = mask[3]
-                        self.mask5 = mask[4]
-                        self.mask6 = mask[5]
-                        self.mask7 = mask[6]
-                        self.mask8 = mask[7]
-                        if not self.network_type:
-                            self.network_type = config.ip_config.network_type
-                        return
+                subnet = free_space.first_free_subnet(net6, new_prefix)
+
+                if subnet is not None:
+                    # Set octs by network generated
+                    self.block1, self.block2, self.block3, self.block4,\
+                        self.block5, self.block6, self.block7, \
+                        self.block8 = str(
+                            subnet.network.exploded
+                        ).split(':')
+
+                    # Set block by network generated
+                    self.block = subnet.prefixlen
+
+                    mask = subnet.netmask.exploded.split(':')
+                    self.mask1 = mask[0]
+                    self.mask2 = mask[1]
+                    self.mask3 = mask[2]
+                    self.mask4 = mask[3]
+                    self.mask5 = mask[4]
+                    self.mask6 = mask[5]
+                    self.mask7 = mask[6]
+                    self.mask8 = mask[7]
+                    if not self.network_type:
+                        self.network_type = config.ip_config.network_type
+                    return
 
             # Checks if found any available network
             if network_found is None:
@@ -4013,6 +3962,13 @@ class Ipv6(BaseModel):
 
     log = logging.getLogger('Ipv6')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'ipv6_equipment_virtual_interface': 'ipv6equipament_set',
+        'vips': 'viprequest_set',
+        'server_pool_members': 'serverpoolmember_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'ipsv6'
         managed = True
@@ -4155,46 +4111,24 @@ class Ipv6(BaseModel):
         cls.networkipv6 = NetworkIPv6.get_by_pk(id_network)
 
         # Cast to API
-        net6 = IPv6Network('%s:%s:%s:%s:%s:%s:%s:%s/%s' % (
-            cls.networkipv6.block1, cls.networkipv6.block2, cls.networkipv6.block3,
-            cls.networkipv6.block4, cls.networkipv6.block5, cls.networkipv6.block6,
-            cls.networkipv6.block7, cls.networkipv6.block8, cls.networkipv6.block))
-        # Find all ipv6s ralated to network
-        ips = Ipv6.objects.filter(networkipv6__id=cls.networkipv6.id)
-
-        # Cast all to API class
-        ipsv6 = set([(IPv6Address('%s:%s:%s:%s:%s:%s:%s:%s' % (
-            ip.block1, ip.block2, ip.block3, ip.block4, ip.block5, ip.block6, ip.block7, ip.block8))) for ip in ips])
+        net6 = IPv6Network(cls.networkipv6.networkv6)
 
         # Get configuration
         conf = configuration.get()
 
-        selected_ip = None
-
-        # For each ip generated
-        # For each ip generated
-        i = 0
-        for ip in net6.iterhosts():
+        # Do not use some range of IPs (config)
+        low, high = allocation_index.hosts_range(
+            net6, conf.IPv6_MIN, conf.IPv6_MAX)
 
-            # Do not use some range of IPs (config)
-            i = i + 1
-            if i >= conf.IPv6_MIN and i < (net6.numhosts - conf.IPv6_MAX):
-
-                # If IP generated was not used
-                if ip not in ipsv6:
-
-                    # Use it
-                    selected_ip = ip
-
-                    return selected_ip.exploded
-
-                    # Stop generation
-                    break
+        selected_ip = allocation_index.ipv6_index.first_available(
+            cls.networkipv6, low, high)
 
         if selected_ip is None:
             raise IpNotAvailableError(
                 None, u'No IP6 available to NETWORK %s.' % cls.networkipv6.id)
 
+        return selected_ip.exploded
+
     @classmethod
     def get_first_available_ip6(cls, id_network, topdown=False):
         """Get a first available ip6 for network6
@@ -4203,46 +4137,21 @@ class Ipv6(BaseModel):
         """
 
         cls.networkipv6 = NetworkIPv6.get_by_pk(id_network)
-        # Cast to API
-        net6 = IPv6Network('%s:%s:%s:%s:%s:%s:%s:%s/%s' % (
-            cls.networkipv6.block1, cls.networkipv6.block2, cls.networkipv6.block3,
-            cls.networkipv6.block4, cls.networkipv6.block5, cls.networkipv6.block6,
-            cls.networkipv6.block7, cls.networkipv6.block8, cls.networkipv6.block))
-        # Find all ipv6s ralated to network
-        ips = Ipv6.objects.filter(networkipv6__id=cls.networkipv6.id)
-        for ip in ips:
-            cls.log.info('ip %s' % ip.block8)
-
-        # Cast all to API class
-        ipsv6 = set([(IPv6Address('%s:%s:%s:%s:%s:%s:%s:%s' % (
-            ip.block1, ip.block2, ip.block3, ip.block4, ip.block5, ip.block6, ip.block7, ip.block8)
-        )) for ip in ips])
 
-        selected_ip = None
-
-        if topdown:
-            method = net6.iterhostsTopDown
-        else:
-            method = net6.iterhosts
-
-        # For each ip generated
-        for ip in method():
-
-            # If IP generated was not used
-            if ip not in ipsv6:
-
-                # Use it
-                selected_ip = ip
+        # Cast to API
+        net6 = IPv6Network(cls.networkipv6.networkv6)
 
-                return selected_ip.exploded
+        low, high = allocation_index.hosts_range(net6)
 
-                # Stop generation
-                break
+        selected_ip = allocation_index.ipv6_index.first_available(
+            cls.networkipv6, low, high, topdown)
 
         if selected_ip is None:
             raise IpNotAvailableError(
                 None, u'No IP6 available to NETWORK %s.' % cls.networkipv6.id)
 
+        return selected_ip.exploded
+
     def delete_ip6(self, user, id_ip):
         try:
 
@@ -4734,6 +4643,7 @@ class Ipv6(BaseModel):
 
             # Deletes Obj IP
             super(Ipv6, self).delete()
+            allocation_index.ipv6_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -4860,6 +4770,7 @@ class Ipv6(BaseModel):
                 self.validate_v3(eqpts)
 
             self.save()
+            allocation_index.ipv6_index.mark_used(self)
 
             # Creates relationship between ip and equipment
             for eqpt in ip_map.get('equipments', []):
@@ -5018,6 +4929,7 @@ class Ipv6(BaseModel):
 
             # Deletes Obj IP
             super(Ipv6, self).delete()
+            allocation_index.ipv6_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -5161,6 +5073,7 @@ class Ipv6(BaseModel):
                 self.validate_v3(eqpts)
 
             self.save()
+            allocation_index.ipv6_index.mark_used(self)
 
             # Creates relationship between ip and equipment
             for eqpt in ip_map.get('equipments', []):
@@ -5342,6 +5255,7 @@ class Ipv6(BaseModel):
 
             # Deletes Obj IP
             super(Ipv6, self).delete()
+            allocation_index.ipv6_index.mark_free(self)
 
             # Sends to Queue
             queue_manager = QueueManager(broker_vhost='tasks',
@@ -5389,36 +5303,17 @@ class Ipv6(BaseModel):
         # Cast to API
         net6 = IPNetwork(self.networkipv6.networkv6)
 
-        # Find all ips ralated to network
-        ips = self.networkipv6.ipv6_set.all()
-
-        # Cast all to API class
-        ipsv6 = set([IPv6Address(ip.ip_formated) for ip in ips])
-
         # Get configuration
         conf = configuration.get()
 
-        selected_ip = None
-
-        # For each ip generated
-        i = 0
-        for ip in net6.iterhosts():
-
-            # Do not use some range of IPs (config)
-            # IPv6_MIN = Firsts
-            # IPv6_MAX = Number minimum of Ip reserveds
-            # First IP and 2 last I
-            i = i + 1
-            if i >= conf.IPv6_MIN and i < (net6.numhosts - conf.IPv6_MAX):
+        # Do not use some range of IPs (config)
+        # IPv6_MIN = Firsts
+        # IPv6_MAX = Number minimum of Ip reserveds
+        low, high = allocation_index.hosts_range(
+            net6, conf.IPv6_MIN, conf.IPv6_MAX)
 
-                # If IP generated was not used
-                if ip not in ipsv6:
-
-                    # Use it
-                    selected_ip = ip
-
-                    # Stop generation
-                    break
+        selected_ip = allocation_index.ipv6_index.first_available(
+            self.networkipv6, low, high)
 
         if selected_ip is None:
             raise IpNotAvailableError(None, u'No IP available to VLAN %s.' %
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import Mock
+from mock import patch
+
+from networkapi.infrastructure.ipaddr import IPv4Network
+from networkapi.ip import allocation_index
+from networkapi.ip.allocation_index import AddressIndex
+from networkapi.ip.allocation_index import block_forms
+from networkapi.ip.allocation_index import hosts_range
+from networkapi.ip.allocation_index import ipv4_index
+
+
+class AddressIndexTestCase(unittest.TestCase):
+
+    def test_from_offsets_merges_adjacent_offsets(self):
+        index = AddressIndex.from_offsets([5, 1, 2, 3, 7, 6, 10])
+
+        self.assertEquals([1, 5, 10], index.starts)
+        self.assertEquals([3, 7, 10], index.ends)
+        self.assertEquals(7, len(index))
+
+    def test_add_joins_ranges(self):
+        index = AddressIndex.from_offsets([1, 2, 4, 5])
+        index.add(3)
+
+        self.assertEquals([1], index.starts)
+        self.assertEquals([5], index.ends)
+
+    def test_add_extends_and_inserts_ranges(self):
+        index = AddressIndex.from_offsets([10])
+        index.add(11)
+        index.add(9)
+        index.add(20)
+        index.add(10)
+
+        self.assertEquals([9, 20], index.starts)
+        self.assertEquals([11, 20], index.ends)
+
+    def test_remove_splits_range(self):
+        index = AddressIndex.from_offsets(range(1, 10))
+        index.remove(5)
+        index.remove(1)
+        index.remove(9)
+        index.remove(30)
+
+        self.assertEquals([2, 6], index.starts)
+        self.assertEquals([4, 8], index.ends)
+        self.assertNotIn(5, index)
+        self.assertIn(6, index)
+
+    def test_first_free(self):
+        index = AddressIndex.from_offsets([1, 2, 3, 6])
+
+        self.assertEquals(4, index.first_free(1, 254))
+        self.assertEquals(5, index.first_free(5, 254))
+        self.assertEquals(7, index.first_free(6, 254))
+        self.assertIsNone(index.first_free(1, 3))
+
+    def test_first_free_topdown(self):
+        index = AddressIndex.from_offsets([250, 251, 252, 253, 254])
+
+        self.assertEquals(249, index.first_free(1, 254, topdown=True))
+        self.assertEquals(240, index.first_free(1, 240, topdown=True))
+        self.assertIsNone(index.first_free(250, 254, topdown=True))
+
+    def test_first_free_in_full_network(self):
+        index = AddressIndex.from_offsets(range(1, 65535))
+
+        self.assertEquals(1, len(index.starts))
+        self.assertIsNone(index.first_free(1, 65534))
+        self.assertIsNone(index.first_free(1, 65534, topdown=True))
+
+    def test_hosts_range(self):
+        net = IPv4Network('10.0.0.0/24')
+
+        self.assertEquals((1, 254), hosts_range(net))
+        self.assertEquals((5, 250), hosts_range(net, 5, 5))
+        self.assertEquals((1, 0), hosts_range(IPv4Network('10.0.0.0/31')))
+
+    def test_ipv6_block_forms(self):
+        self.assertEquals(['a', '0a', '00a', '000a'], block_forms('000a'))
+        self.assertEquals(['0', '00', '000', '0000'], block_forms('0000'))
+        self.assertEquals(['abcd'], block_forms('abcd'))
+
+
+class IndexBackendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = get_cache(
+            'django.core.cache.backends.locmem.LocMemCache')
+        self.cache.clear()
+        self.network = Mock(id=1, networkv4='10.0.0.0/29')
+
+        for target, attribute, value in (
+                (allocation_index, 'cache', self.cache),
+                (ipv4_index, 'is_used', Mock(return_value=False)),
+                (ipv4_index, 'used_offsets', Mock(return_value=[1, 2]))):
+            patcher = patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def ip(self, address):
+        return Mock(networkipv4=self.network, ip_formated=address)
+
+    def test_full_index_is_rebuilt_before_giving_up(self):
+        # 10.0.0.3 was freed out of the index
+        ipv4_index.save(self.network, AddressIndex.from_offsets(range(1, 7)))
+
+        address = ipv4_index.first_available(self.network, 1, 6)
+
+        self.assertEquals('10.0.0.3', str(address))
+        self.assertEquals(1, ipv4_index.used_offsets.call_count)
+
+    def test_full_network(self):
+        ipv4_index.used_offsets.return_value = range(1, 7)
+
+        self.assertIsNone(ipv4_index.first_available(self.network, 1, 6))
+        self.assertEquals(1, ipv4_index.used_offsets.call_count)
+
+    def test_index_is_updated_after_commit(self):
+        ipv4_index.rebuild(self.network)
+        callbacks = []
+
+        with patch.object(allocation_index, 'on_commit', callbacks.append):
+            ipv4_index.mark_used(self.ip('10.0.0.3'))
+            ipv4_index.mark_free(self.ip('10.0.0.1'))
+
+            key = allocation_index.KEY_INDEX_IPV4 % 1
+            self.assertEquals(([1], [2]), self.cache.get(key))
+
+            for callback in callbacks:
+                callback()
+
+        self.assertEquals(([2], [3]), self.cache.get(key))
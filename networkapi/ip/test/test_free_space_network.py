@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from networkapi.infrastructure.ipaddr import IPNetwork
+from networkapi.util.network import FreeSpaceNetwork
+from networkapi.util.network import get_free_space_network
+
+
+class FreeSpaceNetworkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.supernet = IPNetwork('10.0.0.0/24')
+        self.used_nets = [
+            IPNetwork('10.0.0.0/26'),
+            IPNetwork('10.0.0.64/28'),
+            IPNetwork('10.0.0.128/25'),
+        ]
+
+    def test_get_free_space_network(self):
+        free_nets = get_free_space_network([self.supernet], self.used_nets)
+
+        self.assertEquals([IPNetwork('10.0.0.80/28'),
+                           IPNetwork('10.0.0.96/27')], free_nets)
+
+    def test_get_free_space_network_without_used_networks(self):
+        free_nets = get_free_space_network([self.supernet], [])
+
+        self.assertEquals([self.supernet], free_nets)
+
+    def test_first_free_subnet(self):
+        free_space = FreeSpaceNetwork(self.used_nets)
+
+        self.assertEquals(IPNetwork('10.0.0.80/28'),
+                          free_space.first_free_subnet(self.supernet, 28))
+        self.assertEquals(IPNetwork('10.0.0.96/27'),
+                          free_space.first_free_subnet(self.supernet, 27))
+        self.assertIsNone(free_space.first_free_subnet(self.supernet, 26))
+
+    def test_first_free_subnet_ignores_networks_outside_supernet(self):
+        free_space = FreeSpaceNetwork([IPNetwork('10.0.1.0/24'),
+                                       IPNetwork('10.0.0.0/25')])
+
+        self.assertEquals(IPNetwork('10.0.0.128/25'),
+                          free_space.first_free_subnet(self.supernet, 25))
+        self.assertIsNone(free_space.first_free_subnet(
+            IPNetwork('10.0.1.0/24'), 30))
+
+    def test_first_free_subnet_with_invalid_prefix(self):
+        free_space = FreeSpaceNetwork([])
+
+        self.assertIsNone(free_space.first_free_subnet(self.supernet, 23))
+
+    def test_first_free_subnet_ipv6(self):
+        supernet = IPNetwork('2001:db8::/48')
+        free_space = FreeSpaceNetwork([IPNetwork('2001:db8::/64'),
+                                       IPNetwork('2001:db8:0:1::/64')])
+
+        self.assertEquals(IPNetwork('2001:db8:0:2::/64'),
+                          free_space.first_free_subnet(supernet, 64))
+        self.assertEquals(IPNetwork('2001:db8:0:4::/62'),
+                          free_space.first_free_subnet(supernet, 62))
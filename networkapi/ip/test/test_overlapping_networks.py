@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from networkapi.infrastructure.ipaddr import IPNetwork
+from networkapi.util.network import overlapping_networks
+
+
+class OverlappingNetworksTestCase(unittest.TestCase):
+
+    def test_overlapping_networks(self):
+        nets_a = [IPNetwork('10.0.0.0/24'), IPNetwork('10.0.2.0/26'),
+                  IPNetwork('192.168.0.0/24')]
+        nets_b = [IPNetwork('10.0.0.0/16'), IPNetwork('10.0.2.32/27'),
+                  IPNetwork('10.1.0.0/24')]
+
+        pairs = overlapping_networks(nets_a, nets_b)
+
+        self.assertEquals(sorted([(0, 0), (1, 0), (1, 1)]), sorted(pairs))
+
+    def test_same_network(self):
+        pairs = overlapping_networks([IPNetwork('10.0.0.0/24')],
+                                     [IPNetwork('10.0.0.0/24')])
+
+        self.assertEquals([(0, 0)], pairs)
+
+    def test_networks_of_same_list_are_not_compared(self):
+        pairs = overlapping_networks([IPNetwork('10.0.0.0/16'),
+                                      IPNetwork('10.0.0.0/24')], [])
+
+        self.assertEquals([], pairs)
+
+    def test_ipv4_and_ipv6_do_not_overlap(self):
+        pairs = overlapping_networks([IPNetwork('0.0.0.0/0')],
+                                     [IPNetwork('::/0')])
+
+        self.assertEquals([], pairs)
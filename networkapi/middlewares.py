@@ -18,8 +18,11 @@ import logging
 from networkapi.api_rest.authentication import BasicAuthentication
 from networkapi.extra_logging import local
 from networkapi.rest import RestResource
+from networkapi.settings import AUDIT_LOG_DEFERRED
 # from django.conf import settings
 
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
 
 class SQLLogMiddleware(object):
 
@@ -43,6 +46,8 @@ class TrackingRequestOnThreadLocalMiddleware(object):
 
     """
 
+    log = logging.getLogger('TrackingRequestOnThreadLocalMiddleware')
+
     def _get_ip(self, request):
         # get real ip
         if 'HTTP_X_FORWARDED_FOR' in request.META:
@@ -56,15 +61,22 @@ class TrackingRequestOnThreadLocalMiddleware(object):
 
     def process_request(self, request):
 
+        from networkapi.eventlog.models import AuditBuffer
         from networkapi.eventlog.models import AuditRequest
-        if not request.user.is_anonymous():
-            ip = self._get_ip(request)
-            context = local.request_context
-            identity = local.request_id
 
-            AuditRequest.new_request(request.get_full_path(), request.user,
-                                     ip, identity, context)
-        else:
+        if AUDIT_LOG_DEFERRED:
+            AuditBuffer.start()
+
+        path = request.get_full_path()
+        ip = self._get_ip(request)
+        context = local.request_context
+        identity = local.request_id
+
+        def new_request():
+            if not request.user.is_anonymous():
+                return AuditRequest.new_request(path, request.user,
+                                                ip, identity, context)
+
             user_auth_tuple = BasicAuthentication().authenticate(request)
 
             if user_auth_tuple is not None:
@@ -73,14 +85,28 @@ class TrackingRequestOnThreadLocalMiddleware(object):
                 user = RestResource.authenticate_user(request)
 
             if user is not None:
-                ip = self._get_ip(request)
-                context = local.request_context
-                identity = local.request_id
-                AuditRequest.new_request(request.get_full_path(), user,
-                                         ip, identity, context)
+                return AuditRequest.new_request(path, user,
+                                                ip, identity, context)
+
+        # Safe methods rarely change objects, so the user of the audit
+        # request is only resolved when some event is audited.
+        if request.method in SAFE_METHODS:
+            AuditRequest.new_lazy_request(new_request)
+        else:
+            new_request()
 
     def process_response(self, request, response):
+        from networkapi.eventlog.models import AuditBuffer
         from networkapi.eventlog.models import AuditRequest
+
+        # The buffer only has events of changes committed, whatever the
+        # status of the response.
+        try:
+            AuditBuffer.flush()
+        except Exception:
+            self.log.error(u'Error writing audit events of request.',
+                           exc_info=True)
+        AuditBuffer.discard()
         AuditRequest.cleanup_request()
 
         return response
@@ -19,15 +19,15 @@ import re
 from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 
+from networkapi.eventlog.models import AuditBuffer
 from networkapi.eventlog.models import AuditRequest
 from networkapi.eventlog.models import EventLog
-from networkapi.eventlog.models import EventLogQueue
-from networkapi.settings import LOG_QUEUE
 from networkapi.util import signals_helper as m2m_audit
 
 MODEL_LIST = set()
 LOG = logging.getLogger(__name__)
 DEFAULT_CACHE_TIMEOUT = 120
+AUDIT_STATE_ATTR = '_audit_state'
 
 
 def get_cache_key_for_instance(instance, cache_prefix='networkapi_event_log'):
@@ -40,20 +40,21 @@ def get_value(obj, attr):
     Returns the value of an attribute. First it tries to return the unicode value.
     """
     if hasattr(obj, attr):
-
-        try:
-            value = getattr(obj, attr).__unicode__()
-            return {'id': getattr(obj, attr).id, 'value': value}
-        except:
-            value = getattr(obj, attr)
-            if hasattr(value, 'all'):
-                return [v.__unicode__() for v in value.all()]
-            else:
-                return value
+        return format_attr_value(getattr(obj, attr))
     else:
         return None
 
 
+def format_attr_value(value):
+    try:
+        return {'id': value.id, 'value': value.__unicode__()}
+    except:
+        if hasattr(value, 'all'):
+            return [v.__unicode__() for v in value.all()]
+        else:
+            return value
+
+
 def to_dict(obj):
     if obj is None:
         return {}
@@ -69,6 +70,50 @@ def to_dict(obj):
     return state
 
 
+def snapshot_state(instance):
+    """
+    Keeps values of fields of instance as it was loaded (or last saved),
+    so audit of a change does not need to fetch the old row again.
+    """
+
+    instance.__dict__[AUDIT_STATE_ATTR] = dict(
+        (field.attname, instance.__dict__[field.attname])
+        for field in instance._meta.fields
+        if field.attname in instance.__dict__)
+
+
+def old_state_of(instance, new_state):
+    """
+    Returns the state of instance before the change, built from the snapshot
+    of fields. Only foreign keys changed need a query. Falls back to fetching
+    the row when instance was not loaded from database or has deferred fields.
+    """
+
+    snapshot = instance.__dict__.get(AUDIT_STATE_ATTR)
+    fields = instance._meta.fields
+
+    if snapshot is None or instance._state.adding or \
+            any(field.attname not in snapshot for field in fields):
+        return to_dict(instance.__class__.objects.get(pk=instance.pk))
+
+    old_state = dict(new_state)
+    for field in fields:
+        old_value = snapshot[field.attname]
+        if old_value == instance.__dict__.get(field.attname):
+            continue
+
+        if field.rel is None:
+            old_state[field.name] = old_value
+        elif old_value is None:
+            old_state[field.name] = None
+        else:
+            old_state[field.name] = format_attr_value(
+                field.rel.to._default_manager.get(
+                    **{field.rel.field_name: old_value}))
+
+    return old_state
+
+
 def dict_diff(old, new):
 
     keys = set(old.keys() + new.keys())
@@ -126,8 +171,7 @@ def save_audit(instance, operation, kwargs={}):
         try:
             if operation == EventLog.CHANGE and instance.pk:
                 if not m2m_change:
-                    old_state = to_dict(
-                        instance.__class__.objects.get(pk=instance.pk))
+                    old_state = old_state_of(instance, new_state)
                 else:
                     # m2m change
                     LOG.debug('m2m change detected')
@@ -187,7 +231,8 @@ def save_audit(instance, operation, kwargs={}):
                 for description in descriptions:
                     # obj_description = (
                     #     instance and unicode(instance) and '')[:100]
-                    audit_request = AuditRequest.current_request(True)
+                    audit_request = AuditRequest.current_request(
+                        not AuditBuffer.started())
 
                     changed_field = changed_fields.pop(0)
                     old_value_list = {}
@@ -206,17 +251,14 @@ def save_audit(instance, operation, kwargs={}):
                     event['audit_request'] = audit_request
                     # save the event log
                     if audit_request:
-                        EventLog.log(audit_request.user, event)
-                        if LOG_QUEUE:
-                            EventLogQueue.log(audit_request.user, event)
+                        AuditBuffer.log(audit_request.user, event)
                     else:
-                        EventLog.log(None, event)
-                        if LOG_QUEUE:
-                            EventLogQueue.log(None, event)
+                        AuditBuffer.log(None, event)
 
             else:
                 # obj_description = (instance and unicode(instance) and '')[:100]
-                audit_request = AuditRequest.current_request(True)
+                audit_request = AuditRequest.current_request(
+                    not AuditBuffer.started())
 
                 old_value_list = {}
                 new_value_list = {}
@@ -231,13 +273,9 @@ def save_audit(instance, operation, kwargs={}):
                 event['id_objeto'] = instance.pk
                 event['audit_request'] = audit_request
                 if audit_request:
-                    EventLog.log(audit_request.user, event)
-                    if LOG_QUEUE:
-                        EventLogQueue.log(audit_request.user, event)
+                    AuditBuffer.log(audit_request.user, event)
                 else:
-                    EventLog.log(None, event)
-                    if LOG_QUEUE:
-                        EventLogQueue.log(None, event)
+                    AuditBuffer.log(None, event)
     except:
         LOG.error(u'Error registering auditing to %s: (%s) %s',
                   repr(instance), type(instance), getattr(instance, '__dict__', None), exc_info=True)
@@ -291,6 +329,18 @@ def audit_post_save(sender, instance, created, **kwargs):
     if created:
         save_audit(instance, EventLog.ADD)
 
+    snapshot_state(instance)
+
+
+def audit_post_init(sender, instance, **kwargs):
+
+    from networkapi.models.BaseModel import BaseModel
+
+    if (not issubclass(instance.__class__, BaseModel)):
+        return
+
+    snapshot_state(instance)
+
 
 def handle_unicode(s):
     if isinstance(s, basestring):
@@ -31,7 +31,6 @@ class FTOS(BasePlugin):
 
     MAX_TRIES = 10
     RETRY_WAIT_TIME = 5
-    WAIT_FOR_CLI_RETURN = 1
     CURRENTLY_BUSY_WAIT = 'Currently busy with copying a file'
     INVALID_REGEX = '([Ii]nvalid)|overlaps with'
     WARNING_REGEX = 'config ignored|Warning'
@@ -182,10 +181,7 @@ class FTOS(BasePlugin):
         string_ok = 0
         recv_string = ''
         while not string_ok:
-            while not self.channel.recv_ready():
-                sleep(self.WAIT_FOR_CLI_RETURN)
-
-            recv_string = self.channel.recv(9999)
+            recv_string = self.read_output()
             file_name_string = self.removeDisallowedChars(recv_string)
 
             for output_line in recv_string.splitlines():
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import random
+import threading
+import time
+
+import bigsuds
+
+from networkapi.plugins import exceptions as base_exceptions
+from networkapi.system.facade import get_value as get_variable
+
+log = logging.getLogger(__name__)
+
+TOO_MANY_SESSIONS = 'There are too many existing user sessions.'.lower()
+
+# Attempts to open a session when BIG-IP has too many of them, waiting
+# random up to BACKOFF_BASE * 2 ** attempt seconds between them.
+SESSION_ATTEMPTS = 5
+BACKOFF_BASE = 2
+
+# Fraction of session timeout of BIG-IP a session may stay idle in cache,
+# so it is not expired by BIG-IP when reused.
+SESSION_IDLE_FRACTION = 0.5
+
+
+class PooledChannel(object):
+
+    """iControl channel of a device, borrowed from ChannelCache."""
+
+    def __init__(self, key, channel, version, session):
+        self.key = key
+        self.channel = channel
+        self.version = version
+        self.session = session
+        self.last_used = time.time()
+        self.transaction_timeout = None
+
+
+class _Device(object):
+
+    def __init__(self):
+        # idle channels, by session flag
+        self.idle = {True: list(), False: list()}
+        self.sessions = 0
+        self.version = None
+        self.session_timeout = None
+        self.probed = 0
+
+
+class ChannelCache(object):
+
+    """Per-process cache of authenticated iControl channels of BIG-IPs.
+
+    Channels are reused across calls. Version and session timeout of each
+    device are probed once every probe_ttl seconds. At most max_sessions
+    channels with session are borrowed at a time from each device, other
+    borrowers wait for one of them to be released.
+    """
+
+    def __init__(self, max_sessions=4, probe_ttl=300, wait_timeout=300,
+                 channel_factory=bigsuds.BIGIP):
+        self.max_sessions = max(1, max_sessions)
+        self.probe_ttl = probe_ttl
+        self.wait_timeout = wait_timeout
+        self.channel_factory = channel_factory
+
+        self._condition = threading.Condition()
+        self._devices = dict()
+        self._pid = os.getpid()
+
+    def borrow(self, hostname, username, password, session=True):
+        key = (hostname, username)
+
+        with self._condition:
+            self._check_pid()
+            device = self._devices.setdefault(key, _Device())
+
+            if session:
+                deadline = time.time() + self.wait_timeout
+                while device.sessions >= self.max_sessions:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise base_exceptions.CommandErrorException(
+                            'Timeout waiting session of %s' % hostname)
+                    self._condition.wait(remaining)
+                    self._check_pid()
+                    device = self._devices.setdefault(key, _Device())
+                device.sessions += 1
+
+            pooled = self._take_idle(device, session)
+
+        if pooled is not None:
+            return pooled
+
+        try:
+            return self._open(key, device, password, session)
+        except:
+            if session:
+                self._release_session(key)
+            raise
+
+    def release(self, pooled, reusable=True):
+        """Gives channel back. Channels not reusable, as after an error in
+        a transaction, are dropped.
+        """
+
+        with self._condition:
+            self._check_pid()
+            device = self._devices.get(pooled.key)
+            if device is None:
+                return
+
+            if pooled.session:
+                device.sessions -= 1
+            if reusable:
+                pooled.last_used = time.time()
+                device.idle[pooled.session].append(pooled)
+            self._condition.notify_all()
+
+    def _take_idle(self, device, session):
+        limit = 0
+        if session and device.session_timeout:
+            limit = time.time() - \
+                device.session_timeout * SESSION_IDLE_FRACTION
+
+        idle = device.idle[session]
+        while idle:
+            pooled = idle.pop()
+            if pooled.last_used > limit:
+                return pooled
+        return None
+
+    def _release_session(self, key):
+        with self._condition:
+            device = self._devices.get(key)
+            if device is not None:
+                device.sessions -= 1
+            self._condition.notify_all()
+
+    def _open(self, key, device, password, session):
+        hostname, username = key
+
+        channel = self.channel_factory(
+            hostname=hostname, username=username, password=password)
+        log.info('Connected in hostname:%s' % hostname)
+
+        if time.time() - device.probed > self.probe_ttl:
+            self._probe(channel, device)
+
+        if session:
+            channel = self._new_session(channel, hostname)
+
+        return PooledChannel(key, channel, device.version, session)
+
+    def _probe(self, channel, device):
+        version = channel.System.SystemInfo.get_version()
+
+        if version[8:len(version)].split('.')[0] <= 10:
+            raise base_exceptions.UnsupportedVersion(
+                'This plugin only supports BIG-IP v11 or above')
+
+        session_cur = channel.System.Session.get_session_timeout()
+        log.info('Session Timeout Current: %s' % session_cur)
+        session_timeout = get_variable(
+            'set_session_timeout_plugin_f5', '60')
+        if int(session_cur) > int(session_timeout):
+            channel.System.Session.set_session_timeout(session_timeout)
+            session_cur = session_timeout
+
+        device.version = version
+        device.session_timeout = int(session_cur)
+        device.probed = time.time()
+
+    def _new_session(self, channel, hostname):
+        log.info('Try get new session')
+        for attempt in xrange(SESSION_ATTEMPTS):
+            try:
+                session = channel.with_session_id()
+                log.info('Session %s', session)
+                return session
+            except Exception, e:
+                if TOO_MANY_SESSIONS not in str(e).lower() or \
+                        attempt + 1 >= SESSION_ATTEMPTS:
+                    raise
+                # Sessions of other processes, in this or other hosts
+                delay = random.uniform(0, BACKOFF_BASE * 2 ** attempt)
+                log.warning(
+                    'There are too many existing user sessions in %s. '
+                    'Trying again in %.1f seconds' % (hostname, delay))
+                time.sleep(delay)
+
+    def _check_pid(self):
+        # Channels of parent process are not shared with a forked worker.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._devices = dict()
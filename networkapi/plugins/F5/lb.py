@@ -1,71 +1,47 @@
 # -*- coding: utf-8 -*-
 import logging
-from time import sleep
-
-import bigsuds
 
 from networkapi.plugins import exceptions as base_exceptions
-from networkapi.system.facade import get_value as get_variable
+from networkapi.plugins.F5.channels import ChannelCache
+from networkapi.settings import F5_MAX_SESSIONS
+from networkapi.settings import F5_PROBE_CACHE_TIME
 
 log = logging.getLogger(__name__)
 
+channel_cache = ChannelCache(F5_MAX_SESSIONS, F5_PROBE_CACHE_TIME)
+
 
 class Lb(object):
 
+    """Channel of a BIG-IP, borrowed from channel_cache until release()."""
+
     def __init__(self, hostname, username, password, session=True):
 
         self._hostname = hostname
         self._username = username
         self._password = password
-        self._time_reconn = 10
 
         try:
-            self._channel = bigsuds.BIGIP(
-                hostname=self._hostname,
-                username=self._username,
-                password=self._password
-            )
-
+            self._pooled = channel_cache.borrow(
+                hostname, username, password, session)
         except Exception, e:
-            logging.critical('Unable to connect to BIG-IP. Details: %s' % (e))
+            log.error('Unable to connect to BIG-IP %s. Details: %s' %
+                      (hostname, e))
             raise base_exceptions.CommandErrorException(e)
-        else:
-            log.info('Connected in hostname:%s' % hostname)
-            try:
-                self._version = self._channel.System.SystemInfo.get_version()
 
-                if self._version[8:len(self._version)].split('.')[0] <= 10:
-                    raise base_exceptions.UnsupportedVersion(
-                        'This plugin only supports BIG-IP v11 or above')
-                else:
-                    if session:
-                        log.info('Try get new session')
-                        session_cur = self._channel.System.Session.get_session_timeout()
-                        log.info('Session Timeout Current: %s' % session_cur)
-                        session_timeout = get_variable(
-                            'set_session_timeout_plugin_f5', '60')
-                        if int(session_cur) > int(session_timeout):
-                            self._channel.System.Session.set_session_timeout(
-                                session_timeout)
-                        self._channel = self.get_session()
-            except Exception, e:
-                log.error(e)
-                raise base_exceptions.CommandErrorException(e)
+        self._channel = self._pooled.channel
+        self._version = self._pooled.version
 
-    def get_session(self):
+    def set_transaction_timeout(self, timeout):
+        """Sets transaction timeout of session, once for each session."""
 
-        try:
-            channel = self._channel.with_session_id()
-            log.info('Session %s', channel)
-        except Exception, e:
-            if 'There are too many existing user sessions.'.lower() in str(e).lower():
-                self._time_reconn *= 2
-                log.warning(
-                    'There are too many existing user sessions. '
-                    'Trying again in %s seconds' % self._time_reconn)
-                sleep(self._time_reconn)
-                self.get_session()
-            else:
-                raise e
-        else:
-            return channel
+        if self._pooled.transaction_timeout != timeout:
+            self._channel.System.Session.set_transaction_timeout(timeout)
+            self._pooled.transaction_timeout = timeout
+
+    def release(self, reusable=True):
+        """Gives channel back to channel_cache."""
+
+        if self._pooled is not None:
+            channel_cache.release(self._pooled, reusable)
+            self._pooled = None
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import copy
 import logging
+from contextlib import contextmanager
 from functools import wraps
 
 import bigsuds
@@ -32,12 +33,13 @@ def transation(func):
                 access = args[0].get('access').filter(
                     tipo_acesso__protocolo='https').uniqueResult()
                 self._lb = lb.Lb(access.fqdn, access.user, access.password)
-                if not kwargs.__contains__('transation') or kwargs['transation']:
-                    log.info('Transaction Started')
-                    with bigsuds.Transaction(self._lb._channel):
+                with released(self._lb):
+                    if not kwargs.__contains__('transation') or kwargs['transation']:
+                        log.info('Transaction Started')
+                        with bigsuds.Transaction(self._lb._channel):
+                            return func(self, *args, **kwargs)
+                    else:
                         return func(self, *args, **kwargs)
-                else:
-                    return func(self, *args, **kwargs)
             except bigsuds.OperationFailed, e:
                 log.error(e)
                 raise base_exceptions.CommandErrorException(e)
@@ -56,8 +58,9 @@ def connection(func):
             access = args[0].get('access').filter(
                 tipo_acesso__protocolo='https').uniqueResult()
             self._lb = lb.Lb(access.fqdn, access.user, access.password)
-            self._lb._channel.System.Session.set_transaction_timeout(60)
-            return func(self, *args, **kwargs)
+            with released(self._lb):
+                self._lb.set_transaction_timeout(60)
+                return func(self, *args, **kwargs)
         except bigsuds.OperationFailed, e:
             log.error(e)
             raise base_exceptions.CommandErrorException(e)
@@ -71,13 +74,29 @@ def connection_simple(func):
             access = args[0].get('access').filter(
                 tipo_acesso__protocolo='https').uniqueResult()
             self._lb = lb.Lb(access.fqdn, access.user, access.password, False)
-            return func(self, *args, **kwargs)
+            with released(self._lb):
+                return func(self, *args, **kwargs)
         except bigsuds.OperationFailed, e:
             log.error(e)
             raise base_exceptions.CommandErrorException(e)
     return inner
 
 
+@contextmanager
+def released(_lb):
+    """Gives channel of lb back when block ends. After an error, channel
+    is dropped, as it may be left in a transaction.
+    """
+
+    try:
+        yield _lb
+    except:
+        _lb.release(reusable=False)
+        raise
+    else:
+        _lb.release()
+
+
 def get_status_name(status):
     try:
         return STATUS_POOL_MEMBER[status]
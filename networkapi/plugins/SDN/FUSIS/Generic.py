@@ -16,8 +16,7 @@
 """
 import json
 
-import requests
-
+from networkapi.plugins.SDN import inventory
 from networkapi.plugins.SDN.base import BaseSdnPlugin
 from networkapi.plugins.SDN.FUSIS import util
 
@@ -231,7 +230,7 @@ class Generic(BaseSdnPlugin):
 
         method = method.lower()
 
-        request_type_func = getattr(requests, method)
+        request_type_func = getattr(inventory.sessions.get(uri), method)
 
         request = request_type_func(
             uri + url,
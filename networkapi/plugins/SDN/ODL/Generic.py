@@ -17,14 +17,16 @@
 import logging
 import json
 from enum import Enum
+from multiprocessing.dummy import Pool as ThreadPool
 
-import requests
 from requests.auth import HTTPBasicAuth
+from requests.exceptions import ConnectionError
 from requests.exceptions import HTTPError
 
 from django.core.exceptions import ObjectDoesNotExist
 
 from networkapi.plugins import exceptions
+from networkapi.plugins.SDN import inventory
 from networkapi.plugins.SDN.base import BaseSdnPlugin
 from networkapi.equipamento.models import EquipamentoAcesso
 from networkapi.plugins.SDN.ODL.flows.acl import AclFlowBuilder
@@ -44,6 +46,14 @@ class ODLPlugin(BaseSdnPlugin):
 
     versions = ["BERYLLIUM", "BORON", "CARBON", "NITROGEN"]
 
+    # Nodes updated at a time by update_all_flows
+    MAX_NODE_WORKERS = 8
+
+    # Flows of a table sent in one request are worth one request by flow.
+    # When flows to change in a node are more than flows of table divided
+    # by this, whole table is sent at once.
+    FLOWS_BY_REQUEST = 100
+
     def __init__(self, **kwargs):
 
         super(ODLPlugin, self).__init__(**kwargs)
@@ -58,6 +68,9 @@ class ODLPlugin(BaseSdnPlugin):
             # If AttributeError raised, equipment_access do not exists
             self.equipment_access = self._get_equipment_access()
 
+        # Unset when controller does not accept flows of a table at once
+        self._bulk_table = True
+
         if self.version not in self.versions:
             log.error("Invalid version at ODL Controller initialization")
             raise exceptions.ValueInvalid(msg="Invalid version at ODL Controller initialization")
@@ -88,34 +101,92 @@ class ODLPlugin(BaseSdnPlugin):
     def update_all_flows(self, data, flow_type=FlowTypes.ACL):
         current_flows = self.get_flows()
 
-        for node in current_flows.keys():
-            log.info("Starting update all flows for node %s"%node)
+        if flow_type == FlowTypes.ACL:
+            builder = AclFlowBuilder(data, self.environment, version=self.version)
+            # build() reuses the dict it yields, so flows are taken as built
+            new_flows = [flow for flows in builder.build()
+                         for flow in flows['flow']]
 
-            if flow_type == FlowTypes.ACL:
-                builder = AclFlowBuilder(data, self.environment, version=self.version)
-                new_flows_set = builder.build()
+        new_flows_set = [{'flow': new_flows}]
+
+        def update_node(node):
+            log.info("Starting update all flows for node %s"%node)
 
             #Makes a diff
             operations = self._diff_flows(current_flows[node], new_flows_set)
 
             try:
-                for flow in operations["delete"]:
-                    self.del_flow(flow_id=flow['id'], nodes_ids=[node])
-
-                for flow in operations["insert"]:
-                    self._flow(flow_id=flow['id'],
-                               method='put',
-                               data=json.dumps({'flow': [flow]}),
-                               nodes_ids=[node])
-
-            except Exception as e:
+                self._push_flows(node, operations, new_flows)
+            except HTTPError as e:
                 message = self._parse_errors(e.response.json())
                 log.error("ERROR while updating all flows: %s" % message)
                 raise exceptions.CommandErrorException(msg=message)
 
+        self._run_by_node(update_node, current_flows.keys())
+
+    def _push_flows(self, node, operations, flows):
+        """ Applies operations of diff in node. When many flows change, the
+        whole table is sent in one request instead of one by flow.
+        """
+
+        changes = len(operations["delete"]) + len(operations["insert"])
+        if changes == 0:
+            return
+
+        if self._bulk_table and changes > 1 and \
+                changes * self.FLOWS_BY_REQUEST >= len(flows):
+            try:
+                self._put_table(node, flows)
+                return
+            except HTTPError as e:
+                if e.response.status_code not in (400, 405, 501):
+                    raise
+                log.warning("Controller %s refused flows of table in one "
+                            "request, sending flows one by one" %
+                            self.equipment.nome)
+                self._bulk_table = False
+
+        for flow in operations["delete"]:
+            self.del_flow(flow_id=flow['id'], nodes_ids=[node])
+
+        for flow in operations["insert"]:
+            self._flow(flow_id=flow['id'],
+                       method='put',
+                       data=json.dumps({'flow': [flow]}),
+                       nodes_ids=[node])
+
+    def _put_table(self, node_id, flows):
+        """ Replaces all flows of table 0 of node """
+
+        path = "/restconf/config/opendaylight-inventory:nodes/node/" \
+               "%s/flow-node-inventory:table/0" % node_id
+
+        data = {"flow-node-inventory:table": [{
+            "id": AclFlowBuilder.TABLE,
+            "flow": flows
+        }]}
+
+        return self._node_request(method="put", path=path,
+                                  data=json.dumps(data), contentType='json')
+
+    def _run_by_node(self, func, nodes_ids):
+        """ Calls func for each node, for many nodes at a time """
+
+        if len(nodes_ids) <= 1:
+            return map(func, nodes_ids)
+
+        pool = ThreadPool(min(self.MAX_NODE_WORKERS, len(nodes_ids)))
+        try:
+            return pool.map(func, nodes_ids)
+        finally:
+            pool.close()
+            pool.join()
 
     def flush_flows(self):
-        nodes_ids = self._get_nodes_ids()
+        # Flows of every node of controller are removed, not only of the
+        # ones discovered a while ago.
+        self.invalidate_nodes_ids()
+        nodes_ids = self.get_nodes_ids()
         # if len(nodes_ids) < 1:
         #     raise exceptions.ControllerInventoryIsEmpty(msg="No nodes found")
 
@@ -124,7 +195,7 @@ class ODLPlugin(BaseSdnPlugin):
                 path = "/restconf/config/opendaylight-inventory:nodes/node/" \
                        "%s/flow-node-inventory:table/0/" % node_id
 
-                self._request(
+                self._node_request(
                     method="delete", path=path, contentType='json'
                 )
             except HTTPError as e:
@@ -163,7 +234,7 @@ class ODLPlugin(BaseSdnPlugin):
             raise exceptions.ValueInvalid()
 
         if nodes_ids==[]:
-            nodes_ids = self._get_nodes_ids()
+            nodes_ids = self.get_nodes_ids()
             # if len(nodes_ids) < 1:
             #     raise exceptions.ControllerInventoryIsEmpty(msg="No nodes found")
 
@@ -173,7 +244,7 @@ class ODLPlugin(BaseSdnPlugin):
                    "flow-node-inventory:table/0/flow/%s" % (node_id, flow_id)
 
             return_flows.append(
-                self._request(
+                self._node_request(
                     method=method, path=path, data=data, contentType='json'
                 )
             )
@@ -183,7 +254,7 @@ class ODLPlugin(BaseSdnPlugin):
     def get_flows(self):
         """ Returns All flows for table 0 of all switches of a environment """
 
-        nodes_ids = self._get_nodes_ids()
+        nodes_ids = self.get_nodes_ids()
         # if len(nodes_ids) < 1:
         #     raise exceptions.ControllerInventoryIsEmpty(msg="No nodes found")
 
@@ -193,7 +264,7 @@ class ODLPlugin(BaseSdnPlugin):
                 path = "/restconf/config/opendaylight-inventory:nodes/node/" \
                        "%s/flow-node-inventory:table/0/" % (node_id)
 
-                inventory = self._request(
+                inventory = self._node_request(
                     method="get",
                     path=path,
                     contentType='json'
@@ -212,6 +283,18 @@ class ODLPlugin(BaseSdnPlugin):
 
         return flows_list
 
+    def get_nodes_ids(self):
+        """ Returns ids of nodes of controller, kept in cache for a while """
+
+        return inventory.get_nodes_ids(self)
+
+    def invalidate_nodes_ids(self):
+        """ Discards ids of nodes kept in cache, so they are discovered in
+        controller again
+        """
+
+        inventory.invalidate_nodes_ids(self.equipment)
+
     def _get_nodes_ids(self):
         #TODO: We need to check on newer versions (later to Berylliun) if the
         # check on both config and operational is still necessary
@@ -255,6 +338,22 @@ class ODLPlugin(BaseSdnPlugin):
         return nodes_ids_list
 
 
+    def _node_request(self, **kwargs):
+        """ Sends request about a node to controller. When the node is not
+        found or controller is not reachable, ids of nodes kept in cache are
+        discarded, so they are discovered again in next calls.
+        """
+
+        try:
+            return self._request(**kwargs)
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                self.invalidate_nodes_ids()
+            raise
+        except ConnectionError:
+            self.invalidate_nodes_ids()
+            raise
+
     def _request(self, **kwargs):
         """ Sends request to controller """
 
@@ -282,7 +381,8 @@ class ODLPlugin(BaseSdnPlugin):
 
         try:
             # Raises AttributeError if method is not valid
-            func = getattr(requests, params["method"])
+            session = inventory.sessions.get(self._get_host())
+            func = getattr(session, params["method"])
             request = func(
                 uri,
                 auth=self._get_auth(),
@@ -360,34 +460,29 @@ class ODLPlugin(BaseSdnPlugin):
         if current_data != []:
             current_data=current_data[0]['flow']
 
-        #turn lists into dicts and merge ids
-        ids_merged = []
+        #turn lists into dicts by id
         new = {}
         current = {}
 
         for new_flows in new_data:
             for new_flow in new_flows['flow']:
                 new[new_flow['id']] = new_flow
-                ids_merged.append(new_flow['id'])
         for current_flow in current_data:
             current[current_flow['id']] = current_flow
-            if ids_merged.count(current_flow['id'])==0:
-                ids_merged.append(current_flow['id'])
 
         operations={"delete":[], "insert":[]} #update is also an insertion
 
-        ids_merged.sort()
-        for id in ids_merged:
-            if not id in new:
-                operations["delete"].append(current[id])
-                log.debug("flow id %s will be deleted"%id)
-            else:
-                if not id in current:
-                    operations["insert"].append(new[id])
-                    log.debug("flow id %s will be inserted" % id)
-                elif self.assertDictsEqual(new[id], current[id])==False:
-                    operations["insert"].append(new[id])
-                    log.debug("flow id %s will be updated" % id)
+        for id in sorted(set(current) - set(new)):
+            operations["delete"].append(current[id])
+            log.debug("flow id %s will be deleted"%id)
+
+        for id in sorted(new):
+            if not id in current:
+                operations["insert"].append(new[id])
+                log.debug("flow id %s will be inserted" % id)
+            elif self.assertDictsEqual(new[id], current[id])==False:
+                operations["insert"].append(new[id])
+                log.debug("flow id %s will be updated" % id)
 
         return operations
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import threading
+import unittest
+
+from mock import Mock
+from mock import patch
+from requests.exceptions import HTTPError
+
+from networkapi.plugins.SDN.ODL.Generic import ODLPlugin
+
+TABLE_PATH = '/restconf/config/opendaylight-inventory:nodes/node/' \
+    '%s/flow-node-inventory:table/0'
+
+
+def flow(flow_id, priority=65000, cookie=1):
+    return {'id': flow_id, 'table_id': 0, 'priority': priority,
+            'cookie': cookie, 'match': {'ipv4-source': '10.0.0.1/32'}}
+
+
+class FakeBuilder(object):
+
+    """Yields flows as AclFlowBuilder, reusing the dict it yields."""
+
+    TABLE = 0
+
+    def __init__(self, data, environment, version):
+        self.flows_ids = data
+
+    def build(self):
+        flows = {'flow': []}
+        for flow_id in self.flows_ids:
+            flows['flow'] = [flow(flow_id)]
+            yield flows
+        flows['flow'] = []
+
+
+class UpdateAllFlowsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.odl = ODLPlugin.__new__(ODLPlugin)
+        self.odl.environment = 1
+        self.odl.version = 'BORON'
+        self.odl.equipment = Mock(nome='odl')
+        self.odl._bulk_table = True
+
+        self.lock = threading.Lock()
+        self.requests = list()
+        self.odl._request = self.request
+
+        patcher = patch('networkapi.plugins.SDN.ODL.Generic.AclFlowBuilder',
+                        FakeBuilder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, path, data=None, contentType='json'):
+        with self.lock:
+            self.requests.append((method, path, data))
+
+    def set_current_flows(self, flows_by_node):
+        self.odl.get_flows = lambda: dict(
+            (node, [{'id': 0, 'flow': flows}] if flows else [])
+            for node, flows in flows_by_node.items())
+
+    def test_diff_by_id(self):
+        current = [{'id': 0, 'flow': [
+            flow(3), flow(1, cookie=5), flow(2, priority='65000'), flow(9)]}]
+        new = [{'flow': [flow(1), flow(2)]}, {'flow': [flow(4), flow(3, 1)]}]
+
+        operations = self.odl._diff_flows(current, new)
+
+        # cookies and numbers as strings do not change flows
+        self.assertEqual([9], [f['id'] for f in operations['delete']])
+        self.assertEqual([3, 4], [f['id'] for f in operations['insert']])
+
+    def test_diff_without_current_flows(self):
+        operations = self.odl._diff_flows([], [{'flow': [flow(2), flow(1)]}])
+
+        self.assertEqual([], operations['delete'])
+        self.assertEqual([1, 2], [f['id'] for f in operations['insert']])
+
+    def test_few_changes_are_sent_by_flow_in_every_node(self):
+        flows = [flow(flow_id) for flow_id in range(1, 301)]
+        self.set_current_flows({'openflow:1': flows[:299],
+                                'openflow:2': flows[2:]})
+
+        self.odl.update_all_flows(range(1, 301))
+
+        self.assertEqual(sorted([
+            ('put', TABLE_PATH % 'openflow:1' + '/flow/300',
+             json.dumps({'flow': [flow(300)]})),
+            ('put', TABLE_PATH % 'openflow:2' + '/flow/1',
+             json.dumps({'flow': [flow(1)]})),
+            ('put', TABLE_PATH % 'openflow:2' + '/flow/2',
+             json.dumps({'flow': [flow(2)]})),
+        ]), sorted(self.requests))
+
+    def test_many_changes_replace_table(self):
+        self.set_current_flows({'openflow:1': [flow(1), flow(2)],
+                                'openflow:2': [flow(1), flow(2), flow(3)]})
+
+        self.odl.update_all_flows([3, 4])
+
+        self.assertEqual(2, len(self.requests))
+        for method, path, data in self.requests:
+            self.assertEqual('put', method)
+            self.assertIn(path, [TABLE_PATH % 'openflow:1',
+                                 TABLE_PATH % 'openflow:2'])
+            self.assertEqual(
+                {'flow-node-inventory:table': [
+                    {'id': 0, 'flow': [flow(3), flow(4)]}]},
+                json.loads(data))
+
+    def test_table_refused_by_controller_is_sent_by_flow(self):
+        self.set_current_flows({'openflow:1': [flow(1), flow(2)]})
+
+        def request(method, path, data=None, contentType='json'):
+            if path == TABLE_PATH % 'openflow:1':
+                raise HTTPError(response=Mock(status_code=405))
+            self.request(method, path, data, contentType)
+        self.odl._request = request
+
+        self.odl.update_all_flows([3])
+
+        self.assertFalse(self.odl._bulk_table)
+        self.assertEqual(['delete', 'delete', 'put'],
+                         [method for method, path, data in self.requests])
+
+    def test_nodes_without_changes_are_not_requested(self):
+        self.set_current_flows({'openflow:1': [flow(1)],
+                                'openflow:2': [flow(1)]})
+
+        self.odl.update_all_flows([1])
+
+        self.assertEqual([], self.requests)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import os
+import threading
+from multiprocessing.dummy import Pool as ThreadPool
+
+import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from networkapi.settings import SDN_INVENTORY_CACHE_TIME
+
+log = logging.getLogger(__name__)
+
+__all__ = ('SessionPool', 'sessions', 'get_nodes_ids',
+           'invalidate_nodes_ids', 'prefetch')
+
+# Connections kept open to each controller
+POOL_MAXSIZE = 10
+# Controllers prefetched at a time
+MAX_PREFETCH_WORKERS = 8
+
+
+class SessionPool(object):
+
+    """Per-process HTTP sessions of SDN controllers, by host.
+
+    Connections of a session are kept alive between requests, instead of
+    a new connection by request.
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE):
+        self.pool_maxsize = pool_maxsize
+
+        self._lock = threading.Lock()
+        self._sessions = dict()
+        self._pid = os.getpid()
+
+    def get(self, host):
+        with self._lock:
+            # Connections of parent process are not shared with a forked
+            # worker.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._sessions = dict()
+
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+
+            return session
+
+
+sessions = SessionPool()
+
+
+def _nodes_key(equipment):
+    return 'sdn_inventory:nodes:%s' % equipment.id
+
+
+def get_nodes_ids(plugin):
+    """Returns ids of nodes of the controller of plugin.
+
+    Nodes are discovered by plugin._get_nodes_ids and kept in cache for
+    SDN_INVENTORY_CACHE_TIME seconds.
+    """
+
+    key = _nodes_key(plugin.equipment)
+
+    nodes_ids = None
+    if SDN_INVENTORY_CACHE_TIME:
+        nodes_ids = cache.get(key)
+
+    if nodes_ids is None:
+        nodes_ids = plugin._get_nodes_ids()
+        if SDN_INVENTORY_CACHE_TIME:
+            cache.set(key, nodes_ids, SDN_INVENTORY_CACHE_TIME)
+
+    return list(nodes_ids)
+
+
+def invalidate_nodes_ids(equipment):
+    """Discards nodes of controller kept in cache."""
+
+    cache.delete(_nodes_key(equipment))
+
+
+def prefetch(plugins):
+    """Discovers nodes of controllers of plugins, for many controllers at
+    a time, so later calls of plugins find them in cache.
+    """
+
+    plugins = [plugin for plugin in plugins
+               if hasattr(plugin, '_get_nodes_ids')]
+    if not plugins or not SDN_INVENTORY_CACHE_TIME:
+        return
+
+    pool = ThreadPool(min(MAX_PREFETCH_WORKERS, len(plugins)))
+    try:
+        pool.map(_prefetch, plugins)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _prefetch(plugin):
+    try:
+        get_nodes_ids(plugin)
+    except Exception, e:
+        # Plugin raises it again when it needs nodes
+        log.warning('Failure to prefetch nodes of controller %s: %s' %
+                    (plugin.equipment.nome, e))
@@ -14,23 +14,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
-import random
 import re
 import string
+import time
 import unicodedata
-from time import sleep
-
-import paramiko
 
 from . import exceptions
+from .expect import Expect
+from .ssh_pool import SSHPool
 from networkapi.api_rest import exceptions as api_exceptions
 from networkapi.equipamento.models import EquipamentoAcesso
+from networkapi.settings import PLUGIN_COMMAND_TIMEOUT
+from networkapi.settings import SSH_POOL_IDLE_TIMEOUT
+from networkapi.settings import SSH_POOL_MAX_SESSIONS
 from networkapi.settings import TFTP_SERVER_ADDR
 from networkapi.util.decorators import mock_return
 
 
 log = logging.getLogger(__name__)
 
+ssh_pool = SSHPool(SSH_POOL_MAX_SESSIONS, SSH_POOL_IDLE_TIMEOUT)
+
+
+def get_ssh_pool_metrics():
+    """Returns connect latency and reuse ratio of SSH connections."""
+
+    return ssh_pool.metrics.snapshot()
+
 
 class BasePlugin(object):
 
@@ -51,6 +61,11 @@ class BasePlugin(object):
     equipment_access = None
     channel = None
     remote_conn = None
+    session = None
+    # Seconds to wait for output of a command, 0 waits forever.
+    command_timeout = PLUGIN_COMMAND_TIMEOUT
+    # List where output of the equipment is appended, when set.
+    transcript = None
     tftpserver = TFTP_SERVER_ADDR
     management_vrf = ''
 
@@ -77,6 +92,9 @@ class BasePlugin(object):
         """Connects to equipment via ssh using paramiko.SSHClient  and
             sets channel variable with invoked shell object.
 
+            Connections come from ssh_pool, so operations in sequence in
+            the same equipment reuse the connection.
+
         Raises:
             IOError: if cannot connect to host
             Exception: for other unhandled exceptions
@@ -92,29 +110,13 @@ class BasePlugin(object):
                 raise exceptions.InvalidEquipmentAccessException()
 
         device = self.equipment_access.fqdn
-        username = self.equipment_access.user
-        password = self.equipment_access.password
-
-        self.remote_conn = paramiko.SSHClient()
-        self.remote_conn.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
         try:
-            retries = 0
-            connected = 0
-            while(not connected and retries < self.connect_max_retries):
-                try:
-                    self.remote_conn.connect(
-                        device, port=self.connect_port, username=username, password=password)
-                    self.channel = self.remote_conn.invoke_shell()
-                    connected = 1
-                except Exception, e:
-                    retries += 1
-                    # not capable of connecting after max retries
-                    if retries is self.connect_max_retries:
-                        raise Exception(e)
-                    log.error('Try %s/%s - Error connecting to host %s: %s' %
-                              (retries, self.connect_max_retries, device, e))
-                    sleep(random.randint(1, 15))
+            self.session = ssh_pool.borrow(
+                self.equipment_access, self.connect_port,
+                self.connect_max_retries)
+            self.remote_conn = self.session.client
+            self.channel = self.session.channel
 
         except IOError, e:
             log.error('Could not connect to host %s: %s' % (device, e))
@@ -130,7 +132,13 @@ class BasePlugin(object):
 
     @mock_return('')
     def close(self):
-        self.channel.close()
+        """Closes channel, giving the connection back to the pool."""
+
+        if self.session is not None:
+            self.session.release()
+            self.session = None
+        else:
+            self.channel.close()
 
     def ensure_privilege_level(self, privilege_level=None):
         """Ensure connection has the right privileges expected."""
@@ -177,7 +185,24 @@ class BasePlugin(object):
 
         raise NotImplementedError()
 
-    def waitString(self, wait_str_ok_regex='', wait_str_invalid_regex=None, wait_str_failed_regex=None):
+    def read_output(self, timeout=None):
+        """Returns output available in channel, waiting for some until
+        timeout (command_timeout by default).
+        """
+
+        if timeout is None:
+            timeout = self.command_timeout
+
+        return Expect(self.channel, self.transcript).read(
+            time.time() + timeout if timeout else None)
+
+    def waitString(self, wait_str_ok_regex='', wait_str_invalid_regex=None,
+                   wait_str_failed_regex=None, timeout=None):
+        """Waits output of channel matching wait_str_ok_regex, for at most
+        timeout seconds (command_timeout by default).
+
+        Returns: output read while waiting
+        """
 
         if wait_str_invalid_regex is None:
             wait_str_invalid_regex = self.INVALID_REGEX
@@ -185,19 +210,19 @@ class BasePlugin(object):
         if wait_str_failed_regex is None:
             wait_str_failed_regex = self.ERROR_REGEX
 
-        string_ok = 0
-        recv_string = ''
-        while not string_ok:
-            while not self.channel.recv_ready():
-                sleep(1)
-            recv_string = self.channel.recv(9999)
-            file_name_string = self.removeDisallowedChars(recv_string)
-            if re.search(wait_str_invalid_regex, recv_string, re.DOTALL):
-                raise exceptions.CommandErrorException(file_name_string)
-            elif re.search(wait_str_failed_regex, recv_string, re.DOTALL):
-                raise exceptions.InvalidCommandException(file_name_string)
-            elif re.search(wait_str_ok_regex, recv_string, re.DOTALL):
-                string_ok = 1
+        if timeout is None:
+            timeout = self.command_timeout
+
+        index, recv_string = Expect(self.channel, self.transcript).expect(
+            [wait_str_invalid_regex, wait_str_failed_regex, wait_str_ok_regex],
+            timeout)
+
+        if index == 0:
+            raise exceptions.CommandErrorException(
+                self.removeDisallowedChars(recv_string))
+        elif index == 1:
+            raise exceptions.InvalidCommandException(
+                self.removeDisallowedChars(recv_string))
 
         return recv_string
 
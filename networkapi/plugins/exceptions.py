@@ -27,6 +27,11 @@ class CommandErrorException(APIException):
                       'Equipment returned error status. <<%s>>' % (msg)
 
 
+class CommandTimeoutException(APIException):
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    default_detail = 'Timeout waiting for output of command on equipment.'
+
+
 class ConnectionException(APIException):
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     default_detail = 'Failed trying to connect to equipment.'
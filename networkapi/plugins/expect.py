@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import re
+import select
+import time
+
+from . import exceptions
+
+log = logging.getLogger(__name__)
+
+__all__ = ('Expect', 'compile_regex')
+
+RECV_SIZE = 9999
+# Output kept while waiting for a pattern, older output is dropped.
+MAX_BUFFER = 65536
+# Output already searched that is searched again with new output, so
+# patterns split between reads are found.
+LOOKBACK = 1024
+
+_compiled = dict()
+
+
+def compile_regex(pattern):
+    """Returns pattern compiled with re.DOTALL, compiling it once."""
+
+    try:
+        return _compiled[pattern]
+    except KeyError:
+        regex = _compiled[pattern] = re.compile(pattern, re.DOTALL)
+        return regex
+
+
+class Expect(object):
+
+    """Reads output of a shell channel until it matches a pattern.
+
+    Reads block in select until the channel has data or the deadline of
+    the command expires, instead of polling. Output is kept in a buffer
+    while waiting, so patterns that arrive split in many reads are found.
+
+    transcript: list where every output read is appended, when given.
+    """
+
+    def __init__(self, channel, transcript=None, max_buffer=MAX_BUFFER):
+        self.channel = channel
+        self.transcript = transcript
+        self.max_buffer = max_buffer
+
+    def read(self, deadline=None):
+        """Returns output available, waiting until deadline (time.time()
+        based) for some.
+
+        Raises:
+            CommandTimeoutException: if no output arrives until deadline
+            ConnectionException: if channel is closed by equipment
+        """
+
+        if not self.channel.recv_ready():
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    raise exceptions.CommandTimeoutException()
+
+            readable, writable, failed = select.select(
+                [self.channel], [], [], timeout)
+            if not readable:
+                raise exceptions.CommandTimeoutException()
+
+        data = self.channel.recv(RECV_SIZE)
+        if not data:
+            log.error('Channel closed by equipment while waiting output.')
+            raise exceptions.ConnectionException()
+
+        if self.transcript is not None:
+            self.transcript.append(data)
+        return data
+
+    def expect(self, patterns, timeout=None):
+        """Waits output matching one of patterns.
+
+        :param patterns: list of regexes (strings or compiled). When many
+                         match, the first of the list is chosen.
+        :param timeout: seconds to wait for the pattern.
+
+        Returns: (index of pattern matched, output read)
+        """
+
+        regexes = [compile_regex(pattern) if isinstance(pattern, basestring)
+                   else pattern for pattern in patterns]
+        deadline = time.time() + timeout if timeout else None
+
+        output = ''
+        searched = 0
+        while True:
+            output += self.read(deadline)
+
+            if len(output) > self.max_buffer:
+                dropped = len(output) - self.max_buffer
+                output = output[dropped:]
+                searched = max(0, searched - dropped)
+
+            start = max(0, searched - LOOKBACK)
+            for index, regex in enumerate(regexes):
+                if regex.search(output, start):
+                    return index, output
+
+            searched = len(output)
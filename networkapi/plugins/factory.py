@@ -15,11 +15,143 @@
 # limitations under the License.
 import logging
 import re
+import threading
+from collections import OrderedDict
+from importlib import import_module
 
-from networkapi.plugins.SDN.ODL.Generic import ODLPlugin
+from networkapi.equipamento.models import Equipamento
 
 log = logging.getLogger(__name__)
 
+# Plugins by pattern of model or brand of equipment, matched uppercase.
+# Patterns of model are tried before patterns of brand, each in order.
+# Plugins are imported when an equipment first resolves to them.
+# TODO create a table in networkapi to specify wich plugin to load for
+# each equipment configuration
+PLUGINS = (
+    ('modelo', 'NEXUS', 'networkapi.plugins.Cisco.NXOS.plugin.NXOS'),
+    ('modelo', 'WS-|C65', 'networkapi.plugins.Cisco.IOS.plugin.IOS'),
+    ('modelo', 'ACE30', 'networkapi.plugins.Cisco.ACE.plugin.ACE'),
+    ('marca', 'HUAWEI', 'networkapi.plugins.Huawei.Generic.Generic'),
+    ('marca', 'F5', 'networkapi.plugins.F5.Generic.Generic'),
+    ('marca', 'BROCADE|FOUNDRY', 'networkapi.plugins.Brocade.Generic.Generic'),
+    ('marca', 'DELL', 'networkapi.plugins.Dell.FTOS.plugin.FTOS'),
+    ('marca', 'OPENDAYLIGHT', 'networkapi.plugins.SDN.ODL.Generic.ODLPlugin'),
+    ('marca', 'FUSIS', 'networkapi.plugins.SDN.FUSIS.Generic.Generic'),
+)
+
+# Versions of SDN controllers by name of model, BERYLLIUM when none matches
+SDN_VERSIONS = ('BORON', 'CARBON', 'NITROGEN')
+
+# (model, brand) pairs resolved kept by process
+MEMO_SIZE = 256
+
+
+class PluginRegistry(object):
+
+    """Plugin classes by patterns of model and brand of equipments.
+
+    Resolutions are memoized by (model, brand), until a plugin is
+    registered.
+    """
+
+    FIELDS = ('modelo', 'marca')
+
+    def __init__(self, plugins=(), memo_size=MEMO_SIZE):
+        self.memo_size = memo_size
+
+        self._lock = threading.Lock()
+        self._entries = dict((field, list()) for field in self.FIELDS)
+        self._memo = OrderedDict()
+
+        for field, pattern, plugin in plugins:
+            self.add(field, pattern, plugin)
+
+    def add(self, field, pattern, plugin):
+        """Registers plugin for equipments with field matching pattern.
+
+        Args:
+                field: 'modelo' or 'marca'
+                pattern: regular expression searched in uppercase field
+                plugin: plugin class or its dotted path
+        """
+
+        if field not in self._entries:
+            raise ValueError('Invalid field of equipment: %s' % field)
+
+        with self._lock:
+            self._entries[field].append(
+                [re.compile(pattern, re.DOTALL), plugin])
+            self._memo.clear()
+
+    def resolve(self, modelo=None, marca=None):
+        """Returns plugin class of equipment of model and brand.
+
+        Raises:
+                NotImplementedError: if no plugin matches
+        """
+
+        key = (modelo, marca)
+        with self._lock:
+            found = key in self._memo
+            if found:
+                plugin = self._memo.pop(key)
+                self._memo[key] = plugin
+
+        if not found:
+            # Out of lock, as imported plugins may register themselves
+            plugin = self._match(modelo=modelo, marca=marca)
+            with self._lock:
+                self._memo[key] = plugin
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        if plugin is None:
+            raise NotImplementedError('plugin not implemented')
+        return plugin
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def _match(self, **values):
+        for field in self.FIELDS:
+            value = values.get(field)
+            if value is None:
+                continue
+            value = value.upper()
+            for entry in self._entries[field]:
+                if entry[0].search(value):
+                    if isinstance(entry[1], basestring):
+                        entry[1] = _import_class(entry[1])
+                    return entry[1]
+        return None
+
+
+def _import_class(path):
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(import_module(module_name), class_name)
+
+
+registry = PluginRegistry(PLUGINS)
+
+
+def register(modelo=None, marca=None):
+    """Class decorator that registers plugin for equipments with model or
+    brand matching patterns, after plugins registered before.
+
+    Module of plugin must be imported for it to be registered.
+    """
+
+    def decorator(plugin):
+        if modelo is not None:
+            registry.add('modelo', modelo, plugin)
+        if marca is not None:
+            registry.add('marca', marca, plugin)
+        return plugin
+
+    return decorator
+
 
 class PluginFactory(object):
 
@@ -27,7 +159,7 @@ class PluginFactory(object):
     def plugin_exists(cls, **kwargs):
 
         try:
-            cls.get_plugin(kwargs)
+            cls.get_plugin(**kwargs)
             return True
         except NotImplementedError:
             return False
@@ -35,49 +167,8 @@ class PluginFactory(object):
     @classmethod
     def get_plugin(cls, **kwargs):
 
-        if 'modelo' in kwargs:
-            modelo = kwargs.get('modelo')
-
-            # TODO create a table in networkapi to specify wich plugin to load for
-            # each equipment configuration
-            if re.search('NEXUS', modelo.upper(), re.DOTALL):
-                # if 'bgp' in kwargs:
-                #     from .BGP.NXAPI.Generic import NxApiPlugin
-                #     return NxApiPlugin
-                # else:
-                #     from .Cisco.NXOS.plugin import NXOS
-                #     return NXOS
-                from .Cisco.NXOS.plugin import NXOS
-                return NXOS
-            if re.search('WS-|C65', modelo.upper(), re.DOTALL):
-                from .Cisco.IOS.plugin import IOS
-                return IOS
-            if re.search('ACE30', modelo.upper(), re.DOTALL):
-                from .Cisco.ACE.plugin import ACE
-                return ACE
-
-        if 'marca' in kwargs:
-            marca = kwargs.get('marca')
-            if re.search('HUAWEI', marca.upper(), re.DOTALL):
-                from .Huawei import Generic
-                return Generic
-            if re.search('F5', marca.upper(), re.DOTALL):
-                from .F5.Generic import Generic
-                return Generic
-            if re.search('BROCADE', marca.upper(), re.DOTALL) or re.search('FOUNDRY', marca.upper(), re.DOTALL):
-                from .Brocade.Generic import Generic
-                return Generic
-            if re.search('DELL', marca.upper(), re.DOTALL):
-                from .Dell.FTOS.plugin import FTOS
-                return FTOS
-            if re.search('OPENDAYLIGHT', marca.upper(), re.DOTALL):
-                # from .SDN.ODL.Generic import ODLPlugin
-                return ODLPlugin
-            if re.search('FUSIS', marca.upper(), re.DOTALL):
-                from .SDN.FUSIS.Generic import Generic
-                return Generic
-
-        raise NotImplementedError('plugin not implemented')
+        return registry.resolve(modelo=kwargs.get('modelo'),
+                                marca=kwargs.get('marca'))
 
     @classmethod
     def factory(cls, equipment, **kwargs):
@@ -86,20 +177,32 @@ class PluginFactory(object):
         modelo = equipment.modelo.nome
         plugin_name = cls.get_plugin(modelo=modelo, marca=marca, **kwargs)
 
-        if type(plugin_name)==type(ODLPlugin):
-            version='BERYLLIUM'
-            if modelo.upper().find("BORON")>-1:
-                version="BORON"
-            if modelo.upper().find("CARBON")>-1:
-                version = "CARBON"
-            if modelo.upper().find("NITROGEN")>-1:
-                version = "NITROGEN"
-
-            env_id = kwargs.get("env_id")
-            return plugin_name(
-                equipment=equipment,
-                environment=env_id,
-                version=version
-            )
-
-        return plugin_name(equipment=equipment)
+        version = 'BERYLLIUM'
+        for sdn_version in SDN_VERSIONS:
+            if modelo.upper().find(sdn_version) > -1:
+                version = sdn_version
+
+        env_id = kwargs.get('env_id')
+        return plugin_name(
+            equipment=equipment,
+            environment=env_id,
+            version=version
+        )
+
+    @classmethod
+    def factory_many(cls, equipments, **kwargs):
+        """Returns plugins of equipments, in order, loading models and
+        brands of all equipments in one query.
+        """
+
+        equipments = list(equipments)
+        if not equipments:
+            return []
+
+        loaded = Equipamento.objects.select_related('modelo__marca').in_bulk(
+            set(equipment.id for equipment in equipments))
+        for equipment in equipments:
+            if equipment.id in loaded:
+                equipment.modelo = loaded[equipment.id].modelo
+
+        return [cls.factory(equipment, **kwargs) for equipment in equipments]
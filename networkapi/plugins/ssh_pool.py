@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import os
+import random
+import threading
+import time
+
+import paramiko
+
+from . import exceptions
+
+log = logging.getLogger(__name__)
+
+__all__ = ('SSHPool', 'SSHSession', 'SSHPoolMetrics')
+
+# Backoff in seconds between attempts to connect: random up to
+# BACKOFF_BASE * 2 ** attempt, at most BACKOFF_MAX.
+BACKOFF_BASE = 1
+BACKOFF_MAX = 15
+
+
+def new_client():
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return client
+
+
+class SSHPoolMetrics(object):
+
+    """Connections opened and reused, aggregated for all equipments."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {
+            'borrowed': 0,
+            'reused': 0,
+            'connected': 0,
+            'connect_failures': 0,
+            'connect_time': 0.0,
+            'max_connect_time': 0.0,
+            'evicted': 0,
+        }
+
+    def add(self, name, value=1):
+        with self._lock:
+            self._metrics[name] += value
+
+    def connected(self, seconds):
+        with self._lock:
+            self._metrics['connected'] += 1
+            self._metrics['connect_time'] += seconds
+            self._metrics['max_connect_time'] = max(
+                self._metrics['max_connect_time'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+
+        borrowed = metrics['borrowed']
+        connected = metrics['connected']
+        metrics['reuse_ratio'] = \
+            float(metrics['reused']) / borrowed if borrowed else 0.0
+        metrics['avg_connect_time'] = \
+            metrics['connect_time'] / connected if connected else 0.0
+        return metrics
+
+
+class SSHSession(object):
+
+    """Shell channel borrowed from the pool, in a pooled connection."""
+
+    def __init__(self, pool, key, client, channel):
+        self.pool = pool
+        self.key = key
+        self.client = client
+        self.channel = channel
+
+    def release(self):
+        if self.client is not None:
+            self.pool.release(self)
+
+    def __del__(self):
+        # Session of a plugin that failed before closing
+        self.release()
+
+
+class _Device(object):
+
+    def __init__(self):
+        self.idle = list()
+        self.in_use = 0
+
+
+class SSHPool(object):
+
+    """Per-process pool of SSH connections, by equipment access.
+
+    Connections are kept open between operations and a new shell channel
+    is opened in them for each session, so state of a shell (privilege
+    level, configuration mode) is never shared. At most max_sessions
+    connections are open to each equipment; connections idle for
+    idle_timeout seconds are closed. With idle_timeout 0, connections are
+    closed as soon as sessions are released.
+    """
+
+    def __init__(self, max_sessions=2, idle_timeout=60, wait_timeout=300,
+                 client_factory=new_client):
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.client_factory = client_factory
+        self.metrics = SSHPoolMetrics()
+
+        self._condition = threading.Condition()
+        self._devices = dict()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def key(equipment_access, port):
+        return (equipment_access.id, equipment_access.fqdn,
+                equipment_access.user, port)
+
+    def borrow(self, equipment_access, port=22, max_retries=3):
+        """Returns SSHSession with a shell channel in equipment.
+
+        Raises:
+            IOError: if cannot connect to host
+            Exception: for other unhandled exceptions
+        """
+
+        key = self.key(equipment_access, port)
+        self.metrics.add('borrowed')
+
+        client = self._take(key)
+        while client is not None:
+            channel = self._invoke_shell(client)
+            if channel is not None:
+                self.metrics.add('reused')
+                return SSHSession(self, key, client, channel)
+
+            # Connection closed by equipment while idle
+            self._discard(key, client)
+            client = self._take(key)
+
+        try:
+            client = self._connect(equipment_access, port, max_retries)
+            return SSHSession(self, key, client, client.invoke_shell())
+        except:
+            self._discard(key, client)
+            raise
+
+    def release(self, session):
+        """Closes channel of session and gives its connection back."""
+
+        client, session.client = session.client, None
+        try:
+            session.channel.close()
+        except Exception:
+            pass
+
+        with self._condition:
+            self._check_pid()
+            device = self._devices.get(session.key)
+            if device is None:
+                # Session borrowed before fork, its connection belongs to
+                # parent process.
+                return
+
+            device.in_use -= 1
+            to_close = self._evict()
+            if self.idle_timeout and self._is_active(client):
+                device.idle.append((client, time.time()))
+            else:
+                to_close.append(client)
+            self._condition.notify_all()
+
+        for idle_client in to_close:
+            self._close(idle_client)
+
+    def close_all(self):
+        """Closes idle connections."""
+
+        with self._condition:
+            clients = [client for device in self._devices.values()
+                       for client, last_used in device.idle]
+            for device in self._devices.values():
+                device.idle = list()
+
+        for client in clients:
+            self._close(client)
+
+    def _take(self, key):
+        """Reserves a session of device, returning an idle connection to
+        use, or None when a new one must be opened.
+        """
+
+        deadline = time.time() + self.wait_timeout
+
+        with self._condition:
+            self._check_pid()
+            to_close = self._evict()
+
+        for idle_client in to_close:
+            self._close(idle_client)
+
+        with self._condition:
+            device = self._devices.setdefault(key, _Device())
+
+            while device.in_use >= self.max_sessions:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    log.error('Timeout waiting session of host %s.', key[1])
+                    raise exceptions.ConnectionException(key[1])
+                self._condition.wait(remaining)
+                self._check_pid()
+                device = self._devices.setdefault(key, _Device())
+
+            device.in_use += 1
+            return device.idle.pop()[0] if device.idle else None
+
+    def _discard(self, key, client):
+        with self._condition:
+            device = self._devices.get(key)
+            if device is not None:
+                device.in_use -= 1
+            self._condition.notify_all()
+
+        if client is not None:
+            self._close(client)
+
+    def _connect(self, equipment_access, port, max_retries):
+        device = equipment_access.fqdn
+
+        for attempt in xrange(max_retries):
+            client = self.client_factory()
+            start = time.time()
+            try:
+                client.connect(device, port=port,
+                               username=equipment_access.user,
+                               password=equipment_access.password)
+                self.metrics.connected(time.time() - start)
+                return client
+            except Exception, e:
+                self.metrics.add('connect_failures')
+                self._close(client)
+                # not capable of connecting after max retries
+                if attempt + 1 >= max_retries:
+                    raise
+                log.error('Try %s/%s - Error connecting to host %s: %s' %
+                          (attempt + 1, max_retries, device, e))
+                time.sleep(random.uniform(
+                    0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+    def _invoke_shell(self, client):
+        if not self._is_active(client):
+            return None
+        try:
+            return client.invoke_shell()
+        except Exception, e:
+            log.debug('Pooled connection is not usable: %s', e)
+            return None
+
+    def _evict(self):
+        """Removes connections idle for too long, returning them to be
+        closed out of the lock.
+        """
+
+        limit = time.time() - self.idle_timeout
+        evicted = list()
+        for device in self._devices.values():
+            idle = [(client, last_used) for client, last_used in device.idle
+                    if last_used > limit]
+            evicted.extend(client for client, last_used in device.idle
+                           if last_used <= limit)
+            device.idle = idle
+
+        if evicted:
+            self.metrics.add('evicted', len(evicted))
+        return evicted
+
+    def _check_pid(self):
+        # Connections of parent process can not be shared with a forked
+        # worker, it opens its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._devices = dict()
+
+    @staticmethod
+    def _is_active(client):
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    @staticmethod
+    def _close(client):
+        try:
+            client.close()
+        except Exception:
+            pass
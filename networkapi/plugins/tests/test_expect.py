@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import select
+import socket
+import threading
+import time
+import unittest
+
+from networkapi.plugins import exceptions
+from networkapi.plugins.base import BasePlugin
+from networkapi.plugins.expect import Expect
+
+
+class FakeChannel(object):
+
+    """Client end of a FakeShell, with the subset of paramiko.Channel API
+    used by plugins."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv_ready(self):
+        return bool(select.select([self.sock], [], [], 0)[0])
+
+    def recv(self, size):
+        return self.sock.recv(size)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class FakeShell(threading.Thread):
+
+    """Stand-in of an equipment shell: answers each command line sent with
+    the chunks of its reply, waiting delay seconds between chunks.
+    """
+
+    def __init__(self, replies, banner=(), delay=0.01):
+        super(FakeShell, self).__init__()
+        self.daemon = True
+        self.replies = replies
+        self.banner = banner
+        self.delay = delay
+        self.sock, client = socket.socketpair()
+        self.channel = FakeChannel(client)
+        self.start()
+
+    def write(self, chunks):
+        for chunk in chunks:
+            time.sleep(self.delay)
+            self.sock.sendall(chunk)
+
+    def run(self):
+        self.write(self.banner)
+        data = ''
+        while True:
+            received = self.sock.recv(1024)
+            if not received:
+                return
+            data += received
+            while '\n' in data:
+                line, data = data.split('\n', 1)
+                self.write(self.replies.get(line.strip(), ()))
+
+
+NXOS_REPLIES = {
+    'show privilege': ('show privilege\r\nCurrent privilege le',
+                       'vel: -1\r\nswitch# '),
+    'copy tftp://10.0.0.1/file running-config vrf management': (
+        'Trying to connect to tftp server......\r\n',
+        'Copy complete.\r\n', 'switch# '),
+    'interface Vlan4096': ('                     ^\r\n',
+                           '% Invalid command at \'^\' marker.\r\n',
+                           'switch(config)# '),
+}
+
+IOS_REPLIES = {
+    'show privilege': ('Current privilege level is 1\r\nrouter>',),
+    'enable': ('Pass', 'word: ',),
+    'secret': ('\r\nrouter#',),
+}
+
+
+class Plugin(BasePlugin):
+
+    def __init__(self, channel, **kwargs):
+        super(Plugin, self).__init__(**kwargs)
+        self.channel = channel
+
+
+class ExpectTestCase(unittest.TestCase):
+
+    def test_pattern_split_between_reads(self):
+        shell = FakeShell({}, banner=('swi', 'tch', '# '))
+
+        index, output = Expect(shell.channel).expect(['switch# '], 5)
+
+        self.assertEquals(0, index)
+        self.assertEquals('switch# ', output)
+
+    def test_first_pattern_of_list_wins(self):
+        shell = FakeShell({}, banner=('% Invalid command\r\nswitch# ',))
+
+        index, output = Expect(shell.channel).expect(
+            ['[Ii]nvalid', '#'], 5)
+
+        self.assertEquals(0, index)
+
+    def test_timeout(self):
+        shell = FakeShell({}, banner=('switch',))
+
+        start = time.time()
+        with self.assertRaises(exceptions.CommandTimeoutException):
+            Expect(shell.channel).expect(['#'], 0.1)
+
+        self.assertLess(time.time() - start, 1)
+
+    def test_transcript(self):
+        shell = FakeShell({}, banner=('login: ok\r\n', 'switch# '))
+        transcript = list()
+
+        Expect(shell.channel, transcript).expect(['switch# '], 5)
+
+        self.assertEquals('login: ok\r\nswitch# ', ''.join(transcript))
+
+    def test_closed_channel(self):
+        shell = FakeShell({})
+        shell.sock.shutdown(socket.SHUT_RDWR)
+
+        with self.assertRaises(exceptions.ConnectionException):
+            Expect(shell.channel).expect(['#'], 5)
+
+
+class WaitStringTestCase(unittest.TestCase):
+
+    def test_nxos_privilege(self):
+        plugin = Plugin(FakeShell(NXOS_REPLIES).channel)
+
+        plugin.channel.send('show privilege\n')
+        recv = plugin.waitString('Current privilege level: -?[0-9]+')
+
+        self.assertIn('Current privilege level: -1', recv)
+
+    def test_nxos_copy_waits_without_polling(self):
+        plugin = Plugin(FakeShell(NXOS_REPLIES).channel)
+
+        start = time.time()
+        plugin.channel.send(
+            'copy tftp://10.0.0.1/file running-config vrf management\n')
+        recv = plugin.waitString('Copy complete.')
+
+        self.assertIn('Copy complete.', recv)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_nxos_invalid_command(self):
+        plugin = Plugin(FakeShell(NXOS_REPLIES).channel)
+
+        plugin.channel.send('interface Vlan4096\n')
+        with self.assertRaises(exceptions.CommandErrorException):
+            plugin.waitString('#')
+
+    def test_ios_enable(self):
+        plugin = Plugin(FakeShell(IOS_REPLIES).channel)
+
+        plugin.channel.send('show privilege\n')
+        plugin.waitString('Current privilege level is')
+        plugin.channel.send('enable\n')
+        plugin.waitString('Password:')
+        plugin.channel.send('secret\n')
+        recv = plugin.waitString('#')
+
+        self.assertIn('router#', recv)
+
+    def test_command_timeout(self):
+        plugin = Plugin(FakeShell(IOS_REPLIES).channel)
+        plugin.command_timeout = 0.1
+
+        plugin.channel.send('show running-config\n')
+        with self.assertRaises(exceptions.CommandTimeoutException):
+            plugin.waitString('#')
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from mock import patch
+
+from networkapi.plugins.F5 import channels
+from networkapi.plugins.F5.channels import ChannelCache
+
+
+class FakeSession(object):
+
+    def __init__(self, bigip):
+        self.bigip = bigip
+
+    def get_session_timeout(self):
+        self.bigip.calls.append('get_session_timeout')
+        return 60
+
+    def set_session_timeout(self, timeout):
+        self.bigip.calls.append('set_session_timeout')
+
+
+class FakeSystemInfo(object):
+
+    def __init__(self, bigip):
+        self.bigip = bigip
+
+    def get_version(self):
+        self.bigip.calls.append('get_version')
+        return 'BIG-IP_v11.6.0'
+
+
+class FakeSystem(object):
+
+    def __init__(self, bigip):
+        self.Session = FakeSession(bigip)
+        self.SystemInfo = FakeSystemInfo(bigip)
+
+
+class FakeBIGIP(object):
+
+    def __init__(self, calls, too_many=0, hostname=None, username=None,
+                 password=None):
+        self.calls = calls
+        self.too_many = too_many
+        self.System = FakeSystem(self)
+
+    def with_session_id(self):
+        self.calls.append('with_session_id')
+        if self.too_many:
+            self.too_many -= 1
+            raise Exception('There are too many existing user sessions.')
+        return self
+
+
+class ChannelCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = list()
+        self.too_many = 0
+
+        def factory(**kwargs):
+            self.calls.append('BIGIP')
+            return FakeBIGIP(self.calls, self.too_many, **kwargs)
+
+        self.cache = ChannelCache(max_sessions=1, probe_ttl=300,
+                                  wait_timeout=0, channel_factory=factory)
+        patch('networkapi.plugins.F5.channels.get_variable',
+              return_value='60').start()
+        patch('networkapi.plugins.F5.channels.time.sleep').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_channel_is_reused(self):
+        pooled = self.cache.borrow('lb1', 'user', 'password')
+        self.cache.release(pooled)
+        calls = len(self.calls)
+
+        again = self.cache.borrow('lb1', 'user', 'password')
+
+        self.assertIs(pooled, again)
+        self.assertEquals(calls, len(self.calls))
+        self.assertEquals('BIG-IP_v11.6.0', again.version)
+
+    def test_probes_are_cached(self):
+        pooled = self.cache.borrow('lb1', 'user', 'password', session=False)
+        self.cache.borrow('lb1', 'user', 'password', session=False)
+
+        self.assertEquals(1, self.calls.count('get_version'))
+        self.assertEquals(1, self.calls.count('get_session_timeout'))
+        self.assertEquals(2, self.calls.count('BIGIP'))
+        self.assertIsNotNone(pooled.version)
+
+    def test_sessions_are_bounded(self):
+        self.cache.borrow('lb1', 'user', 'password')
+
+        with self.assertRaises(Exception):
+            self.cache.borrow('lb1', 'user', 'password')
+
+        # Channels without session and of other devices are not bounded
+        self.cache.borrow('lb1', 'user', 'password', session=False)
+        self.cache.borrow('lb2', 'user', 'password')
+
+    def test_channel_not_reusable_is_dropped(self):
+        pooled = self.cache.borrow('lb1', 'user', 'password')
+        self.cache.release(pooled, reusable=False)
+
+        again = self.cache.borrow('lb1', 'user', 'password')
+
+        self.assertIsNot(pooled, again)
+
+    def test_too_many_sessions_is_retried(self):
+        self.too_many = 2
+
+        self.cache.borrow('lb1', 'user', 'password')
+
+        self.assertEquals(3, self.calls.count('with_session_id'))
+
+    def test_too_many_sessions_gives_up(self):
+        self.too_many = channels.SESSION_ATTEMPTS
+
+        with self.assertRaises(Exception):
+            self.cache.borrow('lb1', 'user', 'password')
+
+        # Reserved session was given back
+        self.too_many = 0
+        self.cache.borrow('lb1', 'user', 'password')
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+from collections import OrderedDict
+
+from mock import Mock
+from mock import patch
+
+from networkapi.plugins import factory
+from networkapi.plugins.factory import PluginFactory
+from networkapi.plugins.factory import PluginRegistry
+
+
+class FakePlugin(object):
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+class OtherPlugin(FakePlugin):
+    pass
+
+
+def equipment(equipment_id, modelo='NEXUS 9000', marca='Cisco'):
+    eqpt = Mock(id=equipment_id)
+    eqpt.modelo.nome = modelo
+    eqpt.modelo.marca.nome = marca
+    return eqpt
+
+
+class PluginRegistryTestCase(unittest.TestCase):
+
+    def test_model_is_matched_before_brand(self):
+        registry = PluginRegistry([('marca', 'CISCO', OtherPlugin),
+                                   ('modelo', 'NEXUS', FakePlugin)])
+
+        self.assertIs(FakePlugin, registry.resolve('Nexus 9000', 'Cisco'))
+        self.assertIs(OtherPlugin, registry.resolve('C2960', 'Cisco'))
+
+    def test_first_pattern_registered_is_matched(self):
+        registry = PluginRegistry([('marca', 'BROCADE|FOUNDRY', FakePlugin),
+                                   ('marca', 'FOUNDRY', OtherPlugin)])
+
+        self.assertIs(FakePlugin, registry.resolve(None, 'Foundry'))
+
+    def test_unknown_equipment_raises_not_implemented(self):
+        registry = PluginRegistry([('marca', 'F5', FakePlugin)])
+
+        self.assertRaises(NotImplementedError,
+                          registry.resolve, 'BIG-IP', 'Citrix')
+
+    def test_plugin_is_imported_from_dotted_path(self):
+        registry = PluginRegistry(
+            [('marca', 'ODL', 'collections.OrderedDict')])
+
+        self.assertIs(OrderedDict, registry.resolve(None, 'odl'))
+
+    def test_resolutions_are_memoized(self):
+        registry = PluginRegistry([('marca', 'F5', FakePlugin)], memo_size=2)
+
+        with patch.object(registry, '_match',
+                          wraps=registry._match) as match:
+            for marca in ('F5', 'F5', 'Dell', 'F5', 'Cisco', 'F5', 'Dell'):
+                try:
+                    registry.resolve(None, marca)
+                except NotImplementedError:
+                    pass
+
+        # least recently used pair is discarded
+        self.assertEqual(['F5', 'Dell', 'Cisco', 'Dell'],
+                         [c[1]['marca'] for c in match.call_args_list])
+
+    def test_registered_plugin_discards_memo(self):
+        registry = PluginRegistry()
+        self.assertRaises(NotImplementedError,
+                          registry.resolve, None, 'FUSIS')
+
+        registry.add('marca', 'FUSIS', FakePlugin)
+
+        self.assertIs(FakePlugin, registry.resolve(None, 'Fusis'))
+
+    def test_invalid_field(self):
+        self.assertRaises(ValueError, PluginRegistry().add,
+                          'tipo', 'ROUTER', FakePlugin)
+
+
+class PluginFactoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        registry = PluginRegistry([('modelo', 'NEXUS', FakePlugin)])
+        patcher = patch.object(factory, 'registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_plugin_registers_itself(self):
+        @factory.register(marca='ARISTA')
+        class AristaPlugin(FakePlugin):
+            pass
+
+        self.assertIs(AristaPlugin,
+                      PluginFactory.get_plugin(modelo='7050', marca='Arista'))
+        self.assertTrue(PluginFactory.plugin_exists(marca='Arista'))
+        self.assertFalse(PluginFactory.plugin_exists(marca='Juniper'))
+
+    def test_factory_sets_version_of_model(self):
+        plugin = PluginFactory.factory(
+            equipment(1, modelo='NEXUS CARBON'), env_id=3)
+
+        self.assertEqual('CARBON', plugin.kwargs['version'])
+        self.assertEqual(3, plugin.kwargs['environment'])
+
+    def test_factory_many_loads_models_in_one_query(self):
+        equipments = [equipment(1), equipment(2), equipment(1)]
+        loaded = dict((i, equipment(i, modelo='NEXUS %s' % i))
+                      for i in (1, 2))
+
+        with patch.object(factory, 'Equipamento') as model:
+            model.objects.select_related.return_value.in_bulk.return_value = \
+                loaded
+            plugins = PluginFactory.factory_many(iter(equipments))
+
+        model.objects.select_related.assert_called_once_with(
+            'modelo__marca')
+        self.assertEqual([e.id for e in equipments],
+                         [p.kwargs['equipment'].id for p in plugins])
+        self.assertIs(loaded[2].modelo, equipments[1].modelo)
+
+    def test_factory_many_without_equipments(self):
+        with patch.object(factory, 'Equipamento') as model:
+            self.assertEqual([], PluginFactory.factory_many([]))
+
+        self.assertFalse(model.objects.select_related.called)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+from django.core.cache import get_cache
+from mock import Mock
+from mock import patch
+from requests.exceptions import ConnectionError
+from requests.exceptions import HTTPError
+
+from networkapi.plugins.SDN import inventory
+from networkapi.plugins.SDN.inventory import SessionPool
+from networkapi.plugins.SDN.ODL.Generic import ODLPlugin
+
+
+class FakePlugin(object):
+
+    def __init__(self, equipment_id, nodes_ids=None, error=None):
+        self.equipment = Mock(id=equipment_id, nome='odl-%s' % equipment_id)
+        self.nodes_ids = nodes_ids or ['openflow:1', 'openflow:2']
+        self.error = error
+        self.discovered = 0
+        self.threads = set()
+
+    def _get_nodes_ids(self):
+        self.discovered += 1
+        self.threads.add(threading.current_thread().name)
+        if self.error:
+            raise self.error
+        return list(self.nodes_ids)
+
+
+class NodesInventoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        self.cache.clear()
+        patches = [patch.object(inventory, 'cache', self.cache),
+                   patch.object(inventory, 'SDN_INVENTORY_CACHE_TIME', 30)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_nodes_are_discovered_once_while_cached(self):
+        plugin = FakePlugin(1)
+
+        self.assertEqual(['openflow:1', 'openflow:2'],
+                         inventory.get_nodes_ids(plugin))
+        self.assertEqual(['openflow:1', 'openflow:2'],
+                         inventory.get_nodes_ids(plugin))
+        self.assertEqual(1, plugin.discovered)
+
+    def test_nodes_of_each_controller_are_cached_apart(self):
+        first = FakePlugin(1)
+        second = FakePlugin(2, ['openflow:3'])
+
+        inventory.get_nodes_ids(first)
+
+        self.assertEqual(['openflow:3'], inventory.get_nodes_ids(second))
+
+    def test_invalidated_nodes_are_discovered_again(self):
+        plugin = FakePlugin(1)
+        inventory.get_nodes_ids(plugin)
+
+        inventory.invalidate_nodes_ids(plugin.equipment)
+        inventory.get_nodes_ids(plugin)
+
+        self.assertEqual(2, plugin.discovered)
+
+    def test_nodes_are_not_cached_without_cache_time(self):
+        plugin = FakePlugin(1)
+
+        with patch.object(inventory, 'SDN_INVENTORY_CACHE_TIME', 0):
+            inventory.get_nodes_ids(plugin)
+            inventory.get_nodes_ids(plugin)
+
+        self.assertEqual(2, plugin.discovered)
+
+    def test_prefetch_discovers_every_controller(self):
+        plugins = [FakePlugin(1), FakePlugin(2),
+                   FakePlugin(3, error=IOError('refused'))]
+
+        inventory.prefetch(plugins + [Mock(spec=[])])
+
+        self.assertEqual([1, 1, 1], [p.discovered for p in plugins])
+        for plugin in plugins:
+            self.assertNotIn('MainThread', plugin.threads)
+
+        inventory.get_nodes_ids(plugins[0])
+        self.assertEqual(1, plugins[0].discovered)
+        # failures are discovered again when plugin needs nodes
+        self.assertRaises(IOError, inventory.get_nodes_ids, plugins[2])
+
+
+class ODLNodesInvalidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.odl = ODLPlugin.__new__(ODLPlugin)
+        self.odl.equipment = Mock(id=1, nome='odl-1')
+        self.odl.invalidate_nodes_ids = Mock()
+        self.odl.get_nodes_ids = Mock(return_value=['openflow:1'])
+
+    def test_nodes_are_invalidated_when_node_is_not_found(self):
+        self.odl._request = Mock(side_effect=HTTPError(
+            response=Mock(status_code=404)))
+
+        self.assertRaises(HTTPError, self.odl.get_flow, flow_id=1)
+        self.odl.invalidate_nodes_ids.assert_called_once_with()
+
+    def test_nodes_are_invalidated_when_controller_is_not_reachable(self):
+        self.odl._request = Mock(side_effect=ConnectionError())
+
+        self.assertRaises(ConnectionError, self.odl.get_flow, flow_id=1)
+        self.odl.invalidate_nodes_ids.assert_called_once_with()
+
+    def test_nodes_are_kept_on_other_errors(self):
+        self.odl._request = Mock(side_effect=HTTPError(
+            response=Mock(status_code=400)))
+
+        self.assertRaises(HTTPError, self.odl.get_flow, flow_id=1)
+        self.assertFalse(self.odl.invalidate_nodes_ids.called)
+
+    def test_flush_discovers_nodes_again(self):
+        self.odl._request = Mock()
+
+        self.odl.flush_flows()
+
+        self.odl.invalidate_nodes_ids.assert_called_once_with()
+        self.odl._request.assert_called_once_with(
+            method='delete', contentType='json',
+            path='/restconf/config/opendaylight-inventory:nodes/node/'
+                 'openflow:1/flow-node-inventory:table/0/')
+
+
+class SessionPoolTestCase(unittest.TestCase):
+
+    def test_session_is_reused_by_host(self):
+        pool = SessionPool()
+
+        session = pool.get('http://odl-1:8181')
+
+        self.assertIs(session, pool.get('http://odl-1:8181'))
+        self.assertIsNot(session, pool.get('http://odl-2:8181'))
+
+    def test_sessions_are_not_shared_after_fork(self):
+        pool = SessionPool()
+        session = pool.get('http://odl-1:8181')
+
+        with patch.object(inventory.os, 'getpid', return_value=-1):
+            self.assertIsNot(session, pool.get('http://odl-1:8181'))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from networkapi.plugins import ssh_pool
+from networkapi.plugins.ssh_pool import SSHPool
+
+
+class FakeAccess(object):
+
+    id = 1
+    fqdn = 'router.example.com'
+    user = 'user'
+    password = 'password'
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeChannel(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient(object):
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.transport = None
+        self.closed = False
+
+    def connect(self, host, port=22, username=None, password=None):
+        if self.failures:
+            self.failures.pop()
+            raise IOError('connection refused')
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def invoke_shell(self):
+        return FakeChannel()
+
+    def close(self):
+        self.closed = True
+        if self.transport:
+            self.transport.active = False
+
+
+class SSHPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = list()
+        self.failures = list()
+
+        def client_factory():
+            client = FakeClient(self.failures)
+            self.clients.append(client)
+            return client
+
+        self.pool = SSHPool(max_sessions=2, idle_timeout=60, wait_timeout=0,
+                            client_factory=client_factory)
+        self.backoff_max = ssh_pool.BACKOFF_MAX
+        ssh_pool.BACKOFF_MAX = 0
+
+    def tearDown(self):
+        ssh_pool.BACKOFF_MAX = self.backoff_max
+
+    def test_connection_is_reused(self):
+        session = self.pool.borrow(FakeAccess())
+        channel = session.channel
+        session.release()
+
+        session = self.pool.borrow(FakeAccess())
+
+        self.assertEquals(1, len(self.clients))
+        self.assertTrue(channel.closed)
+        self.assertIsNot(channel, session.channel)
+        metrics = self.pool.metrics.snapshot()
+        self.assertEquals(1, metrics['connected'])
+        self.assertEquals(0.5, metrics['reuse_ratio'])
+
+    def test_closed_connection_is_replaced(self):
+        self.pool.borrow(FakeAccess()).release()
+        self.clients[0].transport.active = False
+
+        self.pool.borrow(FakeAccess())
+
+        self.assertEquals(2, len(self.clients))
+        self.assertTrue(self.clients[0].closed)
+
+    def test_max_sessions(self):
+        sessions = [self.pool.borrow(FakeAccess()),
+                    self.pool.borrow(FakeAccess())]
+
+        with self.assertRaises(Exception):
+            self.pool.borrow(FakeAccess())
+
+        sessions.pop().release()
+        self.pool.borrow(FakeAccess())
+
+    def test_session_not_released_is_given_back(self):
+        sessions = [self.pool.borrow(FakeAccess()),
+                    self.pool.borrow(FakeAccess())]
+        del sessions
+
+        self.pool.borrow(FakeAccess())
+
+        self.assertEquals(2, len(self.clients))
+
+    def test_idle_connections_are_evicted(self):
+        self.pool.idle_timeout = -1
+        self.pool.borrow(FakeAccess()).release()
+        self.pool.borrow(FakeAccess())
+
+        self.assertEquals(2, len(self.clients))
+        self.assertTrue(self.clients[0].closed)
+
+    def test_connect_retries(self):
+        self.failures.extend([1, 1])
+
+        session = self.pool.borrow(FakeAccess(), max_retries=3)
+
+        self.assertIs(self.clients[2], session.client)
+        self.assertEquals(2, self.pool.metrics.snapshot()['connect_failures'])
+
+    def test_connect_fails_after_max_retries(self):
+        self.failures.extend([1, 1, 1])
+
+        with self.assertRaises(IOError):
+            self.pool.borrow(FakeAccess(), max_retries=3)
+
+        # Reserved session was given back
+        sessions = [self.pool.borrow(FakeAccess()),
+                    self.pool.borrow(FakeAccess())]
+        self.assertEquals(2, len(sessions))
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from itertools import izip_longest
+
+from kombu import Connection
+from kombu import Exchange
+from kombu import Producer
+from kombu import Queue
+
+from networkapi.settings import BROKER_CONFIRM_TIMEOUT
+from networkapi.settings import BROKER_CONNECT_TIMEOUT
+from networkapi.settings import BROKER_FLUSH_INTERVAL
+
+log = logging.getLogger(__name__)
+
+# AMQP methods Basic.Ack and Basic.Nack
+BASIC_ACK = (60, 80)
+BASIC_NACK = (60, 120)
+
+
+class PublishError(Exception):
+
+    """Messages were not confirmed by broker.
+
+    unconfirmed are the messages that may be published again and cause is
+    the error of connection, if any, or None when broker nacked them.
+    """
+
+    def __init__(self, message, unconfirmed=None, cause=None):
+        super(PublishError, self).__init__(message)
+        self.unconfirmed = unconfirmed or []
+        self.cause = cause
+
+
+class _BrokerChannel(object):
+
+    """Connection to a vhost with a channel in confirm mode.
+
+    Producers, and so declarations of exchanges and queues, are cached
+    while the connection is open.
+    """
+
+    def __init__(self, broker, timeout, confirm_timeout):
+        self.confirm_timeout = confirm_timeout
+        self.connection = Connection(broker, connect_timeout=timeout)
+        self.channel = self.connection.channel()
+        self.channel.confirm_select()
+        self.channel.events['basic_ack'].add(self._on_ack)
+        self.channel.events['basic_nack'].add(self._on_nack)
+
+        self.producers = dict()
+        self.delivery_tag = 0
+        self.pending = set()
+        self.acked = set()
+        self.nacked = set()
+
+    def producer(self, exchange_name, queue_type, queue_name, routing_key):
+        key = (exchange_name, queue_type, queue_name, routing_key)
+
+        if key not in self.producers:
+            exchange = Exchange(exchange_name, type=queue_type)
+            if queue_name:
+                queue = Queue(name=queue_name, channel=self.channel,
+                              exchange=exchange, routing_key=routing_key)
+                queue.declare()
+            self.producers[key] = Producer(exchange=exchange,
+                                           channel=self.channel,
+                                           routing_key=routing_key)
+
+        return self.producers[key]
+
+    def publish(self, messages):
+        """Publishes messages and waits for the broker to confirm them all,
+        for at most confirm_timeout seconds.
+
+        :param messages: list of (destination, body), where destination is
+                         (exchange_name, queue_type, queue_name, routing_key)
+        :raise PublishError: with the messages not acked by broker
+        """
+
+        self.acked = set()
+        self.nacked = set()
+        tags = list()
+
+        try:
+            for destination, body in messages:
+                self.producer(*destination).publish(body)
+                self.delivery_tag += 1
+                self.pending.add(self.delivery_tag)
+                tags.append(self.delivery_tag)
+
+            self._wait_confirms()
+            if not self.nacked:
+                return
+            cause = None
+            message = u'%s messages were nacked by broker.' % \
+                len(self.nacked)
+        except Exception, e:
+            cause = e
+            message = u'Failure to publish messages: %s' % e
+
+        # Messages not published have no tag
+        unconfirmed = [msg for tag, msg in izip_longest(tags, messages)
+                       if tag not in self.acked]
+        raise PublishError(message, unconfirmed, cause)
+
+    def _wait_confirms(self):
+        deadline = time.time() + self.confirm_timeout
+        while self.pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise socket.timeout(
+                    u'%s messages were not confirmed in %ss.' %
+                    (len(self.pending), self.confirm_timeout))
+            self.channel.wait(allowed_methods=[BASIC_ACK, BASIC_NACK],
+                              timeout=remaining)
+
+    def _confirmed(self, delivery_tag, multiple):
+        if multiple:
+            confirmed = set(tag for tag in self.pending
+                            if tag <= delivery_tag)
+        else:
+            confirmed = self.pending & set([delivery_tag])
+        self.pending -= confirmed
+        return confirmed
+
+    def _on_ack(self, delivery_tag, multiple):
+        self.acked |= self._confirmed(delivery_tag, multiple)
+
+    def _on_nack(self, delivery_tag, multiple, requeue=False):
+        self.nacked |= self._confirmed(delivery_tag, multiple)
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class Publisher(object):
+
+    """Process-wide publisher of messages to the broker.
+
+    Keeps one connection per vhost and publishes messages in batches,
+    waiting a single round of confirms for each batch. When flush_interval
+    is set, messages are buffered and published by a background thread.
+    """
+
+    def __init__(self, timeout, flush_interval=0, confirm_timeout=10):
+        self.timeout = timeout
+        self.confirm_timeout = confirm_timeout
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._channels = dict()
+        self._buffer = list()
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def publish(self, broker, destination, bodies):
+        messages = [(destination, body) for body in bodies]
+        if not messages:
+            return
+
+        with self._lock:
+            self._check_pid()
+            if self.flush_interval:
+                self._buffer.extend((broker, message) for message in messages)
+                self._start_flusher()
+            else:
+                self._send(broker, messages)
+
+    def flush(self):
+        """Publishes messages buffered, in the order they were buffered."""
+
+        with self._lock:
+            self._check_pid()
+            buffered, self._buffer = self._buffer, list()
+
+            by_broker = dict()
+            for broker, message in buffered:
+                by_broker.setdefault(broker, list()).append(message)
+
+            for broker, messages in by_broker.iteritems():
+                try:
+                    self._send(broker, messages)
+                except Exception:
+                    log.exception(u'Failure to publish %s messages to %s.',
+                                  len(messages), broker)
+
+    def _send(self, broker, messages):
+        # A connection closed by broker is only noticed when it is used,
+        # so a failed batch is retried once in a new connection. Messages
+        # nacked are retried once in the same connection. Messages acked
+        # are never published again.
+        for attempt in (1, 2):
+            channel = self._channels.get(broker)
+            try:
+                if channel is None:
+                    channel = _BrokerChannel(broker, self.timeout,
+                                             self.confirm_timeout)
+                    self._channels[broker] = channel
+                channel.publish(messages)
+                return
+            except PublishError, e:
+                if e.cause is not None:
+                    self._discard(broker)
+                # Broker may still deliver messages not confirmed in time,
+                # and the lock would be held for another timeout.
+                if attempt == 2 or isinstance(e.cause, socket.timeout):
+                    raise
+                messages = e.unconfirmed
+            except Exception:
+                self._discard(broker)
+                if attempt == 2:
+                    raise
+
+    def _discard(self, broker):
+        channel = self._channels.pop(broker, None)
+        if channel is not None:
+            channel.close()
+
+    def _check_pid(self):
+        # Connections of parent process can not be shared with a forked
+        # worker, it opens its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._channels = dict()
+            self._buffer = list()
+            self._flusher = None
+
+    def _start_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+
+        self._flusher = threading.Thread(target=self._run_flusher,
+                                         name='QueuePublisherFlush')
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+publisher = Publisher(float(BROKER_CONNECT_TIMEOUT), BROKER_FLUSH_INTERVAL,
+                      BROKER_CONFIRM_TIMEOUT)
+
+atexit.register(publisher.flush)
@@ -17,11 +17,7 @@ import json
 import logging
 import types
 
-from kombu import Connection
-from kombu import Exchange
-from kombu import Producer
-from kombu import Queue
-
+from networkapi.queue_tools.rabbitmq.publisher import publisher
 from networkapi.settings import BROKER_CONNECT_TIMEOUT
 from networkapi.settings import BROKER_DESTINATION
 from networkapi.settings import BROKER_URL
@@ -84,33 +80,15 @@ class QueueManager(object):
     def send(self):
 
         try:
-            # Connection
-            conn = Connection(self.broker)
-
-            # Channel
-            channel = conn.channel()
-
-            # Exchange
-            task_exchange = Exchange(self._exchange_name,
-                                     type=self._queue_type)
-
-            # Queues
-            if self._queue_name:
-                queue = Queue(name=self._queue_name, channel=channel,
-                              exchange=task_exchange,
-                              routing_key=self._routing_key)
-                queue.declare()
-
-            # Producer
-            producer = Producer(exchange=task_exchange, channel=channel,
-                                routing_key=self._routing_key)
+            destination = (self._exchange_name, self._queue_type,
+                           self._queue_name, self._routing_key)
 
-            # Send message
-            for message in self._msgs:
-                serialized_message = json.dumps(message, ensure_ascii=False)
-                producer.publish(serialized_message)
+            serialized_messages = [json.dumps(message, ensure_ascii=False)
+                                   for message in self._msgs]
 
-            conn.close()
+            # Connections, declarations and confirms are handled by the
+            # process-wide publisher
+            publisher.publish(self.broker, destination, serialized_messages)
 
         except Exception, e:
 
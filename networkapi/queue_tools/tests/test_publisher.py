@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import socket
+import unittest
+
+from mock import Mock
+from mock import patch
+
+from networkapi.queue_tools.rabbitmq import publisher
+from networkapi.queue_tools.rabbitmq.publisher import _BrokerChannel
+from networkapi.queue_tools.rabbitmq.publisher import PublishError
+from networkapi.queue_tools.rabbitmq.publisher import Publisher
+
+DESTINATION = ('tasks', 'direct', 'tasks', 'tasks')
+
+
+def broker_channel(*confirms):
+    """Returns a _BrokerChannel whose broker sends confirms, a list of
+    (method, args) called on each wait.
+    """
+
+    channel = _BrokerChannel.__new__(_BrokerChannel)
+    channel.confirm_timeout = 5
+    channel.producers = {DESTINATION: Mock()}
+    channel.delivery_tag = 0
+    channel.pending = set()
+    channel.acked = set()
+    channel.nacked = set()
+
+    confirms = list(confirms)
+
+    def wait(allowed_methods, timeout):
+        method, args = confirms.pop(0)
+        if isinstance(method, Exception):
+            raise method
+        getattr(channel, method)(*args)
+
+    channel.channel = Mock(wait=Mock(side_effect=wait))
+    return channel
+
+
+def messages(*bodies):
+    return [(DESTINATION, body) for body in bodies]
+
+
+class BrokerChannelTestCase(unittest.TestCase):
+
+    def test_messages_acked(self):
+        channel = broker_channel(('_on_ack', (2, True)), ('_on_ack', (3, 0)))
+
+        channel.publish(messages('a', 'b', 'c'))
+
+        self.assertEqual(set([1, 2, 3]), channel.acked)
+
+    def test_nack_with_requeue_flag(self):
+        # amqp calls nack callbacks with (delivery_tag, multiple, requeue)
+        channel = broker_channel(('_on_ack', (1, False)),
+                                 ('_on_nack', (3, True, False)))
+
+        with self.assertRaises(PublishError) as error:
+            channel.publish(messages('a', 'b', 'c'))
+
+        self.assertIsNone(error.exception.cause)
+        self.assertEqual(messages('b', 'c'), error.exception.unconfirmed)
+
+    def test_confirms_not_received_in_time(self):
+        channel = broker_channel(('_on_ack', (1, False)),
+                                 (socket.timeout(), None))
+
+        with self.assertRaises(PublishError) as error:
+            channel.publish(messages('a', 'b'))
+
+        self.assertIsInstance(error.exception.cause, socket.timeout)
+        self.assertEqual(messages('b'), error.exception.unconfirmed)
+
+
+class PublisherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = Publisher(2)
+        patcher = patch.object(publisher, '_BrokerChannel')
+        self.channel = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_only_nacked_messages_are_published_again(self):
+        self.channel.publish.side_effect = [
+            PublishError('nacked', messages('b')), None]
+
+        self.publisher.publish('vhost', DESTINATION, ['a', 'b'])
+
+        self.assertEqual(messages('b'),
+                         self.channel.publish.call_args_list[1][0][0])
+        self.assertFalse(self.channel.close.called)
+
+    def test_timeout_is_not_retried(self):
+        self.channel.publish.side_effect = PublishError(
+            'timeout', messages('a'), socket.timeout())
+
+        self.assertRaises(PublishError, self.publisher.publish,
+                          'vhost', DESTINATION, ['a'])
+        self.assertEqual(1, self.channel.publish.call_count)
+        self.assertTrue(self.channel.close.called)
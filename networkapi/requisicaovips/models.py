@@ -2267,6 +2267,12 @@ class ServerPool(BaseModel):
 
     log = logging.getLogger('ServerPool')
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'server_pool_members': 'serverpoolmember_set',
+        'vip_ports': 'vipporttopool_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'server_pool'
         managed = True
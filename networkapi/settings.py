@@ -39,6 +39,21 @@ NETWORKAPI_GELF_HOST = os.getenv('NETWORKAPI_GELF_HOST',
 
 LOG_QUEUE = os.getenv('NETWORKAPI_LOG_QUEUE', '0') == '1'
 
+# Buffers audit events of a request and writes them after the response,
+# in bulk. With AUDIT_LOG_ASYNC the buffer is written by a celery task.
+AUDIT_LOG_DEFERRED = os.getenv('NETWORKAPI_AUDIT_LOG_DEFERRED', '1') == '1'
+# Otherwise, buffers are written right after the response or, with
+# AUDIT_LOG_BACKGROUND, by a background thread of the process that writes
+# buffers of many requests together. Buffers queued for that thread are
+# only in memory: they are lost if the process is killed (SIGKILL, or a
+# deploy that does not wait for workers to exit).
+AUDIT_LOG_ASYNC = os.getenv('NETWORKAPI_AUDIT_LOG_ASYNC', '0') == '1'
+AUDIT_LOG_BACKGROUND = os.getenv(
+    'NETWORKAPI_AUDIT_LOG_BACKGROUND', '0') == '1'
+# Time in seconds that the Usuario of a django user stays in memcached.
+AUDIT_USUARIO_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_AUDIT_USUARIO_CACHE_TIME', 3600))
+
 # Aplicação rodando em modo Debug
 DEBUG = os.getenv('NETWORKAPI_DEBUG', '0') == '1'
 
@@ -270,6 +285,85 @@ SECRET_KEY = 'ry@zgop%w80_nu83#!tbz)m&7*i@1)d-+ki@5^d#%6-&^216sg'
 VLAN_CACHE_TIME = None
 EQUIPMENT_CACHE_TIME = None
 
+# Time in seconds that free-address indexes of networks stay in memcached.
+IP_ALLOCATION_INDEX_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_IP_ALLOCATION_INDEX_CACHE_TIME', 3600))
+
+# Time in seconds that VLAN numbers used by an environment and its equipments
+# stay in memcached. 0 disables the cache.
+VLAN_NUMBERS_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_VLAN_NUMBERS_CACHE_TIME', 0))
+
+# Lease in seconds of distributed locks. Leases are renewed while locks are
+# held, so this is how long locks of a crashed worker stay held.
+LOCK_LEASE_TIMEOUT = int(os.getenv('NETWORKAPI_LOCK_LEASE_TIMEOUT', 120))
+
+# Time in seconds that general permissions of user groups and individual
+# permissions of objects stay in memcached. 0 disables the cache.
+OBJECT_PERMISSION_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_OBJECT_PERMISSION_CACHE_TIME', 300))
+
+# Time in seconds that users authenticated by credentials stay in memcached
+# (0 disables the cache) and in the LRU of each process.
+AUTH_CACHE_TIME = int(os.getenv('NETWORKAPI_AUTH_CACHE_TIME', 300))
+AUTH_CACHE_LOCAL_TIME = int(os.getenv('NETWORKAPI_AUTH_CACHE_LOCAL_TIME', 60))
+AUTH_CACHE_LOCAL_SIZE = int(os.getenv('NETWORKAPI_AUTH_CACHE_LOCAL_SIZE', 1000))
+# Users of LDAP stay in memcached at most this time: until then, a password
+# changed in LDAP is still accepted if the user does not authenticate with
+# the new one.
+AUTH_CACHE_LDAP_TIME = int(os.getenv('NETWORKAPI_AUTH_CACHE_LDAP_TIME', 60))
+# Iterations of PBKDF2 of the passwords checked against memcached entries.
+AUTH_CACHE_HASH_ITERATIONS = int(os.getenv(
+    'NETWORKAPI_AUTH_CACHE_HASH_ITERATIONS', 10000))
+
+# Deploys of config in many equipments run in parallel by at most
+# DEPLOY_MAX_WORKERS threads, each with DEPLOY_EQUIPMENT_TIMEOUT seconds to
+# finish. With DEPLOY_ROLLBACK, network deploys are undone in every
+# equipment when any of them fails.
+DEPLOY_MAX_WORKERS = int(os.getenv('NETWORKAPI_DEPLOY_MAX_WORKERS', 8))
+DEPLOY_EQUIPMENT_TIMEOUT = int(os.getenv(
+    'NETWORKAPI_DEPLOY_EQUIPMENT_TIMEOUT', 300))
+DEPLOY_ROLLBACK = os.getenv('NETWORKAPI_DEPLOY_ROLLBACK', '0') == '1'
+
+# Channels of F5 BIG-IPs are reused by each process, with at most
+# F5_MAX_SESSIONS sessions by device. Version and session timeout of devices
+# are probed every F5_PROBE_CACHE_TIME seconds.
+F5_MAX_SESSIONS = int(os.getenv('NETWORKAPI_F5_MAX_SESSIONS', 4))
+F5_PROBE_CACHE_TIME = int(os.getenv('NETWORKAPI_F5_PROBE_CACHE_TIME', 300))
+
+# Time in seconds that states of pool members read from load balancers stay
+# in memcached, 0 disables the cache.
+POOL_MEMBER_STATE_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_POOL_MEMBER_STATE_CACHE_TIME', 30))
+
+# Seconds plugins wait for output of a command in equipment, 0 waits forever.
+PLUGIN_COMMAND_TIMEOUT = int(os.getenv('NETWORKAPI_PLUGIN_COMMAND_TIMEOUT', 600))
+
+# SSH connections of plugins are kept open for SSH_POOL_IDLE_TIMEOUT seconds
+# after use (0 closes them right away), at most SSH_POOL_MAX_SESSIONS by
+# equipment.
+SSH_POOL_MAX_SESSIONS = int(os.getenv('NETWORKAPI_SSH_POOL_MAX_SESSIONS', 2))
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv('NETWORKAPI_SSH_POOL_IDLE_TIMEOUT', 60))
+
+# Time in seconds that nodes discovered in SDN controllers stay in memcached,
+# 0 discovers them in every operation.
+SDN_INVENTORY_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_SDN_INVENTORY_CACHE_TIME', 30))
+
+# Generated config files older than CONFIG_FILES_MAX_AGE seconds are removed
+# from their directory, as NETWORK_CONFIG_FILES_PATH, when new ones are
+# written. Default 0 keeps them, as files may be used out of NetworkAPI.
+CONFIG_FILES_MAX_AGE = int(os.getenv(
+    'NETWORKAPI_CONFIG_FILES_MAX_AGE', 0))
+
+# Time in seconds that totals of searches paginated by cursor stay in
+# memcached, 0 counts them in every page.
+DATATABLE_TOTAL_CACHE_TIME = int(os.getenv(
+    'NETWORKAPI_DATATABLE_TOTAL_CACHE_TIME', 60))
+
+# Objects serialized at a time in list responses asked as stream.
+STREAM_CHUNK_SIZE = int(os.getenv('NETWORKAPI_STREAM_CHUNK_SIZE', 500))
+
 # List of callables that know how to import templates from various sources.
 MIDDLEWARE_CLASSES = (
     'networkapi.extra_logging.middleware.ExtraLoggingMiddleware',
@@ -387,6 +481,7 @@ INSTALLED_APPS += (
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
+        'networkapi.util.streaming.NDJSONRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
@@ -642,9 +737,15 @@ VIP_REALS_v6_CHECK = 'gerador_vips -i %s --id_ipv6 %s --port_ip %s --port_vip %s
 ##################################
 
 BROKER_CONNECT_TIMEOUT = os.getenv('NETWORKAPI_BROKER_CONNECT_TIMEOUT', '2')
+# Seconds to wait for the broker to confirm a batch of published messages.
+BROKER_CONFIRM_TIMEOUT = float(
+    os.getenv('NETWORKAPI_BROKER_CONFIRM_TIMEOUT', 10))
 BROKER_DESTINATION = os.getenv('NETWORKAPI_BROKER_DESTINATION', 'tasks')
 BROKER_URL = os.getenv('NETWORKAPI_BROKER_URL',
                        u'networkapi:networkapi@localhost:5672')
+# Interval in seconds to publish messages buffered in background.
+# 0 publishes messages when they are sent.
+BROKER_FLUSH_INTERVAL = float(os.getenv('NETWORKAPI_BROKER_FLUSH_INTERVAL', 0))
 
 
 ##################################
@@ -22,8 +22,19 @@ from settings import ALLOWED_HOSTS
 from settings import AMBLOG_MGMT
 from settings import APPLYED_CONFIG_REL_PATH
 from settings import ASSOCIATE_PERMISSION_AUTOMATICALLY
+from settings import AUDIT_LOG_ASYNC
+from settings import AUDIT_LOG_BACKGROUND
+from settings import AUDIT_LOG_DEFERRED
+from settings import AUDIT_USUARIO_CACHE_TIME
+from settings import AUTH_CACHE_HASH_ITERATIONS
+from settings import AUTH_CACHE_LDAP_TIME
+from settings import AUTH_CACHE_LOCAL_SIZE
+from settings import AUTH_CACHE_LOCAL_TIME
+from settings import AUTH_CACHE_TIME
+from settings import BROKER_CONFIRM_TIMEOUT
 from settings import BROKER_CONNECT_TIMEOUT
 from settings import BROKER_DESTINATION
+from settings import BROKER_FLUSH_INTERVAL
 from settings import BROKER_URL
 from settings import CACHE_BACKEND
 from settings import CACHES
@@ -38,14 +49,21 @@ from settings import CELERY_TASK_RESULT_EXPIRES
 from settings import CELERY_TASK_SERIALIZER
 from settings import CELERY_TIMEZONE
 from settings import CELERYD_PREFETCH_MULTIPLIER
+from settings import CONFIG_FILES_MAX_AGE
 from settings import CONFIG_FILES_PATH
 from settings import CONFIG_FILES_REL_PATH
 from settings import CONFIG_TEMPLATE_PATH
 from settings import DATABASES
+from settings import DATATABLE_TOTAL_CACHE_TIME
 from settings import DEBUG
 from settings import DEFAULT_CHARSET
+from settings import DEPLOY_EQUIPMENT_TIMEOUT
+from settings import DEPLOY_MAX_WORKERS
+from settings import DEPLOY_ROLLBACK
 from settings import DIVISAODC_MGMT
 from settings import EQUIPMENT_CACHE_TIME
+from settings import F5_MAX_SESSIONS
+from settings import F5_PROBE_CACHE_TIME
 from settings import FOREMAN_HOSTS_ENVIRONMENT_ID
 from settings import FOREMAN_PASSWORD
 from settings import FOREMAN_URL
@@ -57,10 +75,12 @@ from settings import INTERFACE_CONFIG_FILES_PATH
 from settings import INTERFACE_CONFIG_REL_PATH
 from settings import INTERFACE_CONFIG_TEMPLATE_PATH
 from settings import INTERFACE_CONFIG_TOAPPLY_REL_PATH
+from settings import IP_ALLOCATION_INDEX_CACHE_TIME
 from settings import KICKSTART_SO_LF
 from settings import LANGUAGE_CODE
 from settings import LEAF
 from settings import local_files
+from settings import LOCK_LEASE_TIMEOUT
 from settings import LOG_DAYS
 from settings import LOG_DB_LEVEL
 from settings import LOG_FILE
@@ -100,18 +120,21 @@ from settings import NETWORKIPV4_CREATE
 from settings import NETWORKIPV4_REMOVE
 from settings import NETWORKIPV6_CREATE
 from settings import NETWORKIPV6_REMOVE
+from settings import OBJECT_PERMISSION_CACHE_TIME
 from settings import OOB
 from settings import PATH_ACL
 from settings import PATH_TO_ADD_CONFIG
 from settings import PATH_TO_CONFIG
 from settings import PATH_TO_GUIDE
 from settings import PATH_TO_MV
+from settings import PLUGIN_COMMAND_TIMEOUT
 from settings import POOL_CREATE
 from settings import POOL_HEALTHCHECK
 from settings import POOL_MANAGEMENT_LB_METHOD
 from settings import POOL_MANAGEMENT_LIMITS
 from settings import POOL_MANAGEMENT_MEMBERS_STATUS
 from settings import POOL_MEMBER_PRIORITIES
+from settings import POOL_MEMBER_STATE_CACHE_TIME
 from settings import POOL_REAL_CHECK
 from settings import POOL_REAL_CHECK_BY_POOL
 from settings import POOL_REAL_CHECK_BY_VIP
@@ -128,13 +151,17 @@ from settings import REL_PATH_TO_CONFIG
 from settings import REST_FRAMEWORK
 from settings import ROOT_URLCONF
 from settings import SCRIPTS_DIR
+from settings import SDN_INVENTORY_CACHE_TIME
 from settings import SECRET_KEY
 from settings import SITE_ID
 from settings import SITE_ROOT
 from settings import SPECS
 from settings import SPN
+from settings import SSH_POOL_IDLE_TIMEOUT
+from settings import SSH_POOL_MAX_SESSIONS
 from settings import STATIC_ROOT
 from settings import STATIC_URL
+from settings import STREAM_CHUNK_SIZE
 from settings import TEMPLATE_CONTEXT_PROCESSORS
 from settings import TEMPLATE_DEBUG
 from settings import TEMPLATE_DIRS
@@ -171,6 +198,7 @@ from settings import VIP_REALS_v6_REMOVE
 from settings import VIP_REMOVE
 from settings import VLAN_CACHE_TIME
 from settings import VLAN_CREATE
+from settings import VLAN_NUMBERS_CACHE_TIME
 from settings import VLAN_REMOVE
 # import sys
 
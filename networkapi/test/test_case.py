@@ -6,6 +6,7 @@ import base64
 import json
 import logging
 
+from django.db import connection
 from django.test import TestCase
 
 from networkapi.settings import local_files
@@ -25,6 +26,19 @@ class NetworkApiTestCase(TestCase):
     def tearDown(self):
         pass
 
+    def count_queries(self, func, *args, **kwargs):
+        """Returns number of queries run by func and its result."""
+
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
+
+        return len(connection.queries) - start, result
+
     def load_json_file(self, file_name):
         return load_json(local_files(file_name))
 
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cache of users authenticated by credentials.
+
+There are two tiers, a small LRU in the process and memcached. Neither
+stores passwords. Memcached entries are keyed by username and keep a salted
+PBKDF2 of the password, that is checked on every hit; authenticating with
+another password replaces the entry. The LRU is keyed by an HMAC of the
+credentials with a secret of the process. Both are invalidated by a
+generation key bumped when a user or its groups change, so a stale entry is
+never used after a change.
+"""
+import cPickle as pickle
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.crypto import get_random_string
+from django.utils.crypto import pbkdf2
+
+from networkapi.settings import AUTH_CACHE_HASH_ITERATIONS
+from networkapi.settings import AUTH_CACHE_LDAP_TIME
+from networkapi.settings import AUTH_CACHE_LOCAL_SIZE
+from networkapi.settings import AUTH_CACHE_LOCAL_TIME
+from networkapi.settings import AUTH_CACHE_TIME
+from networkapi.util.cache_generation import bump_generation
+from networkapi.util.cache_generation import current_generation
+
+log = logging.getLogger(__name__)
+
+KEY_GENERATION = 'auth_credentials:generation'
+KEY_CREDENTIALS = 'auth_credentials:%s:%s'
+
+# Digests of the LRU are only meaningful in the process that made them.
+LOCAL_SECRET = os.urandom(32)
+
+
+class LocalLRUCache(object):
+
+    """Thread-safe LRU with TTL of pickled values."""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+
+            expires, entry_generation, data = entry
+            if expires < time.time() or entry_generation != generation:
+                return None
+
+            self._entries[key] = entry
+
+        return pickle.loads(data)
+
+    def set(self, key, generation, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.timeout, generation,
+                                  data)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRUCache(AUTH_CACHE_LOCAL_SIZE, AUTH_CACHE_LOCAL_TIME)
+
+
+def _join(*values):
+    return '\0'.join(
+        value.encode('utf-8') if isinstance(value, unicode) else str(value)
+        for value in values)
+
+
+def credentials_digest(username, password, user_ldap=None):
+    """Key of credentials in the LRU of the process."""
+
+    return hmac.new(LOCAL_SECRET, _join(username, password, user_ldap),
+                    sha256).hexdigest()
+
+
+def username_digest(username, user_ldap=None):
+    """Key of the username in memcached."""
+
+    return sha256(_join(username, user_ldap)).hexdigest()
+
+
+def password_hash(password, salt):
+    return pbkdf2(password, salt, AUTH_CACHE_HASH_ITERATIONS).encode('hex')
+
+
+def get_user(username, password, user_ldap=None):
+    """Returns (user cached for credentials or None, key to cache it).
+
+    Key carries the generation read before authentication, so a user
+    authenticated while the cache is invalidated is not cached as current.
+    """
+
+    if not AUTH_CACHE_TIME:
+        return None, None
+
+    key = (_generation(), username_digest(username, user_ldap),
+           credentials_digest(username, password, user_ldap))
+
+    if AUTH_CACHE_LOCAL_TIME:
+        user = local_cache.get(key[2], key[0])
+        if user is not None:
+            return user, key
+
+    user = None
+    entry = cache.get(KEY_CREDENTIALS % key[:2])
+    if entry is not None:
+        salt, hashed, cached_user = entry
+        if constant_time_compare(password_hash(password, salt), hashed):
+            user = cached_user
+
+    if user is not None and AUTH_CACHE_LOCAL_TIME:
+        local_cache.set(key[2], key[0], user)
+
+    return user, key
+
+
+def set_user(key, password, user):
+    """Caches user authenticated by password, with key of get_user."""
+
+    if key is None:
+        return
+
+    # A password changed in LDAP does not invalidate the cache, so it is
+    # only accepted for a short time after the change.
+    timeout = AUTH_CACHE_TIME
+    if getattr(user, 'user_ldap', None):
+        timeout = min(timeout, AUTH_CACHE_LDAP_TIME)
+
+    salt = get_random_string()
+    cache.set(KEY_CREDENTIALS % key[:2],
+              (salt, password_hash(password, salt), user), timeout)
+    if AUTH_CACHE_LOCAL_TIME:
+        local_cache.set(key[2], key[0], user)
+
+
+def invalidate_cache(sender, instance, **kwargs):
+    """Signal receiver that invalidates every user cached."""
+
+    local_cache.clear()
+    bump_generation(KEY_GENERATION, cache)
+
+
+def _generation():
+    return current_generation(KEY_GENERATION, cache)
@@ -22,10 +22,13 @@ import ldap
 from django.core.exceptions import MultipleObjectsReturned
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 
 from networkapi.models.BaseModel import BaseModel
 from networkapi.system import exceptions
 from networkapi.system.facade import get_value
+from networkapi.usuario import credential_cache
 from networkapi.util import convert_string_or_int_to_boolean
 
 
@@ -277,3 +280,9 @@ class UsuarioGrupo(BaseModel):
         except Exception, e:
             cls.log.error(u'Failure to search the UserGroup.')
             raise UsuarioError(e, u'Failure to search the UserGroup.')
+
+
+post_save.connect(credential_cache.invalidate_cache, sender=Usuario)
+post_delete.connect(credential_cache.invalidate_cache, sender=Usuario)
+post_save.connect(credential_cache.invalidate_cache, sender=UsuarioGrupo)
+post_delete.connect(credential_cache.invalidate_cache, sender=UsuarioGrupo)
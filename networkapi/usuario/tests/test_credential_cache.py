@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import patch
+
+from networkapi.usuario import credential_cache
+from networkapi.usuario.credential_cache import credentials_digest
+from networkapi.usuario.credential_cache import LocalLRUCache
+
+
+class LdapUser(object):
+
+    user_ldap = 'admin'
+
+
+class LocalLRUCacheTestCase(unittest.TestCase):
+
+    def test_get_returns_copy(self):
+        lru = LocalLRUCache(10, 60)
+        value = {'user': 'admin'}
+        lru.set('key', 1, value)
+
+        cached = lru.get('key', 1)
+
+        self.assertEquals(value, cached)
+        self.assertIsNot(value, cached)
+
+    def test_other_generation_is_a_miss(self):
+        lru = LocalLRUCache(10, 60)
+        lru.set('key', 1, 'admin')
+
+        self.assertIsNone(lru.get('key', 2))
+
+    def test_expired_is_a_miss(self):
+        lru = LocalLRUCache(10, -1)
+        lru.set('key', 1, 'admin')
+
+        self.assertIsNone(lru.get('key', 1))
+
+    def test_least_recently_used_is_evicted(self):
+        lru = LocalLRUCache(2, 60)
+        lru.set('a', 1, 'a')
+        lru.set('b', 1, 'b')
+        lru.get('a', 1)
+        lru.set('c', 1, 'c')
+
+        self.assertEquals('a', lru.get('a', 1))
+        self.assertIsNone(lru.get('b', 1))
+        self.assertEquals('c', lru.get('c', 1))
+
+
+class CredentialsDigestTestCase(unittest.TestCase):
+
+    def test_digest_does_not_contain_credentials(self):
+        digest = credentials_digest('admin', 'secret')
+
+        self.assertNotIn('secret', digest)
+        self.assertEquals(digest, credentials_digest('admin', 'secret'))
+        self.assertNotEquals(digest, credentials_digest('admin', 'secret2'))
+        self.assertNotEquals(digest, credentials_digest('admin\0secret', ''))
+
+
+@patch.object(credential_cache, 'AUTH_CACHE_HASH_ITERATIONS', 10)
+@patch.object(credential_cache, 'AUTH_CACHE_LOCAL_TIME', 0)
+class CredentialsCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        patcher = patch.object(credential_cache, 'cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, password, user=None):
+        cached, key = credential_cache.get_user('admin', password)
+        if cached is None and user is not None:
+            credential_cache.set_user(key, password, user)
+        return cached
+
+    def test_user_is_cached_without_password(self):
+        self.authenticate('secret', 'admin')
+
+        self.assertEquals('admin', self.authenticate('secret'))
+        self.assertNotIn('secret', repr(self.cache._cache.values()))
+
+    def test_other_password_is_a_miss(self):
+        self.authenticate('secret', 'admin')
+
+        self.assertIsNone(self.authenticate('other'))
+
+    def test_new_password_replaces_cached_one(self):
+        self.authenticate('secret', 'admin')
+        self.authenticate('changed', 'admin')
+
+        self.assertIsNone(self.authenticate('secret'))
+        self.assertEquals('admin', self.authenticate('changed'))
+
+    @patch.object(credential_cache, 'AUTH_CACHE_LDAP_TIME', -1)
+    def test_ldap_user_is_cached_for_ldap_time(self):
+        self.authenticate('secret', LdapUser())
+
+        self.assertIsNone(self.authenticate('secret'))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Generation counters of cached data.
+
+Keys of cached data include the current generation of a counter kept in
+the cache. Bumping the counter invalidates all of them at once; entries of
+previous generations are not read anymore and expire by themselves.
+"""
+import time
+
+from django.core.cache import cache as default_cache
+
+__all__ = ('current_generation', 'bump_generation')
+
+GENERATION_TIMEOUT = 86400
+
+
+def current_generation(key, cache=None):
+    """Returns current generation of counter key, starting it when it is
+    not in cache.
+    """
+
+    if cache is None:
+        cache = default_cache
+
+    generation = cache.get(key)
+    if generation is None:
+        generation = int(time.time())
+        # Another process may start it at the same time, keep the first
+        cache.add(key, generation, GENERATION_TIMEOUT)
+        generation = cache.get(key) or generation
+
+    return generation
+
+
+def bump_generation(key, cache=None):
+    """Starts a new generation of counter key."""
+
+    if cache is None:
+        cache = default_cache
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Generation was evicted, restart it from current time so keys of
+        # previous generations are not reused.
+        cache.set(key, int(time.time()), GENERATION_TIMEOUT)
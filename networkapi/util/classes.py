@@ -2,13 +2,20 @@
 from rest_framework.views import APIView
 
 from networkapi.extra_logging import local
+from networkapi.util.streaming import StreamedJSON
 
 
 class CustomAPIView(APIView):
 
-    def finalize_response(self, request, *args, **kwargs):
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Lists asked as stream are serialized while response is sent
+        if isinstance(getattr(response, 'data', None), StreamedJSON):
+            headers = dict((key, value) for key, value in response.items()
+                           if key.lower() != 'content-type')
+            response = response.data.response(response.status_code, headers)
+
         response = super(CustomAPIView, self)\
-            .finalize_response(request, *args, **kwargs)
+            .finalize_response(request, response, *args, **kwargs)
 
         response['X-Request-Context'] = local.request_context
         response['X-Request-Id'] = local.request_id,
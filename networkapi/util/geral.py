@@ -1,17 +1,14 @@
 # -*- coding: utf-8 -*-
 import copy
 import logging
-import random
 import urllib
-from time import sleep
 
 from django.db.models.loading import AppCache
 from django.db.models.loading import import_module
 from django.db.models.loading import module_has_submodule
 from rest_framework.response import Response
 
-from networkapi.distributedlock import distributedlock
-from networkapi.distributedlock import LockNotAcquiredError
+from networkapi.distributedlock import lock_manager
 from networkapi.extra_logging import local
 
 
@@ -43,16 +40,14 @@ class CustomResponse(Response):
 def create_lock(objects, lock_name):
     """Creates locks for list of objects"""
 
-    locks_list = list()
+    locks_name = list()
     for obj in objects:
         if isinstance(obj, dict):
-            lock = distributedlock(lock_name % obj['id'])
+            locks_name.append(lock_name % obj['id'])
         else:
-            lock = distributedlock(lock_name % obj)
-        lock.__enter__()
-        locks_list.append(lock)
+            locks_name.append(lock_name % obj)
 
-    return locks_list
+    return _acquire_locks(locks_name)
 
 
 def destroy_lock(locks_list):
@@ -66,26 +61,22 @@ def create_lock_with_blocking(locks_name):
     """
     Creates locks for list of objects.
     Tries to lock all objects, if can not, unlocks all
-    and tries again in 1 at 10 seconds.
+    and tries again after a backoff.
     """
 
-    locks_list = list()
-    for lock_name in locks_name:
-        try:
-            lock = distributedlock(lock_name, blocking=False)
-            lock.__enter__()
-            locks_list.append(lock)
-        except LockNotAcquiredError:
-            destroy_lock(locks_list)
-            break
+    return _acquire_locks(locks_name)
+
+
+def _acquire_locks(locks_name):
+    """Acquires all locks in a single batch of the lock manager.
 
-    if locks_name and not locks_list:
-        time_sleep = random.randint(1, 10)
-        log.warning('Trying lock in %s seconds' % time_sleep)
-        sleep(time_sleep)
-        create_lock_with_blocking(locks_name)
+    Returns a list with the batch, so it can be released by destroy_lock.
+    """
+
+    if not locks_name:
+        return list()
 
-    return locks_list
+    return [lock_manager.acquire(locks_name)]
 
 
 def url_search(obj_model, property_search, request):
@@ -137,10 +128,19 @@ def generate_return_json(obj_serializer, main_property, **kwargs):
         main_property: obj_serializer.data
     }
 
+    data.update(search_properties(**kwargs))
+
+    return data
+
+
+def search_properties(**kwargs):
+    """Returns properties of pagination of search of response."""
+
     request = kwargs.get('request', None)
     obj_model = kwargs.get('obj_model', None)
     only_main_property = kwargs.get('only_main_property', False)
 
+    data = dict()
     if not only_main_property and request:
 
         url_next_search = url_search(obj_model, 'next_search', request)
@@ -158,12 +158,34 @@ def generate_return_json(obj_serializer, main_property, **kwargs):
 
 
 def render_to_json(serializer_obj, **kwargs):
+    # Models import this module, that must not load the views of
+    # rest_framework when it is imported.
+    from networkapi.util.classes import CustomAPIView
+    from networkapi.util.streaming import stream_media_type
+    from networkapi.util.streaming import StreamedJSON
+
+    request = kwargs.get('request', None)
+    media_type = stream_media_type(request)
+
+    # Lists are streamed only by views that send StreamedJSON as
+    # StreamingHttpResponse
+    view = (getattr(request, 'parser_context', None) or dict()).get('view')
+    if media_type and getattr(serializer_obj, 'many', False) and \
+            isinstance(view, CustomAPIView):
+        data = StreamedJSON(serializer_obj, kwargs.get('main_property'),
+                            media_type)
+        data.update(search_properties(
+            obj_model=kwargs.get('obj_model', None),
+            request=request,
+            only_main_property=kwargs.get('only_main_property', False)
+        ))
+        return data
 
     data = generate_return_json(
         serializer_obj,
         kwargs.get('main_property'),
         obj_model=kwargs.get('obj_model', None),
-        request=kwargs.get('request', None),
+        request=request,
         only_main_property=kwargs.get('only_main_property', False)
     )
     return data
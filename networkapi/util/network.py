@@ -1,31 +1,120 @@
 # -*- coding: utf-8 -*-
 import logging
+from bisect import bisect_right
 
 from django.db.models.query_utils import Q
 
 from networkapi.api_network.exceptions import NetworkConflictException
+from networkapi.infrastructure.ipaddr import IPAddress
 from networkapi.infrastructure.ipaddr import IPNetwork
+from networkapi.infrastructure.ipaddr import summarize_address_range
 from networkapi.util.geral import get_app
 
 log = logging.getLogger(__name__)
 
 
+class FreeSpaceNetwork(object):
+
+    """Free space of networks given a list of used networks.
+
+    Used networks are kept as sorted and merged integer intervals (one list
+    per IP version), so it is built once for a VRF/equipment set and each
+    query only sweeps the used intervals inside the requested supernet.
+    """
+
+    def __init__(self, used_nets):
+        intervals = dict()
+        for used_net in used_nets:
+            intervals.setdefault(used_net.version, []).append(
+                (int(used_net.network), int(used_net.broadcast)))
+
+        self.starts = dict()
+        self.ends = dict()
+        for version, items in intervals.items():
+            items.sort()
+            starts = list()
+            ends = list()
+            for start, end in items:
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[version] = starts
+            self.ends[version] = ends
+
+    def _used_in(self, supernet):
+        """Yields used intervals that overlap supernet, clipped to it."""
+
+        first = int(supernet.network)
+        last = int(supernet.broadcast)
+        starts = self.starts.get(supernet.version, [])
+        ends = self.ends.get(supernet.version, [])
+
+        pos = bisect_right(starts, first) - 1
+        if pos < 0 or ends[pos] < first:
+            pos += 1
+
+        while pos < len(starts) and starts[pos] <= last:
+            yield max(starts[pos], first), min(ends[pos], last)
+            pos += 1
+
+    def free_networks(self, supernet):
+        """Return list of free subnets of supernet."""
+
+        version = supernet.version
+        free_nets = list()
+        current = int(supernet.network)
+
+        for start, end in self._used_in(supernet):
+            if current < start:
+                free_nets.extend(summarize_address_range(
+                    IPAddress(current, version=version),
+                    IPAddress(start - 1, version=version)))
+            current = end + 1
+
+        if current <= int(supernet.broadcast):
+            free_nets.extend(summarize_address_range(
+                IPAddress(current, version=version),
+                supernet.broadcast))
+
+        return free_nets
+
+    def first_free_subnet(self, supernet, new_prefix):
+        """Return first free subnet with prefix new_prefix inside supernet
+        or None if there is no space available.
+        """
+
+        if new_prefix < supernet.prefixlen or \
+                new_prefix > supernet.max_prefixlen:
+            return None
+
+        size = 1 << (supernet.max_prefixlen - new_prefix)
+        last = int(supernet.broadcast)
+        candidate = int(supernet.network)
+
+        for start, end in self._used_in(supernet):
+            if candidate + size - 1 < start:
+                break
+            # Next subnet aligned to prefix after used interval
+            candidate = max(candidate, (end // size + 1) * size)
+            if candidate > last:
+                return None
+
+        if candidate + size - 1 > last:
+            return None
+
+        return IPNetwork('%s/%s' % (
+            IPAddress(candidate, version=supernet.version), new_prefix))
+
+
 def get_free_space_network(free_nets, used_nets):
     """Return list of free subnets."""
 
-    for excluded_net in used_nets:
-        temp_net_list = list(free_nets)
-        free_nets = []
-        while temp_net_list:
-            temp_net = temp_net_list.pop()
-            used_nets = []
-            try:
-                used_nets = list(temp_net.address_exclude(excluded_net))
-            except ValueError:
-                used_nets = [temp_net]
-                pass
-            free_nets.extend(used_nets)
+    free_space = FreeSpaceNetwork(used_nets)
 
+    free_nets = reduce(list.__add__, [free_space.free_networks(free_net)
+                                      for free_net in free_nets], [])
     free_nets.sort()
 
     return free_nets
@@ -96,93 +185,225 @@ def validate_vlan_conflict(equips, num_vlan, exclude=None):
         raise models.VlanErrorV3(msg)
 
 
+def overlapping_networks(nets_a, nets_b):
+    """Return pairs of indexes (index in nets_a, index in nets_b) of networks
+    that overlap, using a sorted sweep instead of comparing every pair.
+    """
+
+    items = list()
+    for side, nets in enumerate((nets_a, nets_b)):
+        for idx, net in enumerate(nets):
+            # A larger network comes before the networks it contains
+            items.append((net.version, int(net.network),
+                          -int(net.broadcast), side, idx))
+    items.sort()
+
+    pairs = list()
+    # Networks containing the start of current network. As networks are
+    # CIDR blocks, they are nested, so a stack is enough.
+    active = list()
+    for version, start, end, side, idx in items:
+        end = -end
+        while active and (active[-1][0] != version or
+                          active[-1][2] < start):
+            active.pop()
+        for _, _, _, side_act, idx_act in active:
+            if side_act != side:
+                pairs.append((idx, idx_act) if side == 0
+                             else (idx_act, idx))
+        active.append((version, start, end, side, idx))
+
+    return pairs
+
+
+def _networks_by_vlan(vlans_ids):
+    """Return dict of vlan id => (list of IPv4 networks, list of IPv6
+    networks) of the vlans, in two queries.
+    """
+
+    models = get_app('ip', 'models')
+
+    nets = dict((vlan_id, (list(), list())) for vlan_id in vlans_ids)
+
+    netsv4 = models.NetworkIPv4.objects.filter(vlan__in=vlans_ids)\
+        .order_by('id')\
+        .values_list('vlan', 'oct1', 'oct2', 'oct3', 'oct4', 'block')
+    for vlan_id, oct1, oct2, oct3, oct4, block in netsv4:
+        nets[vlan_id][0].append(IPNetwork('{}.{}.{}.{}/{}'.format(
+            oct1, oct2, oct3, oct4, block)))
+
+    netsv6 = models.NetworkIPv6.objects.filter(vlan__in=vlans_ids)\
+        .order_by('id')\
+        .values_list('vlan', 'block1', 'block2', 'block3', 'block4',
+                     'block5', 'block6', 'block7', 'block8', 'block')
+    for netv6 in netsv6:
+        nets[netv6[0]][1].append(IPNetwork('{}/{}'.format(
+            ':'.join(netv6[1:9]), netv6[9])))
+
+    return nets
+
+
+def _network_conflict(vlans_ip, vlans_rel, vrfs_ip, vrfs_rel, nets):
+    """Return message of first conflict of networks between vlans of
+    environment of IP and vlans of environment related, or None.
+
+    Conflicts are reported in the same order that the former pairwise
+    validation found them: by vlan of IP, vlan related, IPv4 before IPv6,
+    network of IP inside of network related before the contrary.
+    """
+
+    msg = 'One of the equipment associated with the environment ' \
+        'of this Vlan is also associated with other environment ' \
+        'that has a network with the same track, add filters in ' \
+        'environments if necessary. Your Network: {}, Network ' \
+        'already created: {}'
+
+    conflict = None
+    for version in (0, 1):
+        items_ip = [(pos_vlan, pos_net, net)
+                    for pos_vlan, vlan_id in enumerate(vlans_ip)
+                    for pos_net, net in enumerate(nets[vlan_id][version])]
+        items_rel = [(pos_vlan, pos_net, net)
+                     for pos_vlan, vlan_id in enumerate(vlans_rel)
+                     for pos_net, net in enumerate(nets[vlan_id][version])]
+
+        pairs = overlapping_networks([item[2] for item in items_ip],
+                                     [item[2] for item in items_rel])
+
+        for idx_ip, idx_rel in pairs:
+            pos_vlan_ip, pos_net_ip, net_ip = items_ip[idx_ip]
+            pos_vlan_rel, pos_net_rel, net_rel = items_rel[idx_rel]
+
+            # Networks only make conflict when vlans share a vrf
+            if not vrfs_ip[vlans_ip[pos_vlan_ip]] & \
+                    vrfs_rel[vlans_rel[pos_vlan_rel]]:
+                continue
+
+            if net_ip in net_rel:
+                key = (pos_vlan_ip, pos_vlan_rel, version,
+                       0, pos_net_rel, pos_net_ip)
+            else:
+                key = (pos_vlan_ip, pos_vlan_rel, version,
+                       1, pos_net_ip, pos_net_rel)
+
+            if conflict is None or key < conflict[0]:
+                conflict = (key, msg.format(net_ip, net_rel))
+
+    return conflict[1] if conflict else None
+
+
 def validate_conflict_join_envs(env_ip, equipments):
+    """Verify if equipments can be related with environment of IP, checking
+    conflicts of VLAN numbers and networks (in same vrf) between environment
+    of IP and others environments of equipments.
+
+    Data of all environments involved is loaded in a few queries and
+    conflicts of networks are found by a sorted sweep.
+    """
 
-    models_env = get_app('ambiente', 'models')
+    models_eqpt = get_app('equipamento', 'models')
+    models_ip = get_app('ip', 'models')
+    models_vlan = get_app('vlan', 'models')
     models_vrf = get_app('api_vrf', 'models')
 
-    nums_vlan_rel_ip = [vlan.num_vlan for vlan in env_ip.vlans]
-
-    for equipment in equipments:
-
-        # Equipment without environment related, do not need validate
-        # Validate if equipment is not in related in environment
-        if equipment.id not in list(env_ip.eqpts):
-
-            # Validate if equipment has environments related
-            for env_rel in equipment.environments:
-                env_rel_eqpt = env_rel.ambiente
-
-                use_filter = True
-                if env_rel_eqpt.filter != env_ip.filter:
-                    use_filter = False
-
-                # Exists differents filters, so is need to validate
-                # all equipments
-                eqpts = env_rel_eqpt.filtered_eqpts \
-                    if use_filter else env_rel_eqpt.eqpts
-
-                eqpts_env_ip = env_ip.filtered_eqpts \
-                    if use_filter else env_ip.eqpts
-
-                # Verify if vlans of environment of IP make conflict in
-                # new relationship
-                nums_vlan_rel_eqpt = [vlan.num_vlan
-                                      for vlan in env_rel_eqpt.vlans]
-                vlans_conflict = list(
-                    set(nums_vlan_rel_eqpt) & set(nums_vlan_rel_ip))
-                if vlans_conflict:
-                    msg = 'VLANs {} already registred with same ' \
-                        'number in equipments of environment: {}'
-                    msg = msg.format(vlans_conflict, env_rel_eqpt.name)
-                    log.error(msg)
-                    raise models_env.IpErrorV3(msg)
-
-                # Verify if networks of environment of IP make conflict in new
-                # relationship
-                for vlan_rel_ip in env_ip.vlans:
-                    # Get vrfs of 1 vlan of environment of IP
-                    vrfs_vlan_rel_ip = models_vrf.Vrf.objects.filter(Q(
-                        Q(vrfvlanequipment__equipment__in=eqpts) &
-                        Q(vrfvlanequipment__vlan__id=vlan_rel_ip.id)) |
-                        Q(id=vlan_rel_ip.ambiente.default_vrf_id)
-                    )
-
-                    # Get vrfs of 1 vlan of environment related with
-                    # equipment
-                    for vlan_rel_eqpt in env_rel_eqpt.vlans:
-                        vrfs_vlan_rel_eqpt = models_vrf.Vrf.objects.filter(Q(
-                            Q(vrfvlanequipment__equipment__in=eqpts_env_ip) &
-                            Q(vrfvlanequipment__vlan__id=vlan_rel_eqpt.id)) |
-                            Q(id=vlan_rel_eqpt.ambiente.default_vrf_id)
-                        )
-
-                        # Validate conflict of network if has intersect
-                        # of vrfs
-                        vrfs_intersect = list(
-                            set(vrfs_vlan_rel_ip) & set(vrfs_vlan_rel_eqpt))
-
-                        if vrfs_intersect:
-
-                            netv4 = vrfs_vlan_rel_eqpt\
-                                .networkipv4_set.filter()
-                            netv6 = vrfs_vlan_rel_eqpt\
-                                .networkipv6_set.filter()
-                            netv4_eqpt = [IPNetwork(net.networkv4)
-                                          for net in netv4]
-                            netv6_eqpt = [IPNetwork(net.networkv6)
-                                          for net in netv6]
-
-                            netv4 = vrfs_vlan_rel_ip.networkipv4_set.filter()
-                            netv6 = vrfs_vlan_rel_ip.networkipv6_set.filter()
-                            netv4_ip = [IPNetwork(net.networkv4)
-                                        for net in netv4]
-                            netv6_ip = [IPNetwork(net.networkv6)
-                                        for net in netv6]
-
-                            verify_networks(netv4_ip, netv4_eqpt)
-                            verify_networks(netv6_ip, netv6_eqpt)
-                            # get nets de cada vlan e valida conflito
+    # Equipment without environment related, do not need validate
+    # Validate if equipment is not in related in environment
+    eqpts_env_ip = set(env_ip.eqpts)
+    eqpts_ids = [equipment.id for equipment in equipments
+                 if equipment.id not in eqpts_env_ip]
+    if not eqpts_ids:
+        return
+
+    # Environments related with equipments, in order of equipments
+    envs_rel = list()
+    envs_eqpts = models_eqpt.EquipamentoAmbiente.objects\
+        .filter(equipamento__in=eqpts_ids)\
+        .select_related('ambiente')\
+        .order_by('id')
+    envs_eqpts = sorted(envs_eqpts,
+                        key=lambda env_eqpt: eqpts_ids.index(
+                            env_eqpt.equipamento_id))
+    for env_eqpt in envs_eqpts:
+        if env_eqpt.ambiente not in envs_rel:
+            envs_rel.append(env_eqpt.ambiente)
+    if not envs_rel:
+        return
+
+    # Vlans of all environments
+    vlans = dict()
+    nums_vlan = dict()
+    vlans_env = models_vlan.Vlan.objects\
+        .filter(ambiente__in=[env_ip.id] + [env.id for env in envs_rel])\
+        .order_by('id')\
+        .values_list('id', 'num_vlan', 'ambiente')
+    for vlan_id, num_vlan, env_id in vlans_env:
+        vlans.setdefault(env_id, list()).append(vlan_id)
+        nums_vlan.setdefault(env_id, set()).add(num_vlan)
+
+    vlans_ip = vlans.get(env_ip.id, [])
+    nums_vlan_rel_ip = nums_vlan.get(env_ip.id, set())
+    vlans_ids = reduce(list.__add__, vlans.values(), [])
+
+    # Customized vrfs of vlans by equipment
+    vrfs_vlan_eqpt = dict()
+    vrf_vlan_eqpts = models_vrf.VrfVlanEquipment.objects\
+        .filter(vlan__in=vlans_ids)\
+        .values_list('vlan', 'equipment', 'vrf')
+    for vlan_id, eqpt_id, vrf_id in vrf_vlan_eqpts:
+        vrfs_vlan_eqpt.setdefault(vlan_id, list()).append((eqpt_id, vrf_id))
+
+    def get_vrfs(vlans_env, eqpts, default_vrf_id):
+        vrfs = dict()
+        for vlan_id in vlans_env:
+            vrfs[vlan_id] = set(vrf_id for eqpt_id, vrf_id
+                                in vrfs_vlan_eqpt.get(vlan_id, [])
+                                if eqpt_id in eqpts)
+            if default_vrf_id is not None:
+                vrfs[vlan_id].add(default_vrf_id)
+        return vrfs
+
+    nets = _networks_by_vlan(vlans_ids)
+
+    filtered_eqpts_env_ip = None
+
+    for env_rel_eqpt in envs_rel:
+
+        use_filter = True
+        if env_rel_eqpt.filter_id != env_ip.filter_id:
+            use_filter = False
+
+        # Exists differents filters, so is need to validate
+        # all equipments
+        if use_filter:
+            if filtered_eqpts_env_ip is None:
+                filtered_eqpts_env_ip = set(env_ip.filtered_eqpts)
+            eqpts = set(env_rel_eqpt.filtered_eqpts)
+            eqpts_ip = filtered_eqpts_env_ip
+        else:
+            eqpts = set(env_rel_eqpt.eqpts)
+            eqpts_ip = eqpts_env_ip
+
+        # Verify if vlans of environment of IP make conflict in
+        # new relationship
+        vlans_conflict = list(
+            nums_vlan.get(env_rel_eqpt.id, set()) & nums_vlan_rel_ip)
+        if vlans_conflict:
+            msg = 'VLANs {} already registred with same ' \
+                'number in equipments of environment: {}'
+            msg = msg.format(vlans_conflict, env_rel_eqpt.name)
+            log.error(msg)
+            raise models_ip.IpErrorV3(msg)
+
+        # Verify if networks of environment of IP make conflict in new
+        # relationship when vlans has vrfs in common
+        vlans_rel = vlans.get(env_rel_eqpt.id, [])
+        vrfs_ip = get_vrfs(vlans_ip, eqpts, env_ip.default_vrf_id)
+        vrfs_rel = get_vrfs(vlans_rel, eqpts_ip,
+                            env_rel_eqpt.default_vrf_id)
+
+        msg = _network_conflict(vlans_ip, vlans_rel, vrfs_ip, vrfs_rel, nets)
+        if msg:
+            raise NetworkConflictException(msg)
 
 
 def get_networks_related(vrfs, eqpts, has_netv4=True,
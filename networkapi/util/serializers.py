@@ -8,6 +8,83 @@ from networkapi.models.BaseManager import BaseQuerySet
 log = logging.getLogger(__name__)
 
 
+# Field plans kept by process, cleared when full
+FIELD_PLANS_SIZE = 1024
+# Levels of nested serializers whose relations are loaded with the queryset
+PREFETCH_DEPTH = 4
+
+_relations = dict()
+
+
+def get_relations(model):
+    """Returns dict of accessor name -> (related model, joined) of
+    relations of model, where joined relations are loaded with
+    select_related and the others with prefetch_related.
+    """
+
+    relations = _relations.get(model)
+    if relations is None:
+        opts = model._meta
+        relations = dict()
+        for field in opts.fields:
+            if field.rel:
+                relations[field.name] = (field.rel.to, True)
+        for field in opts.many_to_many:
+            relations[field.name] = (field.rel.to, False)
+        for related in opts.get_all_related_objects() + \
+                opts.get_all_related_many_to_many_objects():
+            relations[related.get_accessor_name()] = (related.model, False)
+        _relations[model] = relations
+
+    return relations
+
+
+def get_relation(model, name):
+    """Returns (accessor name, related model, joined) of relation read by
+    attribute name of model, or None.
+
+    Properties that only return all objects of a relation are declared in
+    property_relations of model.
+    """
+
+    name = getattr(model, 'property_relations', dict()).get(name, name)
+    relation = get_relations(model).get(name)
+    if relation is None:
+        return None
+    return (name,) + relation
+
+
+class FieldPlan(object):
+
+    """Fields, nested serializers and eager loadings of a serializer class
+    for a combination of fields, include, exclude, prohibited and kind.
+
+    Plans are compiled once by process and shared by serializers, so they
+    must not be changed, except for related paths set once when planned.
+    """
+
+    def __init__(self, all_fields, filtred_fields, mapping, serializers,
+                 allowed, forbidden, prohibited):
+        self.all_fields = all_fields
+        self.filtred_fields = filtred_fields
+        self.mapping = mapping
+        self.serializers = serializers
+        self.allowed = allowed
+        self.forbidden = forbidden
+        self.prohibited = prohibited
+        # (select_related paths, prefetch_related paths), by model
+        self.related = dict()
+
+    def drop(self, existing):
+        """Returns names of fields of serializer that are not rendered."""
+
+        drop = set(self.prohibited)
+        if self.allowed is not None:
+            drop |= existing - self.allowed
+        drop |= existing & self.forbidden
+        return drop
+
+
 class DynamicFieldsModelSerializer(serializers.ModelSerializer):
 
     """
@@ -17,6 +94,8 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
 
     mapping = dict()
 
+    _field_plans = dict()
+
     def __init__(self, *args, **kwargs):
 
         # Don't pass the 'fields' arg up to the superclass
@@ -26,16 +105,64 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
         prohibited = kwargs.pop('prohibited', tuple())
         kind = kwargs.pop('kind', None)
 
+        plan = self.get_field_plan(
+            bool(args), fields, include, exclude, prohibited, kind)
+        self.mapping = plan.mapping
+
+        if args:
+            args = (self.prepare_queryset(args[0], plan),) + args[1:]
+
+        # Instantiate the superclass normally
+        super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
+
+        # Prepare field for serializer
+        # Example: field: field_details | field: field
+        self.context = {'serializers': plan.serializers}
+        self._field_plan = plan
+        self._nested_serializers = dict()
+
+        for field_name in plan.drop(set(self.fields.keys())):
+            self.fields.pop(field_name, None)
+
+    def get_field_plan(self, has_args, fields, include, exclude, prohibited,
+                       kind):
+        """Returns FieldPlan of serializer class, compiled once by process
+        for each combination of arguments.
+        """
+
+        try:
+            key = (self.__class__, has_args, kind) + tuple(
+                (type(value), tuple(value))
+                for value in (fields, include, exclude, prohibited))
+            plan = self._field_plans.get(key)
+        except TypeError:
+            # unhashable arguments
+            key, plan = None, None
+
+        if plan is None:
+            plan = self.compile_field_plan(
+                has_args, fields, include, exclude, prohibited, kind)
+            if key is not None:
+                if len(self._field_plans) >= FIELD_PLANS_SIZE:
+                    self._field_plans.clear()
+                self._field_plans[key] = plan
+
+        return plan
+
+    def compile_field_plan(self, has_args, fields, include, exclude,
+                           prohibited, kind):
+
         try:
             self.get_serializers()
         except:
             self.mapping = dict()
 
+        # Copied when changed, as self.mapping may be shared by instances
+        mapping = dict(self.mapping)
+
         filtred_fields = tuple()
         all_fields = tuple()
-        if args:
-            queryset = args[0]
-
+        if has_args:
             if not fields:
                 try:
                     fields_class = None
@@ -58,48 +185,18 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
             filtred_fields = [self.get_main_key(field, kind)[0]
                               for field in all_fields]
 
-            if filtred_fields and type(queryset) == BaseQuerySet:
-                # import pdb; pdb.Pdb(skip=['django.*']).set_trace()  #
-                # breakpoint 184999ff //
-
-                # for key in all_fields:
-                # import pdb; pdb.Pdb(skip=['django.*']).set_trace()  #
-                # breakpoint 50ca06f4 //
-
-                #     queryset = self.recur(self, key, kind, queryset)
-
-                queryset = self.exec_eager_loading(filtred_fields, queryset)
-
-            args = (queryset,)
-
-        # Instantiate the superclass normally
-        super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
-
-        # Prepare field for serializer
-        self.context = {'serializers': dict()}
-
-        # Use default_fields when exists
-        existing = set(self.fields.keys())
-
+        allowed = None
         if filtred_fields:
             # Drop any fields that are not specified in the `fields` argument.
             allowed = set([field.split('__')[0] for field in filtred_fields])
 
-            for field_name in existing - allowed:
-                try:
-                    self.fields.pop(field_name)
-                except:
-                    pass
-
+        forbidden = set()
         if exclude:
             # Drop any fields that are specified in the `exclude` argument.
             forbidden = set([field.split('__')[0] for field in exclude])
-            for field_name in existing & forbidden:
-                try:
-                    self.fields.pop(field_name)
-                except:
-                    pass
 
+        serializers = dict()
+        prohibited_fields = list()
         for field in all_fields:
 
             field_filtered, other_fields = self.get_main_key(field, kind)
@@ -107,37 +204,105 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
             key_split = field_filtered.split('__')
             fd_key = key_split[0]
 
-            if self.mapping.get(field_filtered):
+            if mapping.get(field_filtered):
 
                 # remove field because is prohibited
                 if prohibited:
                     if other_fields in prohibited or field_filtered in prohibited or\
                             field in prohibited:
-                        self.fields.pop(field_filtered.split('__')[0])
+                        prohibited_fields.append(fd_key)
                         continue
 
                 if other_fields:
-                    param = self.mapping.get(
-                        field_filtered).get('kwargs', dict())
+                    slr_model = dict(mapping[field_filtered])
+                    param = dict(slr_model.get('kwargs', dict()))
 
-                    if param:
+                    param['include'] = \
+                        param.get('include', tuple()) + (other_fields,)
 
-                        inc_ser = param.get('include', tuple())
+                    slr_model['kwargs'] = param
+                    mapping[field_filtered] = slr_model
 
-                        self.mapping[field_filtered]['kwargs']['include'] = \
-                            inc_ser + (other_fields,)
-                    else:
-                        self.mapping[field_filtered].update({
-                            'kwargs': {
-                                'include': (other_fields,)
-                            }
-                        })
-
-                # Example: field: field_details | field: field
-                self.context['serializers'].update({
+                serializers.update({
                     fd_key: field_filtered
                 })
 
+        return FieldPlan(all_fields, filtred_fields, mapping, serializers,
+                         allowed, forbidden, prohibited_fields)
+
+    def prepare_queryset(self, queryset, plan):
+        """Applies eager loadings of fields of plan to queryset, and loads
+        relations rendered by nested serializers with it.
+
+        Querysets already evaluated, such as prefetched relations, are
+        not changed.
+        """
+
+        if plan.filtred_fields and type(queryset) == BaseQuerySet and \
+                queryset._result_cache is None:
+            queryset = self.exec_eager_loading(plan.filtred_fields, queryset)
+
+            select, prefetch = self.get_related_paths(plan, queryset.model)
+            if select:
+                queryset = queryset.select_related(*select)
+            if prefetch:
+                queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def get_related_paths(self, plan, model):
+        """Returns (select_related paths, prefetch_related paths) of
+        relations of model rendered by fields of plan, planned once.
+        """
+
+        related = plan.related.get(model)
+        if related is None:
+            select, prefetch = set(), set()
+            self.plan_related(plan, model, '', False, PREFETCH_DEPTH,
+                              select, prefetch)
+            related = (tuple(sorted(select)), tuple(sorted(prefetch)))
+            plan.related[model] = related
+
+        return related
+
+    def plan_related(self, plan, model, prefix, prefetched, depth, select,
+                     prefetch):
+        """Adds to select and prefetch paths of relations read by 'obj' of
+        mappings of fields of plan, and of their nested serializers down to
+        depth levels.
+        """
+
+        for fd_key, key in plan.serializers.items():
+            slr_model = plan.mapping.get(key) or dict()
+            if fd_key in plan.forbidden or slr_model.get('keys') or \
+                    not slr_model.get('obj'):
+                continue
+
+            relation = get_relation(model, slr_model['obj'])
+            if relation is None:
+                continue
+            name, related_model, joined = relation
+
+            path = prefix + name
+            if prefetched or not joined:
+                prefetch.add(path)
+            else:
+                select.add(path)
+
+            serializer = slr_model.get('serializer')
+            if depth > 1 and isinstance(serializer, type) and \
+                    issubclass(serializer, DynamicFieldsModelSerializer):
+                kwargs = slr_model.get('kwargs', dict())
+                # Only plans are compiled, serializer is not initialized
+                nested = serializer.__new__(serializer)
+                nested_plan = nested.get_field_plan(
+                    True, kwargs.get('fields', tuple()),
+                    kwargs.get('include', tuple()),
+                    kwargs.get('exclude', tuple()),
+                    kwargs.get('prohibited', tuple()), kwargs.get('kind'))
+                nested.plan_related(
+                    nested_plan, related_model, path + '__',
+                    prefetched or not joined, depth - 1, select, prefetch)
+
     def extends_serializer(self, obj, default_field):
 
         key = self.context.get('serializers').get(default_field, default_field)
@@ -174,15 +339,39 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
         else:
 
             try:
-                model_serializer = slr_model.get('serializer')(
-                    obj, **slr_model.get('kwargs', dict())
-                )
+                model_serializer = self.get_nested_serializer(obj, slr_model)
                 ret_srl = model_serializer.data
             except:
                 return None
 
             return ret_srl
 
+    def get_nested_serializer(self, obj, slr_model):
+        """Returns serializer of slr_model bound to obj.
+
+        Serializer is created for first object and reused for next objects
+        rendered by this serializer, as its fields do not change.
+        """
+
+        key = id(slr_model)
+        kwargs = slr_model.get('kwargs', dict())
+
+        model_serializer = self._nested_serializers.get(key)
+        if model_serializer is None or \
+                not isinstance(model_serializer, DynamicFieldsModelSerializer):
+            model_serializer = slr_model.get('serializer')(obj, **kwargs)
+            self._nested_serializers[key] = model_serializer
+        else:
+            if kwargs.get('many') and not hasattr(obj, '__iter__'):
+                raise ValueError(
+                    'instance should be a queryset or other iterable with '
+                    'many=True')
+            model_serializer.object = model_serializer.prepare_queryset(
+                obj, model_serializer._field_plan)
+            model_serializer._data = None
+
+        return model_serializer
+
     def get_main_key(self, key, kind):
 
         # split field
@@ -215,20 +404,20 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
         return key, fields_aux
 
     def exec_eager_loading(self, filted_fields, queryset):
-        try:
 
-            # get fields with prefetch_related
-            mapping = self.mapping
+        # get fields with prefetch_related
+        mapping = self.mapping
 
-            # For each field
-            for key in filted_fields:
-                # if has key
-                eager_loading = mapping.get(key, {}).get('eager_loading')
-                if eager_loading:
+        # For each field
+        for key in filted_fields:
+            # if has key
+            eager_loading = mapping.get(key, {}).get('eager_loading')
+            if eager_loading:
+                try:
                     queryset = eager_loading(queryset)
-        except Exception, e:
-            log.info(e)
-            pass
+                except Exception:
+                    log.exception('Failure in eager loading of field %s of '
+                                  '%s' % (key, self.__class__.__name__))
         return queryset
 
 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import logging
+from itertools import islice
+
+from django.db.models.query import prefetch_related_objects
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from networkapi.settings import STREAM_CHUNK_SIZE
+
+log = logging.getLogger(__name__)
+
+__all__ = ('JSON_MEDIA_TYPE', 'NDJSON_MEDIA_TYPE', 'NDJSONRenderer',
+           'stream_media_type', 'iter_chunks', 'StreamedJSON')
+
+JSON_MEDIA_TYPE = 'application/json'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+class NDJSONRenderer(JSONRenderer):
+
+    """Renders responses that are not streamed to clients that accept only
+    NDJSON, as one line of JSON.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        return json.dumps(data, cls=self.encoder_class,
+                          ensure_ascii=self.ensure_ascii) + '\n'
+
+
+def stream_media_type(request):
+    """Returns media type of response streamed to request, or None when
+    response is not streamed.
+
+    Response is streamed as NDJSON, one object by line, when client
+    accepts it, or as JSON with GET parameter stream=1. Properties of
+    NDJSON responses other than objects, such as total and next_search,
+    are sent in headers X-Total and X-Next-Search.
+    """
+
+    if request is None:
+        return None
+
+    if NDJSON_MEDIA_TYPE in request.META.get('HTTP_ACCEPT', ''):
+        return NDJSON_MEDIA_TYPE
+
+    if request.GET.get('stream', '').lower() in ('1', 'true'):
+        return JSON_MEDIA_TYPE
+
+    return None
+
+
+def iter_chunks(objects, chunk_size=None):
+    """Yields lists of at most chunk_size objects.
+
+    Querysets not evaluated yet are read with iterator(), so their objects
+    are not kept by queryset, and their prefetch_related lookups are loaded
+    by chunk.
+    """
+
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+
+    lookups = None
+    if isinstance(objects, QuerySet) and objects._result_cache is None:
+        lookups = objects._prefetch_related_lookups
+        objects = objects.iterator()
+
+    iterator = iter(objects)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        if lookups:
+            prefetch_related_objects(chunk, lookups)
+        yield chunk
+
+
+class StreamedJSON(dict):
+
+    """Data of a list response whose objects are serialized by chunks
+    while response is sent, instead of all of them before.
+
+    Other properties of response, such as total and next_search, are kept
+    as items of dict. They follow the list in JSON, and are sent as
+    headers in NDJSON, that has only objects as lines: next_search becomes
+    header X-Next-Search with its value encoded as JSON.
+
+    Args:
+            serializer: serializer with many=True
+            main_property: name of list of serialized objects
+            media_type: JSON_MEDIA_TYPE or NDJSON_MEDIA_TYPE
+            chunk_size: objects serialized at a time, defaults to
+                        STREAM_CHUNK_SIZE
+    """
+
+    def __init__(self, serializer, main_property, media_type=JSON_MEDIA_TYPE,
+                 chunk_size=None, **kwargs):
+        super(StreamedJSON, self).__init__(**kwargs)
+
+        self.serializer = serializer
+        self.main_property = main_property
+        self.media_type = media_type
+        self.chunk_size = chunk_size
+
+    def _encode(self, data):
+        # Same encoding of rest_framework JSONRenderer
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=True)
+
+    def _iter_objects(self):
+        for chunk in iter_chunks(self.serializer.object, self.chunk_size):
+            yield [self._encode(self.serializer.to_native(obj))
+                   for obj in chunk]
+
+    def iter_content(self):
+        """Yields encoded response by chunk of objects."""
+
+        try:
+            if self.media_type == NDJSON_MEDIA_TYPE:
+                for chunk in self._iter_objects():
+                    yield '\n'.join(chunk) + '\n'
+                return
+
+            yield '{%s: [' % self._encode(self.main_property)
+            separator = ''
+            for chunk in self._iter_objects():
+                yield separator + ', '.join(chunk)
+                separator = ', '
+            yield ']'
+
+            for key, value in self.items():
+                yield ', %s: %s' % (self._encode(key), self._encode(value))
+            yield '}'
+
+        except Exception:
+            # Status was already sent, client gets a truncated response
+            log.exception('Failure to stream %s of response.' %
+                          self.main_property)
+            raise
+
+    def property_headers(self):
+        """Returns headers of properties that NDJSON lines do not carry."""
+
+        if self.media_type != NDJSON_MEDIA_TYPE:
+            return dict()
+
+        return dict(('X-%s' % key.replace('_', '-').title(),
+                     self._encode(value))
+                    for key, value in self.items())
+
+    def response(self, status=None, headers=None):
+        """Returns StreamingHttpResponse of data."""
+
+        response = StreamingHttpResponse(self.iter_content(),
+                                         content_type=self.media_type,
+                                         status=status)
+        for key, value in self.property_headers().items():
+            response[key] = value
+        for key, value in (headers or dict()).items():
+            response[key] = value
+
+        return response
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from mock import patch
+
+from networkapi.util import cache_generation
+from networkapi.util.cache_generation import bump_generation
+from networkapi.util.cache_generation import current_generation
+
+
+class GenerationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        self.cache.clear()
+
+    def test_generation_is_kept(self):
+        generation = current_generation('generation', self.cache)
+
+        self.assertEquals(generation,
+                          current_generation('generation', self.cache))
+
+    def test_bump_starts_new_generation(self):
+        generation = current_generation('generation', self.cache)
+
+        bump_generation('generation', self.cache)
+
+        self.assertEquals(generation + 1,
+                          current_generation('generation', self.cache))
+
+    def test_evicted_generation_restarts_from_current_time(self):
+        with patch.object(cache_generation.time, 'time', return_value=100):
+            current_generation('generation', self.cache)
+        self.cache.delete('generation')
+
+        with patch.object(cache_generation.time, 'time', return_value=200):
+            bump_generation('generation', self.cache)
+
+            self.assertEquals(200,
+                              current_generation('generation', self.cache))
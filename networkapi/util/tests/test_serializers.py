@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.db.models import get_model
+from mock import patch
+from rest_framework import serializers
+
+from networkapi.api_equipment.serializers import BrandV3Serializer
+from networkapi.api_equipment.serializers import ModelV3Serializer
+from networkapi.util import serializers as util_serializers
+from networkapi.util.serializers import DynamicFieldsModelSerializer
+from networkapi.util.serializers import get_relation
+
+
+def models():
+    Marca = get_model('equipamento', 'Marca')
+    Modelo = get_model('equipamento', 'Modelo')
+
+    return [Modelo(id=i, nome='model-%s' % i,
+                   marca=Marca(id=10 + i, nome='brand-%s' % i))
+            for i in range(3)]
+
+
+class FieldPlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        DynamicFieldsModelSerializer._field_plans.clear()
+
+    def test_plan_is_compiled_once_by_arguments(self):
+        with patch.object(ModelV3Serializer, 'get_serializers',
+                          autospec=True,
+                          side_effect=ModelV3Serializer.get_serializers) \
+                as get_serializers:
+            for _ in range(3):
+                ModelV3Serializer(models(), many=True,
+                                  include=('brand__details',)).data
+            ModelV3Serializer(models(), many=True, kind='details').data
+
+        self.assertEqual(2, get_serializers.call_count)
+
+    def test_rendering_with_plan(self):
+        data = ModelV3Serializer(models()[:2], many=True,
+                                 include=('brand__details',)).data
+
+        self.assertEqual([
+            {'id': 0, 'name': 'model-0',
+             'brand': {'id': 10, 'name': 'brand-0'}},
+            {'id': 1, 'name': 'model-1',
+             'brand': {'id': 11, 'name': 'brand-1'}},
+        ], [dict(item, brand=dict(item['brand'])) for item in data])
+
+        data = ModelV3Serializer(models()[:1], many=True,
+                                 fields=('name',)).data
+        self.assertEqual([{'name': 'model-0'}], [dict(i) for i in data])
+
+    def test_nested_fields_do_not_change_plans_of_other_arguments(self):
+        nested = ModelV3Serializer(models(), many=True,
+                                   include=('brand__details__name',))
+        plain = ModelV3Serializer(models(), many=True,
+                                  include=('brand__details',))
+
+        self.assertEqual(('name',),
+                         nested.mapping['brand__details']['kwargs']['include'])
+        self.assertEqual({}, plain.mapping['brand__details']['kwargs'])
+
+    def test_nested_serializer_is_created_once_for_all_objects(self):
+        with patch.object(BrandV3Serializer, '__init__', autospec=True,
+                          side_effect=BrandV3Serializer.__init__) as init:
+            data = ModelV3Serializer(models(), many=True,
+                                     include=('brand__details',)).data
+
+        self.assertEqual(1, init.call_count)
+        self.assertEqual(['brand-0', 'brand-1', 'brand-2'],
+                         [item['brand']['name'] for item in data])
+
+
+class IpEquipmentSerializer(DynamicFieldsModelSerializer):
+
+    ip = serializers.SerializerMethodField('get_ip')
+
+    def get_ip(self, obj):
+        return self.extends_serializer(obj, 'ip')
+
+    def get_serializers(self):
+        if not self.mapping:
+            self.mapping = {
+                'ip': {
+                    'obj': 'ip_id'
+                },
+                'ip__details': {
+                    'obj': 'ip'
+                },
+            }
+
+    class Meta:
+        model = get_model('ip', 'IpEquipamento')
+        fields = (
+            'id',
+            'ip',
+        )
+
+
+class EquipmentSerializer(DynamicFieldsModelSerializer):
+
+    model = serializers.SerializerMethodField('get_model')
+    ipsv4 = serializers.SerializerMethodField('get_ipsv4')
+
+    def get_model(self, obj):
+        return self.extends_serializer(obj, 'model')
+
+    def get_ipsv4(self, obj):
+        return self.extends_serializer(obj, 'ipsv4')
+
+    def get_serializers(self):
+        if not self.mapping:
+            self.mapping = {
+                'model': {
+                    'obj': 'modelo_id'
+                },
+                'model__details': {
+                    'serializer': ModelV3Serializer,
+                    'kwargs': {
+                        'include': ('brand__details',)
+                    },
+                    'obj': 'modelo'
+                },
+                'ipsv4': {
+                    'serializer': IpEquipmentSerializer,
+                    'kwargs': {
+                        'many': True,
+                    },
+                    'obj': 'ipv4_equipment_virtual_interface'
+                },
+                'ipsv4__details': {
+                    'serializer': IpEquipmentSerializer,
+                    'kwargs': {
+                        'many': True,
+                        'kind': 'details'
+                    },
+                    'obj': 'ipv4_equipment_virtual_interface'
+                },
+            }
+
+    class Meta:
+        model = get_model('equipamento', 'Equipamento')
+        fields = (
+            'id',
+            'model',
+            'ipsv4',
+        )
+
+
+class RelatedPathsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        DynamicFieldsModelSerializer._field_plans.clear()
+
+    def related(self, queryset):
+        query = queryset.query
+        return query.select_related, tuple(queryset._prefetch_related_lookups)
+
+    def test_relations_of_fields_are_loaded_with_queryset(self):
+        Modelo = get_model('equipamento', 'Modelo')
+
+        serializer = ModelV3Serializer(Modelo.objects.all(), many=True,
+                                       include=('brand__details',))
+
+        self.assertEqual(({'marca': {}}, ()), self.related(serializer.object))
+
+    def test_relations_of_nested_serializers_are_loaded_with_queryset(self):
+        Equipamento = get_model('equipamento', 'Equipamento')
+
+        serializer = EquipmentSerializer(
+            Equipamento.objects.all(), many=True,
+            include=('model__details', 'ipsv4__details'))
+
+        self.assertEqual(
+            ({'modelo': {'marca': {}}},
+             ('ipequipamento_set', 'ipequipamento_set__ip')),
+            self.related(serializer.object))
+
+    def test_ids_are_rendered_without_relations(self):
+        Equipamento = get_model('equipamento', 'Equipamento')
+
+        serializer = EquipmentSerializer(
+            Equipamento.objects.all(), many=True, fields=('id', 'model'))
+
+        self.assertEqual((False, ()), self.related(serializer.object))
+
+    def test_relations_of_properties(self):
+        Equipamento = get_model('equipamento', 'Equipamento')
+        IpEquipamento = get_model('ip', 'IpEquipamento')
+        Modelo = get_model('equipamento', 'Modelo')
+
+        self.assertEqual(
+            ('ipequipamento_set', IpEquipamento, False),
+            get_relation(Equipamento, 'ipv4_equipment_virtual_interface'))
+        self.assertEqual(('modelo', Modelo, True),
+                         get_relation(Equipamento, 'modelo'))
+        self.assertIsNone(get_relation(Equipamento, 'modelo_id'))
+
+    def test_evaluated_queryset_is_not_changed(self):
+        Modelo = get_model('equipamento', 'Modelo')
+        queryset = Modelo.objects.all()
+        queryset._result_cache = []
+
+        serializer = ModelV3Serializer(queryset, many=True,
+                                       include=('brand__details',))
+
+        self.assertIs(queryset, serializer.object)
+
+    def test_failure_of_eager_loading_is_logged(self):
+        Modelo = get_model('equipamento', 'Modelo')
+
+        def eager_loading(queryset):
+            raise ValueError('invalid')
+
+        mapping = {
+            'brand__details': {
+                'serializer': BrandV3Serializer,
+                'obj': 'marca',
+                'eager_loading': eager_loading
+            }
+        }
+
+        with patch.object(ModelV3Serializer, 'mapping', mapping), \
+                patch.object(util_serializers, 'log') as log:
+            serializer = ModelV3Serializer(Modelo.objects.all(), many=True,
+                                           include=('brand__details',))
+
+        self.assertEqual(1, log.exception.call_count)
+        self.assertEqual({'marca': {}}, self.related(serializer.object)[0])
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+from django.db.models import get_model
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from mock import Mock
+from mock import patch
+from rest_framework.response import Response
+
+from networkapi.api_equipment.serializers import ModelV3Serializer
+from networkapi.util import streaming
+from networkapi.util.classes import CustomAPIView
+from networkapi.util.streaming import NDJSON_MEDIA_TYPE
+from networkapi.util.streaming import StreamedJSON
+
+
+def models(size=3):
+    Marca = get_model('equipamento', 'Marca')
+    Modelo = get_model('equipamento', 'Modelo')
+
+    return [Modelo(id=i, nome='model-%s' % i,
+                   marca=Marca(id=10 + i, nome='brand-%s' % i))
+            for i in range(size)]
+
+
+def request(accept='', **params):
+    return Mock(META={'HTTP_ACCEPT': accept}, GET=params)
+
+
+class StreamMediaTypeTestCase(unittest.TestCase):
+
+    def test_ndjson_is_streamed_when_accepted(self):
+        self.assertEqual(NDJSON_MEDIA_TYPE, streaming.stream_media_type(
+            request('application/x-ndjson, application/json')))
+
+    def test_json_is_streamed_with_parameter(self):
+        self.assertEqual(streaming.JSON_MEDIA_TYPE,
+                         streaming.stream_media_type(request(stream='1')))
+        self.assertIsNone(streaming.stream_media_type(request(stream='0')))
+        self.assertIsNone(streaming.stream_media_type(request()))
+        self.assertIsNone(streaming.stream_media_type(None))
+
+
+class IterChunksTestCase(unittest.TestCase):
+
+    def test_objects_by_chunk(self):
+        self.assertEqual([[0, 1], [2, 3], [4]],
+                         list(streaming.iter_chunks(range(5), 2)))
+
+    def test_queryset_is_iterated_and_prefetched_by_chunk(self):
+        objects = models(3)
+        queryset = Mock(spec=QuerySet, _result_cache=None,
+                        _prefetch_related_lookups=['marca'])
+        queryset.iterator.return_value = iter(objects)
+
+        with patch.object(streaming, 'prefetch_related_objects') as prefetch:
+            chunks = list(streaming.iter_chunks(queryset, 2))
+
+        self.assertEqual([objects[:2], objects[2:]], chunks)
+        self.assertEqual([((objects[:2], ['marca']),),
+                          ((objects[2:], ['marca']),)],
+                         prefetch.call_args_list)
+
+
+class StreamedJSONTestCase(unittest.TestCase):
+
+    def serializer(self, size=3):
+        return ModelV3Serializer(models(size), many=True,
+                                 include=('brand__details',))
+
+    def test_json_is_same_of_response_rendered_at_once(self):
+        data = StreamedJSON(self.serializer(), 'models', chunk_size=2)
+        data.update({'total': 3, 'next_search': None})
+
+        content = ''.join(data.iter_content())
+
+        self.assertEqual({'models': self.serializer().data, 'total': 3,
+                          'next_search': None}, json.loads(content))
+
+    def test_empty_list(self):
+        data = StreamedJSON(self.serializer(0), 'models')
+
+        self.assertEqual('{"models": []}', ''.join(data.iter_content()))
+
+    def test_ndjson_has_one_object_by_line(self):
+        data = StreamedJSON(self.serializer(), 'models', NDJSON_MEDIA_TYPE,
+                            chunk_size=2)
+        data.update({'total': 3})
+
+        lines = ''.join(data.iter_content()).splitlines()
+
+        self.assertEqual(self.serializer().data,
+                         [json.loads(line) for line in lines])
+
+    def test_ndjson_sends_other_properties_as_headers(self):
+        next_search = {'start_record': 3, 'end_record': 6}
+        data = StreamedJSON(self.serializer(), 'models', NDJSON_MEDIA_TYPE)
+        data.update({'total': 3, 'next_search': next_search})
+
+        response = data.response(200)
+
+        self.assertEqual('3', response['X-Total'])
+        self.assertEqual(next_search, json.loads(response['X-Next-Search']))
+        self.assertEqual(3, len(''.join(response.streaming_content)
+                                .splitlines()))
+
+    def test_json_sends_no_property_headers(self):
+        data = StreamedJSON(self.serializer(), 'models')
+        data.update({'total': 3})
+
+        self.assertFalse(data.response(200).has_header('X-Total'))
+
+    def test_view_sends_streaming_response(self):
+        view = CustomAPIView()
+        view.headers = {}
+        data = StreamedJSON(self.serializer(), 'models', NDJSON_MEDIA_TYPE)
+
+        with patch('networkapi.util.classes.local'):
+            response = view.finalize_response(
+                Mock(), Response(data, status=200))
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(NDJSON_MEDIA_TYPE, response['Content-Type'])
+        self.assertEqual(3, len(''.join(response.streaming_content)
+                                .splitlines()))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.db import transaction
+
+from networkapi.util.transaction_hooks import on_commit
+
+
+class OnCommitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def callback(self):
+        self.calls.append('called')
+
+    def test_called_at_once_out_of_transaction(self):
+        on_commit(self.callback)
+
+        self.assertEqual(['called'], self.calls)
+
+    def test_called_after_commit(self):
+        with transaction.commit_manually():
+            on_commit(self.callback)
+            self.assertEqual([], self.calls)
+
+            transaction.commit()
+
+        self.assertEqual(['called'], self.calls)
+
+    def test_discarded_by_rollback(self):
+        with transaction.commit_manually():
+            on_commit(self.callback)
+            transaction.rollback()
+
+            transaction.commit()
+
+        self.assertEqual([], self.calls)
+
+    def test_failure_of_callback_does_not_stop_others(self):
+        def fail():
+            raise ValueError()
+
+        with transaction.commit_manually():
+            on_commit(fail)
+            on_commit(self.callback)
+            transaction.commit()
+
+        self.assertEqual(['called'], self.calls)
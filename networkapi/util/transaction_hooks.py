@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Callbacks run after the transaction of a connection is committed.
+
+Django 1.5 has no transaction.on_commit. Callbacks registered inside a
+managed transaction (commit_on_success, commit_manually) are kept in the
+connection, that is local to the thread, and are called after commit() or
+discarded by rollback(). Out of a managed transaction, changes were
+already committed when they were made, so callbacks are called at once.
+
+Savepoints are not tracked: callbacks registered after a savepoint that is
+rolled back are still called when the transaction is committed.
+"""
+import logging
+
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends import BaseDatabaseWrapper
+
+log = logging.getLogger(__name__)
+
+__all__ = ('on_commit',)
+
+_commit = BaseDatabaseWrapper.commit
+_rollback = BaseDatabaseWrapper.rollback
+
+
+def on_commit(func, using=None):
+    """Calls func when changes made so far in the transaction of using
+    are committed.
+    """
+
+    connection = connections[using or DEFAULT_DB_ALIAS]
+
+    if connection.is_managed():
+        connection.__dict__.setdefault('commit_callbacks', []).append(func)
+    else:
+        func()
+
+
+def _commit_and_call(self):
+    _commit(self)
+
+    for func in self.__dict__.pop('commit_callbacks', None) or ():
+        try:
+            func()
+        except Exception:
+            log.exception(u'Failure to call %s after commit.' % func)
+
+
+def _rollback_and_discard(self):
+    self.__dict__.pop('commit_callbacks', None)
+    _rollback(self)
+
+
+BaseDatabaseWrapper.commit = _commit_and_call
+BaseDatabaseWrapper.rollback = _rollback_and_discard
@@ -8,6 +8,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.db.models import get_model
 from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 
 from networkapi.admin_permission import AdminPermission
 from networkapi.distributedlock import LOCK_ENVIRONMENT_ALLOCATES
@@ -22,12 +24,14 @@ from networkapi.settings import MAX_VLAN_NUMBER_01
 from networkapi.settings import MAX_VLAN_NUMBER_02
 from networkapi.settings import MIN_VLAN_NUMBER_01
 from networkapi.settings import MIN_VLAN_NUMBER_02
+from networkapi.settings import VLAN_NUMBERS_CACHE_TIME
 from networkapi.util import clone
 from networkapi.util import network
 from networkapi.util.decorators import cached_property
 from networkapi.util.geral import create_lock_with_blocking
 from networkapi.util.geral import destroy_lock
 from networkapi.util.geral import get_app
+from networkapi.vlan import numbers
 
 
 class VlanError(Exception):
@@ -240,6 +244,12 @@ class Vlan(BaseModel):
 
     networks_ipv6 = property(_get_networks_ipv6)
 
+    # Relations returned by properties, loaded by serializers
+    property_relations = {
+        'networks_ipv4': 'networkipv4_set',
+        'networks_ipv6': 'networkipv6_set',
+    }
+
     class Meta(BaseModel.Meta):
         db_table = u'vlans'
         managed = True
@@ -1507,59 +1517,73 @@ class Vlan(BaseModel):
             max_num_02 = MAX_VLAN_NUMBER_02
 
         # Calculate Number VLAN
-        self.num_vlan = self.calculate_vlan_number_v3(min_num_01, max_num_01)
+        used_numbers = self.get_used_vlan_numbers()
+        self.num_vlan = self.calculate_vlan_number_v3(
+            min_num_01, max_num_01, used_numbers=used_numbers)
         if self.num_vlan is None:
             self.num_vlan = self.calculate_vlan_number_v3(
-                min_num_02, max_num_02)
+                min_num_02, max_num_02, used_numbers=used_numbers)
             if self.num_vlan is None:
                 raise VlanNumberNotAvailableError(
                     None, u'Number VLAN unavailable for environment %d.'
                     % self.ambiente.id)
 
-    def calculate_vlan_number_v3(self, min_num, max_num, list_available=False):
+    def get_used_vlan_numbers(self):
+        """Returns VlanNumbers used in environment of vlan and in others
+        environments that has equipments of environment of vlan.
+        """
+
+        # Find equipment's ids from environmnet that is 'switches',
+        # 'roteadores' or 'balanceadores'
+        id_equipamentos = self.get_eqpt()
+
+        if VLAN_NUMBERS_CACHE_TIME:
+            id_equipamentos = list(id_equipamentos)
+            used_numbers = numbers.get_cached(
+                self.ambiente_id, id_equipamentos)
+            if used_numbers is not None:
+                return used_numbers
+
+        # Vlan numbers in the same environment or in environments that has
+        # equipments found in before filter
+        vlan_numbers = Vlan.objects.filter(
+            Q(ambiente__id=self.ambiente_id) |
+            Q(ambiente__equipamentoambiente__equipamento__id__in=id_equipamentos)
+        ).values_list('num_vlan', flat=True).distinct()
+
+        used_numbers = numbers.VlanNumbers(vlan_numbers)
+
+        numbers.set_cached(self.ambiente_id, id_equipamentos, used_numbers)
+
+        return used_numbers
+
+    def calculate_vlan_number_v3(self, min_num, max_num, list_available=False,
+                                 used_numbers=None):
         """Caculate if has a number available in range (min_num/max_num) to
         specified environment
 
         @param min_num: Minimum number that the vlan can be created.
         @param max_num: Maximum number that the vlan can be created.
         @param list_available: If = True, return the list of numbers availables
+        @param used_numbers: VlanNumbers already found by
+                             get_used_vlan_numbers.
 
-        @return: None when hasn't a number available | num_vlan when found
-                 a number available
+        @return: None when hasn't a number available | lowest num_vlan
+                 available
         """
 
-        interval = range(min_num, max_num + 1)
-
-        # Vlan numbers in interval in the same environment
-        vlan_numbers_in_interval = self.search_vlan_numbers(
-            self.ambiente_id, min_num, max_num)
+        if used_numbers is None:
+            used_numbers = self.get_used_vlan_numbers()
 
-        # Find equipment's ids from environmnet that is 'switches',
-        # 'roteadores' or 'balanceadores'
-        id_equipamentos = self.get_eqpt()
-
-        # Vlan numbers in others environment but in environment that has
-        # equipments found in before filter ('switches', 'roteadores' or
-        # 'balanceadores')
-        vlans_others_environments = Vlan.objects.exclude(
-            ambiente__id=self.ambiente_id
-        ).filter(
-            ambiente__equipamentoambiente__equipamento__id__in=id_equipamentos
-        ).values_list('num_vlan', flat=True)
+        if list_available:
+            return used_numbers.free_numbers(min_num, max_num)
 
-        # Clean duplicates numbers and update merge 'vlan_numbers_in_interval'
-        # with 'vlans_others_environments'
-        vlan_numbers_in_interval = set(vlan_numbers_in_interval)
-        vlan_numbers_in_interval.update(vlans_others_environments)
+        num_vlan = used_numbers.first_free(min_num, max_num)
+        self.log.debug('Number available in interval %s-%s: %s.',
+                       min_num, max_num, num_vlan)
 
-        self.log.debug('Interval: %s.', interval)
-        self.log.debug('VLANs in interval: %s.', vlan_numbers_in_interval)
+        return num_vlan
 
-        diff_set = set(interval) - set(vlan_numbers_in_interval)
-        self.log.debug('Difference in the lists: %s.', diff_set)
 
-        if list_available:
-            return diff_set
-        for num_vlan in diff_set:
-            return num_vlan
-        return None
+post_save.connect(numbers.invalidate_cache, sender=Vlan)
+post_delete.connect(numbers.invalidate_cache, sender=Vlan)
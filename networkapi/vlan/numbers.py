@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+from hashlib import sha1
+
+from django.core.cache import cache
+
+from networkapi.settings import VLAN_NUMBERS_CACHE_TIME
+from networkapi.util.cache_generation import bump_generation
+from networkapi.util.cache_generation import current_generation
+
+log = logging.getLogger(__name__)
+
+KEY_GENERATION = 'vlan_numbers:generation'
+KEY_VLAN_NUMBERS = 'vlan_numbers:%s:%s:%s'
+
+
+class VlanNumbers(object):
+
+    """Bitmap of the 4096 VLAN numbers.
+
+    A bit is set when the number is used by the environment or by an
+    environment that shares equipments with it.
+    """
+
+    SIZE = 4096
+
+    def __init__(self, numbers=(), bitmap=0):
+        self.bitmap = bitmap
+        for number in numbers:
+            self.add(number)
+
+    def add(self, number):
+        if 0 <= number < self.SIZE:
+            self.bitmap |= 1 << number
+
+    def __contains__(self, number):
+        return 0 <= number < self.SIZE and bool(self.bitmap >> number & 1)
+
+    def _free_mask(self, min_num, max_num):
+        min_num = max(min_num, 0)
+        max_num = min(max_num, self.SIZE - 1)
+        if min_num > max_num:
+            return 0
+
+        interval = ((1 << (max_num - min_num + 1)) - 1) << min_num
+        return interval & ~self.bitmap
+
+    def first_free(self, min_num, max_num):
+        """Returns lowest free number in [min_num, max_num] or None."""
+
+        free = self._free_mask(min_num, max_num)
+        if not free:
+            return None
+        return (free & -free).bit_length() - 1
+
+    def free_numbers(self, min_num, max_num):
+        """Returns set of free numbers in [min_num, max_num]."""
+
+        free = self._free_mask(min_num, max_num)
+        numbers = set()
+        while free:
+            lowest = free & -free
+            numbers.add(lowest.bit_length() - 1)
+            free ^= lowest
+        return numbers
+
+
+def get_cached(environment_id, equipments):
+    """Returns VlanNumbers cached for environment and equipments or None."""
+
+    if not VLAN_NUMBERS_CACHE_TIME:
+        return None
+
+    bitmap = cache.get(_cache_key(environment_id, equipments))
+    if bitmap is None:
+        return None
+    return VlanNumbers(bitmap=bitmap)
+
+
+def set_cached(environment_id, equipments, vlan_numbers):
+
+    if not VLAN_NUMBERS_CACHE_TIME:
+        return
+
+    cache.set(_cache_key(environment_id, equipments), vlan_numbers.bitmap,
+              VLAN_NUMBERS_CACHE_TIME)
+
+
+def invalidate_cache(sender, instance, **kwargs):
+    """Signal receiver that invalidates every cached VlanNumbers."""
+
+    if not VLAN_NUMBERS_CACHE_TIME:
+        return
+
+    bump_generation(KEY_GENERATION, cache)
+
+
+def _cache_key(environment_id, equipments):
+    generation = current_generation(KEY_GENERATION, cache)
+
+    digest = sha1(','.join(str(eqpt) for eqpt in sorted(equipments)))\
+        .hexdigest()
+
+    return KEY_VLAN_NUMBERS % (generation, environment_id, digest)
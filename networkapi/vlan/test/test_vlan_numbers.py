@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from django.core.cache import get_cache
+from django.db.models.signals import post_save
+from mock import Mock
+from mock import patch
+
+from networkapi.equipamento.models import EquipamentoAmbiente
+from networkapi.vlan import models as vlan_models
+from networkapi.vlan import numbers
+from networkapi.vlan.models import Vlan
+from networkapi.vlan.numbers import VlanNumbers
+
+
+class VlanNumbersTestCase(unittest.TestCase):
+
+    def test_first_free_returns_lowest_number(self):
+        vlan_numbers = VlanNumbers([2, 3, 4, 7])
+
+        self.assertEquals(5, vlan_numbers.first_free(2, 1001))
+        self.assertEquals(8, vlan_numbers.first_free(7, 1001))
+        self.assertIsNone(vlan_numbers.first_free(2, 4))
+
+    def test_first_free_in_second_range(self):
+        vlan_numbers = VlanNumbers(range(2, 1002))
+
+        self.assertIsNone(vlan_numbers.first_free(2, 1001))
+        self.assertEquals(1006, vlan_numbers.first_free(1006, 4094))
+
+    def test_first_free_limits_range(self):
+        vlan_numbers = VlanNumbers([4095])
+
+        self.assertIsNone(vlan_numbers.first_free(4095, 5000))
+        self.assertEquals(0, vlan_numbers.first_free(-10, 10))
+        self.assertIsNone(vlan_numbers.first_free(10, 2))
+
+    def test_free_numbers(self):
+        vlan_numbers = VlanNumbers([10, 12])
+
+        self.assertEquals(set([11, 13]), vlan_numbers.free_numbers(10, 13))
+
+    def test_contains(self):
+        vlan_numbers = VlanNumbers([1, 4094, 9999])
+
+        self.assertIn(1, vlan_numbers)
+        self.assertIn(4094, vlan_numbers)
+        self.assertNotIn(2, vlan_numbers)
+        self.assertNotIn(9999, vlan_numbers)
+
+
+class VlanNumbersCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        cache = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        cache.clear()
+
+        # Numbers of VLANs in the environment and in the environments of
+        # its equipments.
+        self.vlan_numbers = [2, 3]
+        objects = Mock()
+        objects.filter.return_value.values_list.return_value.distinct\
+            .side_effect = lambda: list(self.vlan_numbers)
+
+        for target, attribute, value in (
+                (numbers, 'cache', cache),
+                (numbers, 'VLAN_NUMBERS_CACHE_TIME', 300),
+                (vlan_models, 'VLAN_NUMBERS_CACHE_TIME', 300),
+                (Vlan, 'objects', objects),
+                (Vlan, 'get_eqpt', Mock(return_value=[1]))):
+            patcher = patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.vlan = Vlan(ambiente_id=10)
+
+    def test_numbers_are_cached(self):
+        self.assertEquals(4, self.vlan.calculate_vlan_number_v3(2, 100))
+
+        self.vlan_numbers.append(4)
+
+        self.assertEquals(4, self.vlan.calculate_vlan_number_v3(2, 100))
+
+    def test_linking_equipment_to_environment_invalidates_numbers(self):
+        self.assertEquals(4, self.vlan.calculate_vlan_number_v3(2, 100))
+
+        # Equipment 1 is linked to an environment with VLAN 4
+        self.vlan_numbers.append(4)
+        post_save.send(sender=EquipamentoAmbiente,
+                       instance=EquipamentoAmbiente(equipamento_id=1,
+                                                    ambiente_id=20),
+                       created=True)
+
+        self.assertEquals(5, self.vlan.calculate_vlan_number_v3(2, 100))
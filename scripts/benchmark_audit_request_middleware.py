@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of TrackingRequestOnThreadLocalMiddleware for read requests.
+
+Compares the former process_request, which authenticated the user and
+resolved its Usuario on every request, with the current middleware, that
+defers both until an event is audited. Reports time and number of queries
+per GET request with basic authentication.
+
+Usage:
+    python manage.py runscript benchmark_audit_request_middleware \
+        --script-args="<user> <password>"
+    python manage.py runscript benchmark_audit_request_middleware \
+        --script-args="<user> <password> 1000"
+"""
+import base64
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+
+from networkapi.api_rest.authentication import BasicAuthentication
+from networkapi.eventlog.models import AuditRequest
+from networkapi.extra_logging import local
+from networkapi.middlewares import TrackingRequestOnThreadLocalMiddleware
+from networkapi.rest import RestResource
+
+PATH = '/api/v3/vip-request/'
+
+
+class LegacyTrackingMiddleware(TrackingRequestOnThreadLocalMiddleware):
+
+    """Former process_request."""
+
+    def process_request(self, request):
+        if not request.user.is_anonymous():
+            ip = self._get_ip(request)
+            context = local.request_context
+            identity = local.request_id
+
+            AuditRequest.new_request(request.get_full_path(), request.user,
+                                     ip, identity, context)
+        else:
+            user_auth_tuple = BasicAuthentication().authenticate(request)
+
+            if user_auth_tuple is not None:
+                user, token = user_auth_tuple
+            else:
+                user = RestResource.authenticate_user(request)
+
+            if user is not None:
+                ip = self._get_ip(request)
+                context = local.request_context
+                identity = local.request_id
+                AuditRequest.new_request(request.get_full_path(), user,
+                                         ip, identity, context)
+
+    def process_response(self, request, response):
+        AuditRequest.cleanup_request()
+        return response
+
+
+def new_request(factory, username, password):
+    credentials = base64.b64encode('%s:%s' % (username, password))
+    request = factory.get(PATH, HTTP_AUTHORIZATION='Basic %s' % credentials)
+    request.user = AnonymousUser()
+    return request
+
+
+def timed(middleware, requests):
+    queries = 0
+    response = HttpResponse()
+    start = time.time()
+    for request in requests:
+        count = len(connection.queries)
+        middleware.process_request(request)
+        middleware.process_response(request, response)
+        queries += len(connection.queries) - count
+    return time.time() - start, queries
+
+
+def run(*args):
+    if len(args) < 2:
+        print 'Usage: --script-args="<user> <password> [requests]"'
+        return
+
+    username, password = args[0], args[1]
+    size = int(args[2]) if len(args) > 2 else 500
+
+    # Counting queries needs them to be recorded.
+    settings.DEBUG = True
+
+    factory = RequestFactory()
+    middlewares = (
+        ('process_request (former)', LegacyTrackingMiddleware()),
+        ('process_request (lazy)', TrackingRequestOnThreadLocalMiddleware()),
+    )
+
+    print 'GET requests: %s' % size
+    for name, middleware in middlewares:
+        requests = [new_request(factory, username, password)
+                    for i in xrange(size)]
+        elapsed, queries = timed(middleware, requests)
+        print '  %s: %.4fs (%.3fms/request) %.2f queries/request' % (
+            name, elapsed, 1000.0 * elapsed / size, float(queries) / size)
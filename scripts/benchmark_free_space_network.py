@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of free space computation used by allocate_network_v3.
+
+Compares the former get_free_space_network (one address_exclude for every
+used network) with FreeSpaceNetwork on synthetic topologies of used /24
+networks spread over a 10.0.0.0/8 supernet.
+
+Usage:
+    python manage.py runscript benchmark_free_space_network
+    python manage.py runscript benchmark_free_space_network \
+        --script-args="1000 10000"
+"""
+import random
+import time
+
+from networkapi.infrastructure.ipaddr import IPNetwork
+from networkapi.util.network import FreeSpaceNetwork
+
+SUPERNET = IPNetwork('10.0.0.0/8')
+NEW_PREFIX = 24
+# Former implementation is quadratic, so bigger topologies only run with
+# the new one.
+LEGACY_MAX_USED = 2000
+
+
+def legacy_get_free_space_network(free_nets, used_nets):
+    """Former get_free_space_network."""
+
+    for excluded_net in used_nets:
+        temp_net_list = list(free_nets)
+        free_nets = []
+        while temp_net_list:
+            temp_net = temp_net_list.pop()
+            used_nets = []
+            try:
+                used_nets = list(temp_net.address_exclude(excluded_net))
+            except ValueError:
+                used_nets = [temp_net]
+                pass
+            free_nets.extend(used_nets)
+
+    free_nets.sort()
+
+    return free_nets
+
+
+def legacy_first_free_subnet(supernet, used_nets, new_prefix):
+    for free_net in legacy_get_free_space_network([supernet], used_nets):
+        try:
+            return free_net.iter_subnets(new_prefix=new_prefix).next()
+        except Exception:
+            pass
+
+
+def synthetic_topology(size):
+    """Returns size random used /24 networks of SUPERNET."""
+
+    random.seed(size)
+    blocks = random.sample(xrange(2 ** 16), size)
+    return [IPNetwork('10.%s.%s.0/24' % (block >> 8, block & 255))
+            for block in blocks]
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def run(*args):
+    sizes = [int(arg) for arg in args] or [1000, 10000]
+
+    for size in sizes:
+        used_nets = synthetic_topology(size)
+
+        free_space, build_time = timed(FreeSpaceNetwork, used_nets)
+        subnet, query_time = timed(
+            free_space.first_free_subnet, SUPERNET, NEW_PREFIX)
+        free_nets, list_time = timed(free_space.free_networks, SUPERNET)
+
+        print 'used networks: %s' % size
+        print '  FreeSpaceNetwork build: %.4fs first free /%s: %.6fs ' \
+            '(%s) free list: %.4fs (%s networks)' % (
+                build_time, NEW_PREFIX, query_time, subnet, list_time,
+                len(free_nets))
+
+        if size > LEGACY_MAX_USED:
+            print '  get_free_space_network (former): skipped, more ' \
+                'than %s used networks' % LEGACY_MAX_USED
+            continue
+
+        legacy_subnet, legacy_time = timed(
+            legacy_first_free_subnet, SUPERNET, used_nets, NEW_PREFIX)
+        print '  get_free_space_network (former): %.4fs (%s)' % (
+            legacy_time, legacy_subnet)
+
+        if legacy_subnet != subnet:
+            print '  WARNING: results differ'
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of memory of list responses rendered at once and streamed.
+
+Gets a list endpoint with a search of every object, as one JSON document
+built in memory, streamed as JSON (stream=1) and streamed as NDJSON. Each
+mode runs in a forked process and reports the growth of its peak RSS,
+time and size of response.
+
+With seed, the database is seeded with that many equipments, in the
+group of an existing equipment so the user can read them, and they are
+removed at the end.
+
+Usage:
+    python manage.py runscript benchmark_streaming_json \
+        --script-args="<user> <password>"
+    python manage.py runscript benchmark_streaming_json \
+        --script-args="<user> <password> /api/v4/equipment/ 20000"
+"""
+import base64
+import json
+import os
+import resource
+import time
+import urllib
+
+from django.db import connection
+from django.db import transaction
+from django.test.client import Client
+
+from networkapi.equipamento.models import Equipamento
+from networkapi.equipamento.models import EquipamentoGrupo
+from networkapi.equipamento.models import Modelo
+from networkapi.equipamento.models import TipoEquipamento
+from networkapi.util.streaming import NDJSON_MEDIA_TYPE
+
+PATH = '/api/v4/equipment/'
+SEED_PREFIX = 'benchmark-stream-'
+SEED_BATCH = 1000
+
+MODES = (
+    ('at once', {}, {}),
+    ('stream json', {'stream': '1'}, {}),
+    ('stream ndjson', {}, {'HTTP_ACCEPT': NDJSON_MEDIA_TYPE}),
+)
+
+
+def peak_rss():
+    # kilobytes in linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@transaction.commit_on_success
+def seed(size):
+    modelo = Modelo.objects.all()[0]
+    tipo = TipoEquipamento.objects.all()[0]
+    egrupo = EquipamentoGrupo.objects.all()[0].egrupo
+
+    for start in xrange(0, size, SEED_BATCH):
+        Equipamento.objects.bulk_create([
+            Equipamento(nome='%s%s' % (SEED_PREFIX, i), modelo=modelo,
+                        tipo_equipamento=tipo, maintenance=False)
+            for i in xrange(start, min(size, start + SEED_BATCH))])
+
+    ids = Equipamento.objects.filter(
+        nome__startswith=SEED_PREFIX).values_list('id', flat=True)
+    EquipamentoGrupo.objects.bulk_create([
+        EquipamentoGrupo(egrupo=egrupo, equipamento_id=equipment_id)
+        for equipment_id in ids])
+
+
+@transaction.commit_on_success
+def unseed():
+    EquipamentoGrupo.objects.filter(
+        equipamento__nome__startswith=SEED_PREFIX).delete()
+    Equipamento.objects.filter(nome__startswith=SEED_PREFIX).delete()
+
+
+def get(path, authorization, params, headers):
+    search = {
+        'start_record': 0,
+        'end_record': 10 ** 9,
+        'asorting_cols': ['id'],
+        'searchable_columns': [],
+        'extends_search': []
+    }
+    params = dict(params, search=json.dumps(search))
+    url = '%s?%s' % (path, urllib.urlencode(params))
+
+    response = Client().get(url, HTTP_AUTHORIZATION=authorization, **headers)
+
+    size = 0
+    if response.streaming:
+        for chunk in response.streaming_content:
+            size += len(chunk)
+    else:
+        size = len(response.content)
+
+    return response.status_code, size
+
+
+def measure(path, authorization, params, headers):
+    """Returns (status, size, seconds, growth of peak RSS in KB) of
+    request made in a forked process.
+    """
+
+    # Child opens its own connection
+    connection.close()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            before = peak_rss()
+            start = time.time()
+            status, size = get(path, authorization, params, headers)
+            result = (status, size, time.time() - start, peak_rss() - before)
+            os.write(write_fd, json.dumps(result))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    data = os.read(read_fd, 4096)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    return json.loads(data)
+
+
+def run(*args):
+    if len(args) < 2:
+        print 'Usage: --script-args="<user> <password> [path] [seed]"'
+        return
+
+    username, password = args[0], args[1]
+    path = args[2] if len(args) > 2 else PATH
+    size = int(args[3]) if len(args) > 3 else 0
+
+    authorization = 'Basic %s' % base64.b64encode(
+        '%s:%s' % (username, password))
+
+    if size:
+        print 'Seeding %s equipments' % size
+        seed(size)
+
+    try:
+        print 'GET %s' % path
+        for name, params, headers in MODES:
+            status, length, elapsed, growth = measure(
+                path, authorization, params, headers)
+            print '  %s: status %s, %.1fMB in %.2fs, peak RSS +%.1fMB' % (
+                name, status, length / 1048576.0, elapsed, growth / 1024.0)
+    finally:
+        if size:
+            unseed()
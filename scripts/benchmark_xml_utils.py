@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of XML of API v1 written and read by xml_utils and by minidom.
+
+Builds a listing of vlans like the ones of VlanFindResource, writes it
+with dumps and dumps_minidom and reads it with loads and loads_minidom.
+Each one runs in a forked process and reports time and growth of its peak
+RSS.
+
+Usage:
+    python manage.py runscript benchmark_xml_utils
+    python manage.py runscript benchmark_xml_utils --script-args="50000"
+"""
+import json
+import os
+import resource
+import time
+
+from networkapi.infrastructure import xml_utils
+
+SIZE = 10000
+
+
+def peak_rss():
+    # kilobytes in linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def listing(size):
+    return {'vlan': [{
+        'id': i,
+        'nome': 'VLAN_%s' % i,
+        'num_vlan': i % 4096,
+        'descricao': u'Descrição da vlan %s' % i,
+        'ativada': True,
+        'acl_file_name': None,
+        'ambiente': {'id': 3, 'nome': 'DC-FE-ORQ'},
+        'redeipv4': [{'id': i, 'oct1': 10, 'oct2': i % 256, 'oct3': 0,
+                      'oct4': 0, 'bloco': 24}],
+    } for i in xrange(size)]}
+
+
+def measure(function, *args):
+    """Returns (seconds, growth of peak RSS in KB) of function called in a
+    forked process.
+    """
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            before = peak_rss()
+            start = time.time()
+            function(*args)
+            result = (time.time() - start, peak_rss() - before)
+            os.write(write_fd, json.dumps(result))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    data = os.read(read_fd, 4096)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    return json.loads(data)
+
+
+def run(*args):
+    size = int(args[0]) if args else SIZE
+
+    map = listing(size)
+    xml = xml_utils.dumps_networkapi(map)
+
+    print '%s vlans, %.1fMB of XML' % (size, len(xml) / 1048576.0)
+    attributes = {'versao': '1.0'}
+    for name, function, call_args in (
+            ('dumps_minidom', xml_utils.dumps_minidom,
+             (map, 'networkapi', attributes)),
+            ('dumps', xml_utils.dumps, (map, 'networkapi', attributes)),
+            ('loads_minidom', xml_utils.loads_minidom, (xml, ['vlan'])),
+            ('loads', xml_utils.loads, (xml, ['vlan']))):
+        elapsed, growth = measure(function, *call_args)
+        print '  %s: %.2fs, peak RSS +%.1fMB' % (name, elapsed,
+                                                 growth / 1024.0)
+
+    # After measures, not to raise peak RSS inherited by forked processes
+    if xml != xml_utils.dumps_minidom(map, 'networkapi', attributes):
+        print 'XML of dumps differs from dumps_minidom'
+    if xml_utils.loads(xml, ['vlan']) != xml_utils.loads_minidom(xml,
+                                                                 ['vlan']):
+        print 'Map of loads differs from loads_minidom'